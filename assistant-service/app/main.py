@@ -13,12 +13,12 @@ This service:
 import logging
 from contextlib import asynccontextmanager
 
+from cartographer_usage import UsageTrackingMiddleware
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
 from .config import reload_env_overrides, settings
 from .routers.assistant import router as assistant_router
-from .services.usage_middleware import UsageTrackingMiddleware
 
 # Configure logging
 logging.basicConfig(
@@ -112,7 +112,7 @@ This service provides intelligent assistance by:
     )
 
     # Usage tracking middleware - reports endpoint usage to metrics service
-    app.add_middleware(UsageTrackingMiddleware, service_name="assistant-service")
+    app.add_middleware(UsageTrackingMiddleware, service_name="assistant-service", settings=settings)
 
     # Include routers
     app.include_router(assistant_router, prefix="/api")
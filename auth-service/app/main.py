@@ -12,6 +12,7 @@ import sys
 from contextlib import asynccontextmanager
 from pathlib import Path
 
+from cartographer_usage import UsageTrackingMiddleware
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -19,7 +20,6 @@ from .config import reload_env_overrides, settings
 from .routers.auth import router as auth_router
 from .routers.health import router as health_router
 from .routers.webhooks import router as webhooks_router
-from .services.usage_middleware import UsageTrackingMiddleware
 
 # Configure logging
 logging.basicConfig(
@@ -182,7 +182,7 @@ def create_app() -> FastAPI:
     )
 
     # Usage tracking middleware - reports endpoint usage to metrics service
-    app.add_middleware(UsageTrackingMiddleware, service_name="auth-service")
+    app.add_middleware(UsageTrackingMiddleware, service_name="auth-service", settings=settings)
 
     # Include routers
     app.include_router(auth_router, prefix="/api/auth")
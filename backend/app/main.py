@@ -8,6 +8,7 @@ including middleware, routers, and lifecycle management.
 import logging
 from contextlib import asynccontextmanager
 
+from cartographer_usage import UsageTrackingMiddleware
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -27,7 +28,6 @@ from .routers.notification_proxy import router as notification_proxy_router
 from .routers.static import create_static_router, mount_assets
 from .services.cache_service import cache_service
 from .services.http_client import http_pool, register_all_services
-from .services.usage_middleware import UsageTrackingMiddleware
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
@@ -137,7 +137,13 @@ def create_app() -> FastAPI:
     )
 
     # Usage tracking middleware - reports endpoint usage to metrics service
-    app.add_middleware(UsageTrackingMiddleware, service_name="backend")
+    app.add_middleware(
+        UsageTrackingMiddleware,
+        service_name="backend",
+        settings=settings,
+        excluded_paths={"/favicon.png"},
+        excluded_prefixes=("/assets", "/api/metrics/usage"),
+    )
 
     # Internal health endpoints (no /api prefix)
     app.include_router(health_router)
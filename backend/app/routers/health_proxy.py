@@ -122,6 +122,53 @@ async def clear_monitored_devices(user: AuthenticatedUser = Depends(require_writ
     return await proxy_health_request("DELETE", "/monitoring/devices")
 
 
+@router.get("/monitoring/networks/{network_id}/devices")
+async def get_network_devices(network_id: str, user: AuthenticatedUser = Depends(require_auth)):
+    """Proxy get one network's monitored devices. Requires authentication."""
+    return await proxy_health_request("GET", f"/monitoring/networks/{network_id}/devices")
+
+
+@router.put("/monitoring/networks/{network_id}/devices")
+async def replace_network_devices(
+    network_id: str, request: Request, user: AuthenticatedUser = Depends(require_write_access)
+):
+    """
+    Proxy set one network's monitored devices. Requires write access.
+
+    Expects JSON body with:
+    - ips: List[str] - Every device IP address in the network
+    """
+    body = await request.json()
+    return await proxy_health_request(
+        "PUT", f"/monitoring/networks/{network_id}/devices", json_body=body
+    )
+
+
+@router.patch("/monitoring/networks/{network_id}/devices")
+async def update_network_devices(
+    network_id: str, request: Request, user: AuthenticatedUser = Depends(require_write_access)
+):
+    """
+    Proxy add/remove devices in one network. Requires write access.
+
+    Expects JSON body with:
+    - add: List[str] - Device IP addresses to start monitoring
+    - remove: List[str] - Device IP addresses to stop monitoring
+    """
+    body = await request.json()
+    return await proxy_health_request(
+        "PATCH", f"/monitoring/networks/{network_id}/devices", json_body=body
+    )
+
+
+@router.delete("/monitoring/networks/{network_id}/devices")
+async def clear_network_devices(
+    network_id: str, user: AuthenticatedUser = Depends(require_write_access)
+):
+    """Proxy clear one network's monitored devices. Requires write access."""
+    return await proxy_health_request("DELETE", f"/monitoring/networks/{network_id}/devices")
+
+
 @router.get("/monitoring/config")
 async def get_monitoring_config(user: AuthenticatedUser = Depends(require_auth)):
     """Proxy get monitoring config. Requires authentication."""
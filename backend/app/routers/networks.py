@@ -2,13 +2,15 @@
 Network management API routes.
 """
 
+import hashlib
 import ipaddress
+import json
 import logging
 import uuid
 from datetime import datetime, timezone
 from typing import Any
 
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, status
 from sqlalchemy import select
 from sqlalchemy.exc import InvalidRequestError
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -35,7 +37,7 @@ from ..schemas import (
     SyncDevice,
 )
 from ..services import health_proxy_service
-from ..services.cache_service import CacheService, get_cache
+from ..services.cache_service import CacheService, cache_service, get_cache
 from ..services.network_service import (
     generate_agent_key,
     get_network_member_user_ids,
@@ -48,6 +50,10 @@ router = APIRouter(prefix="/networks", tags=["Networks"])
 settings = get_settings()
 logger = logging.getLogger(__name__)
 
+# Redis pub/sub channel announcing saved layouts, so the metrics service can
+# refresh its cached copy
+LAYOUT_SAVED_CHANNEL = "networks:layout_saved"
+
 
 # ============================================================================
 # Network CRUD
@@ -366,13 +372,38 @@ async def delete_network(
 # ============================================================================
 
 
+def _layout_etag(layout_data: dict | None) -> str:
+    """Strong ETag of a layout, derived from its content."""
+    serialized = json.dumps(layout_data, sort_keys=True, separators=(",", ":"), default=str)
+    return f'"{hashlib.sha1(serialized.encode()).hexdigest()}"'
+
+
+async def _announce_layout_saved(network: Network) -> None:
+    """Tell other services a network's layout changed (best effort)."""
+    await cache_service.publish(
+        LAYOUT_SAVED_CHANNEL,
+        {
+            "event_type": "layout_saved",
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "payload": {"network_id": network.id, "etag": _layout_etag(network.layout_data)},
+        },
+    )
+
+
 @router.get("/{network_id}/layout", response_model=NetworkLayoutResponse)
 async def get_network_layout(
     network_id: str,
     current_user: AuthenticatedUser = Depends(require_auth),
     db: AsyncSession = Depends(get_db),
+    response: Response = None,
+    if_none_match: str | None = Header(None, alias="If-None-Match"),
 ):
-    """Get the network layout data."""
+    """
+    Get the network layout data.
+
+    Responses carry an ETag; a request whose If-None-Match matches it gets an
+    empty 304 Not Modified instead of the layout.
+    """
     network, _, _ = await get_network_with_access(
         network_id,
         current_user.user_id,
@@ -380,6 +411,12 @@ async def get_network_layout(
         is_service=is_service_token(current_user.user_id),
     )
 
+    etag = _layout_etag(network.layout_data)
+    if isinstance(if_none_match, str) and etag in (t.strip() for t in if_none_match.split(",")):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    if response is not None:
+        response.headers["ETag"] = etag
+
     return NetworkLayoutResponse(
         id=network.id,
         name=network.name,
@@ -413,6 +450,7 @@ async def save_network_layout(
     network.layout_data = layout_data.layout_data
     await db.commit()
     await db.refresh(network)
+    await _announce_layout_saved(network)
 
     if prepopulated:
         for node_id in added_ids:
@@ -1611,6 +1649,7 @@ async def sync_agent_scan(
     _flag_layout_modified_if_needed(network)
     network.last_sync_at = datetime.now(timezone.utc)
     await db.commit()
+    await _announce_layout_saved(network)
 
     if pre_sync_populated:
         for node_id in added_snapshot_ids:
@@ -1712,6 +1751,7 @@ async def sync_agent_health(
     network.layout_data = layout_data
     _flag_layout_modified_if_needed(network)
     await db.commit()
+    await _announce_layout_saved(network)
 
     # Also forward health data to the health-service to update its cache
     # This ensures the frontend's real-time health metrics are updated
@@ -110,17 +110,42 @@ async def get_service_status(
 # ==================== History & Stats ====================
 
 
+def _history_params(
+    cursor: str | None,
+    per_page: int,
+    channel: str | None,
+    success: bool | None,
+    since: str | None,
+    until: str | None,
+) -> dict:
+    params = {"per_page": per_page}
+    for key, value in (
+        ("cursor", cursor),
+        ("channel", channel),
+        ("success", success),
+        ("since", since),
+        ("until", until),
+    ):
+        if value is not None:
+            params[key] = value
+    return params
+
+
 @router.get("/history")
 async def get_notification_history(
-    page: int = Query(1, ge=1),
+    cursor: str = Query(None, description="next_cursor from the previous page"),
     per_page: int = Query(50, ge=1, le=100),
+    channel: str = Query(None),
+    success: bool = Query(None),
+    since: str = Query(None),
+    until: str = Query(None),
     user: AuthenticatedUser = Depends(require_auth),
 ):
     """Get notification history for the current user."""
     return await proxy_notification_request(
         "GET",
         "/history",
-        params={"page": page, "per_page": per_page},
+        params=_history_params(cursor, per_page, channel, success, since, until),
         headers={"X-User-Id": user.user_id},
     )
 
@@ -128,15 +153,19 @@ async def get_notification_history(
 @router.get("/networks/{network_id}/history")
 async def get_network_notification_history(
     network_id: str,
-    page: int = Query(1, ge=1),
+    cursor: str = Query(None, description="next_cursor from the previous page"),
     per_page: int = Query(50, ge=1, le=100),
+    channel: str = Query(None),
+    success: bool = Query(None),
+    since: str = Query(None),
+    until: str = Query(None),
     user: AuthenticatedUser = Depends(require_auth),
 ):
     """Get notification history for a specific network."""
     return await proxy_notification_request(
         "GET",
         f"/networks/{network_id}/history",
-        params={"page": page, "per_page": per_page},
+        params=_history_params(cursor, per_page, channel, success, since, until),
         headers={"X-User-Id": user.user_id},
     )
 
@@ -166,6 +195,25 @@ async def get_network_notification_stats(
     )
 
 
+@router.get("/networks/{network_id}/stats/range")
+async def get_network_notification_stats_range(
+    network_id: str,
+    since: str = Query(..., description="Start of the range (ISO 8601)"),
+    until: str = Query(None, description="End of the range (ISO 8601, default now)"),
+    user: AuthenticatedUser = Depends(require_auth),
+):
+    """Get notification statistics for a network over a time range."""
+    params = {"since": since}
+    if until is not None:
+        params["until"] = until
+    return await proxy_notification_request(
+        "GET",
+        f"/networks/{network_id}/stats/range",
+        params=params,
+        headers={"X-User-Id": user.user_id},
+    )
+
+
 # ==================== ML / Anomaly Detection ====================
 
 
@@ -184,6 +184,31 @@ class CacheService:
             logger.warning(f"Cache DELETE pattern error for '{pattern}': {e}")
             return 0
 
+    async def publish(self, channel: str, message: dict) -> bool:
+        """
+        Publish a message on a Redis pub/sub channel.
+
+        Channels are shared by every database on the server, so other services
+        receive it whichever database they use.
+
+        Args:
+            channel: Channel name
+            message: Message to publish (must be JSON serializable)
+
+        Returns:
+            True if published, False otherwise
+        """
+        if not self._enabled or not self._client:
+            return False
+
+        try:
+            await self._client.publish(channel, json.dumps(message, default=str))
+            logger.debug(f"Cache PUBLISH: {channel}")
+            return True
+        except (RedisError, TypeError, ValueError) as e:
+            logger.warning(f"Cache PUBLISH error for channel {channel}: {e}")
+            return False
+
     async def get_or_compute(self, key: str, compute_fn: Callable, ttl: int | None = None) -> Any:
         """
         Get from cache or compute and cache the result.
@@ -6,6 +6,8 @@ for real-time metrics streaming.
 
 Features:
 - Bidirectional message forwarding
+- Subprotocol negotiation passed through to the upstream service
+- Binary frames relayed as binary (e.g. msgpack payloads)
 - Concurrent read/write handling
 - Graceful disconnect handling
 - Resource cleanup on connection close
@@ -34,7 +36,10 @@ async def forward_to_client(
     """
     try:
         async for message in upstream_ws:
-            await client_ws.send_text(message)
+            if isinstance(message, bytes):
+                await client_ws.send_bytes(message)
+            else:
+                await client_ws.send_text(message)
     except ConnectionClosed:
         pass  # Normal disconnect
     except Exception as e:
@@ -70,8 +75,10 @@ async def proxy_websocket(
     Proxy a WebSocket connection to an upstream service.
 
     This is the main entry point for WebSocket proxying. It:
-    1. Accepts the client WebSocket connection
-    2. Establishes connection to the upstream service
+    1. Establishes connection to the upstream service, offering the
+       subprotocols the client offered
+    2. Accepts the client WebSocket connection with the subprotocol the
+       upstream service selected
     3. Runs bidirectional forwarding concurrently
     4. Handles disconnects and errors gracefully
 
@@ -83,10 +90,12 @@ async def proxy_websocket(
         This function handles all cleanup internally. Caller should not
         need to manage the WebSocket lifecycle.
     """
-    await client_ws.accept()
+    offered = list(client_ws.scope.get("subprotocols") or [])
 
     try:
-        async with websockets.connect(upstream_url) as upstream_ws:
+        async with websockets.connect(upstream_url, subprotocols=offered or None) as upstream_ws:
+            await client_ws.accept(subprotocol=upstream_ws.subprotocol)
+
             # Run both forwarding tasks concurrently
             await asyncio.gather(
                 forward_to_client(upstream_ws, client_ws),
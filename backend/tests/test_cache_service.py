@@ -151,6 +151,19 @@ class TestCacheService:
 
         assert result is False
 
+    @pytest.mark.asyncio
+    async def test_publish(self, cache_service, mock_redis):
+        """Test publishing a JSON message, and the no-op when disabled."""
+        assert await cache_service.publish("channel", {"data": "value"}) is False
+
+        cache_service._client = mock_redis
+        mock_redis.publish = AsyncMock(return_value=1)
+        assert await cache_service.publish("channel", {"data": "value"}) is True
+        mock_redis.publish.assert_awaited_once_with("channel", json.dumps({"data": "value"}))
+
+        mock_redis.publish.side_effect = RedisError("Connection lost")
+        assert await cache_service.publish("channel", {"data": "value"}) is False
+
     @pytest.mark.asyncio
     async def test_delete_success(self, cache_service, mock_redis):
         """Test successful cache delete."""
@@ -194,6 +194,7 @@ class TestMetricsWebSocketForwarding:
         from fastapi import WebSocket, WebSocketDisconnect
 
         mock_websocket = AsyncMock(spec=WebSocket)
+        mock_websocket.scope = {"type": "websocket", "subprotocols": []}
         mock_websocket.accept = AsyncMock()
         mock_websocket.close = AsyncMock()
         mock_websocket.send_text = AsyncMock(side_effect=Exception("Send failed"))
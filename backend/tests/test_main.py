@@ -368,10 +368,9 @@ class TestAppModuleImports:
 
     def test_services_imported(self):
         """Service modules should be importable"""
-        from app.services import http_client, network_service, usage_middleware
+        from app.services import http_client, network_service
 
         assert hasattr(http_client, "http_pool")
-        assert hasattr(usage_middleware, "UsageTrackingMiddleware")
         assert hasattr(network_service, "get_network_with_access")
 
 
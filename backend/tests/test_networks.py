@@ -1073,6 +1073,30 @@ class TestGetNetworkLayout:
         assert response.id == sample_network.id
         assert response.layout_data == sample_network.layout_data
 
+    async def test_get_layout_not_modified(self, owner_user, mock_db, sample_network):
+        """Should set an ETag and answer a matching If-None-Match with 304"""
+        from fastapi import Response
+
+        from app.routers.networks import get_network_layout
+
+        mock_result = MagicMock()
+        mock_result.scalar_one_or_none.return_value = sample_network
+        mock_db.execute = AsyncMock(return_value=mock_result)
+
+        response = Response()
+        await get_network_layout("network-123", owner_user, mock_db, response, None)
+        etag = response.headers["ETag"]
+
+        cached = await get_network_layout("network-123", owner_user, mock_db, Response(), etag)
+        assert cached.status_code == 304
+        assert cached.headers["ETag"] == etag
+
+        sample_network.layout_data = {"root": {"id": "changed"}}
+        changed = Response()
+        result = await get_network_layout("network-123", owner_user, mock_db, changed, etag)
+        assert result.layout_data == {"root": {"id": "changed"}}
+        assert changed.headers["ETag"] != etag
+
 
 class TestSaveNetworkLayout:
     """Tests for save_network_layout endpoint"""
@@ -1090,9 +1114,15 @@ class TestSaveNetworkLayout:
         mock_db.commit = AsyncMock()
         mock_db.refresh = AsyncMock()
 
-        response = await save_network_layout("network-123", layout_data, owner_user, mock_db)
+        with patch("app.routers.networks.cache_service") as cache:
+            cache.publish = AsyncMock(return_value=True)
+            response = await save_network_layout("network-123", layout_data, owner_user, mock_db)
 
         assert sample_network.layout_data == {"root": {"id": "new-router"}}
+        channel, message = cache.publish.await_args.args
+        assert channel == "networks:layout_saved"
+        assert message["event_type"] == "layout_saved"
+        assert message["payload"]["network_id"] == "network-123"
 
     async def test_save_layout_aggregates_device_removed_notification(
         self, owner_user, mock_db, sample_network
@@ -173,6 +173,21 @@ class TestHealthProxyRouter:
         call_kwargs = mock_http_pool.request.call_args[1]
         assert call_kwargs["method"] == "DELETE"
 
+    async def test_update_network_devices(self, mock_http_pool, readwrite_user):
+        """update_network_devices should PATCH the network's device diff"""
+        from app.routers.health_proxy import update_network_devices
+
+        body = {"add": ["192.168.1.2"], "remove": ["192.168.1.1"]}
+        mock_request = MagicMock()
+        mock_request.json = AsyncMock(return_value=body)
+
+        await update_network_devices(network_id="net-1", request=mock_request, user=readwrite_user)
+
+        call_kwargs = mock_http_pool.request.call_args[1]
+        assert call_kwargs["method"] == "PATCH"
+        assert "/monitoring/networks/net-1/devices" in call_kwargs["path"]
+        assert call_kwargs["json_body"] == body
+
     async def test_get_monitoring_config(self, mock_http_pool, owner_user):
         """get_monitoring_config should work"""
         from app.routers.health_proxy import get_monitoring_config
@@ -1447,17 +1462,23 @@ class TestNotificationProxyRouter:
         assert "/networks/net-123/test" in call_kwargs["path"]
 
     async def test_get_network_notification_history(self, mock_http_pool, owner_user):
-        """get_network_notification_history should GET with pagination"""
+        """get_network_notification_history should forward cursor and filters"""
         from app.routers.notification_proxy import get_network_notification_history
 
         await get_network_notification_history(
-            network_id="net-123", page=2, per_page=25, user=owner_user
+            network_id="net-123",
+            cursor="abc",
+            per_page=25,
+            channel="email",
+            success=None,
+            since=None,
+            until=None,
+            user=owner_user,
         )
 
         call_kwargs = mock_http_pool.request.call_args[1]
         assert "/networks/net-123/history" in call_kwargs["path"]
-        assert call_kwargs["params"]["page"] == 2
-        assert call_kwargs["params"]["per_page"] == 25
+        assert call_kwargs["params"] == {"per_page": 25, "cursor": "abc", "channel": "email"}
 
     async def test_get_network_notification_stats(self, mock_http_pool, owner_user):
         """get_network_notification_stats should GET"""
@@ -1468,6 +1489,18 @@ class TestNotificationProxyRouter:
         call_kwargs = mock_http_pool.request.call_args[1]
         assert "/networks/net-123/stats" in call_kwargs["path"]
 
+    async def test_get_network_notification_stats_range(self, mock_http_pool, owner_user):
+        """get_network_notification_stats_range should forward the range"""
+        from app.routers.notification_proxy import get_network_notification_stats_range
+
+        await get_network_notification_stats_range(
+            network_id="net-123", since="2026-01-01T00:00:00Z", until=None, user=owner_user
+        )
+
+        call_kwargs = mock_http_pool.request.call_args[1]
+        assert "/networks/net-123/stats/range" in call_kwargs["path"]
+        assert call_kwargs["params"] == {"since": "2026-01-01T00:00:00Z"}
+
     # ==================== Legacy Preferences Tests ====================
 
     async def test_get_preferences(self, mock_http_pool, owner_user, mock_cache):
@@ -1559,14 +1592,21 @@ class TestNotificationProxyRouter:
         assert "/test" in call_kwargs["path"]
 
     async def test_get_notification_history(self, mock_http_pool, owner_user):
-        """get_notification_history should GET with pagination"""
+        """get_notification_history should forward cursor and filters"""
         from app.routers.notification_proxy import get_notification_history
 
-        await get_notification_history(page=2, per_page=25, user=owner_user)
+        await get_notification_history(
+            cursor=None,
+            per_page=25,
+            channel=None,
+            success=False,
+            since=None,
+            until=None,
+            user=owner_user,
+        )
 
         call_kwargs = mock_http_pool.request.call_args[1]
-        assert call_kwargs["params"]["page"] == 2
-        assert call_kwargs["params"]["per_page"] == 25
+        assert call_kwargs["params"] == {"per_page": 25, "success": False}
 
     async def test_get_notification_stats(self, mock_http_pool, owner_user):
         """get_notification_stats should GET"""
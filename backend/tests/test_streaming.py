@@ -115,6 +115,7 @@ class TestMetricsWebSocketProxy:
         from app.routers.metrics_proxy import websocket_proxy
 
         mock_websocket = AsyncMock(spec=WebSocket)
+        mock_websocket.scope = {"type": "websocket", "subprotocols": []}
         mock_websocket.accept = AsyncMock()
         mock_websocket.close = AsyncMock()
         mock_websocket.send_text = AsyncMock()
@@ -127,8 +128,9 @@ class TestMetricsWebSocketProxy:
             # Should handle the error gracefully
             await websocket_proxy(mock_websocket)
 
-            # Accept should have been called
-            mock_websocket.accept.assert_called_once()
+            # The client is turned away without being accepted
+            mock_websocket.accept.assert_not_called()
+            mock_websocket.close.assert_called_once()
 
 
 class TestAssistantProxyURLConfig:
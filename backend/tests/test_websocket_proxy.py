@@ -112,6 +112,7 @@ class TestWebSocketProxyService:
 
         mock_client = AsyncMock()
         mock_client.accept = AsyncMock()
+        mock_client.scope = {"subprotocols": []}
 
         with patch("websockets.connect") as mock_connect:
             mock_upstream = AsyncMock()
@@ -123,6 +124,64 @@ class TestWebSocketProxyService:
 
         mock_client.accept.assert_awaited_once()
 
+    @pytest.mark.asyncio
+    async def test_forward_to_client_relays_binary_frames(self):
+        """Binary upstream frames (msgpack) should reach the client as binary"""
+        from app.services.websocket_proxy_service import forward_to_client
+
+        async def frames():
+            yield b"\x82\xa4type"
+            yield '{"type": "pong"}'
+
+        mock_upstream = MagicMock()
+        mock_upstream.__aiter__ = lambda self: frames()
+        mock_client = AsyncMock()
+
+        await forward_to_client(mock_upstream, mock_client)
+
+        mock_client.send_bytes.assert_awaited_once_with(b"\x82\xa4type")
+        mock_client.send_text.assert_awaited_once_with('{"type": "pong"}')
+
+    @pytest.mark.asyncio
+    async def test_proxy_websocket_negotiates_subprotocol_upstream(self):
+        """The client's subprotocols go upstream and the upstream's pick is accepted"""
+        from app.services.websocket_proxy_service import proxy_websocket
+
+        mock_client = AsyncMock()
+        mock_client.scope = {"subprotocols": ["msgpack+zstd", "msgpack"]}
+
+        with patch("app.services.websocket_proxy_service.websockets.connect") as mock_connect:
+            mock_upstream = AsyncMock()
+            mock_upstream.subprotocol = "msgpack"
+            mock_connect.return_value.__aenter__.return_value = mock_upstream
+
+            with patch("asyncio.gather", AsyncMock()):
+                await proxy_websocket(mock_client, "ws://test:8000/ws")
+
+        mock_connect.assert_called_once_with(
+            "ws://test:8000/ws", subprotocols=["msgpack+zstd", "msgpack"]
+        )
+        mock_client.accept.assert_awaited_once_with(subprotocol="msgpack")
+
+    @pytest.mark.asyncio
+    async def test_proxy_websocket_without_subprotocols(self):
+        """A client offering no subprotocol is proxied as plain JSON text"""
+        from app.services.websocket_proxy_service import proxy_websocket
+
+        mock_client = AsyncMock()
+        mock_client.scope = {"subprotocols": []}
+
+        with patch("app.services.websocket_proxy_service.websockets.connect") as mock_connect:
+            mock_upstream = AsyncMock()
+            mock_upstream.subprotocol = None
+            mock_connect.return_value.__aenter__.return_value = mock_upstream
+
+            with patch("asyncio.gather", AsyncMock()):
+                await proxy_websocket(mock_client, "ws://test:8000/ws")
+
+        mock_connect.assert_called_once_with("ws://test:8000/ws", subprotocols=None)
+        mock_client.accept.assert_awaited_once_with(subprotocol=None)
+
     def test_build_ws_url_http(self):
         """Test converting HTTP URL to WebSocket URL"""
         from app.services.websocket_proxy_service import build_ws_url
@@ -204,6 +204,13 @@ function Initialize-Venv {
         pip install --quiet -r $reqFile
         New-Item -Path $markerFile -ItemType File -Force | Out-Null
     }
+
+    # Shared usage tracking middleware; editable, so changes to it apply without reinstalling
+    python -c "import cartographer_usage" 2>$null
+    if ($LASTEXITCODE -ne 0) {
+        Write-ServiceLog $Service "Installing shared usage tracking package..."
+        pip install --quiet -e (Join-Path $ScriptDir "packages" "usage-tracking")
+    }
     
     return $venvDir
 }
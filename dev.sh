@@ -288,6 +288,12 @@ ensure_venv() {
         python -m pip install -q -r "$req_file"
         touch "$marker_file"
     fi
+
+    # Shared usage tracking middleware; editable, so changes to it apply without reinstalling
+    if ! python -c "import cartographer_usage" 2>/dev/null; then
+        log_service "$service" "Installing shared usage tracking package..."
+        python -m pip install -q -e "$SCRIPT_DIR/packages/usage-tracking"
+    fi
 }
 
 setup_frontend() {
@@ -25,6 +25,12 @@ class Settings(BaseSettings):
     notification_service_url: str = "http://localhost:8005"
     metrics_service_url: str = "http://localhost:8003"
 
+    # Devices are announced to the metrics service when their status changes,
+    # or when latency or packet loss drift this far from the last announced
+    # values, so snapshots do not wait for its slow fallback cycle
+    metrics_change_latency_ms: float = 20.0
+    metrics_change_packet_loss_percent: float = 10.0
+
     # Usage tracking configuration
     usage_batch_size: int = 10
     usage_batch_interval_seconds: float = 5.0
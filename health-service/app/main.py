@@ -1,13 +1,13 @@
 import logging
 from contextlib import asynccontextmanager
 
+from cartographer_usage import UsageTrackingMiddleware
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
 from .config import reload_env_overrides, settings
 from .routers.health import router as health_router
 from .services.health_checker import health_checker
-from .services.usage_middleware import UsageTrackingMiddleware
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -49,7 +49,13 @@ def create_app() -> FastAPI:
     )
 
     # Usage tracking middleware - reports endpoint usage to metrics service
-    app.add_middleware(UsageTrackingMiddleware, service_name="health-service")
+    # Only the backend gateway calls this service, so no request is user-generated
+    app.add_middleware(
+        UsageTrackingMiddleware,
+        service_name="health-service",
+        settings=settings,
+        user_facing=False,
+    )
 
     # Include routers
     app.include_router(health_router, prefix="/api")
@@ -49,6 +49,15 @@ class CheckHistoryEntry(BaseModel):
     latency_ms: float | None = None
 
 
+class CheckHistoryPage(BaseModel):
+    """A page of check history, oldest first"""
+
+    ip: str
+    entries: list[CheckHistoryEntry] = []
+    # Pass as `since` to get the next page; None when this is the last one
+    next_since: datetime | None = None
+
+
 class DeviceMetrics(BaseModel):
     """Comprehensive metrics for a device"""
 
@@ -126,6 +135,19 @@ class RegisterDevicesRequest(BaseModel):
     network_id: str  # UUID string - the network these devices belong to
 
 
+class NetworkDevicesRequest(BaseModel):
+    """Request to set the full device list of one network"""
+
+    ips: list[str]
+
+
+class NetworkDeviceChangesRequest(BaseModel):
+    """Request to add and remove devices in one network"""
+
+    add: list[str] = []
+    remove: list[str] = []
+
+
 # ==================== Gateway Test IP Models ====================
 
 
@@ -8,18 +8,24 @@ from ..models import (
     AgentSyncRequest,
     AgentSyncResponse,
     BatchHealthResponse,
+    CheckHistoryPage,
     DeviceMetrics,
     GatewayTestIPConfig,
     GatewayTestIPsResponse,
     HealthCheckRequest,
     MonitoringConfig,
     MonitoringStatus,
+    NetworkDeviceChangesRequest,
+    NetworkDevicesRequest,
     RegisterDevicesRequest,
     SetGatewayTestIPsRequest,
     SpeedTestResult,
 )
 from ..services.health_checker import health_checker
-from ..services.notification_reporter import sync_devices_with_notification_service
+from ..services.notification_reporter import (
+    sync_device_changes_with_notification_service,
+    sync_devices_with_notification_service,
+)
 
 router = APIRouter(prefix="/health", tags=["health"])
 
@@ -101,6 +107,17 @@ async def check_multiple_devices(request: HealthCheckRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/cached/networks", response_model=dict[str, dict[str, DeviceMetrics]])
+async def get_network_cached_metrics():
+    """
+    Get agent-reported metrics per network.
+
+    The same private address can be a different device in each network, so
+    these take precedence over the IP-keyed /cached entries for that network.
+    """
+    return health_checker.get_all_network_metrics()
+
+
 @router.get("/cached/{ip}", response_model=DeviceMetrics | None)
 async def get_cached_metrics(ip: str):
     """
@@ -122,6 +139,26 @@ async def get_all_cached_metrics():
     return health_checker.get_all_cached_metrics()
 
 
+@router.get("/history/{ip}", response_model=CheckHistoryPage)
+async def get_check_history(
+    ip: str,
+    since: datetime | None = Query(None, description="Only checks after this time"),
+    until: datetime | None = Query(None, description="Only checks up to this time"),
+    limit: int = Query(500, ge=1, le=1440, description="Maximum entries per page"),
+    network_id: str | None = Query(None, description="Network the device belongs to"),
+):
+    """
+    Get a device's full-resolution check history, oldest first.
+
+    Pages are chained by passing the response's next_since as `since`.
+    """
+    _validate_ip(ip)
+    entries, next_since = health_checker.get_check_history_page(
+        ip, since, until, limit, network_id=network_id
+    )
+    return CheckHistoryPage(ip=ip, entries=entries, next_since=next_since)
+
+
 @router.delete("/cache")
 async def clear_cache():
     """
@@ -218,12 +255,61 @@ async def check_dns(ip: str):
 # ==================== Monitoring Endpoints ====================
 
 
+# Networks whose current device set the notification service is known to hold.
+# A network leaves the set when a sync fails, so its next change resends the full list.
+_synced_networks: set[str] = set()
+
+
+async def _forward_device_changes(network_id: str, added: list[str], removed: list[str]) -> bool:
+    """
+    Bring the notification service's device set for a network up to date.
+
+    Only the change is sent while the network is in sync. The first sync of a
+    network since startup, and any sync after a failed one, sends the full list
+    instead, so a lost delta or a restart of either service cannot leave the ML
+    anomaly detector tracking the wrong devices. The notification service also
+    rejects deltas for networks it has not had a full list for since it started,
+    which lands here as a failure and triggers the full resend.
+    """
+    if network_id in _synced_networks:
+        if await sync_device_changes_with_notification_service(network_id, added, removed):
+            return True
+        _synced_networks.discard(network_id)
+
+    if await sync_devices_with_notification_service(
+        health_checker.get_network_devices(network_id), network_id=network_id
+    ):
+        _synced_networks.add(network_id)
+        return True
+    return False
+
+
+async def _replace_network_devices(network_id: str, ips: list[str]) -> dict:
+    """Replace one network's devices and forward the change downstream"""
+    added, removed = health_checker.replace_network_devices(network_id, ips)
+
+    # Sync with notification service so ML anomaly detection tracks only current devices
+    await _forward_device_changes(network_id, added, removed)
+
+    return {
+        "network_id": network_id,
+        "devices": health_checker.get_network_devices(network_id),
+        "added": added,
+        "removed": removed,
+        "active_monitoring": not settings.disable_active_checks,
+    }
+
+
 @router.post("/monitoring/devices")
 async def register_devices(request: RegisterDevicesRequest):
     """
     Register devices for passive monitoring.
     These devices will be checked periodically in the background.
 
+    Replaces the device set of request.network_id only; devices registered for
+    other networks are left alone. Prefer the /monitoring/networks/{network_id}/devices
+    endpoints, which this is equivalent to PUT on.
+
     Args:
         request: Contains list of IPs and network_id (UUID string)
 
@@ -231,26 +317,11 @@ async def register_devices(request: RegisterDevicesRequest):
     registered for tracking purposes but won't be actively pinged. Device health
     data comes exclusively from the Cartographer Agent via /agent-sync.
     """
-    # Create mapping of IP to network_id (now a UUID string)
-    devices_map = {ip: request.network_id for ip in request.ips}
-
-    # Only register for active monitoring if active checks are enabled
-    # In cloud mode, we don't actively ping devices - the agent provides health data
-    if not settings.disable_active_checks:
-        health_checker.set_monitored_devices(devices_map)
-    else:
-        # In cloud mode, just log the registration request
-        # Devices will get their health data from agent-sync
-        pass
-
-    # Sync with notification service so ML anomaly detection tracks only current devices
-    await sync_devices_with_notification_service(request.ips, network_id=request.network_id)
-
+    result = await _replace_network_devices(request.network_id, request.ips)
     return {
         "message": f"Registered {len(request.ips)} devices for monitoring",
+        **result,
         "devices": request.ips,
-        "network_id": request.network_id,
-        "active_monitoring": not settings.disable_active_checks,
     }
 
 
@@ -263,14 +334,62 @@ async def get_monitored_devices():
 @router.delete("/monitoring/devices")
 async def clear_monitored_devices():
     """Clear all devices from monitoring"""
-    health_checker.set_monitored_devices({})
+    cleared = health_checker.clear_monitored_devices()
 
-    # Sync with notification service to clear device tracking
-    await sync_devices_with_notification_service([])
+    # Sync with notification service to clear device tracking in each network
+    for network_id, removed in cleared.items():
+        await _forward_device_changes(network_id, [], removed)
 
     return {"message": "Cleared all monitored devices"}
 
 
+@router.get("/monitoring/networks/{network_id}/devices")
+async def get_network_devices(network_id: str):
+    """Get the devices monitored for one network"""
+    return {"network_id": network_id, "devices": health_checker.get_network_devices(network_id)}
+
+
+@router.put("/monitoring/networks/{network_id}/devices")
+async def replace_network_devices(network_id: str, request: NetworkDevicesRequest):
+    """
+    Set the full device list of one network.
+
+    The response lists which devices were added and removed; only those are
+    forwarded to the notification service.
+    """
+    return await _replace_network_devices(network_id, request.ips)
+
+
+@router.patch("/monitoring/networks/{network_id}/devices")
+async def update_network_devices(network_id: str, request: NetworkDeviceChangesRequest):
+    """
+    Add and remove devices in one network without resending the rest.
+
+    Removals are applied before additions.
+    """
+    removed = health_checker.remove_devices(network_id, request.remove)
+    added = health_checker.add_devices(network_id, request.add)
+    await _forward_device_changes(network_id, added, removed)
+
+    return {
+        "network_id": network_id,
+        "added": added,
+        "removed": removed,
+        "active_monitoring": not settings.disable_active_checks,
+    }
+
+
+@router.delete("/monitoring/networks/{network_id}/devices")
+async def clear_network_devices(network_id: str):
+    """Stop monitoring every device of one network"""
+    removed = health_checker.remove_devices(
+        network_id, health_checker.get_network_devices(network_id)
+    )
+    await _forward_device_changes(network_id, [], removed)
+
+    return {"network_id": network_id, "removed": removed}
+
+
 @router.get("/monitoring/config", response_model=MonitoringConfig)
 async def get_monitoring_config():
     """Get current monitoring configuration"""
@@ -434,6 +553,25 @@ async def get_cached_test_ip_metrics(gateway_ip: str):
     return health_checker.get_cached_test_ip_metrics(gateway_ip)
 
 
+@router.get("/gateway/{gateway_ip}/test-ips/{test_ip}/history", response_model=CheckHistoryPage)
+async def get_test_ip_check_history(
+    gateway_ip: str,
+    test_ip: str,
+    since: datetime | None = Query(None, description="Only checks after this time"),
+    until: datetime | None = Query(None, description="Only checks up to this time"),
+    limit: int = Query(500, ge=1, le=1440, description="Maximum entries per page"),
+):
+    """
+    Get a gateway test IP's full-resolution check history, oldest first.
+
+    Pages are chained by passing the response's next_since as `since`.
+    """
+    entries, next_since = health_checker.get_test_ip_check_history_page(
+        gateway_ip, test_ip, since, until, limit
+    )
+    return CheckHistoryPage(ip=test_ip, entries=entries, next_since=next_since)
+
+
 # ==================== Speed Test Endpoints ====================
 
 
@@ -23,6 +23,7 @@ from ..models import (
     PortCheckResult,
     SpeedTestResult,
 )
+from .metrics_reporter import report_change
 from .notification_reporter import report_health_check
 
 logger = logging.getLogger(__name__)
@@ -58,11 +59,20 @@ class HealthChecker:
     def __init__(self):
         self._metrics_cache: dict[str, DeviceMetrics] = {}
         self._history: dict[str, deque] = {}  # IP -> deque of (timestamp, success, latency)
+        # Agents on different networks can report the same private address, so
+        # agent results are also kept per network; history for them is stored
+        # under "network_id:ip" (see _history_key)
+        self._network_metrics: dict[str, dict[str, DeviceMetrics]] = {}  # network_id -> {ip}
         self._history_max_size = 1440  # 24 hours at 1-minute intervals
+        # What the metrics service was last told per history key (test IPs are
+        # prefixed "test_ip:"): (status, avg latency ms, packet loss percent)
+        self._announced: dict[str, tuple[HealthStatus, float | None, float]] = {}
 
         # Background monitoring state
-        # Map device IP to network_id for multi-tenant support
-        self._monitored_devices: dict[str, int] = {}  # IP -> network_id
+        # Monitored devices are keyed by (network_id, ip): each network has its own
+        # device set, and the same private address in two networks is two devices
+        self._network_devices: dict[str, set[str]] = {}  # network_id -> device IPs
+        self._device_networks: dict[str, set[str]] = {}  # IP -> network_ids monitoring it
         self._monitoring_config = MonitoringConfig()
         self._monitoring_task: asyncio.Task | None = None
         self._last_check_time: datetime | None = None
@@ -186,6 +196,33 @@ class HealthChecker:
         """Get all stored speed test results"""
         return self._speed_test_results.copy()
 
+    @staticmethod
+    def _history_key(ip: str, network_id: str | None = None) -> str:
+        """History key for a device, scoped to a network when one is given"""
+        return f"{network_id}:{ip}" if network_id else ip
+
+    def _should_announce(self, key: str, status: HealthStatus, ping: PingResult) -> bool:
+        """
+        Whether new results differ enough from what was last announced.
+
+        Status changes always count. Latency and packet loss count once they
+        have moved METRICS_CHANGE_LATENCY_MS / METRICS_CHANGE_PACKET_LOSS_PERCENT
+        from the announced values, so slow drift is announced as well.
+        """
+        latency, loss = ping.avg_latency_ms, ping.packet_loss_percent
+        announced = self._announced.get(key)
+        if announced is not None:
+            last_status, last_latency, last_loss = announced
+            if latency is None or last_latency is None:
+                latency_moved = latency != last_latency
+            else:
+                latency_moved = abs(latency - last_latency) >= settings.metrics_change_latency_ms
+            loss_moved = abs(loss - last_loss) >= settings.metrics_change_packet_loss_percent
+            if last_status == status and not latency_moved and not loss_moved:
+                return False
+        self._announced[key] = (status, latency, loss)
+        return True
+
     def _record_check(self, ip: str, success: bool, latency_ms: float | None):
         """Record a health check result for historical tracking"""
         if ip not in self._history:
@@ -227,6 +264,51 @@ class HealthChecker:
 
         return history
 
+    @staticmethod
+    def _history_page(
+        history: deque | None,
+        since: datetime | None,
+        until: datetime | None,
+        limit: int,
+    ) -> tuple[list[CheckHistoryEntry], datetime | None]:
+        """
+        Entries of a history deque after `since` and up to `until`, oldest first.
+
+        Returns at most `limit` entries, and the timestamp to pass as `since`
+        for the next page (None when there is none).
+        """
+        since, until = (
+            t.replace(tzinfo=timezone.utc) if t is not None and t.tzinfo is None else t
+            for t in (since, until)
+        )
+        entries: list[CheckHistoryEntry] = []
+        for ts, success, latency in history or ():
+            if since is not None and ts <= since:
+                continue
+            if until is not None and ts > until:
+                break
+            if len(entries) == limit:
+                return entries, entries[-1].timestamp
+            entries.append(CheckHistoryEntry(timestamp=ts, success=success, latency_ms=latency))
+        return entries, None
+
+    def get_check_history_page(
+        self,
+        ip: str,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        limit: int = 500,
+        network_id: str | None = None,
+    ) -> tuple[list[CheckHistoryEntry], datetime | None]:
+        """
+        Get a page of a device's full-resolution check history.
+
+        With network_id, the history an agent reported for that network is used
+        when there is one; otherwise the IP's own history is.
+        """
+        history = self._history.get(self._history_key(ip, network_id)) or self._history.get(ip)
+        return self._history_page(history, since, until, limit)
+
     async def ping_host(self, ip: str, count: int = 3, timeout: float = 2.0) -> PingResult:
         """
         Ping a host and return results.
@@ -528,28 +610,31 @@ class HealthChecker:
 
         # Cache the results
         self._metrics_cache[ip] = metrics
+        # Snapshots show status and latency: have the metrics service regenerate them
+        if self._should_announce(ip, status, ping_result):
+            report_change("health", [ip], self._device_networks.get(ip, ()))
 
         # Report to notification service (async, fire-and-forget to not slow down checks)
-        # Get network_id if device is being monitored
-        network_id = self._monitored_devices.get(ip)
-        asyncio.create_task(
-            report_health_check(
-                device_ip=ip,
-                success=ping_result.success,
-                network_id=network_id,
-                latency_ms=ping_result.avg_latency_ms,
-                packet_loss=(
-                    ping_result.packet_loss_percent / 100.0
-                    if ping_result.packet_loss_percent
-                    else None
-                ),
-                device_name=(
-                    dns_result.resolved_hostname
-                    if dns_result and dns_result.resolved_hostname
-                    else None
-                ),
+        # The address is pinged once and reported to every network monitoring it
+        for network_id in sorted(self._device_networks.get(ip, ())) or [None]:
+            asyncio.create_task(
+                report_health_check(
+                    device_ip=ip,
+                    success=ping_result.success,
+                    network_id=network_id,
+                    latency_ms=ping_result.avg_latency_ms,
+                    packet_loss=(
+                        ping_result.packet_loss_percent / 100.0
+                        if ping_result.packet_loss_percent
+                        else None
+                    ),
+                    device_name=(
+                        dns_result.resolved_hostname
+                        if dns_result and dns_result.resolved_hostname
+                        else None
+                    ),
+                )
             )
-        )
 
         return metrics
 
@@ -606,6 +691,10 @@ class HealthChecker:
         """Get all cached metrics"""
         return self._metrics_cache.copy()
 
+    def get_all_network_metrics(self) -> dict[str, dict[str, DeviceMetrics]]:
+        """Get agent-reported metrics per network"""
+        return {network_id: dict(metrics) for network_id, metrics in self._network_metrics.items()}
+
     async def update_from_agent_health(
         self,
         ip: str,
@@ -632,14 +721,20 @@ class HealthChecker:
         """
         now = datetime.now(timezone.utc)
 
-        # Get or create cached entry
-        cached = self._metrics_cache.get(ip)
+        # Get or create cached entry. With a network_id the entry and its history
+        # belong to that network, so another network's device at the same address
+        # does not feed into its failures or uptime.
+        network_cache = (
+            self._network_metrics.setdefault(network_id, {}) if network_id else self._metrics_cache
+        )
+        cached = network_cache.get(ip)
+        key = self._history_key(ip, network_id)
 
         # Record for historical tracking
-        self._record_check(ip, reachable, response_time_ms)
+        self._record_check(key, reachable, response_time_ms)
 
         # Calculate historical stats
-        uptime_24h, avg_lat_24h, passed_24h, failed_24h = self._calculate_historical_stats(ip)
+        uptime_24h, avg_lat_24h, passed_24h, failed_24h = self._calculate_historical_stats(key)
 
         # Determine health status
         if not reachable:
@@ -658,7 +753,7 @@ class HealthChecker:
         )
 
         # Get check history
-        check_history = self._get_check_history(ip)
+        check_history = self._get_check_history(key)
 
         # Perform DNS lookup if:
         # - include_dns is enabled
@@ -694,8 +789,12 @@ class HealthChecker:
             consecutive_failures=consecutive_failures,
         )
 
-        # Cache the results
+        # Cache the results; the IP-keyed cache keeps the latest report for readers
+        # that do not know the network
+        network_cache[ip] = metrics
         self._metrics_cache[ip] = metrics
+        if self._should_announce(key, status, ping_result):
+            report_change("health", [ip], (network_id, *self._device_networks.get(ip, ())))
 
         # Report to notification service (async, fire-and-forget to not slow down sync)
         asyncio.create_task(
@@ -713,21 +812,23 @@ class HealthChecker:
             )
         )
 
-        # Register the device for active monitoring if we have a network_id,
-        # it's not already monitored, AND active checks are enabled.
+        # Register the device for active monitoring in its network if we have a
+        # network_id AND active checks are enabled.
         # When active checks are disabled (cloud deployment), we should NOT register
         # devices for background monitoring since the health service cannot reach them
         # and would incorrectly mark them as unhealthy.
-        if network_id and ip not in self._monitored_devices and not settings.disable_active_checks:
-            self._monitored_devices[ip] = network_id
-            logger.debug(f"Registered device {ip} from agent sync for network {network_id}")
+        if network_id and not settings.disable_active_checks:
+            if self.add_devices(network_id, [ip]):
+                logger.debug(f"Registered device {ip} from agent sync for network {network_id}")
 
         return True
 
     def clear_cache(self):
         """Clear the metrics cache"""
         self._metrics_cache.clear()
+        self._network_metrics.clear()
         self._history.clear()
+        self._announced.clear()
 
     # ==================== Gateway Test IP Methods ====================
 
@@ -824,6 +925,18 @@ class HealthChecker:
 
         return history
 
+    def get_test_ip_check_history_page(
+        self,
+        gateway_ip: str,
+        test_ip: str,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        limit: int = 500,
+    ) -> tuple[list[CheckHistoryEntry], datetime | None]:
+        """Get a page of a test IP's full-resolution check history"""
+        key = self._get_test_ip_history_key(gateway_ip, test_ip)
+        return self._history_page(self._test_ip_history.get(key), since, until, limit)
+
     async def check_test_ip(
         self, gateway_ip: str, test_ip: str, label: str | None = None
     ) -> GatewayTestIPMetrics:
@@ -890,6 +1003,9 @@ class HealthChecker:
         if gateway_ip not in self._test_ip_metrics_cache:
             self._test_ip_metrics_cache[gateway_ip] = {}
         self._test_ip_metrics_cache[gateway_ip][test_ip] = metrics
+        key = f"test_ip:{self._get_test_ip_history_key(gateway_ip, test_ip)}"
+        if self._should_announce(key, status, ping_result):
+            report_change("test_ip", [gateway_ip])
 
         return metrics
 
@@ -1012,6 +1128,7 @@ class HealthChecker:
             if gateway_ip:
                 self._speed_test_results[gateway_ip] = result
                 self._save_speed_test_results()
+                report_change("speed_test", [gateway_ip])
 
             return result
 
@@ -1034,37 +1151,123 @@ class HealthChecker:
 
     # ==================== Background Monitoring ====================
 
-    def register_devices(self, devices: dict[str, int]) -> None:
+    def add_devices(self, network_id: str, ips: list[str]) -> list[str]:
+        """
+        Add devices to a network's monitored set.
+
+        Returns the IPs that were not already monitored in that network.
+        """
+        devices = self._network_devices.setdefault(network_id, set())
+        added = []
+        for ip in ips:
+            if ip in devices:
+                continue
+            devices.add(ip)
+            self._device_networks.setdefault(ip, set()).add(network_id)
+            added.append(ip)
+        return added
+
+    def remove_devices(self, network_id: str, ips: list[str]) -> list[str]:
+        """
+        Remove devices from a network's monitored set.
+
+        Returns the IPs that were monitored in that network. Other networks
+        monitoring the same address are not affected.
+        """
+        devices = self._network_devices.get(network_id)
+        if not devices:
+            return []
+        removed = []
+        for ip in ips:
+            if ip not in devices:
+                continue
+            devices.discard(ip)
+            self._history.pop(self._history_key(ip, network_id), None)
+            self._announced.pop(self._history_key(ip, network_id), None)
+            networks = self._device_networks.get(ip)
+            if networks is not None:
+                networks.discard(network_id)
+                if not networks:
+                    del self._device_networks[ip]
+            removed.append(ip)
+        network_metrics = self._network_metrics.get(network_id)
+        if network_metrics is not None:
+            for ip in removed:
+                network_metrics.pop(ip, None)
+            if not network_metrics:
+                del self._network_metrics[network_id]
+        if not devices:
+            del self._network_devices[network_id]
+        return removed
+
+    def replace_network_devices(
+        self, network_id: str, ips: list[str]
+    ) -> tuple[list[str], list[str]]:
+        """
+        Set a network's monitored devices, leaving every other network untouched.
+
+        Returns (added, removed) relative to the network's previous set.
+        """
+        wanted = set(ips)
+        current = self._network_devices.get(network_id, set())
+        removed = self.remove_devices(network_id, sorted(current - wanted))
+        added = self.add_devices(network_id, [ip for ip in dict.fromkeys(ips) if ip not in current])
+        if added or removed:
+            logger.info(
+                f"Network {network_id}: +{len(added)} -{len(removed)} monitored devices. "
+                f"Total: {len(self._network_devices.get(network_id, ()))}"
+            )
+        return added, removed
+
+    def get_network_devices(self, network_id: str) -> list[str]:
+        """Get the device IPs monitored for one network"""
+        return sorted(self._network_devices.get(network_id, ()))
+
+    def clear_monitored_devices(self) -> dict[str, list[str]]:
+        """
+        Stop monitoring every device.
+
+        Returns the removed device IPs per network.
+        """
+        cleared = {network_id: sorted(ips) for network_id, ips in self._network_devices.items()}
+        self._network_devices = {}
+        self._device_networks = {}
+        logger.info(f"Cleared monitored devices for {len(cleared)} networks")
+        return cleared
+
+    def register_devices(self, devices: dict[str, str]) -> None:
         """
         Register devices to be monitored passively.
 
         Args:
             devices: Dict mapping device IP to network_id
         """
-        self._monitored_devices.update(devices)
+        for ip, network_id in devices.items():
+            self.add_devices(network_id, [ip])
         logger.info(
-            f"Registered {len(devices)} devices for monitoring. Total: {len(self._monitored_devices)}"
+            f"Registered {len(devices)} devices for monitoring. Total: {len(self._device_networks)}"
         )
 
     def unregister_devices(self, ips: list[str]) -> None:
-        """Unregister devices from passive monitoring"""
+        """Unregister devices from passive monitoring in every network"""
         for ip in ips:
-            self._monitored_devices.pop(ip, None)
-        logger.info(f"Unregistered {len(ips)} devices. Remaining: {len(self._monitored_devices)}")
+            for network_id in list(self._device_networks.get(ip, ())):
+                self.remove_devices(network_id, [ip])
+        logger.info(f"Unregistered {len(ips)} devices. Remaining: {len(self._device_networks)}")
 
-    def set_monitored_devices(self, devices: dict[str, int]) -> None:
+    def set_monitored_devices(self, devices: dict[str, str]) -> None:
         """
-        Set the full list of devices to monitor (replaces existing).
+        Set the full list of devices to monitor across all networks (replaces existing).
 
         Args:
             devices: Dict mapping device IP to network_id
         """
-        self._monitored_devices = devices.copy()
-        logger.info(f"Set {len(self._monitored_devices)} devices for monitoring")
+        self.clear_monitored_devices()
+        self.register_devices(devices)
 
     def get_monitored_devices(self) -> list[str]:
-        """Get list of currently monitored device IPs"""
-        return list(self._monitored_devices.keys())
+        """Get list of currently monitored device IPs across all networks"""
+        return list(self._device_networks.keys())
 
     def get_monitoring_config(self) -> MonitoringConfig:
         """Get current monitoring configuration"""
@@ -1089,7 +1292,7 @@ class HealthChecker:
             enabled=self._monitoring_config.enabled,
             check_interval_seconds=self._monitoring_config.check_interval_seconds,
             include_dns=self._monitoring_config.include_dns,
-            monitored_devices=list(self._monitored_devices.keys()),
+            monitored_devices=list(self._device_networks.keys()),
             last_check=self._last_check_time,
             next_check=self._next_check_time,
         )
@@ -1102,7 +1305,7 @@ class HealthChecker:
             logger.debug("Active checks disabled, skipping monitoring check")
             return
 
-        if not self._monitored_devices and not self._gateway_test_ips:
+        if not self._device_networks and not self._gateway_test_ips:
             return
 
         if self._is_checking:
@@ -1114,12 +1317,13 @@ class HealthChecker:
             self._last_check_time = datetime.now(timezone.utc)
 
             # Check all devices in parallel
-            if self._monitored_devices:
+            # Each address is checked once even when several networks monitor it
+            if self._device_networks:
                 logger.debug(
-                    f"Starting passive health check for {len(self._monitored_devices)} devices"
+                    f"Starting passive health check for {len(self._device_networks)} devices"
                 )
                 await self.check_multiple_devices(
-                    ips=list(self._monitored_devices),
+                    ips=list(self._device_networks),
                     include_ports=False,  # Don't scan ports during passive checks (too slow)
                     include_dns=self._monitoring_config.include_dns,
                 )
@@ -1153,7 +1357,7 @@ class HealthChecker:
 
         while True:
             try:
-                if self._monitoring_config.enabled and self._monitored_devices:
+                if self._monitoring_config.enabled and self._device_networks:
                     # Perform the check with timeout to prevent indefinite blocking
                     try:
                         await asyncio.wait_for(
@@ -0,0 +1,83 @@
+"""
+Change reporter for the metrics service.
+
+The metrics service regenerates a network's topology snapshot when something
+in it changes, rather than on a fixed timer. This reports the changes only the
+health service sees: a device or gateway test IP changing status or moving past
+the latency / packet loss thresholds, and a speed test completing.
+
+Reports are fire-and-forget. Changes made while a report is being sent are
+merged into the next one, so a monitoring pass in which many devices change
+sends a handful of requests rather than one per device.
+"""
+
+import asyncio
+import logging
+from collections.abc import Iterable
+
+import httpx
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+# Changes not yet sent: reason -> IPs, and the networks they are known to belong to
+_pending_reasons: set[str] = set()
+_pending_ips: set[str] = set()
+_pending_networks: set[str] = set()
+_sender: asyncio.Task | None = None
+
+
+def report_change(reason: str, ips: Iterable[str] = (), network_ids: Iterable[str] = ()) -> None:
+    """
+    Tell the metrics service that the snapshots showing these IPs changed.
+
+    Args:
+        reason: What changed, e.g. "health", "test_ip" or "speed_test"
+        ips: Device or gateway IPs whose data changed
+        network_ids: Networks the IPs are monitored in, where known
+    """
+    global _sender
+
+    _pending_reasons.add(reason)
+    _pending_ips.update(ips)
+    _pending_networks.update(n for n in network_ids if n)
+
+    if _sender is None or _sender.done():
+        _sender = asyncio.create_task(_send_pending())
+
+
+async def _send_pending() -> None:
+    """Send pending changes until none are left."""
+    while _pending_ips or _pending_networks:
+        changes = {
+            "reasons": sorted(_pending_reasons),
+            "ips": sorted(_pending_ips),
+            "network_ids": sorted(_pending_networks),
+        }
+        _pending_reasons.clear()
+        _pending_ips.clear()
+        _pending_networks.clear()
+
+        try:
+            async with httpx.AsyncClient(timeout=5.0) as client:
+                response = await client.post(
+                    f"{settings.metrics_service_url}/api/metrics/events/changes",
+                    json=changes,
+                )
+                if response.status_code != 200:
+                    logger.debug(f"Metrics service returned {response.status_code} for changes")
+        except httpx.ConnectError:
+            # Its fallback cycle picks the changes up
+            logger.debug("Metrics service not available")
+        except Exception as e:
+            logger.warning(f"Failed to report changes to metrics service: {e}")
+
+    _pending_reasons.clear()
+
+
+def clear_pending_changes():
+    """Drop changes not yet sent (for testing/reset)."""
+    _pending_reasons.clear()
+    _pending_ips.clear()
+    _pending_networks.clear()
@@ -247,3 +247,42 @@ async def sync_devices_with_notification_service(
     except Exception as e:
         logger.warning(f"Failed to sync devices with notification service: {e}")
         return False
+
+
+async def sync_device_changes_with_notification_service(
+    network_id: str, added: list[str], removed: list[str]
+) -> bool:
+    """
+    Send the devices added to and removed from a network since the last sync.
+
+    Only the change crosses the wire, so a layout save that touches a few devices
+    costs a few entries regardless of how large the network is.
+
+    Returns True if successfully synced (or there was nothing to send), False otherwise.
+    """
+    if not added and not removed:
+        return True
+
+    try:
+        async with httpx.AsyncClient(timeout=5.0) as client:
+            response = await client.post(
+                f"{settings.notification_service_url}/api/notifications/ml/sync-devices/delta",
+                params={"network_id": network_id},
+                json={"added": added, "removed": removed},
+            )
+
+            if response.status_code == 200:
+                logger.info(
+                    f"Synced device changes (+{len(added)} -{len(removed)}) with notification "
+                    f"service for network {network_id}"
+                )
+                return True
+            logger.warning(f"Notification service returned {response.status_code}: {response.text}")
+            return False
+
+    except httpx.ConnectError:
+        logger.debug("Notification service not available for device sync")
+        return False
+    except Exception as e:
+        logger.warning(f"Failed to sync device changes with notification service: {e}")
+        return False
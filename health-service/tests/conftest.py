@@ -14,6 +14,13 @@ os.environ["NOTIFICATION_SERVICE_URL"] = "http://test-notification:8005"
 os.environ["HEALTH_DATA_DIR"] = "/tmp/test-health-data"
 
 
+@pytest.fixture(autouse=True)
+def mock_report_change():
+    """Keep health checks from reporting changes to a metrics service"""
+    with patch("app.services.health_checker.report_change") as mock:
+        yield mock
+
+
 @pytest.fixture
 def mock_ping_success():
     """Mock successful ping result"""
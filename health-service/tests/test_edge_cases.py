@@ -271,7 +271,7 @@ class TestMonitoringLoopEdgeCases:
     async def test_perform_monitoring_check_empty_devices(self, health_checker_instance):
         """Should do nothing when no devices registered"""
         # Clear all devices
-        health_checker_instance._monitored_devices = {}
+        health_checker_instance.clear_monitored_devices()
         health_checker_instance._gateway_test_ips = {}
 
         await health_checker_instance._perform_monitoring_check()
@@ -30,7 +30,7 @@ class TestHealthCheckerInit:
         """Should initialize with empty caches"""
         assert health_checker_instance._metrics_cache == {}
         assert health_checker_instance._history == {}
-        assert health_checker_instance._monitored_devices == {}
+        assert health_checker_instance.get_monitored_devices() == []
 
     def test_init_default_config(self, health_checker_instance):
         """Should have default monitoring config"""
@@ -220,6 +220,38 @@ class TestCheckDeviceHealth:
             assert metrics.status == HealthStatus.UNHEALTHY
             assert metrics.consecutive_failures == 1
 
+    async def test_status_changes_are_reported_to_metrics_service(
+        self, health_checker_instance, mock_ping_success, mock_ping_failure, mock_report_change
+    ):
+        """Should report a device's first status and every change, not repeats"""
+        health_checker_instance.add_devices("net-1", ["192.168.1.1"])
+        health_checker_instance.ping_host = AsyncMock(return_value=mock_ping_success)
+
+        with patch("app.services.health_checker.report_health_check", new_callable=AsyncMock):
+            for ping in (mock_ping_success, mock_ping_success, mock_ping_failure):
+                health_checker_instance.ping_host = AsyncMock(return_value=ping)
+                await health_checker_instance.check_device_health("192.168.1.1", include_dns=False)
+
+        assert [c.args for c in mock_report_change.call_args_list] == [
+            ("health", ["192.168.1.1"], {"net-1"}),
+            ("health", ["192.168.1.1"], {"net-1"}),
+        ]
+
+    async def test_latency_drift_is_reported_to_metrics_service(
+        self, health_checker_instance, mock_ping_success, mock_report_change
+    ):
+        """Should report latency once it drifts past the threshold from the last report"""
+        # 25.5 (first), +10, +20 (drifted 20 from 25.5), +25 (5 from last report)
+        latencies = (25.5, 35.5, 45.5, 50.5)
+
+        with patch("app.services.health_checker.report_health_check", new_callable=AsyncMock):
+            for latency in latencies:
+                ping = mock_ping_success.model_copy(update={"avg_latency_ms": latency})
+                health_checker_instance.ping_host = AsyncMock(return_value=ping)
+                await health_checker_instance.check_device_health("192.168.1.1", include_dns=False)
+
+        assert mock_report_change.call_count == 2
+
 
 class TestHealthCheckerCoverageBoost:
     """Additional tests for uncovered branches"""
@@ -372,7 +404,7 @@ Approximate round trip times in milli-seconds:
     ):
         """Should skip monitoring when active checks are disabled"""
         monkeypatch.setattr("app.services.health_checker.settings.disable_active_checks", True)
-        health_checker_instance._monitored_devices = {"192.168.1.1": "net-1"}
+        health_checker_instance.add_devices("net-1", ["192.168.1.1"])
         health_checker_instance.check_multiple_devices = AsyncMock()
 
         await health_checker_instance._perform_monitoring_check()
@@ -384,7 +416,7 @@ Approximate round trip times in milli-seconds:
         health_checker_instance._monitoring_config = MonitoringConfig(
             enabled=True, check_interval_seconds=1, include_dns=True
         )
-        health_checker_instance._monitored_devices = {"192.168.1.1": "net-1"}
+        health_checker_instance.add_devices("net-1", ["192.168.1.1"])
         health_checker_instance._perform_monitoring_check = AsyncMock()
 
         async def fake_wait_for(coro, timeout):
@@ -410,7 +442,7 @@ Approximate round trip times in milli-seconds:
         health_checker_instance._monitoring_config = MonitoringConfig(
             enabled=True, check_interval_seconds=1, include_dns=True
         )
-        health_checker_instance._monitored_devices = {"192.168.1.1": "net-1"}
+        health_checker_instance.add_devices("net-1", ["192.168.1.1"])
         health_checker_instance._perform_monitoring_check = AsyncMock()
 
         call_count = {"sleep": 0}
@@ -666,6 +698,19 @@ class TestGatewayTestIPs:
         assert metrics.label == "Google DNS"
         assert metrics.status == HealthStatus.HEALTHY
 
+    async def test_check_test_ip_reports_status_change(
+        self, health_checker_instance, mock_ping_success, mock_ping_failure, mock_report_change
+    ):
+        """Should report the gateway when one of its test IPs changes status"""
+        health_checker_instance.ping_host = AsyncMock(return_value=mock_ping_success)
+        await health_checker_instance.check_test_ip("192.168.1.1", "8.8.8.8")
+        await health_checker_instance.check_test_ip("192.168.1.1", "8.8.8.8")
+        health_checker_instance.ping_host = AsyncMock(return_value=mock_ping_failure)
+        await health_checker_instance.check_test_ip("192.168.1.1", "8.8.8.8")
+
+        assert mock_report_change.call_count == 2
+        mock_report_change.assert_called_with("test_ip", ["192.168.1.1"])
+
     async def test_check_gateway_test_ips(
         self, health_checker_instance, sample_gateway_test_ips, mock_ping_success
     ):
@@ -811,6 +856,52 @@ class TestMonitoringDevices:
         assert "192.168.1.10" in devices
         assert "192.168.1.20" in devices
 
+    def test_same_ip_in_two_networks(self, health_checker_instance):
+        """Should keep one device per (network_id, ip)"""
+        health_checker_instance.add_devices("net-a", ["192.168.1.1", "192.168.1.2"])
+        health_checker_instance.add_devices("net-b", ["192.168.1.1"])
+
+        assert health_checker_instance.remove_devices("net-a", ["192.168.1.1"]) == ["192.168.1.1"]
+
+        assert health_checker_instance.get_network_devices("net-a") == ["192.168.1.2"]
+        assert health_checker_instance.get_network_devices("net-b") == ["192.168.1.1"]
+        assert sorted(health_checker_instance.get_monitored_devices()) == [
+            "192.168.1.1",
+            "192.168.1.2",
+        ]
+
+    def test_replace_network_devices_returns_diff(self, health_checker_instance):
+        """Should return only the devices added and removed in that network"""
+        health_checker_instance.add_devices("net-a", ["10.0.0.1", "10.0.0.2"])
+        health_checker_instance.add_devices("net-b", ["10.0.0.9"])
+
+        added, removed = health_checker_instance.replace_network_devices(
+            "net-a", ["10.0.0.2", "10.0.0.3", "10.0.0.3"]
+        )
+
+        assert (added, removed) == (["10.0.0.3"], ["10.0.0.1"])
+        assert health_checker_instance.get_network_devices("net-b") == ["10.0.0.9"]
+
+    async def test_shared_ip_is_pinged_once_and_reported_to_each_network(
+        self, health_checker_instance, mock_ping_success
+    ):
+        """Should check an address once and report it to every network monitoring it"""
+        health_checker_instance.add_devices("net-a", ["192.168.1.1"])
+        health_checker_instance.add_devices("net-b", ["192.168.1.1"])
+        health_checker_instance.ping_host = AsyncMock(return_value=mock_ping_success)
+
+        with patch(
+            "app.services.health_checker.report_health_check", new_callable=AsyncMock
+        ) as mock_report:
+            await health_checker_instance._perform_monitoring_check()
+            await asyncio.sleep(0)
+
+        assert health_checker_instance.ping_host.await_count == 1
+        assert sorted(c.kwargs["network_id"] for c in mock_report.call_args_list) == [
+            "net-a",
+            "net-b",
+        ]
+
 
 class TestMonitoringConfig:
     """Tests for monitoring configuration"""
@@ -1040,8 +1131,7 @@ class TestAgentHealthSync:
                     ip=ip, reachable=True, response_time_ms=30.0, network_id=network_id
                 )
 
-        assert ip in health_checker_instance._monitored_devices
-        assert health_checker_instance._monitored_devices[ip] == network_id
+        assert health_checker_instance.get_network_devices(network_id) == [ip]
 
     async def test_update_from_agent_health_records_history(self, health_checker_instance):
         """Should record check in history for historical stats"""
@@ -1060,6 +1150,59 @@ class TestAgentHealthSync:
         assert cached.checks_passed_24h == 5
         assert cached.checks_failed_24h == 0
 
+    async def test_update_from_agent_health_keeps_networks_apart(self, health_checker_instance):
+        """The same address reported by two networks' agents should not share state"""
+        ip = "192.168.1.1"
+
+        with patch("app.services.health_checker.report_health_check", new_callable=AsyncMock):
+            for _ in range(3):
+                await health_checker_instance.update_from_agent_health(
+                    ip=ip,
+                    reachable=False,
+                    response_time_ms=None,
+                    network_id="net-a",
+                    include_dns=False,
+                )
+            await health_checker_instance.update_from_agent_health(
+                ip=ip,
+                reachable=True,
+                response_time_ms=5.0,
+                network_id="net-b",
+                include_dns=False,
+            )
+
+        by_network = health_checker_instance.get_all_network_metrics()
+        assert by_network["net-a"][ip].status == HealthStatus.UNHEALTHY
+        assert by_network["net-a"][ip].consecutive_failures == 3
+        assert by_network["net-a"][ip].checks_failed_24h == 3
+        assert by_network["net-b"][ip].status == HealthStatus.HEALTHY
+        assert by_network["net-b"][ip].checks_passed_24h == 1
+        assert by_network["net-b"][ip].checks_failed_24h == 0
+        # The IP-keyed view holds the latest report
+        assert health_checker_instance.get_cached_metrics(ip).status == HealthStatus.HEALTHY
+
+        entries, _ = health_checker_instance.get_check_history_page(ip, network_id="net-a")
+        assert [entry.success for entry in entries] == [False, False, False]
+
+    async def test_removed_device_drops_network_metrics(self, health_checker_instance):
+        """Removing a device from a network should drop what its agent reported there"""
+        with patch("app.services.health_checker.report_health_check", new_callable=AsyncMock):
+            await health_checker_instance.update_from_agent_health(
+                ip="192.168.1.1",
+                reachable=True,
+                response_time_ms=5.0,
+                network_id="net-a",
+                include_dns=False,
+            )
+
+        health_checker_instance.remove_devices("net-a", ["192.168.1.1"])
+
+        assert health_checker_instance.get_all_network_metrics() == {}
+        entries, _ = health_checker_instance.get_check_history_page(
+            "192.168.1.1", network_id="net-a"
+        )
+        assert entries == []
+
     async def test_update_from_agent_health_skips_dns_when_disabled(self, health_checker_instance):
         """Should skip DNS lookup when include_dns is False"""
         with patch("app.services.health_checker.report_health_check", new_callable=AsyncMock):
@@ -2,7 +2,8 @@
 Unit tests for health router endpoints.
 """
 
-from datetime import datetime, timezone
+from collections import deque
+from datetime import datetime, timedelta, timezone
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
@@ -188,6 +189,55 @@ class TestCachedMetrics:
             mock_checker.clear_cache.assert_called_once()
 
 
+class TestCheckHistory:
+    """Tests for the paginated check history endpoints"""
+
+    @pytest.fixture
+    def checker(self, health_checker_instance):
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        health_checker_instance._history["192.168.1.1"] = deque(
+            (start + timedelta(minutes=m), m % 10 != 0, float(m)) for m in range(25)
+        )
+        health_checker_instance._test_ip_history["192.168.1.1:8.8.8.8"] = deque(
+            [(start, True, 9.0)]
+        )
+        with patch("app.routers.health.health_checker", health_checker_instance):
+            yield health_checker_instance
+
+    def test_pages_chain_through_next_since(self, client, checker):
+        entries = []
+        params = {"limit": 10, "since": "2024-01-01T00:02:00Z"}
+        while True:
+            page = client.get("/api/health/history/192.168.1.1", params=params).json()
+            entries.extend(page["entries"])
+            if page["next_since"] is None:
+                break
+            params["since"] = page["next_since"]
+
+        assert [e["latency_ms"] for e in entries] == [float(m) for m in range(3, 25)]
+
+    def test_until_bounds_the_range(self, client, checker):
+        page = client.get(
+            "/api/health/history/192.168.1.1", params={"until": "2024-01-01T00:04:00"}
+        ).json()
+
+        assert len(page["entries"]) == 5
+        assert page["entries"][0]["success"] is False
+        assert page["next_since"] is None
+
+    def test_test_ip_history(self, client, checker):
+        response = client.get("/api/health/gateway/192.168.1.1/test-ips/8.8.8.8/history")
+
+        assert response.status_code == 200
+        assert response.json()["ip"] == "8.8.8.8"
+        assert len(response.json()["entries"]) == 1
+
+    def test_unknown_device_and_invalid_limit(self, client, checker):
+        assert client.get("/api/health/history/10.0.0.1").json()["entries"] == []
+        assert client.get("/api/health/history/192.168.1.1?limit=0").status_code == 422
+        assert client.get("/api/health/history/not-an-ip").status_code == 400
+
+
 class TestQuickPing:
     """Tests for GET /api/health/ping/{ip}"""
 
@@ -286,29 +336,120 @@ class TestDnsCheck:
 class TestMonitoringDevices:
     """Tests for monitoring device endpoints"""
 
-    def test_register_devices(self, client):
-        """Should register devices for monitoring"""
-        with (
-            patch("app.routers.health.health_checker") as mock_checker,
-            patch(
-                "app.routers.health.sync_devices_with_notification_service", new_callable=AsyncMock
-            ) as mock_sync,
-        ):
-            mock_checker.set_monitored_devices = MagicMock()
+    @pytest.fixture
+    def checker(self, health_checker_instance):
+        with patch("app.routers.health.health_checker", health_checker_instance):
+            yield health_checker_instance
+
+    @pytest.fixture(autouse=True)
+    def synced(self):
+        """Networks the notification service is known to be in sync for"""
+        with patch("app.routers.health._synced_networks", set()) as synced:
+            yield synced
+
+    @pytest.fixture
+    def mock_sync(self):
+        with patch(
+            "app.routers.health.sync_devices_with_notification_service", new_callable=AsyncMock
+        ) as mock_sync:
             mock_sync.return_value = True
+            yield mock_sync
+
+    @pytest.fixture
+    def mock_sync_changes(self):
+        with patch(
+            "app.routers.health.sync_device_changes_with_notification_service",
+            new_callable=AsyncMock,
+        ) as mock_sync_changes:
+            mock_sync_changes.return_value = True
+            yield mock_sync_changes
+
+    def test_register_devices(self, client, checker, mock_sync, mock_sync_changes):
+        """Should register devices for monitoring"""
+        response = client.post(
+            "/api/health/monitoring/devices",
+            json={"ips": ["192.168.1.1", "192.168.1.2"], "network_id": "network-uuid-42"},
+        )
 
-            response = client.post(
-                "/api/health/monitoring/devices",
-                json={"ips": ["192.168.1.1", "192.168.1.2"], "network_id": "network-uuid-42"},
-            )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["message"] == "Registered 2 devices for monitoring"
+        assert data["network_id"] == "network-uuid-42"
+        # The first registration of a network sends the full list
+        mock_sync.assert_called_once_with(
+            ["192.168.1.1", "192.168.1.2"], network_id="network-uuid-42"
+        )
+        mock_sync_changes.assert_not_called()
 
-            assert response.status_code == 200
-            data = response.json()
-            assert data["message"] == "Registered 2 devices for monitoring"
-            assert data["network_id"] == "network-uuid-42"
-            mock_sync.assert_called_once_with(
-                ["192.168.1.1", "192.168.1.2"], network_id="network-uuid-42"
-            )
+    def test_reregister_forwards_only_changes(self, client, checker, mock_sync, mock_sync_changes):
+        """Should send only added and removed devices once a network is in sync"""
+        client.post(
+            "/api/health/monitoring/devices",
+            json={"ips": ["192.168.1.1", "192.168.1.2"], "network_id": "network-uuid-42"},
+        )
+        mock_sync.reset_mock()
+
+        response = client.post(
+            "/api/health/monitoring/devices",
+            json={"ips": ["192.168.1.2", "192.168.1.3"], "network_id": "network-uuid-42"},
+        )
+
+        assert response.status_code == 200
+        assert response.json()["added"] == ["192.168.1.3"]
+        assert response.json()["removed"] == ["192.168.1.1"]
+        mock_sync.assert_not_called()
+        mock_sync_changes.assert_called_once_with(
+            "network-uuid-42", ["192.168.1.3"], ["192.168.1.1"]
+        )
+
+    def test_failed_sync_resends_full_list(
+        self, client, checker, mock_sync, mock_sync_changes, synced
+    ):
+        """A failed sync should make the next change send the whole device set"""
+        mock_sync.return_value = False
+        client.post(
+            "/api/health/monitoring/devices",
+            json={"ips": ["192.168.1.1"], "network_id": "network-uuid-42"},
+        )
+        assert "network-uuid-42" not in synced
+
+        mock_sync.return_value = True
+        client.patch(
+            "/api/health/monitoring/networks/network-uuid-42/devices",
+            json={"add": ["192.168.1.2"]},
+        )
+
+        mock_sync_changes.assert_not_called()
+        mock_sync.assert_called_with(["192.168.1.1", "192.168.1.2"], network_id="network-uuid-42")
+        assert "network-uuid-42" in synced
+
+    def test_rejected_delta_falls_back_to_full_list(
+        self, client, checker, mock_sync, mock_sync_changes, synced
+    ):
+        """A delta the notification service refuses (e.g. after its restart) is resent in full"""
+        checker.add_devices("net-a", ["192.168.1.1"])
+        synced.add("net-a")
+        mock_sync_changes.return_value = False
+
+        client.patch("/api/health/monitoring/networks/net-a/devices", json={"add": ["192.168.1.2"]})
+
+        mock_sync_changes.assert_called_once_with("net-a", ["192.168.1.2"], [])
+        mock_sync.assert_called_once_with(["192.168.1.1", "192.168.1.2"], network_id="net-a")
+        assert "net-a" in synced
+
+    def test_register_devices_leaves_other_networks(
+        self, client, checker, mock_sync, mock_sync_changes
+    ):
+        """Should replace only the devices of the network being registered"""
+        checker.add_devices("net-a", ["192.168.1.1", "192.168.1.2"])
+
+        client.post(
+            "/api/health/monitoring/devices",
+            json={"ips": ["192.168.1.1"], "network_id": "net-b"},
+        )
+
+        assert checker.get_network_devices("net-a") == ["192.168.1.1", "192.168.1.2"]
+        assert checker.get_network_devices("net-b") == ["192.168.1.1"]
 
     def test_get_monitored_devices(self, client):
         """Should return monitored devices"""
@@ -320,22 +461,49 @@ class TestMonitoringDevices:
             assert response.status_code == 200
             assert response.json()["devices"] == ["192.168.1.1"]
 
-    def test_clear_monitored_devices(self, client):
-        """Should clear monitored devices"""
-        with (
-            patch("app.routers.health.health_checker") as mock_checker,
-            patch(
-                "app.routers.health.sync_devices_with_notification_service", new_callable=AsyncMock
-            ) as mock_sync,
-        ):
-            mock_checker.set_monitored_devices = MagicMock()
-            mock_sync.return_value = False  # No network_id means it returns False
+    def test_clear_monitored_devices(self, client, checker, mock_sync_changes, synced):
+        """Should clear monitored devices and forward removals per network"""
+        checker.add_devices("net-a", ["192.168.1.1"])
+        checker.add_devices("net-b", ["192.168.1.1", "10.0.0.1"])
+        synced.update({"net-a", "net-b"})
 
-            response = client.delete("/api/health/monitoring/devices")
+        response = client.delete("/api/health/monitoring/devices")
 
-            assert response.status_code == 200
-            mock_checker.set_monitored_devices.assert_called_once_with({})
-            mock_sync.assert_called_once_with([])
+        assert response.status_code == 200
+        assert checker.get_monitored_devices() == []
+        assert sorted(c.args for c in mock_sync_changes.call_args_list) == [
+            ("net-a", [], ["192.168.1.1"]),
+            ("net-b", [], ["10.0.0.1", "192.168.1.1"]),
+        ]
+
+    def test_update_network_devices(self, client, checker, mock_sync_changes, synced):
+        """Should apply and forward an add/remove diff for one network"""
+        checker.add_devices("net-a", ["192.168.1.1", "192.168.1.2"])
+        synced.add("net-a")
+
+        response = client.patch(
+            "/api/health/monitoring/networks/net-a/devices",
+            json={"add": ["192.168.1.2", "192.168.1.3"], "remove": ["192.168.1.1", "10.9.9.9"]},
+        )
+
+        assert response.status_code == 200
+        assert response.json()["added"] == ["192.168.1.3"]
+        assert response.json()["removed"] == ["192.168.1.1"]
+        assert checker.get_network_devices("net-a") == ["192.168.1.2", "192.168.1.3"]
+        mock_sync_changes.assert_called_once_with("net-a", ["192.168.1.3"], ["192.168.1.1"])
+
+    def test_network_device_endpoints(self, client, checker, mock_sync, mock_sync_changes):
+        """Should set, read and clear one network's devices"""
+        client.put("/api/health/monitoring/networks/net-a/devices", json={"ips": ["10.0.0.1"]})
+        checker.add_devices("net-b", ["10.0.0.1"])
+
+        response = client.get("/api/health/monitoring/networks/net-a/devices")
+        assert response.json() == {"network_id": "net-a", "devices": ["10.0.0.1"]}
+
+        response = client.delete("/api/health/monitoring/networks/net-a/devices")
+        assert response.json()["removed"] == ["10.0.0.1"]
+        assert checker.get_network_devices("net-a") == []
+        assert checker.get_network_devices("net-b") == ["10.0.0.1"]
 
 
 class TestMonitoringConfig:
@@ -761,10 +929,12 @@ class TestDisabledActiveChecks:
             assert "192.168.1.1" in data["devices"]
             assert "192.168.1.2" not in data["devices"]
 
-    def test_register_devices_disabled_active_checks(self, client, monkeypatch):
-        """Should skip active monitoring when active checks are disabled"""
+    def test_register_devices_disabled_active_checks(
+        self, client, monkeypatch, health_checker_instance
+    ):
+        """Should track devices without active monitoring when active checks are disabled"""
         monkeypatch.setattr("app.routers.health.settings.disable_active_checks", True)
-        with patch("app.routers.health.health_checker") as mock_checker:
+        with patch("app.routers.health.health_checker", health_checker_instance):
             with patch(
                 "app.routers.health.sync_devices_with_notification_service",
                 new_callable=AsyncMock,
@@ -779,7 +949,9 @@ class TestDisabledActiveChecks:
                 assert response.status_code == 200
                 data = response.json()
                 assert data["active_monitoring"] is False
-                mock_checker.set_monitored_devices.assert_not_called()
+                # Membership is tracked so later changes can be diffed; the
+                # monitoring loop still never pings in this mode
+                assert health_checker_instance.get_network_devices("net-1") == ["192.168.1.1"]
 
     def test_start_monitoring_disabled(self, client, monkeypatch):
         """Should reject monitoring start when active checks are disabled"""
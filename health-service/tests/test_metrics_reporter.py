@@ -0,0 +1,73 @@
+"""
+Unit tests for metrics_reporter service.
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import pytest
+
+from app.services import metrics_reporter
+from app.services.metrics_reporter import clear_pending_changes, report_change
+
+
+@pytest.fixture
+def mock_client():
+    client = AsyncMock()
+    client.__aenter__ = AsyncMock(return_value=client)
+    client.__aexit__ = AsyncMock(return_value=None)
+    client.post = AsyncMock(return_value=MagicMock(status_code=200))
+    with patch("httpx.AsyncClient", return_value=client):
+        yield client
+    clear_pending_changes()
+
+
+async def _sent():
+    await metrics_reporter._sender
+
+
+class TestReportChange:
+    """Tests for report_change"""
+
+    async def test_reports_changes(self, mock_client):
+        """Should post the reason, IPs and networks to the metrics service"""
+        report_change("health", ["192.168.1.1"], {"net-1", None})
+        await _sent()
+
+        mock_client.post.assert_awaited_once()
+        assert mock_client.post.await_args.args[0].endswith("/api/metrics/events/changes")
+        assert mock_client.post.await_args.kwargs["json"] == {
+            "reasons": ["health"],
+            "ips": ["192.168.1.1"],
+            "network_ids": ["net-1"],
+        }
+
+    async def test_changes_during_a_report_are_merged_into_the_next(self, mock_client):
+        """Should send one report for changes made while another is being sent"""
+        report_change("health", ["192.168.1.1"])
+        await asyncio.sleep(0)  # The first report is in flight
+        report_change("health", ["192.168.1.2"])
+        report_change("test_ip", ["192.168.1.3"])
+        report_change("speed_test", ["192.168.1.3"])
+        await _sent()
+
+        sent = [c.kwargs["json"] for c in mock_client.post.await_args_list]
+        assert sent == [
+            {"reasons": ["health"], "ips": ["192.168.1.1"], "network_ids": []},
+            {
+                "reasons": ["health", "speed_test", "test_ip"],
+                "ips": ["192.168.1.2", "192.168.1.3"],
+                "network_ids": [],
+            },
+        ]
+
+    async def test_unavailable_metrics_service_drops_changes(self, mock_client):
+        """Should not raise or keep changes when the metrics service is down"""
+        mock_client.post.side_effect = httpx.ConnectError("refused")
+
+        report_change("health", ["192.168.1.1"])
+        await _sent()
+
+        assert not metrics_reporter._pending_ips
+        assert not metrics_reporter._pending_reasons
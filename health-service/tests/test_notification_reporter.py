@@ -14,6 +14,7 @@ from app.services.notification_reporter import (
     clear_state_tracking,
     report_health_check,
     report_health_checks_batch,
+    sync_device_changes_with_notification_service,
     sync_devices_with_notification_service,
 )
 
@@ -404,3 +405,39 @@ class TestSyncDevicesWithNotificationService:
             call_args = mock_client.post.call_args
             assert call_args.kwargs.get("json") == []
             assert call_args.kwargs.get("params") == {"network_id": 42}
+
+
+class TestSyncDeviceChangesWithNotificationService:
+    """Tests for sync_device_changes_with_notification_service function"""
+
+    async def test_sync_changes_posts_delta(self):
+        """Should post only the added and removed devices"""
+        mock_response = AsyncMock()
+        mock_response.status_code = 200
+
+        mock_client = AsyncMock()
+        mock_client.__aenter__ = AsyncMock(return_value=mock_client)
+        mock_client.__aexit__ = AsyncMock(return_value=None)
+        mock_client.post = AsyncMock(return_value=mock_response)
+
+        with patch("httpx.AsyncClient", return_value=mock_client):
+            result = await sync_device_changes_with_notification_service(
+                "net-1", ["192.168.1.3"], ["192.168.1.1"]
+            )
+
+            assert result is True
+            call_args = mock_client.post.call_args
+            assert call_args.args[0].endswith("/ml/sync-devices/delta")
+            assert call_args.kwargs.get("json") == {
+                "added": ["192.168.1.3"],
+                "removed": ["192.168.1.1"],
+            }
+            assert call_args.kwargs.get("params") == {"network_id": "net-1"}
+
+    async def test_sync_no_changes_skips_request(self):
+        """Should not call the notification service when nothing changed"""
+        with patch("httpx.AsyncClient") as mock_client_cls:
+            result = await sync_device_changes_with_notification_service("net-1", [], [])
+
+            assert result is True
+            mock_client_cls.assert_not_called()
@@ -6,6 +6,7 @@ All environment variables are defined here.
 """
 
 import logging
+from typing import Literal
 
 from pydantic import model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -26,17 +27,58 @@ class Settings(BaseSettings):
     # Redis configuration
     redis_url: str = "redis://localhost:6379"
     redis_db: int = 0
+    # Encoding of published events and stored snapshots (see payload_codec);
+    # readers accept all of them, but outside subscribers may expect JSON
+    redis_payload_encoding: Literal["json", "msgpack", "msgpack+zstd"] = "json"
+    # zstd level for msgpack+zstd payloads, in Redis and on WebSockets
+    payload_zstd_level: int = 1
 
     # JWT configuration (must match auth service) - no default, must be set
     jwt_secret: str = ""
     jwt_algorithm: str = "HS256"
 
-    # Publishing configuration
-    metrics_publish_interval: int = 30
+    # Publishing configuration: snapshots are regenerated when their network
+    # changes; this is the slow fallback cycle over every network
+    metrics_publish_interval: int = 300
+    # Changes to a network within this long are published in one snapshot
+    snapshot_debounce_seconds: float = 0.5
+    # Minimum time between change-driven snapshots of the same network
+    snapshot_min_interval_seconds: float = 2.0
+    # Minimum time between change-driven regenerations of any networks, each of
+    # which fetches the health payloads shared by all networks
+    snapshot_shared_fetch_interval_seconds: float = 1.0
+    # Networks whose snapshots are generated at once in each publish cycle
+    snapshot_concurrency: int = 16
+    # Every Nth published snapshot of a network is sent in full; the rest are deltas
+    snapshot_keyframe_interval: int = 10
+    # Lifetime of each network's last-snapshot key in Redis
+    snapshot_ttl_seconds: int = 3600
+    # Cached layouts are used without asking the backend for this long after
+    # being fetched or revalidated; saves invalidate them sooner
+    layout_revalidate_seconds: int = 60
+    # Check history in snapshots is summarized into this many buckets over the
+    # last HISTORY_SPARKLINE_HOURS
+    history_sparkline_points: int = 48
+    history_sparkline_hours: int = 24
+
+    # WebSocket clients: frames queued per client, and queue overflows tolerated
+    # before a client that is not catching up is disconnected
+    websocket_send_queue_size: int = 64
+    websocket_max_overflows: int = 3
 
     # Usage tracking configuration
     usage_batch_size: int = 10
     usage_batch_interval_seconds: float = 5.0
+    # Recorded usage is aggregated in memory and written to Redis once per window
+    usage_flush_interval_seconds: float = 1.0
+    # Per-route latency histograms: one per window of this many seconds, kept
+    # for USAGE_LATENCY_RETENTION_HOURS. Each is also rolled up into windows of
+    # USAGE_LATENCY_ROLLUP_SECONDS, which are read instead once a span would take
+    # more than USAGE_LATENCY_MAX_WINDOWS windows per route
+    usage_latency_window_seconds: int = 60
+    usage_latency_rollup_seconds: int = 3600
+    usage_latency_max_windows: int = 120
+    usage_latency_retention_hours: int = 24
 
     # PostHog analytics
     posthog_api_key: str = ""  # To be set via environment variable
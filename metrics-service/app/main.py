@@ -14,15 +14,19 @@ This service:
 import logging
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, Request
+from cartographer_usage import UsageTrackingMiddleware
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 
 from .config import reload_env_overrides, settings
 from .routers.metrics import router as metrics_router
 from .services.http_client import http_client
+from .services.layout_cache import LAYOUT_SAVED_CHANNEL
 from .services.metrics_aggregator import metrics_aggregator
+from .services.metrics_exporter import metrics_exporter
+from .services.openmetrics import CONTENT_TYPE as OPENMETRICS_CONTENT_TYPE
 from .services.redis_publisher import redis_publisher
-from .services.usage_middleware import UsageTrackingMiddleware
+from .services.usage_tracker import usage_tracker
 
 # Configure logging
 logging.basicConfig(
@@ -37,12 +41,14 @@ async def lifespan(app: FastAPI):
     Manage application startup and shutdown events.
 
     On startup:
-    - Connect to Redis
+    - Connect to Redis and listen for saved layouts
+    - Start flushing recorded usage
     - Generate initial snapshot immediately
     - Start the background metrics publishing loop
 
     On shutdown:
     - Stop publishing
+    - Flush recorded usage
     - Disconnect from Redis
     """
     import asyncio
@@ -61,6 +67,13 @@ async def lifespan(app: FastAPI):
     else:
         logger.warning("Failed to connect to Redis - will retry on publish")
 
+    # Write recorded usage to Redis once per window
+    usage_tracker.start_flushing()
+
+    # Refetch a network's cached layout when the backend saves a new one
+    redis_publisher.add_handler(LAYOUT_SAVED_CHANNEL, metrics_aggregator.on_layout_saved)
+    await redis_publisher.subscribe(LAYOUT_SAVED_CHANNEL)
+
     # Generate initial snapshots for ALL networks IMMEDIATELY (before starting background loop)
     # This ensures snapshots are available as soon as the service starts accepting requests
     logger.info("Generating initial snapshots for all networks...")
@@ -73,10 +86,8 @@ async def lifespan(app: FastAPI):
                 f"Initial snapshots ready for {len(initial_snapshots)} networks with {total_nodes} total nodes"
             )
             if redis_connected:
-                for network_id, snapshot in initial_snapshots.items():
-                    await redis_publisher.store_last_snapshot(snapshot)
-                    await redis_publisher.publish_topology_snapshot(snapshot)
-                    logger.debug(f"Published initial snapshot for network {network_id}")
+                # The first publish of each network is a full keyframe
+                await metrics_aggregator.publish_snapshots(initial_snapshots)
         else:
             logger.warning(
                 "No initial snapshots generated - networks may not exist yet or have no layouts"
@@ -97,6 +108,9 @@ async def lifespan(app: FastAPI):
     metrics_aggregator.stop_publishing()
     logger.info("Background publishing stopped")
 
+    # Write the last window of usage while Redis is still connected
+    await usage_tracker.stop_flushing()
+
     # Disconnect from Redis
     await redis_publisher.disconnect()
     logger.info("Disconnected from Redis")
@@ -127,7 +141,7 @@ by other services and real-time dashboards.
 
 ## Redis Channels
 
-- `metrics:topology` - Full topology snapshots and node updates
+- `metrics:topology:{network_id}` - A network's topology snapshots (full keyframes and deltas) and node updates; subscribe to `metrics:topology:*` for all networks
 - `metrics:health` - Health status changes
 - `metrics:speedtest` - Speed test results
         """,
@@ -148,7 +162,15 @@ by other services and real-time dashboards.
     )
 
     # Usage tracking middleware - tracks own endpoint usage
-    app.add_middleware(UsageTrackingMiddleware, service_name="metrics-service")
+    # Recorded directly, not posted back to this service's own usage endpoint
+    app.add_middleware(
+        UsageTrackingMiddleware,
+        service_name="metrics-service",
+        settings=settings,
+        excluded_paths={"/metrics"},
+        excluded_prefixes=("/api/metrics/usage",),
+        reporter=usage_tracker.record_reported,
+    )
 
     # Include routers
     app.include_router(metrics_router, prefix="/api")
@@ -164,6 +186,7 @@ by other services and real-time dashboards.
             "version": "0.1.0",
             "endpoints": {
                 "metrics": "/api/metrics",
+                "openmetrics": "/metrics",
                 "docs": "/docs",
                 "health": "/healthz",
             },
@@ -186,6 +209,15 @@ by other services and real-time dashboards.
             "is_publishing": config["is_running"],
         }
 
+    # Scrape endpoint for Prometheus-compatible collectors
+    @app.get("/metrics", include_in_schema=False)
+    async def openmetrics():
+        """
+        OpenMetrics exposition of device health and service internals.
+        Rendered from cached state; see metrics_exporter.
+        """
+        return Response(metrics_exporter.render(), media_type=OPENMETRICS_CONTENT_TYPE)
+
     # Readiness check endpoint
     @app.get("/ready")
     async def readyz():
@@ -90,6 +90,31 @@ class CheckHistoryEntry(BaseModel):
     latency_ms: float | None = None
 
 
+class HistorySparkline(BaseModel):
+    """
+    Check history downsampled into equal time buckets, oldest first.
+
+    Bucket i covers bucket_seconds from start + i * bucket_seconds. Buckets
+    without checks have 0 checks and no latency. Full-resolution history is
+    served by the history endpoints.
+    """
+
+    start: datetime
+    bucket_seconds: int
+    checks: list[int]
+    failed: list[int]
+    avg_latency_ms: list[float | None]
+
+
+class CheckHistoryPage(BaseModel):
+    """A page of full-resolution check history, oldest first"""
+
+    ip: str
+    entries: list[CheckHistoryEntry] = []
+    # Pass as `since` to get the next page; None when this is the last one
+    next_since: datetime | None = None
+
+
 # ==================== ISP / Speed Test Metrics ====================
 
 
@@ -119,7 +144,7 @@ class TestIPMetrics(BaseModel):
     last_check: datetime | None = None
     ping: PingMetrics | None = None
     uptime: UptimeMetrics | None = None
-    check_history: list[CheckHistoryEntry] = []
+    history: HistorySparkline | None = None
 
 
 class GatewayISPInfo(BaseModel):
@@ -248,7 +273,7 @@ class NodeMetrics(BaseModel):
 
     # Uptime metrics
     uptime: UptimeMetrics | None = None
-    check_history: list[CheckHistoryEntry] = []
+    history: HistorySparkline | None = None
 
     # User notes
     notes: str | None = None
@@ -307,6 +332,40 @@ class NetworkTopologySnapshot(BaseModel):
     # Root node ID (for tree representation)
     root_node_id: str | None = None
 
+    # Publishing: the network this snapshot belongs to, and its per-network sequence
+    # number (set when published; deltas name the sequence they apply on top of)
+    network_id: str | None = None
+    sequence: int | None = None
+
+
+class NetworkTopologyDelta(BaseModel):
+    """
+    Changes between two consecutive published snapshots of a network.
+
+    A client holding the snapshot at base_sequence applies this to reach
+    sequence. Any other base means updates were missed and it should resync.
+    """
+
+    network_id: str | None = None
+    sequence: int
+    base_sequence: int
+    snapshot_id: str
+    timestamp: datetime
+
+    # Summary fields that changed (total/healthy/degraded/unhealthy/unknown nodes, root_node_id)
+    summary: dict[str, Any] = Field(default_factory=dict)
+
+    # Nodes added or changed, by ID, and IDs of nodes that are gone
+    nodes_changed: dict[str, NodeMetrics] = Field(default_factory=dict)
+    nodes_removed: list[str] = Field(default_factory=list)
+
+    # Connections added or changed, and connections that are gone, by (source_id, target_id)
+    connections_changed: list[NodeConnection] = Field(default_factory=list)
+    connections_removed: list[NodeConnection] = Field(default_factory=list)
+
+    # The full gateway list, only when it changed
+    gateways: list[GatewayISPInfo] | None = None
+
 
 # ==================== Event Types ====================
 
@@ -315,10 +374,12 @@ class MetricsEventType(str, Enum):
     """Types of metrics events published to Redis"""
 
     FULL_SNAPSHOT = "full_snapshot"  # Complete topology snapshot
+    SNAPSHOT_DELTA = "snapshot_delta"  # Changes since the previous snapshot of a network
     NODE_UPDATE = "node_update"  # Single node update
     HEALTH_UPDATE = "health_update"  # Health status change
     SPEED_TEST_RESULT = "speed_test_result"  # New speed test result
     CONNECTIVITY_CHANGE = "connectivity_change"  # Node connectivity changed
+    LAYOUT_SAVED = "layout_saved"  # A network layout was saved (published by the backend)
 
 
 class MetricsEvent(BaseModel):
@@ -407,6 +468,39 @@ class UsageStatsResponse(BaseModel):
     last_updated: datetime | None = None
 
 
+class LatencyPercentiles(BaseModel):
+    """Response time percentiles of one route over one time window"""
+
+    start: datetime
+    end: datetime
+    count: int = 0
+    p50_ms: float | None = None
+    p90_ms: float | None = None
+    p95_ms: float | None = None
+    p99_ms: float | None = None
+
+
+class RouteLatencyStats(BaseModel):
+    """Response time percentiles of a route template, overall and per step"""
+
+    service: str
+    method: str
+    endpoint: str = Field(description="The route template (e.g., /api/health/check/{ip})")
+    overall: LatencyPercentiles
+    windows: list[LatencyPercentiles] = Field(
+        default_factory=list, description="Consecutive windows of step_minutes, oldest first"
+    )
+
+
+class LatencyStatsResponse(BaseModel):
+    """Response containing per-route latency percentiles"""
+
+    start: datetime
+    end: datetime
+    step_minutes: int | None = None
+    routes: list[RouteLatencyStats] = Field(default_factory=list)
+
+
 class UsageRecordBatch(BaseModel):
     """Batch of usage records for efficient reporting"""
 
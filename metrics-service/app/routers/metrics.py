@@ -17,21 +17,18 @@ from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 
 from ..models import (
+    CheckHistoryPage,
     EndpointUsageRecord,
-    MetricsEvent,
+    LatencyStatsResponse,
     NetworkTopologySnapshot,
     PublishConfig,
     UsageRecordBatch,
     UsageStatsResponse,
 )
 from ..services.metrics_aggregator import metrics_aggregator
-from ..services.redis_publisher import (
-    CHANNEL_HEALTH,
-    CHANNEL_SPEED_TEST,
-    CHANNEL_TOPOLOGY,
-    redis_publisher,
-)
+from ..services.redis_publisher import redis_publisher
 from ..services.usage_tracker import usage_tracker
+from ..services.websocket_hub import websocket_hub
 
 logger = logging.getLogger(__name__)
 
@@ -58,6 +55,12 @@ class ConfigResponse(BaseModel):
     is_running: bool
     last_snapshot_id: str | None = None
     last_snapshot_timestamp: str | None = None
+    # Networks, snapshots and phase timings (ms) of the last all-network cycle
+    last_cycle: dict | None = None
+    # Connected WebSocket clients, channels and frames queued or skipped
+    websocket: dict | None = None
+    # Change-driven regeneration: changes reported, coalesced, networks regenerated
+    regeneration: dict | None = None
 
 
 class TriggerResponse(BaseModel):
@@ -67,6 +70,16 @@ class TriggerResponse(BaseModel):
     message: str
 
 
+class ChangesRequest(BaseModel):
+    """Changes reported by another service that affect published snapshots"""
+
+    reasons: list[str] = []
+    # Device or gateway IPs whose data changed
+    ips: list[str] = []
+    # Networks known to be affected
+    network_ids: list[str] = []
+
+
 class SpeedTestRequest(BaseModel):
     """Request to trigger a speed test"""
 
@@ -156,13 +169,16 @@ async def publish_snapshot(
 
 
 @router.get("/snapshot/cached")
-async def get_cached_snapshot():
+async def get_cached_snapshot(
+    network_id: str | None = Query(None, description="Network ID (UUID) to get snapshot for")
+):
     """
-    Get the last published snapshot from Redis.
-    Useful for new subscribers to get initial state.
+    Get a network's last published keyframe from Redis.
+    Useful for new subscribers to get initial state; deltas published since
+    are folded into the next keyframe.
     """
     try:
-        snapshot = await redis_publisher.get_last_snapshot()
+        snapshot = await redis_publisher.get_last_snapshot(network_id)
 
         if snapshot:
             return JSONResponse({"success": True, "snapshot": snapshot.model_dump(mode="json")})
@@ -189,6 +205,9 @@ async def get_config():
         is_running=aggregator_config["is_running"],
         last_snapshot_id=aggregator_config["last_snapshot_id"],
         last_snapshot_timestamp=aggregator_config["last_snapshot_timestamp"],
+        last_cycle=aggregator_config.get("last_cycle"),
+        websocket=websocket_hub.get_stats(),
+        regeneration=aggregator_config.get("regeneration"),
     )
 
 
@@ -239,6 +258,22 @@ async def trigger_speed_test(request: SpeedTestRequest):
         raise HTTPException(status_code=500, detail=f"Failed to run speed test: {e}")
 
 
+# ==================== Change Events ====================
+
+
+@router.post("/events/changes", response_model=TriggerResponse)
+async def report_changes(request: ChangesRequest):
+    """
+    Schedule regeneration of the snapshots affected by changes elsewhere.
+
+    Called by the health service when a device or test IP changes status or a
+    speed test completes. Regeneration is debounced per network, so reports
+    can be sent as often as changes happen.
+    """
+    count = metrics_aggregator.on_changes(request.reasons, request.ips, request.network_ids)
+    return TriggerResponse(success=True, message=f"Regeneration scheduled for {count} network(s)")
+
+
 # ==================== Redis Connection Endpoints ====================
 
 
@@ -270,37 +305,12 @@ async def reconnect_redis():
 # ==================== WebSocket for Real-time Updates ====================
 
 
-class ConnectionManager:
-    """Manages WebSocket connections for real-time updates."""
-
-    def __init__(self):
-        self.active_connections: list[WebSocket] = []
-
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-        logger.info(f"WebSocket client connected. Total: {len(self.active_connections)}")
-
-    def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-        logger.info(f"WebSocket client disconnected. Total: {len(self.active_connections)}")
-
-    async def broadcast(self, message: dict):
-        """Broadcast a message to all connected clients."""
-        disconnected = []
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(message)
-            except Exception:
-                disconnected.append(connection)
-
-        # Clean up disconnected clients
-        for conn in disconnected:
-            self.disconnect(conn)
-
-
-connection_manager = ConnectionManager()
+async def _latest_snapshot(network_id: str | None) -> NetworkTopologySnapshot | None:
+    """What this process last published for a network, else the keyframe kept in Redis."""
+    snapshot = metrics_aggregator.get_published_snapshot(network_id)
+    if snapshot is None:
+        snapshot = await redis_publisher.get_last_snapshot(network_id)
+    return snapshot
 
 
 @router.websocket("/ws")
@@ -309,88 +319,96 @@ async def websocket_endpoint(websocket: WebSocket):
     WebSocket endpoint for real-time metrics updates.
 
     Clients receive:
-    - Full topology snapshots when published
+    - Full topology snapshots when published (periodic keyframes)
+    - Snapshot deltas in between, only when something changed
     - Node updates
     - Health status changes
     - Speed test results
-    """
-    await connection_manager.connect(websocket)
-
-    # Set up Redis subscriber for this connection
-    async def on_topology_event(event: MetricsEvent):
-        await connection_manager.broadcast(
-            {
-                "type": event.event_type.value,
-                "timestamp": event.timestamp.isoformat(),
-                "payload": event.payload,
-            }
-        )
 
-    # Subscribe to Redis channels
-    redis_publisher.add_handler(CHANNEL_TOPOLOGY, on_topology_event)
-    redis_publisher.add_handler(CHANNEL_HEALTH, on_topology_event)
-    redis_publisher.add_handler(CHANNEL_SPEED_TEST, on_topology_event)
+    Topology events are sent for the single-tenant topology and for each network
+    the client subscribed to with {"action": "subscribe_network", "network_id": ...}.
 
-    await redis_publisher.subscribe(CHANNEL_TOPOLOGY, CHANNEL_HEALTH, CHANNEL_SPEED_TEST)
+    Every snapshot carries a per-network sequence number and every delta the
+    base_sequence it applies on top of. A full snapshot always replaces what
+    the client holds; a delta whose base_sequence isn't the client's current
+    sequence means updates were missed, and the client should send
+    {"action": "resync", "network_id": ...} to get the current snapshot.
+    Clients that fall behind are sent no deltas until the next keyframe, and
+    are disconnected if they keep falling behind.
 
-    # Send initial snapshot if available (legacy mode - no network_id)
-    snapshot = metrics_aggregator.get_last_snapshot()
-    if snapshot:
-        await websocket.send_json(
-            {
-                "type": "initial_snapshot",
-                "timestamp": datetime.utcnow().isoformat(),
-                "payload": snapshot.model_dump(mode="json"),
-            }
-        )
+    Frames are JSON text unless the client offered the msgpack or msgpack+zstd
+    subprotocol, in which case they are binary in that encoding. Client
+    requests are JSON either way.
+    """
+    client = await websocket_hub.connect(websocket)
 
     try:
+        # Topology events not tied to a network (legacy mode)
+        await websocket_hub.subscribe(client, None)
+
+        # Send initial snapshot if available (legacy mode - no network_id)
+        snapshot = await _latest_snapshot(None)
+        if snapshot:
+            websocket_hub.send(
+                client,
+                {
+                    "type": "initial_snapshot",
+                    "timestamp": datetime.utcnow().isoformat(),
+                    "payload": snapshot.model_dump(mode="json"),
+                },
+            )
+
         while True:
             # Keep connection alive and handle client messages
             try:
                 data = await asyncio.wait_for(websocket.receive_json(), timeout=30.0)
 
                 # Handle client requests
-                if data.get("action") == "request_snapshot":
-                    # Support network_id in client request for multi-tenant mode
+                if data.get("action") in ("request_snapshot", "resync"):
+                    # Support network_id in client request for multi-tenant mode.
+                    # Send what deltas build on, so the client can resume from it.
                     network_id = data.get("network_id")
-                    snapshot = metrics_aggregator.get_last_snapshot(network_id)
+                    snapshot = await _latest_snapshot(network_id)
                     if snapshot:
-                        await websocket.send_json(
+                        websocket_hub.send(
+                            client,
                             {
                                 "type": "snapshot",
                                 "timestamp": datetime.utcnow().isoformat(),
                                 "network_id": network_id,
                                 "payload": snapshot.model_dump(mode="json"),
-                            }
+                            },
                         )
                     else:
-                        await websocket.send_json(
+                        websocket_hub.send(
+                            client,
                             {
                                 "type": "error",
                                 "timestamp": datetime.utcnow().isoformat(),
                                 "message": f"No snapshot available for network_id={network_id}",
-                            }
+                            },
                         )
 
                 elif data.get("action") == "subscribe_network":
                     # Allow client to specify which network they want updates for
                     network_id = data.get("network_id")
-                    snapshot = metrics_aggregator.get_last_snapshot(network_id)
+                    await websocket_hub.subscribe(client, network_id)
+                    snapshot = await _latest_snapshot(network_id)
                     if snapshot:
-                        await websocket.send_json(
+                        websocket_hub.send(
+                            client,
                             {
                                 "type": "initial_snapshot",
                                 "timestamp": datetime.utcnow().isoformat(),
                                 "network_id": network_id,
                                 "payload": snapshot.model_dump(mode="json"),
-                            }
+                            },
                         )
 
             except asyncio.TimeoutError:
                 # Send ping to keep connection alive
-                await websocket.send_json(
-                    {"type": "ping", "timestamp": datetime.utcnow().isoformat()}
+                websocket_hub.send(
+                    client, {"type": "ping", "timestamp": datetime.utcnow().isoformat()}
                 )
 
     except WebSocketDisconnect:
@@ -398,11 +416,7 @@ async def websocket_endpoint(websocket: WebSocket):
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
     finally:
-        # Clean up handlers
-        redis_publisher.remove_handler(CHANNEL_TOPOLOGY, on_topology_event)
-        redis_publisher.remove_handler(CHANNEL_HEALTH, on_topology_event)
-        redis_publisher.remove_handler(CHANNEL_SPEED_TEST, on_topology_event)
-        connection_manager.disconnect(websocket)
+        await websocket_hub.disconnect(client)
 
 
 # ==================== Summary Endpoints ====================
@@ -491,6 +505,60 @@ async def get_node_metrics(
     return JSONResponse(node.model_dump(mode="json"))
 
 
+@router.get("/nodes/{node_id}/history", response_model=CheckHistoryPage)
+async def get_node_history(
+    node_id: str,
+    network_id: str | None = Query(None, description="Network ID (UUID)"),
+    since: datetime | None = Query(None, description="Only checks after this time"),
+    until: datetime | None = Query(None, description="Only checks up to this time"),
+    limit: int = Query(500, ge=1, le=1440, description="Maximum entries per page"),
+):
+    """Get a node's full-resolution check history, oldest first.
+
+    Snapshots carry a downsampled sparkline; this serves the checks behind it
+    from the health service. Pages are chained by passing the response's
+    next_since as `since`.
+
+    Args:
+        node_id: The node ID to get history for.
+        network_id: Optional network ID for multi-tenant mode.
+    """
+    snapshot = metrics_aggregator.get_last_snapshot(network_id)
+
+    if not snapshot:
+        raise HTTPException(
+            status_code=404, detail=f"No snapshot available for network_id={network_id}"
+        )
+
+    node = snapshot.nodes.get(node_id)
+    if not node or not node.ip:
+        raise HTTPException(status_code=404, detail=f"Node {node_id} not found")
+
+    page = await metrics_aggregator.fetch_check_history(
+        node.ip, since, until, limit, network_id=network_id
+    )
+    if page is None:
+        raise HTTPException(status_code=502, detail="Check history unavailable")
+    return page
+
+
+@router.get("/gateways/{gateway_ip}/test-ips/{test_ip}/history", response_model=CheckHistoryPage)
+async def get_test_ip_history(
+    gateway_ip: str,
+    test_ip: str,
+    since: datetime | None = Query(None, description="Only checks after this time"),
+    until: datetime | None = Query(None, description="Only checks up to this time"),
+    limit: int = Query(500, ge=1, le=1440, description="Maximum entries per page"),
+):
+    """Get a gateway test IP's full-resolution check history, oldest first."""
+    page = await metrics_aggregator.fetch_check_history(
+        test_ip, since, until, limit, gateway_ip=gateway_ip
+    )
+    if page is None:
+        raise HTTPException(status_code=502, detail="Check history unavailable")
+    return page
+
+
 @router.get("/connections")
 async def get_connections(network_id: str | None = Query(None, description="Network ID (UUID)")):
     """Get all node connections from the current snapshot.
@@ -636,6 +704,26 @@ async def get_usage_stats(service: str | None = Query(None, description="Filter
         raise HTTPException(status_code=500, detail=f"Failed to get usage stats: {e}")
 
 
+@router.get("/usage/latency", response_model=LatencyStatsResponse)
+async def get_latency_stats(
+    service: str | None = Query(None, description="Filter by service name"),
+    minutes: int = Query(60, ge=1, le=7 * 24 * 60, description="Span to report on"),
+    step_minutes: int | None = Query(
+        None, ge=1, description="Also report consecutive windows of this many minutes"
+    ),
+):
+    """
+    Get response time percentiles (p50/p90/p95/p99) per route template.
+
+    Covers the last `minutes`, limited to how long latency histograms are kept.
+    """
+    try:
+        return await usage_tracker.get_latency_stats(service, minutes, step_minutes)
+    except Exception as e:
+        logger.error(f"Failed to get latency stats: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get latency stats: {e}")
+
+
 @router.delete("/usage/stats")
 async def reset_usage_stats(
     service: str | None = Query(None, description="Service to reset, or all if not specified")
@@ -0,0 +1,82 @@
+"""
+Check history sparklines for topology snapshots.
+
+The health service keeps up to 1440 checks per device (a day at one check a
+minute). Rather than re-sending all of them in every snapshot, each device's
+history is summarized into HISTORY_SPARKLINE_POINTS buckets covering the last
+HISTORY_SPARKLINE_HOURS: checks, failures and average latency per bucket.
+Full-resolution history is fetched on demand from the history endpoints.
+
+Buckets are aligned to multiples of their width, so a device with no new
+checks gets the same sparkline in consecutive snapshots and delta encoding
+(see snapshot_delta) leaves it out.
+"""
+
+import time
+from datetime import datetime, timezone
+from typing import Any
+
+from ..config import settings
+from ..models import HistorySparkline
+
+
+def _timestamp(value: Any) -> float | None:  # noqa: ANN401
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def summarize_history(
+    history: list[dict] | None, now: float | None = None
+) -> HistorySparkline | None:
+    """
+    Summarize check history entries from the health service into a sparkline.
+
+    Returns None when no entry falls within the sparkline's window.
+    """
+    if not history:
+        return None
+
+    points = max(1, settings.history_sparkline_points)
+    bucket_seconds = max(1, settings.history_sparkline_hours * 3600 // points)
+    now = time.time() if now is None else now
+    # The last bucket is the one now falls in
+    end = (int(now) // bucket_seconds + 1) * bucket_seconds
+    start = end - points * bucket_seconds
+
+    checks = [0] * points
+    failed = [0] * points
+    latency_sums = [0.0] * points
+    latency_counts = [0] * points
+    for entry in history:
+        try:
+            ts = _timestamp(entry.get("timestamp"))
+        except (AttributeError, ValueError):
+            continue
+        if ts is None or not start <= ts < end:
+            continue
+        i = int(ts - start) // bucket_seconds
+        checks[i] += 1
+        if not entry.get("success", False):
+            failed[i] += 1
+        latency = entry.get("latency_ms")
+        if latency is not None:
+            latency_sums[i] += latency
+            latency_counts[i] += 1
+
+    if not any(checks):
+        return None
+    return HistorySparkline(
+        start=datetime.fromtimestamp(start, timezone.utc),
+        bucket_seconds=bucket_seconds,
+        checks=checks,
+        failed=failed,
+        avg_latency_ms=[
+            round(total / count, 2) if count else None
+            for total, count in zip(latency_sums, latency_counts)
+        ],
+    )
@@ -0,0 +1,135 @@
+"""
+Layout caching for snapshot generation.
+
+Network layouts change far less often than the health data merged into them,
+yet every publish cycle used to download, parse and walk each one again. The
+cache keeps each network's parsed layout together with:
+
+- the ETag the backend served it with, so it is refetched conditionally
+  (If-None-Match) and an unchanged layout costs an empty 304
+- its node tree walked once into (node, depth, parent_id) entries in BFS order,
+  reused by every snapshot built from the same layout
+
+An entry revalidated within LAYOUT_REVALIDATE_SECONDS is used without asking
+the backend at all. The backend announces saved layouts on
+LAYOUT_SAVED_CHANNEL, which marks the network's entry stale so the next
+snapshot refetches it.
+"""
+
+import time
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+from ..config import settings
+
+# Redis channel the backend announces saved layouts on
+LAYOUT_SAVED_CHANNEL = "networks:layout_saved"
+
+# (node_data, depth, parent_id) for every node of a layout tree, in BFS order
+LayoutWalk = list[tuple[dict, int, str | None]]
+
+
+def walk_layout(root: dict) -> LayoutWalk:
+    """Walk a layout tree breadth-first, recording each node's depth and parent."""
+    walk: LayoutWalk = []
+    queue = deque([(root, 0, None)])
+    while queue:
+        node_data, depth, parent_id = queue.popleft()
+        walk.append((node_data, depth, parent_id))
+        node_id = node_data.get("id", "")
+        for child in node_data.get("children", []):
+            queue.append((child, depth + 1, node_id))
+    return walk
+
+
+@dataclass
+class CachedLayout:
+    """A network's parsed layout and what was derived from it"""
+
+    layout: dict[str, Any]
+    etag: str | None
+    walk: LayoutWalk | None
+    validated_at: float
+    stale: bool = False
+
+
+class LayoutCache:
+    """Parsed layouts per network, keyed by the backend's ETag."""
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._entries: dict[str, CachedLayout] = {}
+        self._stats = {"hits": 0, "not_modified": 0, "fetched": 0, "invalidated": 0}
+
+    def get(self, network_id: str) -> CachedLayout | None:
+        return self._entries.get(network_id)
+
+    def is_fresh(self, network_id: str) -> bool:
+        """Whether a network's layout can be used without asking the backend."""
+        entry = self._entries.get(network_id)
+        fresh = (
+            entry is not None
+            and not entry.stale
+            and self._clock() - entry.validated_at < settings.layout_revalidate_seconds
+        )
+        if fresh:
+            self._stats["hits"] += 1
+        return fresh
+
+    def store(self, network_id: str, layout: dict[str, Any], etag: str | None) -> CachedLayout:
+        """Cache a layout the backend sent in full."""
+        root = layout.get("root")
+        entry = CachedLayout(
+            layout=layout,
+            etag=etag,
+            walk=walk_layout(root) if root else None,
+            validated_at=self._clock(),
+        )
+        self._entries[network_id] = entry
+        self._stats["fetched"] += 1
+        return entry
+
+    def revalidated(self, network_id: str) -> CachedLayout | None:
+        """Mark a network's layout as confirmed unchanged by the backend (304)."""
+        entry = self._entries.get(network_id)
+        if entry is not None:
+            entry.validated_at = self._clock()
+            entry.stale = False
+            self._stats["not_modified"] += 1
+        return entry
+
+    def invalidate(self, network_id: str, etag: str | None = None) -> bool:
+        """
+        Mark a network's layout stale so the next use revalidates it.
+
+        Returns False when there was nothing to invalidate, including when the
+        cached layout already has the given ETag.
+        """
+        entry = self._entries.get(network_id)
+        if entry is None or entry.stale or (etag is not None and etag == entry.etag):
+            return False
+        entry.stale = True
+        self._stats["invalidated"] += 1
+        return True
+
+    def discard(self, network_id: str):
+        """Forget a network's layout, e.g. after the backend stopped serving it."""
+        self._entries.pop(network_id, None)
+
+    def walk_for(self, network_id: str | None, layout: dict[str, Any]) -> LayoutWalk:
+        """The walk of a layout, reusing the cached one when the layout is the cached one."""
+        entry = self._entries.get(network_id) if network_id is not None else None
+        if entry is not None and entry.layout is layout and entry.walk is not None:
+            return entry.walk
+        return walk_layout(layout["root"])
+
+    def retain(self, network_ids: list[str]):
+        """Forget the layouts of networks that no longer exist."""
+        keep = set(network_ids)
+        for network_id in [n for n in self._entries if n not in keep]:
+            del self._entries[network_id]
+
+    def get_stats(self) -> dict:
+        return {"cached": len(self._entries), **self._stats}
@@ -7,11 +7,22 @@ to produce comprehensive network topology snapshots.
 Performance optimizations:
 - Uses shared HTTP client with connection pooling (not new clients per request)
 - Parallel data fetching via asyncio.gather
+- All-network cycles fetch the health, test IP and speed test payloads once and
+  build network snapshots concurrently, bounded by SNAPSHOT_CONCURRENCY
+- Snapshots are published as deltas against the previous one with periodic full
+  keyframes, and not at all when nothing changed (see snapshot_delta)
+- Layouts are cached parsed and pre-walked, refetched conditionally by ETag and
+  invalidated when the backend announces a save (see layout_cache)
+- Networks are regenerated when something in them changes, debounced and
+  coalesced per network; the all-network cycle is only a slow fallback (see
+  snapshot_scheduler)
 """
 
 import asyncio
 import logging
+import time
 import uuid
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta, timezone
 from typing import Any
 
@@ -21,12 +32,14 @@ import jwt
 from ..config import settings
 from ..models import (
     CheckHistoryEntry,
+    CheckHistoryPage,
     DeviceRole,
     DnsMetrics,
     GatewayISPInfo,
     HealthStatus,
     LanPort,
     LanPortsConfig,
+    MetricsEvent,
     NetworkTopologySnapshot,
     NodeConnection,
     NodeMetrics,
@@ -39,8 +52,13 @@ from ..models import (
     TestIPMetrics,
     UptimeMetrics,
 )
+from .history_sparkline import summarize_history
 from .http_client import http_client
+from .layout_cache import LayoutCache, LayoutWalk, walk_layout
+from .openmetrics import Histogram
 from .redis_publisher import redis_publisher
+from .snapshot_delta import SnapshotSequencer
+from .snapshot_scheduler import RegenerationSchedule
 
 logger = logging.getLogger(__name__)
 
@@ -72,6 +90,29 @@ SERVICE_TOKEN = _generate_service_token()
 SERVICE_AUTH_HEADER = {"Authorization": f"Bearer {SERVICE_TOKEN}"}
 
 
+@dataclass
+class SnapshotCycle:
+    """
+    Inputs shared by every network in one snapshot cycle, and its timings.
+
+    The health, gateway test IP and speed test payloads each cover every device
+    and are keyed by IP, so one fetch per cycle serves all networks: a network's
+    nodes are looked up by IP while its layout is walked. Agent-reported health
+    is also fetched per network, and overrides the IP-keyed entries for its own
+    network since the same private address can be a different device elsewhere.
+    """
+
+    health_metrics: dict[str, Any]
+    gateway_test_ips: dict[str, Any]
+    speed_test_results: dict[str, Any]
+    network_health_metrics: dict[str, dict[str, Any]] = field(default_factory=dict)
+    # Phase -> seconds. Per-network phases (layout, build) are summed across networks.
+    timings: dict[str, float] = field(default_factory=dict)
+
+    def record(self, phase: str, seconds: float):
+        self.timings[phase] = self.timings.get(phase, 0.0) + seconds
+
+
 class MetricsAggregator:
     """
     Aggregates metrics from multiple sources and publishes
@@ -85,6 +126,19 @@ class MetricsAggregator:
         # Multi-tenant: store snapshots per network_id (None key for legacy single-network mode)
         self._snapshots: dict[str | None, NetworkTopologySnapshot] = {}
         self._last_speed_test: dict[str, SpeedTestMetrics] = {}  # gateway_ip -> last speed test
+        self._last_cycle: dict[str, Any] | None = None  # Stats of the last all-network cycle
+        self._sequencer = SnapshotSequencer()
+        # The publish loop, POST /publish and the regeneration loop all publish;
+        # plan -> publish -> commit runs under the network's lock so two updates
+        # are never planned against the same base sequence
+        self._publish_locks: dict[str | None, asyncio.Lock] = {}
+        self._layout_cache = LayoutCache()
+        self._regeneration = RegenerationSchedule()
+        self._regeneration_task: asyncio.Task | None = None
+        self._regeneration_wakeup: asyncio.Event | None = None
+        # Seconds taken by all-network cycles, and by publishing each network's update
+        self._cycle_seconds = Histogram((0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0))
+        self._publish_seconds = Histogram()
 
     @property
     def _last_snapshot(self) -> NetworkTopologySnapshot | None:
@@ -138,27 +192,47 @@ class MetricsAggregator:
             network_id: The network ID to fetch layout for. Required for multi-tenant
                        mode. If None, falls back to the legacy single-file endpoint
                        for backwards compatibility only.
+
+        Network layouts are cached: a recently validated one is returned without
+        a request, and otherwise it is refetched with If-None-Match so that an
+        unchanged layout is neither downloaded nor parsed again.
         """
         try:
             if network_id is not None:
+                cached = self._layout_cache.get(network_id)
+                if cached is not None and self._layout_cache.is_fresh(network_id):
+                    return cached.layout
+
                 # Use multi-tenant endpoint - requires explicit network_id
+                headers = SERVICE_AUTH_HEADER
+                if cached is not None and cached.etag:
+                    headers = {**SERVICE_AUTH_HEADER, "If-None-Match": cached.etag}
                 response = await http_client.get(
                     f"{settings.backend_service_url}/api/networks/{network_id}/layout",
-                    headers=SERVICE_AUTH_HEADER,
+                    headers=headers,
                 )
+                if response.status_code == 304 and cached is not None:
+                    logger.debug(f"Layout for network {network_id} not modified")
+                    self._layout_cache.revalidated(network_id)
+                    return cached.layout
                 if response.status_code == 200:
                     data = response.json()
                     # Multi-tenant endpoint returns layout_data directly (not wrapped in exists/layout)
                     layout_data = data.get("layout_data")
                     if layout_data:
                         logger.debug(f"Fetched layout for network {network_id}")
+                        self._layout_cache.store(
+                            network_id, layout_data, response.headers.get("ETag")
+                        )
                         return layout_data
                     else:
                         logger.debug(f"Network {network_id} has no layout data yet")
+                        self._layout_cache.discard(network_id)
                 elif response.status_code == 401:
                     logger.error("Authentication failed fetching layout - check JWT_SECRET")
                 elif response.status_code == 404:
                     logger.warning(f"Network {network_id} not found or no layout exists")
+                    self._layout_cache.discard(network_id)
                 elif response.status_code == 500:
                     logger.error(f"Backend error fetching layout for network {network_id}")
                 return None
@@ -202,6 +276,22 @@ class MetricsAggregator:
             logger.error(f"Failed to fetch health metrics: {e}")
             return {}
 
+    async def _fetch_network_health_metrics(self) -> dict[str, dict[str, Any]]:
+        """Fetch agent-reported health metrics per network from the health service."""
+        try:
+            response = await http_client.get(
+                f"{settings.health_service_url}/api/health/cached/networks"
+            )
+            if response.status_code == 200:
+                return response.json()
+            return {}
+        except httpx.ConnectError:
+            logger.warning("Health service unavailable - cannot fetch network health metrics")
+            return {}
+        except Exception as e:
+            logger.error(f"Failed to fetch network health metrics: {e}")
+            return {}
+
     async def _fetch_gateway_test_ips(self) -> dict[str, Any]:
         """Fetch all gateway test IP metrics (with status) from health service."""
         try:
@@ -242,6 +332,23 @@ class MetricsAggregator:
             logger.error(f"Failed to fetch speed test results: {e}")
             return {}
 
+    async def _fetch_cycle_inputs(self) -> SnapshotCycle:
+        """Fetch the payloads shared by every network, in parallel."""
+        (
+            health_metrics,
+            gateway_test_ips,
+            speed_test_results,
+            network_health_metrics,
+        ) = await asyncio.gather(
+            self._fetch_health_metrics(),
+            self._fetch_gateway_test_ips(),
+            self._fetch_speed_test_results(),
+            self._fetch_network_health_metrics(),
+        )
+        return SnapshotCycle(
+            health_metrics, gateway_test_ips, speed_test_results, network_health_metrics
+        )
+
     async def _fetch_monitoring_status(self) -> dict[str, Any] | None:
         """Fetch monitoring status from health service."""
         try:
@@ -258,6 +365,48 @@ class MetricsAggregator:
             logger.error(f"Failed to fetch monitoring status: {e}")
             return None
 
+    async def fetch_check_history(
+        self,
+        ip: str,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        limit: int = 500,
+        gateway_ip: str | None = None,
+        network_id: str | None = None,
+    ) -> CheckHistoryPage | None:
+        """
+        Fetch a page of full-resolution check history from the health service.
+
+        Snapshots only carry sparklines; this serves the history behind them.
+        With gateway_ip, ip is one of that gateway's test IPs; with network_id,
+        the history an agent reported for that network is preferred. Returns None if
+        the health service could not be reached or refused the request.
+        """
+        base = f"{settings.health_service_url}/api/health"
+        if gateway_ip:
+            url = f"{base}/gateway/{gateway_ip}/test-ips/{ip}/history"
+        else:
+            url = f"{base}/history/{ip}"
+        params: dict[str, Any] = {"limit": limit}
+        if network_id and not gateway_ip:
+            params["network_id"] = network_id
+        if since:
+            params["since"] = since.isoformat()
+        if until:
+            params["until"] = until.isoformat()
+        try:
+            response = await http_client.get(url, params=params)
+            if response.status_code == 200:
+                return CheckHistoryPage.model_validate(response.json())
+            logger.warning(f"Health service returned {response.status_code} for history of {ip}")
+            return None
+        except httpx.ConnectError:
+            logger.warning("Health service unavailable - cannot fetch check history")
+            return None
+        except Exception as e:
+            logger.error(f"Failed to fetch check history: {e}")
+            return None
+
     # ==================== Data Transformation ====================
 
     def _parse_device_role(self, role_str: str | None) -> DeviceRole | None:
@@ -375,7 +524,7 @@ class MetricsAggregator:
                 last_seen_online=test_ip_data.get("last_seen_online"),
                 consecutive_failures=test_ip_data.get("consecutive_failures", 0),
             ),
-            check_history=self._transform_check_history(test_ip_data.get("check_history", [])),
+            history=summarize_history(test_ip_data.get("check_history")),
         )
 
     def _transform_lan_ports(self, lan_ports_data: dict | None) -> LanPortsConfig | None:
@@ -571,7 +720,7 @@ class MetricsAggregator:
             dns=self._transform_dns_metrics(health_data.get("dns")),
             open_ports=open_ports,
             uptime=self._transform_uptime_metrics(health_data) if health_data else None,
-            check_history=self._transform_check_history(health_data.get("check_history", [])),
+            history=summarize_history(health_data.get("check_history")),
             notes=node_data.get("notes"),
             created_at=created_at,
             updated_at=updated_at,
@@ -603,22 +752,24 @@ class MetricsAggregator:
         health_metrics: dict[str, Any],
         gateway_test_ips: dict[str, Any],
         speed_test_results: dict[str, Any],
+        walk: LayoutWalk | None = None,
     ) -> tuple[dict[str, NodeMetrics], list[NodeConnection], str]:
         """
-        Process the entire node tree recursively.
+        Process the entire node tree in BFS order.
         Returns (nodes_dict, connections_list, root_node_id)
+
+        walk is the tree already walked by walk_layout(); it is walked here if
+        not given.
         """
         nodes: dict[str, NodeMetrics] = {}
         connections: list[NodeConnection] = []
 
-        # BFS to process all nodes
-        queue = [(root_data, 0, None)]  # (node_data, depth, parent_id)
+        if walk is None:
+            walk = walk_layout(root_data)
         root_node_id = root_data.get("id", "")
 
-        while queue:
-            node_data, depth, parent_id = queue.pop(0)
-
-            node_metrics, node_connections, children = self._process_node(
+        for node_data, depth, parent_id in walk:
+            node_metrics, node_connections, _ = self._process_node(
                 node_data, health_metrics, gateway_test_ips, speed_test_results, depth, parent_id
             )
 
@@ -636,16 +787,12 @@ class MetricsAggregator:
             nodes[node_metrics.id] = node_metrics
             connections.extend(node_connections)
 
-            # Queue children
-            for child in children:
-                queue.append((child, depth + 1, node_metrics.id))
-
         return nodes, connections, root_node_id
 
     # ==================== Snapshot Generation ====================
 
     async def generate_snapshot(
-        self, network_id: str | None = None
+        self, network_id: str | None = None, cycle: SnapshotCycle | None = None
     ) -> NetworkTopologySnapshot | None:
         """
         Generate a complete network topology snapshot by aggregating
@@ -654,29 +801,46 @@ class MetricsAggregator:
         Args:
             network_id: The network ID to generate snapshot for. If None, falls back
                        to legacy single-file layout (for backwards compatibility).
+            cycle: Shared inputs of an all-network cycle. If None, they are fetched
+                   alongside the layout for this network alone.
         """
         logger.debug(f"Generating network topology snapshot for network_id={network_id}...")
 
-        # Fetch data from all sources in parallel
-        layout_task = self._fetch_network_layout(network_id)
-        health_task = self._fetch_health_metrics()
-        test_ips_task = self._fetch_gateway_test_ips()
-        speed_test_task = self._fetch_speed_test_results()
-
-        layout, health_metrics, gateway_test_ips, speed_test_results = await asyncio.gather(
-            layout_task, health_task, test_ips_task, speed_test_task
-        )
+        started = time.perf_counter()
+        if cycle is None:
+            # Fetch data from all sources in parallel
+            layout, cycle = await asyncio.gather(
+                self._fetch_network_layout(network_id), self._fetch_cycle_inputs()
+            )
+        else:
+            layout = await self._fetch_network_layout(network_id)
+        cycle.record("layout", time.perf_counter() - started)
 
         if not layout or not layout.get("root"):
             logger.warning("No network layout available")
             return None
 
+        started = time.perf_counter()
+        snapshot = self._build_snapshot(network_id, layout, cycle)
+        cycle.record("build", time.perf_counter() - started)
+        return snapshot
+
+    def _build_snapshot(
+        self, network_id: str | None, layout: dict[str, Any], cycle: SnapshotCycle
+    ) -> NetworkTopologySnapshot:
+        """Merge a network layout with the cycle's health data into a snapshot."""
+        health_metrics = cycle.health_metrics
+        network_health = cycle.network_health_metrics.get(network_id) if network_id else None
+        if network_health:
+            health_metrics = {**health_metrics, **network_health}
+
         # Process the node tree
         nodes, connections, root_node_id = self._process_tree(
             layout["root"],
             health_metrics,
-            gateway_test_ips,
-            speed_test_results,
+            cycle.gateway_test_ips,
+            cycle.speed_test_results,
+            walk=self._layout_cache.walk_for(network_id, layout),
         )
 
         # Count node statuses (excluding group nodes to match frontend)
@@ -716,6 +880,7 @@ class MetricsAggregator:
             connections=connections,
             gateways=gateways,
             root_node_id=root_node_id,
+            network_id=network_id,
         )
 
         # Store snapshot by network_id for multi-tenant support
@@ -735,16 +900,19 @@ class MetricsAggregator:
     async def generate_all_snapshots(self) -> dict[str, NetworkTopologySnapshot]:
         """Generate snapshots for all networks in the system.
 
-        This fetches the list of all networks and generates a snapshot for each.
-        Used at startup and in the background publish loop.
+        This fetches the list of all networks, then the inputs shared by all of
+        them once, and generates every network's snapshot concurrently (at most
+        SNAPSHOT_CONCURRENCY at a time). Used at startup and in the fallback
+        publish loop.
 
         Returns:
             Dict mapping network_id (UUID string) to generated snapshot.
         """
-        snapshots: dict[str, NetworkTopologySnapshot] = {}
+        cycle_started = time.perf_counter()
 
         # Fetch all network IDs
         network_ids = await self._fetch_all_network_ids()
+        networks_seconds = time.perf_counter() - cycle_started
 
         if not network_ids:
             # Fallback to legacy mode if no networks found
@@ -752,17 +920,29 @@ class MetricsAggregator:
             legacy_snapshot = await self.generate_snapshot(None)
             if legacy_snapshot:
                 logger.info("Generated legacy snapshot (no network_id)")
-            return snapshots
+            return {}
 
-        # Generate snapshot for each network
-        for network_id in network_ids:
-            try:
-                snapshot = await self.generate_snapshot(network_id)
-                if snapshot:
-                    snapshots[network_id] = snapshot
-                    logger.debug(f"Generated snapshot for network {network_id}")
-            except Exception as e:
-                logger.error(f"Failed to generate snapshot for network {network_id}: {e}")
+        self._layout_cache.retain(network_ids)
+        self._regeneration.retain(network_ids)
+
+        started = time.perf_counter()
+        cycle = await self._fetch_cycle_inputs()
+        cycle.record("networks", networks_seconds)
+        cycle.record("shared_inputs", time.perf_counter() - started)
+
+        started = time.perf_counter()
+        snapshots = await self._generate_snapshots(network_ids, cycle)
+        self._regeneration.ran(network_ids)
+        cycle.record("snapshots", time.perf_counter() - started)
+        cycle.record("total", time.perf_counter() - cycle_started)
+        self._cycle_seconds.observe(cycle.timings["total"])
+
+        self._last_cycle = {
+            "networks": len(network_ids),
+            "snapshots": len(snapshots),
+            "timings_ms": {phase: round(s * 1000, 1) for phase, s in cycle.timings.items()},
+        }
+        logger.info(f"Snapshot cycle: {self._last_cycle}")
 
         if snapshots:
             logger.info(
@@ -773,6 +953,27 @@ class MetricsAggregator:
 
         return snapshots
 
+    async def _generate_snapshots(
+        self, network_ids: list[str | None], cycle: SnapshotCycle
+    ) -> dict[str | None, NetworkTopologySnapshot]:
+        """Generate several networks' snapshots concurrently from one cycle's inputs."""
+        snapshots: dict[str | None, NetworkTopologySnapshot] = {}
+        semaphore = asyncio.Semaphore(max(1, settings.snapshot_concurrency))
+
+        async def generate(network_id: str | None):
+            async with semaphore:
+                try:
+                    snapshot = await self.generate_snapshot(network_id, cycle=cycle)
+                    if snapshot:
+                        snapshots[network_id] = snapshot
+                        logger.debug(f"Generated snapshot for network {network_id}")
+                except Exception as e:
+                    logger.error(f"Failed to generate snapshot for network {network_id}: {e}")
+
+        # Generate snapshot for each network
+        await asyncio.gather(*(generate(network_id) for network_id in network_ids))
+        return snapshots
+
     async def publish_snapshot(self, network_id: str | None = None) -> bool:
         """Generate and publish a network topology snapshot.
 
@@ -784,37 +985,85 @@ class MetricsAggregator:
         if not snapshot:
             return False
 
-        # Publish to Redis
-        success = await redis_publisher.publish_topology_snapshot(snapshot)
+        return await self._publish(network_id, snapshot)
 
-        if success:
-            # Store as last snapshot for new subscribers
-            await redis_publisher.store_last_snapshot(snapshot)
+    async def _publish(self, network_id: str | None, snapshot: NetworkTopologySnapshot) -> bool:
+        """Publish a snapshot, or only what changed since the last one published.
 
-        return success
+        Returns True if anything was published.
+        """
+        lock = self._publish_locks.setdefault(network_id, asyncio.Lock())
+        async with lock:
+            update = self._sequencer.plan(network_id, snapshot)
+            if update is None:
+                logger.debug(f"Snapshot for network {network_id} unchanged, nothing published")
+                await redis_publisher.refresh_last_snapshot(network_id)
+                return False
+
+            # Publish to Redis
+            started = time.perf_counter()
+            if update.delta is None:
+                success = await redis_publisher.publish_topology_snapshot(snapshot)
+            else:
+                success = await redis_publisher.publish_topology_delta(update.delta)
+
+            if success:
+                self._sequencer.commit(update)
+                # Keyframes are stored for new subscribers and other replicas. A
+                # delta only refreshes the stored keyframe's TTL: re-serializing the
+                # full snapshot for every small change would cost more than the delta
+                # saves, and a client resyncing from the stored copy catches up at
+                # the next keyframe.
+                if update.delta is None:
+                    await redis_publisher.store_last_snapshot(snapshot)
+                else:
+                    await redis_publisher.refresh_last_snapshot(network_id)
+                self._publish_seconds.observe(time.perf_counter() - started)
 
-    async def publish_all_snapshots(self) -> int:
-        """Generate and publish snapshots for all networks.
+            return success
+
+    async def publish_snapshots(self, snapshots: dict[str, NetworkTopologySnapshot]) -> int:
+        """Publish generated snapshots for several networks.
 
         Returns:
-            Number of snapshots successfully published.
+            Number of networks something was published for.
         """
-        snapshots = await self.generate_all_snapshots()
         published_count = 0
 
         for network_id, snapshot in snapshots.items():
             try:
-                success = await redis_publisher.publish_topology_snapshot(snapshot)
-                if success:
-                    await redis_publisher.store_last_snapshot(snapshot)
+                if await self._publish(network_id, snapshot):
                     published_count += 1
             except Exception as e:
                 logger.error(f"Failed to publish snapshot for network {network_id}: {e}")
 
         return published_count
 
+    async def publish_all_snapshots(self) -> int:
+        """Generate and publish snapshots for all networks.
+
+        Returns:
+            Number of networks something was published for.
+        """
+        snapshots = await self.generate_all_snapshots()
+        return await self.publish_snapshots(snapshots)
+
+    async def publish_networks(self, network_ids: list[str | None]) -> int:
+        """Generate and publish snapshots for some networks, sharing one fetch of health data.
+
+        Returns:
+            Number of networks something was published for.
+        """
+        cycle = await self._fetch_cycle_inputs()
+        snapshots = await self._generate_snapshots(network_ids, cycle)
+        return await self.publish_snapshots(snapshots)
+
     async def _publish_loop(self, skip_initial: bool = False):
-        """Background loop that periodically publishes snapshots for all networks."""
+        """Fallback loop that publishes snapshots for all networks every publish interval.
+
+        Changes announced by other services are published sooner, by the
+        regeneration loop; this catches everything else.
+        """
         logger.info(f"Starting metrics publish loop (interval: {self._publish_interval}s)")
 
         # If skip_initial is True, wait before first publish (initial was already done at startup)
@@ -850,15 +1099,102 @@ class MetricsAggregator:
             return
 
         self._publish_task = asyncio.create_task(self._publish_loop(skip_initial=skip_initial))
+        self._regeneration_wakeup = asyncio.Event()
+        self._regeneration_task = asyncio.create_task(self._regeneration_loop())
         logger.info("Background publishing started")
 
     def stop_publishing(self):
         """Stop the background publishing task."""
+        if self._regeneration_task:
+            self._regeneration_task.cancel()
+            self._regeneration_task = None
+            self._regeneration_wakeup = None
         if self._publish_task:
             self._publish_task.cancel()
             self._publish_task = None
             logger.info("Background publishing stopped")
 
+    # ==================== Change-Driven Regeneration ====================
+
+    def request_regeneration(self, network_id: str | None, reason: str):
+        """Regenerate and publish a network's snapshot soon, because something in it changed.
+
+        Requests for a network already scheduled join that regeneration.
+        """
+        if self._regeneration.mark(network_id):
+            logger.debug(f"Network {network_id} changed ({reason}), regeneration scheduled")
+            if self._regeneration_wakeup:
+                self._regeneration_wakeup.set()
+
+    def networks_showing(self, ips: set[str]) -> set[str | None]:
+        """Networks whose last snapshot has a node with one of these IPs."""
+        return {
+            network_id
+            for network_id, snapshot in self._snapshots.items()
+            if snapshot and any(node.ip in ips for node in snapshot.nodes.values())
+        }
+
+    def on_changes(self, reasons: list[str], ips: list[str], network_ids: list[str]) -> int:
+        """
+        Handle the health service announcing changed devices.
+
+        Networks are those named, and those whose snapshot shows any of the
+        IPs. Returns the number of networks regenerations were requested for.
+        """
+        networks = set(network_ids) | self.networks_showing(set(ips))
+        reason = ",".join(reasons) or "changed"
+        for network_id in networks:
+            self.request_regeneration(network_id, reason)
+        return len(networks)
+
+    async def _regeneration_loop(self):
+        """Background loop that regenerates networks when their changes are due."""
+        while True:
+            try:
+                try:
+                    # Nothing scheduled: sleep until a change is announced
+                    await asyncio.wait_for(
+                        self._regeneration_wakeup.wait(), self._regeneration.seconds_until_due()
+                    )
+                except asyncio.TimeoutError:
+                    pass
+                self._regeneration_wakeup.clear()
+
+                network_ids = self._regeneration.pop_due()
+                if network_ids and self._publishing_enabled:
+                    published = await self.publish_networks(network_ids)
+                    logger.debug(
+                        f"Regenerated {len(network_ids)} changed networks, published {published}"
+                    )
+
+            except asyncio.CancelledError:
+                logger.info("Regeneration loop cancelled")
+                break
+            except Exception as e:
+                logger.error(f"Error in regeneration loop: {e}")
+                await asyncio.sleep(1)
+
+    # ==================== Layout Invalidation ====================
+
+    async def on_layout_saved(self, event: MetricsEvent):
+        """
+        Handle the backend announcing a saved layout.
+
+        The network's snapshot is regenerated, refetching its layout, unless
+        the cache already holds the announced version. That includes networks
+        with nothing cached: a new network's first save, or one whose layout
+        was discarded after the backend stopped serving it.
+        """
+        network_id = event.payload.get("network_id")
+        if not network_id:
+            return
+        etag = event.payload.get("etag")
+        cached = self._layout_cache.get(network_id)
+        if cached is not None and etag is not None and cached.etag == etag:
+            return
+        self._layout_cache.invalidate(network_id, etag)
+        self.request_regeneration(network_id, "layout saved")
+
     # ==================== Speed Test Integration ====================
 
     async def trigger_speed_test(self, gateway_ip: str) -> SpeedTestMetrics | None:
@@ -900,6 +1236,8 @@ class MetricsAggregator:
 
                 # Publish immediately
                 await redis_publisher.publish_speed_test_result(gateway_ip, result)
+                for network_id in self.networks_showing({gateway_ip}):
+                    self.request_regeneration(network_id, "speed test")
 
                 return result
 
@@ -932,8 +1270,31 @@ class MetricsAggregator:
             "last_snapshot_timestamp": (
                 self._last_snapshot.timestamp.isoformat() if self._last_snapshot else None
             ),
+            "last_cycle": self._last_cycle,
+            "publishing": self._sequencer.get_stats(),
+            "layouts": self._layout_cache.get_stats(),
+            "regeneration": self._regeneration.get_stats(),
         }
 
+    def get_published_snapshot(
+        self, network_id: str | None = None
+    ) -> NetworkTopologySnapshot | None:
+        """Get the last snapshot published for a network, which deltas build on.
+
+        Falls back to the last generated snapshot if nothing was published yet.
+        """
+        return self._sequencer.get_published_snapshot(network_id) or self.get_last_snapshot(
+            network_id
+        )
+
+    def get_timings(self) -> dict[str, Histogram]:
+        """Durations of all-network cycles and of publishing each network's update."""
+        return {"cycle": self._cycle_seconds, "publish": self._publish_seconds}
+
+    def get_snapshots(self) -> dict[str | None, NetworkTopologySnapshot]:
+        """The last generated snapshot of every network."""
+        return dict(self._snapshots)
+
     def get_last_snapshot(self, network_id: str | None = None) -> NetworkTopologySnapshot | None:
         """Get the last generated snapshot for a specific network.
 
@@ -0,0 +1,299 @@
+"""
+OpenMetrics exporter for device health and service internals.
+
+Served at GET /metrics for Prometheus-compatible scrapers. Two kinds of
+families are exposed:
+
+- Device health from each network's latest snapshot: status, ping latency,
+  packet loss, 24h uptime and consecutive failures per device, and device
+  counts per network and status
+- Service internals: snapshot cycle and publish timings, publish and
+  regeneration counters, layout cache, WebSocket clients and queues, and the
+  usage counted for every service
+
+Device samples make up nearly all of a scrape, so they are not rendered on
+every scrape. Each network's samples are rendered once per snapshot and kept;
+a scrape re-renders only the networks whose snapshot was regenerated since
+the last one and joins the kept text. Snapshots are regenerated when a network
+changes (see snapshot_scheduler), so most scrapes render no devices at all.
+"""
+
+from dataclasses import dataclass
+
+from ..models import HealthStatus, NetworkTopologySnapshot
+from .metrics_aggregator import metrics_aggregator
+from .openmetrics import header, labels, sample
+from .usage_tracker import usage_tracker
+from .websocket_hub import websocket_hub
+
+_STATUSES = [status.value for status in HealthStatus]
+
+# name -> (type, unit, help) of the families rendered per network, in exposition order
+DEVICE_FAMILIES = {
+    "cartographer_device_status": ("stateset", None, "Health status of a monitored device"),
+    "cartographer_device_latency_seconds": ("gauge", "seconds", "Last ping round-trip time"),
+    "cartographer_device_packet_loss_ratio": ("gauge", "ratio", "Packet loss of the last ping"),
+    "cartographer_device_uptime_ratio": (
+        "gauge",
+        "ratio",
+        "Share of checks passed over the last 24 hours",
+    ),
+    "cartographer_device_consecutive_failures": ("gauge", None, "Failed checks in a row"),
+    "cartographer_network_devices": ("gauge", None, "Devices in a network by health status"),
+}
+
+
+@dataclass
+class _RenderedNetwork:
+    """A network's device samples, rendered from one snapshot"""
+
+    snapshot: NetworkTopologySnapshot
+    # Family name -> sample lines
+    families: dict[str, str]
+
+
+def render_network(network_id: str | None, snapshot: NetworkTopologySnapshot) -> dict[str, str]:
+    """Render a network's device samples, by family."""
+    lines: dict[str, list[str]] = {name: [] for name in DEVICE_FAMILIES}
+    status_lines = lines["cartographer_device_status"]
+    latency_lines = lines["cartographer_device_latency_seconds"]
+    loss_lines = lines["cartographer_device_packet_loss_ratio"]
+    uptime_lines = lines["cartographer_device_uptime_ratio"]
+    failure_lines = lines["cartographer_device_consecutive_failures"]
+
+    for node in snapshot.nodes.values():
+        # Groups and other layout-only nodes have nothing monitored
+        if not node.ip:
+            continue
+        device = labels(network=network_id, node=node.id, name=node.name, ip=node.ip)
+
+        for status in _STATUSES:
+            status_lines.append(
+                sample(
+                    "cartographer_device_status",
+                    node.status == status,
+                    f'{device},cartographer_device_status="{status}"',
+                )
+            )
+        if node.ping:
+            if node.ping.latency_ms is not None:
+                latency_lines.append(
+                    sample(
+                        "cartographer_device_latency_seconds", node.ping.latency_ms / 1000, device
+                    )
+                )
+            loss_lines.append(
+                sample(
+                    "cartographer_device_packet_loss_ratio",
+                    node.ping.packet_loss_percent / 100,
+                    device,
+                )
+            )
+        if node.uptime:
+            if node.uptime.uptime_percent_24h is not None:
+                uptime_lines.append(
+                    sample(
+                        "cartographer_device_uptime_ratio",
+                        node.uptime.uptime_percent_24h / 100,
+                        device,
+                    )
+                )
+            failure_lines.append(
+                sample(
+                    "cartographer_device_consecutive_failures",
+                    node.uptime.consecutive_failures,
+                    device,
+                )
+            )
+
+    counts = {
+        HealthStatus.HEALTHY.value: snapshot.healthy_nodes,
+        HealthStatus.DEGRADED.value: snapshot.degraded_nodes,
+        HealthStatus.UNHEALTHY.value: snapshot.unhealthy_nodes,
+        HealthStatus.UNKNOWN.value: snapshot.unknown_nodes,
+    }
+    for status, count in counts.items():
+        lines["cartographer_network_devices"].append(
+            sample("cartographer_network_devices", count, labels(network=network_id, status=status))
+        )
+
+    return {name: "".join(family) for name, family in lines.items()}
+
+
+class MetricsExporter:
+    """Renders the /metrics exposition, keeping each network's device samples."""
+
+    def __init__(self):
+        self._networks: dict[str | None, _RenderedNetwork] = {}
+        self._stats = {"scrapes": 0, "networks_rendered": 0}
+
+    def _device_families(self) -> list[str]:
+        snapshots = metrics_aggregator.get_snapshots()
+
+        for network_id in [n for n in self._networks if n not in snapshots]:
+            del self._networks[network_id]
+        for network_id, snapshot in snapshots.items():
+            rendered = self._networks.get(network_id)
+            if rendered is None or rendered.snapshot is not snapshot:
+                self._networks[network_id] = _RenderedNetwork(
+                    snapshot, render_network(network_id, snapshot)
+                )
+                self._stats["networks_rendered"] += 1
+
+        parts = []
+        for name, (kind, unit, help_text) in DEVICE_FAMILIES.items():
+            parts.append(header(name, kind, help_text, unit))
+            parts.extend(rendered.families[name] for rendered in self._networks.values())
+        return parts
+
+    def _service_families(self) -> list[str]:
+        config = metrics_aggregator.get_config()
+        timings = metrics_aggregator.get_timings()
+        parts = []
+
+        def gauge(name: str, help_text: str, value: float, unit: str | None = None):
+            parts.append(header(name, "gauge", help_text, unit) + sample(name, value))
+
+        def counter(name: str, help_text: str, values: float | dict[str, float], label: str = ""):
+            parts.append(header(name, "counter", help_text))
+            if not label:
+                parts.append(sample(f"{name}_total", values))
+                return
+            for key, value in values.items():
+                parts.append(sample(f"{name}_total", value, labels(**{label: key})))
+
+        parts.append(
+            header(
+                "cartographer_snapshot_cycle_seconds",
+                "histogram",
+                "Duration of all-network snapshot cycles",
+                "seconds",
+            )
+            + timings["cycle"].render("cartographer_snapshot_cycle_seconds")
+        )
+        last_cycle = config.get("last_cycle") or {}
+        parts.append(
+            header(
+                "cartographer_snapshot_cycle_phase_seconds",
+                "gauge",
+                "Time spent in each phase of the last all-network cycle",
+                "seconds",
+            )
+        )
+        for phase, ms in last_cycle.get("timings_ms", {}).items():
+            parts.append(
+                sample("cartographer_snapshot_cycle_phase_seconds", ms / 1000, labels(phase=phase))
+            )
+        gauge(
+            "cartographer_snapshot_cycle_networks",
+            "Networks in the last all-network cycle",
+            last_cycle.get("networks", 0),
+        )
+        parts.append(
+            header(
+                "cartographer_snapshot_publish_seconds",
+                "histogram",
+                "Time to publish a network's snapshot or delta to Redis",
+                "seconds",
+            )
+            + timings["publish"].render("cartographer_snapshot_publish_seconds")
+        )
+
+        publishing = config["publishing"]
+        counter(
+            "cartographer_snapshots_published",
+            "Snapshot updates published, by kind",
+            {"keyframe": publishing["keyframes"], "delta": publishing["deltas"]},
+            "kind",
+        )
+        counter(
+            "cartographer_snapshots_unchanged",
+            "Regenerated snapshots not published because nothing changed",
+            publishing["unchanged"],
+        )
+        counter(
+            "cartographer_snapshots_stale",
+            "Snapshots not published because a newer one already was",
+            publishing["stale"],
+        )
+        regeneration = config["regeneration"]
+        counter(
+            "cartographer_regeneration_events",
+            "Change-driven regeneration requests, by outcome",
+            {
+                "scheduled": regeneration["changes"] - regeneration["coalesced"],
+                "coalesced": regeneration["coalesced"],
+            },
+            "outcome",
+        )
+        gauge(
+            "cartographer_regeneration_pending",
+            "Networks waiting for a change-driven regeneration",
+            regeneration["pending"],
+        )
+        layouts = config["layouts"]
+        gauge("cartographer_layout_cache_entries", "Network layouts cached", layouts["cached"])
+        counter(
+            "cartographer_layout_cache_lookups",
+            "Cached layout lookups, by result",
+            {
+                "hit": layouts["hits"],
+                "not_modified": layouts["not_modified"],
+                "fetched": layouts["fetched"],
+            },
+            "result",
+        )
+
+        websocket = websocket_hub.get_stats()
+        gauge("cartographer_websocket_clients", "Connected WebSocket clients", websocket["clients"])
+        gauge(
+            "cartographer_websocket_queued_frames",
+            "Frames queued for WebSocket clients",
+            websocket["queued"],
+        )
+        counter(
+            "cartographer_websocket_frames",
+            "Frames sent to WebSocket clients, and deltas skipped for slow ones",
+            {"sent": websocket["frames"], "skipped_delta": websocket["skipped_deltas"]},
+            "result",
+        )
+        counter(
+            "cartographer_websocket_dropped_clients",
+            "WebSocket clients disconnected for falling behind",
+            websocket["dropped_clients"],
+        )
+
+        usage = usage_tracker.get_local_totals()
+        counter(
+            "cartographer_service_requests",
+            "Requests handled by each service since this one started",
+            {service: summary.total_requests for service, summary in usage.items()},
+            "service",
+        )
+        counter(
+            "cartographer_service_errors",
+            "Requests answered with an error status, by service",
+            {service: summary.total_errors for service, summary in usage.items()},
+            "service",
+        )
+        gauge(
+            "cartographer_usage_pending_records",
+            "Usage records counted but not yet written to Redis",
+            usage_tracker.get_pending_count(),
+        )
+        return parts
+
+    def render(self) -> str:
+        """Render the full exposition."""
+        self._stats["scrapes"] += 1
+        parts = self._device_families()
+        parts.extend(self._service_families())
+        parts.append("# EOF\n")
+        return "".join(parts)
+
+    def get_stats(self) -> dict:
+        return {"networks": len(self._networks), **self._stats}
+
+
+# Singleton instance
+metrics_exporter = MetricsExporter()
@@ -0,0 +1,83 @@
+"""
+OpenMetrics text exposition primitives.
+
+Just what the /metrics endpoint needs: escaped label sets, families with their
+TYPE, UNIT and HELP lines, and fixed-bucket histograms cheap enough to observe
+on every publish. Families are built as text so that a block of samples can be
+rendered once, kept, and joined into later scrapes unchanged.
+"""
+
+import math
+from bisect import bisect_left
+from collections.abc import Iterable
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# Bucket upper bounds, in seconds, for internal operation timings
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def escape(value: str) -> str:
+    """Escape a label value."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def labels(**values: str | None) -> str:
+    """A label set, without braces; None values render as empty strings."""
+    return ",".join(f'{name}="{escape(value or "")}"' for name, value in values.items())
+
+
+def format_value(value: float) -> str:
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int):
+        return str(value)
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def sample(name: str, value: float, label_set: str = "") -> str:
+    """One sample line."""
+    if label_set:
+        return f"{name}{{{label_set}}} {format_value(value)}\n"
+    return f"{name} {format_value(value)}\n"
+
+
+def header(name: str, kind: str, help_text: str, unit: str | None = None) -> str:
+    """The metadata lines that open a family."""
+    lines = f"# TYPE {name} {kind}\n"
+    if unit:
+        lines += f"# UNIT {name} {unit}\n"
+    return lines + f"# HELP {name} {help_text}\n"
+
+
+class Histogram:
+    """Cumulative-bucket histogram of observed values, usually durations in seconds."""
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.bounds = tuple(sorted(buckets))
+        # One count per bound, plus one for values above the last
+        self._counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self._counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def render(self, name: str, label_set: str = "") -> str:
+        """The _bucket, _count and _sum samples, without the family header."""
+        prefix = f"{label_set}," if label_set else ""
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.bounds, self._counts):
+            cumulative += count
+            lines.append(sample(f"{name}_bucket", cumulative, f'{prefix}le="{bound}"'))
+        lines.append(sample(f"{name}_bucket", self.count, f'{prefix}le="+Inf"'))
+        lines.append(sample(f"{name}_count", self.count, label_set))
+        lines.append(sample(f"{name}_sum", self.sum, label_set))
+        return "".join(lines)
@@ -0,0 +1,94 @@
+"""
+Payload encodings for Redis messages and WebSocket frames.
+
+Topology snapshots of large networks, with a check history per node, run to
+hundreds of KB as JSON. Besides JSON, payloads can be sent as:
+
+- msgpack: the same values in a compact binary form
+- msgpack+zstd: msgpack compressed with zstd at PAYLOAD_ZSTD_LEVEL
+
+Payloads are self-describing: decode() tells JSON (starts with "{" or "["),
+zstd frames (by their magic number) and bare msgpack apart, so a reader
+copes with whatever encoding the writer was configured with.
+
+WebSocket clients pick an encoding by offering it as a subprotocol; see
+negotiate().
+"""
+
+import json
+from typing import Any
+
+import msgpack
+import zstandard
+
+from ..config import settings
+
+ENCODING_JSON = "json"
+ENCODING_MSGPACK = "msgpack"
+ENCODING_MSGPACK_ZSTD = "msgpack+zstd"
+
+ENCODINGS: tuple[str, ...] = (ENCODING_JSON, ENCODING_MSGPACK, ENCODING_MSGPACK_ZSTD)
+
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+# Compression contexts are reused; the service runs on a single event loop
+_compressors: dict[int, zstandard.ZstdCompressor] = {}
+_decompressor = zstandard.ZstdDecompressor()
+
+
+class PayloadDecodeError(ValueError):
+    """A payload that is not valid JSON, msgpack or zstd-compressed msgpack"""
+
+
+def _compressor() -> zstandard.ZstdCompressor:
+    level = settings.payload_zstd_level
+    if level not in _compressors:
+        _compressors[level] = zstandard.ZstdCompressor(level=level)
+    return _compressors[level]
+
+
+def encode(data: Any, encoding: str) -> str | bytes:  # noqa: ANN401
+    """
+    Encode JSON-compatible data.
+
+    JSON is returned as text, the binary encodings as bytes. Values JSON and
+    msgpack cannot represent (such as datetimes) are converted with str().
+    """
+    if encoding == ENCODING_JSON:
+        return json.dumps(data, default=str)
+    packed = msgpack.packb(data, default=str)
+    if encoding == ENCODING_MSGPACK:
+        return packed
+    if encoding == ENCODING_MSGPACK_ZSTD:
+        return _compressor().compress(packed)
+    raise ValueError(f"Unknown payload encoding: {encoding}")
+
+
+def is_json(raw: str | bytes) -> bool:
+    """Whether a payload is JSON rather than one of the binary encodings."""
+    return raw[:1] in ("{", "[", b"{", b"[")
+
+
+def decode(raw: str | bytes) -> Any:  # noqa: ANN401
+    """
+    Decode a payload in any of the encodings.
+
+    Text that is not JSON is taken to be binary read through a Redis client
+    that decodes responses with errors="surrogateescape", and turned back into
+    the original bytes.
+    """
+    try:
+        if is_json(raw):
+            return json.loads(raw)
+        if isinstance(raw, str):
+            raw = raw.encode("utf-8", "surrogateescape")
+        if raw[:4] == _ZSTD_MAGIC:
+            raw = _decompressor.decompress(raw)
+        return msgpack.unpackb(raw)
+    except (ValueError, UnicodeError, msgpack.UnpackException, zstandard.ZstdError) as e:
+        raise PayloadDecodeError(f"Undecodable payload: {e}") from e
+
+
+def negotiate(offered: list[str]) -> str | None:
+    """The first encoding among the WebSocket subprotocols a client offered, if any."""
+    return next((protocol for protocol in offered if protocol in ENCODINGS), None)
@@ -19,10 +19,12 @@ from ..config import settings
 from ..models import (
     MetricsEvent,
     MetricsEventType,
+    NetworkTopologyDelta,
     NetworkTopologySnapshot,
     NodeMetrics,
     SpeedTestMetrics,
 )
+from . import payload_codec
 
 logger = logging.getLogger(__name__)
 
@@ -31,6 +33,22 @@ CHANNEL_TOPOLOGY = "metrics:topology"
 CHANNEL_HEALTH = "metrics:health"
 CHANNEL_SPEED_TEST = "metrics:speedtest"
 
+# Every network publishes to its own topology channel; consumers that need all
+# networks subscribe to the pattern
+CHANNEL_TOPOLOGY_PATTERN = f"{CHANNEL_TOPOLOGY}:*"
+
+LAST_SNAPSHOT_KEY = "metrics:last_snapshot"
+
+
+def topology_channel(network_id: str | None) -> str:
+    """Channel a network's topology events are published to."""
+    return f"{CHANNEL_TOPOLOGY}:{network_id}" if network_id else CHANNEL_TOPOLOGY
+
+
+def last_snapshot_key(network_id: str | None) -> str:
+    """Key holding a network's latest keyframe snapshot."""
+    return f"{LAST_SNAPSHOT_KEY}:{network_id}" if network_id else LAST_SNAPSHOT_KEY
+
 
 class RedisPublisher:
     """
@@ -46,6 +64,8 @@ class RedisPublisher:
         self._subscriber_tasks: list[asyncio.Task] = []
         self._message_handlers: dict[str, list[Callable]] = {}
         self._connected = False
+        # Bytes of published messages by event type
+        self._bytes_published: dict[str, int] = {}
 
     async def connect(self) -> bool:
         """
@@ -57,6 +77,9 @@ class RedisPublisher:
                 settings.redis_url,
                 db=settings.redis_db,
                 decode_responses=True,
+                # Binary payloads (see payload_codec) survive decoding and are
+                # turned back into bytes when read
+                encoding_errors="surrogateescape",
                 socket_timeout=5.0,
                 socket_connect_timeout=5.0,
             )
@@ -109,9 +132,15 @@ class RedisPublisher:
             return await self.connect()
         return True
 
-    def _serialize_event(self, event: MetricsEvent) -> str:
-        """Serialize a MetricsEvent to JSON string."""
-        return event.model_dump_json()
+    def _serialize_event(self, event: MetricsEvent) -> str | bytes:
+        """Serialize a MetricsEvent in the configured REDIS_PAYLOAD_ENCODING."""
+        return self._serialize_model(event)
+
+    def _serialize_model(self, model: BaseModel) -> str | bytes:
+        encoding = settings.redis_payload_encoding
+        if encoding == payload_codec.ENCODING_JSON:
+            return model.model_dump_json()
+        return payload_codec.encode(model.model_dump(mode="json"), encoding)
 
     def _serialize_payload(self, payload: Any) -> str:  # noqa: ANN401
         """Serialize any payload to JSON string."""
@@ -157,6 +186,9 @@ class RedisPublisher:
 
             message = self._serialize_event(event)
             num_subscribers = await self._redis.publish(channel, message)
+            self._bytes_published[event_type.value] = self._bytes_published.get(
+                event_type.value, 0
+            ) + len(message)
 
             logger.debug(
                 f"Published {event_type.value} to {channel} ({num_subscribers} subscribers)"
@@ -172,12 +204,20 @@ class RedisPublisher:
             return False
 
     async def publish_topology_snapshot(self, snapshot: NetworkTopologySnapshot) -> bool:
-        """Publish a full network topology snapshot."""
-        return await self.publish(CHANNEL_TOPOLOGY, MetricsEventType.FULL_SNAPSHOT, snapshot)
+        """Publish a full network topology snapshot to its network's channel."""
+        return await self.publish(
+            topology_channel(snapshot.network_id), MetricsEventType.FULL_SNAPSHOT, snapshot
+        )
 
-    async def publish_node_update(self, node: NodeMetrics) -> bool:
+    async def publish_topology_delta(self, delta: NetworkTopologyDelta) -> bool:
+        """Publish the changes between two consecutive snapshots of a network."""
+        return await self.publish(
+            topology_channel(delta.network_id), MetricsEventType.SNAPSHOT_DELTA, delta
+        )
+
+    async def publish_node_update(self, node: NodeMetrics, network_id: str | None = None) -> bool:
         """Publish a single node update."""
-        return await self.publish(CHANNEL_TOPOLOGY, MetricsEventType.NODE_UPDATE, node)
+        return await self.publish(topology_channel(network_id), MetricsEventType.NODE_UPDATE, node)
 
     async def publish_health_update(self, node_id: str, status: str, metrics: dict) -> bool:
         """Publish a health status update for a node."""
@@ -198,7 +238,7 @@ class RedisPublisher:
     # ==================== Subscription Methods ====================
 
     def add_handler(self, channel: str, handler: Callable):
-        """Add a message handler for a channel."""
+        """Add a message handler for a channel, or for a pattern passed to psubscribe()."""
         if channel not in self._message_handlers:
             self._message_handlers[channel] = []
         self._message_handlers[channel].append(handler)
@@ -236,6 +276,31 @@ class RedisPublisher:
             logger.error(f"Failed to subscribe: {e}")
             return False
 
+    async def psubscribe(self, *patterns: str) -> bool:
+        """
+        Subscribe to every channel matching one or more glob-style patterns.
+        Messages are passed to handlers registered for the pattern itself.
+        """
+        if not await self._ensure_connected():
+            return False
+
+        try:
+            if self._pubsub is None:
+                self._pubsub = self._redis.pubsub()
+
+            await self._pubsub.psubscribe(*patterns)
+            logger.info(f"Subscribed to patterns: {', '.join(patterns)}")
+
+            if not any(not t.done() for t in self._subscriber_tasks):
+                task = asyncio.create_task(self._listen_for_messages())
+                self._subscriber_tasks.append(task)
+
+            return True
+
+        except redis.RedisError as e:
+            logger.error(f"Failed to subscribe: {e}")
+            return False
+
     async def unsubscribe(self, *channels: str) -> bool:
         """Unsubscribe from one or more Redis channels."""
         if self._pubsub is None:
@@ -260,15 +325,16 @@ class RedisPublisher:
                         ignore_subscribe_messages=True, timeout=1.0
                     )
 
-                    if message and message["type"] == "message":
-                        channel = message["channel"]
+                    if message and message["type"] in ("message", "pmessage"):
+                        # Pattern subscriptions are dispatched to the pattern's handlers
+                        channel = message.get("pattern") or message["channel"]
                         data = message["data"]
 
                         # Parse the event
                         try:
-                            event_data = json.loads(data)
+                            event_data = payload_codec.decode(data)
                             event = MetricsEvent(**event_data)
-                        except (json.JSONDecodeError, ValueError) as e:
+                        except (TypeError, ValueError) as e:
                             logger.warning(f"Failed to parse message: {e}")
                             continue
 
@@ -294,37 +360,58 @@ class RedisPublisher:
 
     # ==================== Utility Methods ====================
 
-    async def get_last_snapshot(self) -> NetworkTopologySnapshot | None:
+    async def get_last_snapshot(
+        self, network_id: str | None = None
+    ) -> NetworkTopologySnapshot | None:
         """
-        Get the last published topology snapshot from Redis.
+        Get the last published topology snapshot of a network from Redis.
         We store the latest snapshot in a Redis key for new subscribers.
         """
         if not await self._ensure_connected():
             return None
 
         try:
-            data = await self._redis.get("metrics:last_snapshot")
-            if data:
+            data = await self._redis.get(last_snapshot_key(network_id))
+            if not data:
+                return None
+            if payload_codec.is_json(data):
                 return NetworkTopologySnapshot.model_validate_json(data)
-            return None
+            return NetworkTopologySnapshot.model_validate(payload_codec.decode(data))
         except Exception as e:
             logger.error(f"Failed to get last snapshot: {e}")
             return None
 
     async def store_last_snapshot(self, snapshot: NetworkTopologySnapshot) -> bool:
-        """Store the latest snapshot for new subscribers to retrieve."""
+        """Store the latest snapshot of its network for new subscribers to retrieve."""
         if not await self._ensure_connected():
             return False
 
         try:
             await self._redis.set(
-                "metrics:last_snapshot", snapshot.model_dump_json(), ex=3600  # Expire after 1 hour
+                last_snapshot_key(snapshot.network_id),
+                self._serialize_model(snapshot),
+                ex=settings.snapshot_ttl_seconds,
             )
             return True
         except Exception as e:
             logger.error(f"Failed to store snapshot: {e}")
             return False
 
+    async def refresh_last_snapshot(self, network_id: str | None) -> bool:
+        """Keep a network's stored snapshot from expiring while it is still current."""
+        if not await self._ensure_connected():
+            return False
+
+        try:
+            return bool(
+                await self._redis.expire(
+                    last_snapshot_key(network_id), settings.snapshot_ttl_seconds
+                )
+            )
+        except Exception as e:
+            logger.error(f"Failed to refresh stored snapshot: {e}")
+            return False
+
     async def get_connection_info(self) -> dict:
         """Get Redis connection information for debugging."""
         return {
@@ -332,6 +419,7 @@ class RedisPublisher:
             "db": settings.redis_db,
             "connected": self.is_connected,
             "channels": list(self._message_handlers.keys()),
+            "bytes_published": dict(self._bytes_published),
         }
 
 
@@ -0,0 +1,179 @@
+"""
+Snapshot sequencing and delta encoding.
+
+Every publish cycle regenerates each network's full topology snapshot, but
+usually only a few nodes actually change between cycles. The sequencer keeps
+the last published snapshot of each network and decides what to send:
+
+- nothing, when no node, connection, gateway or summary field changed
+- a full snapshot (keyframe) for the first publish of a network and every
+  SNAPSHOT_KEYFRAME_INTERVAL publishes after that
+- otherwise a NetworkTopologyDelta holding only what changed
+
+Published snapshots carry a per-network sequence number and each delta names
+the sequence it applies on top of, so a client that sees a gap knows to
+request a resync.
+"""
+
+from dataclasses import dataclass, field
+from typing import Any
+
+from ..config import settings
+from ..models import NetworkTopologyDelta, NetworkTopologySnapshot
+
+SUMMARY_FIELDS = (
+    "total_nodes",
+    "healthy_nodes",
+    "degraded_nodes",
+    "unhealthy_nodes",
+    "unknown_nodes",
+    "root_node_id",
+)
+
+
+@dataclass
+class _PublishedState:
+    """What clients of one network last received"""
+
+    snapshot: NetworkTopologySnapshot
+    nodes: dict[str, dict]  # node_id -> JSON dump, compared against the next snapshot
+    connections: dict[tuple[str, str], dict]  # (source_id, target_id) -> JSON dump
+    gateways: list[dict]
+    since_keyframe: int = 0
+
+
+@dataclass
+class SnapshotUpdate:
+    """A planned publish for one network; applied with SnapshotSequencer.commit()"""
+
+    network_id: str | None
+    snapshot: NetworkTopologySnapshot
+    delta: NetworkTopologyDelta | None  # None means publish the full snapshot
+    state: _PublishedState = field(repr=False)
+
+
+def _dump_state(snapshot: NetworkTopologySnapshot) -> _PublishedState:
+    return _PublishedState(
+        snapshot=snapshot,
+        nodes={node_id: node.model_dump(mode="json") for node_id, node in snapshot.nodes.items()},
+        connections={
+            (c.source_id, c.target_id): c.model_dump(mode="json") for c in snapshot.connections
+        },
+        gateways=[g.model_dump(mode="json") for g in snapshot.gateways],
+    )
+
+
+def compute_delta(previous: _PublishedState, current: _PublishedState) -> dict[str, Any] | None:
+    """Fields of a NetworkTopologyDelta between two states, or None if nothing changed"""
+    snapshot = current.snapshot
+    summary = {
+        name: getattr(snapshot, name)
+        for name in SUMMARY_FIELDS
+        if getattr(snapshot, name) != getattr(previous.snapshot, name)
+    }
+    nodes_changed = {
+        node_id: snapshot.nodes[node_id]
+        for node_id, dump in current.nodes.items()
+        if previous.nodes.get(node_id) != dump
+    }
+    nodes_removed = [node_id for node_id in previous.nodes if node_id not in current.nodes]
+
+    connections_by_key = {(c.source_id, c.target_id): c for c in snapshot.connections}
+    connections_changed = [
+        connections_by_key[key]
+        for key, dump in current.connections.items()
+        if previous.connections.get(key) != dump
+    ]
+    connections_removed = [
+        previous_connection
+        for previous_connection in previous.snapshot.connections
+        if (previous_connection.source_id, previous_connection.target_id) not in current.connections
+    ]
+    gateways = snapshot.gateways if current.gateways != previous.gateways else None
+
+    if not (
+        summary
+        or nodes_changed
+        or nodes_removed
+        or connections_changed
+        or connections_removed
+        or gateways is not None
+    ):
+        return None
+
+    return {
+        "summary": summary,
+        "nodes_changed": nodes_changed,
+        "nodes_removed": nodes_removed,
+        "connections_changed": connections_changed,
+        "connections_removed": connections_removed,
+        "gateways": gateways,
+    }
+
+
+class SnapshotSequencer:
+    """Per-network sequence numbers and the last published state for delta encoding"""
+
+    def __init__(self):
+        self._published: dict[str | None, _PublishedState] = {}
+        self._stats = {"keyframes": 0, "deltas": 0, "unchanged": 0, "stale": 0}
+
+    def plan(
+        self, network_id: str | None, snapshot: NetworkTopologySnapshot
+    ) -> SnapshotUpdate | None:
+        """
+        Decide what to publish for a freshly generated snapshot.
+
+        Returns None when nothing changed since the last published snapshot, or
+        when the snapshot was generated before it (a slower publisher finishing
+        late). The sequencer is not advanced until the update is committed, so a
+        failed publish is retried against the same base next cycle. Callers
+        serialize plan -> publish -> commit per network.
+        """
+        previous = self._published.get(network_id)
+        if previous is not None and snapshot.timestamp < previous.snapshot.timestamp:
+            self._stats["stale"] += 1
+            return None
+
+        current = _dump_state(snapshot)
+        snapshot.network_id = network_id
+
+        if previous is None:
+            snapshot.sequence = 1
+            return SnapshotUpdate(network_id, snapshot, None, current)
+
+        changes = compute_delta(previous, current)
+        if changes is None:
+            # Same content as what clients already have
+            snapshot.sequence = previous.snapshot.sequence
+            self._stats["unchanged"] += 1
+            return None
+
+        snapshot.sequence = previous.snapshot.sequence + 1
+        current.since_keyframe = previous.since_keyframe + 1
+        if current.since_keyframe >= max(1, settings.snapshot_keyframe_interval):
+            current.since_keyframe = 0
+            return SnapshotUpdate(network_id, snapshot, None, current)
+
+        delta = NetworkTopologyDelta(
+            network_id=network_id,
+            sequence=snapshot.sequence,
+            base_sequence=previous.snapshot.sequence,
+            snapshot_id=snapshot.snapshot_id,
+            timestamp=snapshot.timestamp,
+            **changes,
+        )
+        return SnapshotUpdate(network_id, snapshot, delta, current)
+
+    def commit(self, update: SnapshotUpdate):
+        """Record an update as published"""
+        self._published[update.network_id] = update.state
+        self._stats["keyframes" if update.delta is None else "deltas"] += 1
+
+    def get_published_snapshot(self, network_id: str | None) -> NetworkTopologySnapshot | None:
+        """The last snapshot clients of a network were sent, for resyncs"""
+        state = self._published.get(network_id)
+        return state.snapshot if state else None
+
+    def get_stats(self) -> dict:
+        return {"networks": len(self._published), **self._stats}
@@ -0,0 +1,99 @@
+"""
+Change-driven snapshot regeneration.
+
+Snapshots used to be regenerated for every network on a fixed timer, so a
+device going down reached dashboards up to a full interval later, and networks
+where nothing happened were regenerated all the same. Now what changes a
+snapshot announces it:
+
+- the health service, when a device or gateway test IP changes status, its
+  latency or packet loss moves past a threshold, or a speed test completes
+  (POST /api/metrics/events/changes)
+- the backend, when a layout is saved (LAYOUT_SAVED_CHANNEL)
+- speed tests run through this service, when they complete
+
+and only the networks concerned are regenerated. Changes are coalesced per
+network: the first schedules a regeneration SNAPSHOT_DEBOUNCE_SECONDS later,
+and any arriving before it runs join it. A network is regenerated at most once
+per SNAPSHOT_MIN_INTERVAL_SECONDS. Each regeneration fetches the health
+service's payloads shared by all networks, so regenerations run at most once
+per SNAPSHOT_SHARED_FETCH_INTERVAL_SECONDS across networks; those due sooner
+wait and share the next fetch. The all-network cycle still runs every
+METRICS_PUBLISH_INTERVAL as a slow fallback for what is not announced, such as
+check history and uptime.
+"""
+
+import time
+from collections.abc import Callable, Iterable
+
+from ..config import settings
+
+
+class RegenerationSchedule:
+    """When each network with unpublished changes is due to be regenerated."""
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._due: dict[str | None, float] = {}
+        self._last_run: dict[str | None, float] = {}
+        # When the inputs shared by all networks were last fetched, by any run
+        self._last_shared_fetch: float | None = None
+        self._stats = {"changes": 0, "coalesced": 0, "regenerated": 0, "batches": 0}
+
+    def mark(self, network_id: str | None) -> bool:
+        """Note a change to a network. Returns True if it scheduled a regeneration."""
+        self._stats["changes"] += 1
+        if network_id in self._due:
+            self._stats["coalesced"] += 1
+            return False
+
+        due = self._clock() + settings.snapshot_debounce_seconds
+        last_run = self._last_run.get(network_id)
+        if last_run is not None:
+            due = max(due, last_run + settings.snapshot_min_interval_seconds)
+        self._due[network_id] = due
+        return True
+
+    def seconds_until_due(self) -> float | None:
+        """Time until the next regeneration is due, None when nothing is scheduled."""
+        if not self._due:
+            return None
+        return max(0.0, max(min(self._due.values()), self._next_shared_fetch()) - self._clock())
+
+    def _next_shared_fetch(self) -> float:
+        """Earliest time the next batch may fetch the inputs shared by all networks."""
+        if self._last_shared_fetch is None:
+            return 0.0
+        return self._last_shared_fetch + settings.snapshot_shared_fetch_interval_seconds
+
+    def pop_due(self) -> list[str | None]:
+        """Take the networks due for regeneration now; changes after this schedule anew."""
+        now = self._clock()
+        if now < self._next_shared_fetch():
+            return []
+        due = [network_id for network_id, at in self._due.items() if at <= now]
+        for network_id in due:
+            del self._due[network_id]
+            self._last_run[network_id] = now
+        if due:
+            self._last_shared_fetch = now
+            self._stats["batches"] += 1
+        self._stats["regenerated"] += len(due)
+        return due
+
+    def ran(self, network_ids: Iterable[str | None]):
+        """Note networks regenerated outside the schedule, by the fallback cycle."""
+        now = self._clock()
+        self._last_shared_fetch = now
+        for network_id in network_ids:
+            self._last_run[network_id] = now
+
+    def retain(self, network_ids: Iterable[str]):
+        """Forget networks that no longer exist."""
+        keep = set(network_ids)
+        for schedule in (self._due, self._last_run):
+            for network_id in [n for n in schedule if n is not None and n not in keep]:
+                del schedule[network_id]
+
+    def get_stats(self) -> dict:
+        return {**self._stats, "pending": len(self._due)}
@@ -3,13 +3,39 @@ Usage Tracker Service
 
 Tracks and aggregates endpoint usage statistics across all microservices.
 Uses Redis for persistent storage and real-time aggregation.
+
+Every service reports every request it handles, so records are not written
+to Redis one by one. They are aggregated in memory per (service, endpoint,
+method, status) and each window of USAGE_FLUSH_INTERVAL_SECONDS is written
+with one pipelined transaction. At most one window of counts is lost if the
+service dies; stats reads and shutdown flush first.
+
+Endpoints are route templates (/api/health/check/{ip}), as reported by the
+usage middleware. Besides counters, each endpoint's response times are
+counted into a latency histogram per USAGE_LATENCY_WINDOW_SECONDS, kept for
+USAGE_LATENCY_RETENTION_HOURS; percentiles over any span of windows are
+read back by merging them (see latency_histogram). The same counts are rolled
+up per USAGE_LATENCY_ROLLUP_SECONDS so long spans read a few coarse windows.
 """
 
+import asyncio
 import logging
-from datetime import datetime
+import math
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timezone
 from inspect import isawaitable
 
-from ..models import EndpointUsage, EndpointUsageRecord, ServiceUsageSummary, UsageStatsResponse
+from ..config import settings
+from ..models import (
+    EndpointUsage,
+    EndpointUsageRecord,
+    LatencyPercentiles,
+    LatencyStatsResponse,
+    RouteLatencyStats,
+    ServiceUsageSummary,
+    UsageStatsResponse,
+)
+from . import latency_histogram
 from .redis_publisher import redis_publisher
 
 logger = logging.getLogger(__name__)
@@ -19,6 +45,141 @@ USAGE_KEY_PREFIX = "usage:"
 USAGE_SERVICE_KEY = "usage:services"
 USAGE_META_KEY = "usage:meta"
 
+# Lowers min_response_time_ms and raises max_response_time_ms of an endpoint
+# hash server-side, so a flush needs no read round-trip
+_MIN_MAX_SCRIPT = """
+local min = redis.call('HGET', KEYS[1], 'min_response_time_ms')
+if not min or tonumber(ARGV[1]) < tonumber(min) then
+    redis.call('HSET', KEYS[1], 'min_response_time_ms', ARGV[1])
+end
+local max = redis.call('HGET', KEYS[1], 'max_response_time_ms')
+if not max or tonumber(ARGV[2]) > tonumber(max) then
+    redis.call('HSET', KEYS[1], 'max_response_time_ms', ARGV[2])
+end
+"""
+
+
+def _utc(timestamp: datetime) -> datetime:
+    # Services report naive UTC or aware timestamps
+    if timestamp.tzinfo is None:
+        return timestamp.replace(tzinfo=timezone.utc)
+    return timestamp
+
+
+def _latency_window(timestamp: datetime) -> int:
+    """Start, in epoch seconds, of the latency histogram window a time falls in."""
+    width = settings.usage_latency_window_seconds
+    return int(timestamp.timestamp()) // width * width
+
+
+def _rollup_window(window: int) -> int:
+    """Start of the rollup window a latency histogram window falls in."""
+    width = settings.usage_latency_rollup_seconds
+    return window // width * width
+
+
+@dataclass
+class PendingUsage:
+    """Usage of one (service, endpoint, method, status) not yet written to Redis"""
+
+    count: int
+    total_response_time_ms: float
+    min_response_time_ms: float
+    max_response_time_ms: float
+    first_accessed: datetime
+    last_accessed: datetime
+    # (latency window start, histogram bucket) -> count
+    latency: dict[tuple[int, int], int] = field(default_factory=dict)
+
+    @classmethod
+    def of(cls, record: EndpointUsageRecord) -> "PendingUsage":
+        timestamp = _utc(record.timestamp)
+        bucket = latency_histogram.bucket_of(record.response_time_ms)
+        return cls(
+            count=1,
+            total_response_time_ms=record.response_time_ms,
+            min_response_time_ms=record.response_time_ms,
+            max_response_time_ms=record.response_time_ms,
+            first_accessed=timestamp,
+            last_accessed=timestamp,
+            latency={(_latency_window(timestamp), bucket): 1},
+        )
+
+    def copy(self) -> "PendingUsage":
+        return replace(self, latency=dict(self.latency))
+
+    def merge(self, other: "PendingUsage"):
+        self.count += other.count
+        self.total_response_time_ms += other.total_response_time_ms
+        self.min_response_time_ms = min(self.min_response_time_ms, other.min_response_time_ms)
+        self.max_response_time_ms = max(self.max_response_time_ms, other.max_response_time_ms)
+        self.first_accessed = min(self.first_accessed, other.first_accessed)
+        self.last_accessed = max(self.last_accessed, other.last_accessed)
+        for key, count in other.latency.items():
+            self.latency[key] = self.latency.get(key, 0) + count
+
+
+# (service, endpoint, method, status_code)
+UsageKey = tuple[str, str, str, int]
+
+
+def _latency_key(endpoint_key: str, window: int, rollup: bool = False) -> str:
+    """Redis hash of an endpoint's latency histogram for one window."""
+    return f"{endpoint_key}:{'latency_rollup' if rollup else 'latency'}:{window}"
+
+
+def _latency_span(minutes: int) -> tuple[range, bool]:
+    """
+    Latency histogram windows covering the last `minutes`, and whether they are rollups.
+
+    Spans needing more than USAGE_LATENCY_MAX_WINDOWS windows are read from the
+    rollups, and never more than that many windows are read per route.
+    """
+    minutes = min(minutes, settings.usage_latency_retention_hours * 60)
+    rollup = (
+        minutes * 60 > settings.usage_latency_max_windows * settings.usage_latency_window_seconds
+    )
+    width = (
+        settings.usage_latency_rollup_seconds if rollup else settings.usage_latency_window_seconds
+    )
+    end = int(datetime.now(timezone.utc).timestamp()) // width * width + width
+    count = min(max(1, math.ceil(minutes * 60 / width)), max(1, settings.usage_latency_max_windows))
+    return range(end - count * width, end, width), rollup
+
+
+def _latency_percentiles(histograms: list[dict], start: int, end: int) -> LatencyPercentiles:
+    """Percentiles of histograms read from Redis, merged, for the span start-end."""
+    merged = latency_histogram.merge(histograms)
+    return LatencyPercentiles(
+        start=datetime.fromtimestamp(start, timezone.utc),
+        end=datetime.fromtimestamp(end, timezone.utc),
+        count=sum(merged.values()),
+        **{f"{name}_ms": value for name, value in latency_histogram.percentiles(merged).items()},
+    )
+
+
+def _route_latency(
+    route: list[str | None], histograms: list[dict], windows: range, step: int | None
+) -> RouteLatencyStats:
+    """A route's percentiles over all windows, and per `step` windows if given."""
+    service, method, endpoint = route
+    stats = RouteLatencyStats(
+        service=service or "",
+        method=method or "",
+        endpoint=endpoint or "",
+        overall=_latency_percentiles(histograms, windows.start, windows.stop),
+    )
+    if step:
+        for j in range(0, len(histograms), step):
+            stats.windows.append(
+                _latency_percentiles(
+                    histograms[j : j + step],
+                    windows[j],
+                    min(windows.stop, windows[j] + step * windows.step),
+                )
+            )
+    return stats
+
 
 class UsageTracker:
     """
@@ -32,6 +193,8 @@ class UsageTracker:
         self._local_cache: dict[str, ServiceUsageSummary] = {}
         self._collection_started: datetime | None = None
         self._last_updated: datetime | None = None
+        self._pending: dict[UsageKey, PendingUsage] = {}
+        self._flush_task: asyncio.Task | None = None
 
     def _get_endpoint_key(self, service: str, method: str, endpoint: str) -> str:
         """Generate a unique Redis key for an endpoint."""
@@ -43,96 +206,28 @@ class UsageTracker:
         """
         Record a single endpoint usage event.
 
-        Updates both Redis storage and local cache.
+        Updates the local cache and adds the event to the current flush
+        window. Returns False if Redis is not connected, in which case the
+        event is only counted locally.
         """
-        try:
-            redis = redis_publisher._redis
-            if not redis:
-                logger.warning("Redis not connected - storing usage locally only")
-                self._update_local_cache(record)
-                return False
-
-            # Generate keys
-            endpoint_key = self._get_endpoint_key(record.service, record.method, record.endpoint)
-            service_key = f"{USAGE_KEY_PREFIX}{record.service}:summary"
-
-            # Use Redis transaction for atomic updates
-            pipe = redis.pipeline()
-
-            # Update endpoint-specific stats using hash
-            pipe.hincrby(endpoint_key, "request_count", 1)
-            if 200 <= record.status_code < 400:
-                pipe.hincrby(endpoint_key, "success_count", 1)
-            else:
-                pipe.hincrby(endpoint_key, "error_count", 1)
-
-            pipe.hincrbyfloat(endpoint_key, "total_response_time_ms", record.response_time_ms)
-            pipe.hincrby(endpoint_key, f"status:{record.status_code}", 1)
-
-            # Store endpoint metadata
-            pipe.hset(endpoint_key, "endpoint", record.endpoint)
-            pipe.hset(endpoint_key, "method", record.method)
-            pipe.hset(endpoint_key, "service", record.service)
-            pipe.hset(endpoint_key, "last_accessed", record.timestamp.isoformat())
-
-            # Update min/max response times
-            pipe.hget(endpoint_key, "min_response_time_ms")
-            pipe.hget(endpoint_key, "max_response_time_ms")
-
-            # Track this endpoint in the service's endpoint set
-            pipe.sadd(f"{USAGE_KEY_PREFIX}{record.service}:endpoints", endpoint_key)
-
-            # Track this service in the global service set
-            pipe.sadd(USAGE_SERVICE_KEY, record.service)
-
-            # Update service-level summary
-            pipe.hincrby(service_key, "total_requests", 1)
-            if 200 <= record.status_code < 400:
-                pipe.hincrby(service_key, "total_successes", 1)
-            else:
-                pipe.hincrby(service_key, "total_errors", 1)
-            pipe.hincrbyfloat(service_key, "total_response_time_ms", record.response_time_ms)
-            pipe.hset(service_key, "last_updated", record.timestamp.isoformat())
-
-            # Update global metadata
-            pipe.hset(USAGE_META_KEY, "last_updated", record.timestamp.isoformat())
-            pipe.hsetnx(USAGE_META_KEY, "collection_started", record.timestamp.isoformat())
-
-            results = await pipe.execute()
-
-            # Handle min/max updates (need separate operation)
-            current_min = results[10]  # hget min
-            current_max = results[11]  # hget max
-
-            update_pipe = redis.pipeline()
-
-            if current_min is None or record.response_time_ms < float(current_min):
-                update_pipe.hset(endpoint_key, "min_response_time_ms", str(record.response_time_ms))
-
-            if current_max is None or record.response_time_ms > float(current_max):
-                update_pipe.hset(endpoint_key, "max_response_time_ms", str(record.response_time_ms))
-
-            # Set first_accessed only if not already set
-            update_pipe.hsetnx(endpoint_key, "first_accessed", record.timestamp.isoformat())
-
-            await update_pipe.execute()
-
-            # Also update local cache for fast reads
-            self._update_local_cache(record)
-
-            return True
-
-        except Exception as e:
-            logger.error(f"Failed to record usage: {e}")
-            # Fall back to local cache
-            self._update_local_cache(record)
+        self._update_local_cache(record)
+        if not redis_publisher._redis:
+            logger.warning("Redis not connected - storing usage locally only")
             return False
 
+        key = (record.service, record.endpoint, record.method, record.status_code)
+        pending = self._pending.get(key)
+        if pending is None:
+            self._pending[key] = PendingUsage.of(record)
+        else:
+            pending.merge(PendingUsage.of(record))
+        return True
+
     async def record_batch(self, records: list[EndpointUsageRecord]) -> int:
         """
         Record multiple usage events efficiently.
 
-        Returns the number of successfully recorded events.
+        Returns the number of events added to the flush window.
         """
         success_count = 0
         for record in records:
@@ -140,6 +235,136 @@ class UsageTracker:
                 success_count += 1
         return success_count
 
+    async def record_reported(self, records: list[dict]) -> bool:
+        """
+        Record a batch of this service's own usage, handed over by its usage
+        middleware instead of being posted back to itself.
+        """
+        await self.record_batch([EndpointUsageRecord(**record) for record in records])
+        return True
+
+    # ==================== Flushing ====================
+
+    def _queue_flush(self, pipe, pending: dict[UsageKey, PendingUsage]):
+        """Queue the Redis updates for a window of pending usage on a pipeline."""
+        endpoints: dict[str, PendingUsage] = {}
+        services: dict[str, PendingUsage] = {}
+        service_successes: dict[str, int] = {}
+
+        for (service, endpoint, method, status_code), usage in pending.items():
+            endpoint_key = self._get_endpoint_key(service, method, endpoint)
+            succeeded = 200 <= status_code < 400
+            pipe.hincrby(endpoint_key, "request_count", usage.count)
+            pipe.hincrby(endpoint_key, "success_count" if succeeded else "error_count", usage.count)
+            pipe.hincrbyfloat(endpoint_key, "total_response_time_ms", usage.total_response_time_ms)
+            pipe.hincrby(endpoint_key, f"status:{status_code}", usage.count)
+
+            if endpoint_key in endpoints:
+                endpoints[endpoint_key].merge(usage)
+            else:
+                endpoints[endpoint_key] = usage.copy()
+                pipe.hset(
+                    endpoint_key,
+                    mapping={"endpoint": endpoint, "method": method, "service": service},
+                )
+                # Track this endpoint in the service's endpoint set
+                pipe.sadd(f"{USAGE_KEY_PREFIX}{service}:endpoints", endpoint_key)
+
+            if service in services:
+                services[service].merge(usage)
+            else:
+                services[service] = usage.copy()
+            service_successes[service] = service_successes.get(service, 0) + (
+                usage.count if succeeded else 0
+            )
+
+        retention = settings.usage_latency_retention_hours * 3600
+        for endpoint_key, usage in endpoints.items():
+            for (window, bucket), count in usage.latency.items():
+                pipe.hincrby(_latency_key(endpoint_key, window), str(bucket), count)
+                pipe.hincrby(
+                    _latency_key(endpoint_key, _rollup_window(window), True), str(bucket), count
+                )
+            windows = {window for window, _ in usage.latency}
+            for window in windows:
+                pipe.expire(_latency_key(endpoint_key, window), retention)
+            for window in {_rollup_window(window) for window in windows}:
+                pipe.expire(
+                    _latency_key(endpoint_key, window, True),
+                    retention + settings.usage_latency_rollup_seconds,
+                )
+            pipe.hset(endpoint_key, "last_accessed", usage.last_accessed.isoformat())
+            pipe.hsetnx(endpoint_key, "first_accessed", usage.first_accessed.isoformat())
+            pipe.eval(
+                _MIN_MAX_SCRIPT,
+                1,
+                endpoint_key,
+                str(usage.min_response_time_ms),
+                str(usage.max_response_time_ms),
+            )
+
+        for service, usage in services.items():
+            service_key = f"{USAGE_KEY_PREFIX}{service}:summary"
+            successes = service_successes[service]
+            pipe.sadd(USAGE_SERVICE_KEY, service)
+            pipe.hincrby(service_key, "total_requests", usage.count)
+            pipe.hincrby(service_key, "total_successes", successes)
+            pipe.hincrby(service_key, "total_errors", usage.count - successes)
+            pipe.hincrbyfloat(service_key, "total_response_time_ms", usage.total_response_time_ms)
+            pipe.hset(service_key, "last_updated", usage.last_accessed.isoformat())
+
+        last_accessed = max(usage.last_accessed for usage in services.values())
+        first_accessed = min(usage.first_accessed for usage in services.values())
+        pipe.hset(USAGE_META_KEY, "last_updated", last_accessed.isoformat())
+        pipe.hsetnx(USAGE_META_KEY, "collection_started", first_accessed.isoformat())
+
+    async def flush(self) -> int:
+        """
+        Write the pending window to Redis in one transaction.
+
+        If Redis is not connected or the write fails, the window is kept and
+        merged into the next one. Returns the number of events written.
+        """
+        redis = redis_publisher._redis
+        if not redis or not self._pending:
+            return 0
+        pending, self._pending = self._pending, {}
+        try:
+            pipe = redis.pipeline()
+            self._queue_flush(pipe, pending)
+            await pipe.execute()
+            return sum(usage.count for usage in pending.values())
+        except Exception as e:
+            logger.error(f"Failed to flush usage: {e}")
+            for key, usage in pending.items():
+                if key in self._pending:
+                    usage.merge(self._pending[key])
+                self._pending[key] = usage
+            return 0
+
+    async def _flush_loop(self):
+        """Background loop that flushes one window at a time."""
+        while True:
+            await asyncio.sleep(settings.usage_flush_interval_seconds)
+            await self.flush()
+
+    def start_flushing(self):
+        """Start the background flush task."""
+        if self._flush_task and not self._flush_task.done():
+            return
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop_flushing(self):
+        """Stop the background flush task and flush what is pending."""
+        if self._flush_task:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+
     def _update_local_cache(self, record: EndpointUsageRecord):
         """Update the local in-memory cache."""
         if record.service not in self._local_cache:
@@ -159,6 +384,14 @@ class UsageTracker:
             self._collection_started = record.timestamp
         self._last_updated = record.timestamp
 
+    def get_local_totals(self) -> dict[str, ServiceUsageSummary]:
+        """Requests, successes and errors of each service counted since startup."""
+        return dict(self._local_cache)
+
+    def get_pending_count(self) -> int:
+        """Usage events counted in the current window, not yet written to Redis."""
+        return sum(usage.count for usage in self._pending.values())
+
     async def get_usage_stats(self, service: str | None = None) -> UsageStatsResponse:
         """
         Get aggregated usage statistics.
@@ -174,6 +407,8 @@ class UsageTracker:
             if not redis:
                 return self._get_local_stats(service)
 
+            # Include the current window
+            await self.flush()
             response = UsageStatsResponse()
 
             # Get metadata
@@ -297,6 +532,73 @@ class UsageTracker:
             logger.error(f"Failed to get endpoint usage for {key}: {e}")
             return None
 
+    async def get_latency_stats(
+        self, service: str | None = None, minutes: int = 60, step_minutes: int | None = None
+    ) -> LatencyStatsResponse:
+        """
+        Get response time percentiles per route over the last `minutes`.
+
+        Args:
+            service: Optional service name to filter by
+            minutes: Span to report on, up to USAGE_LATENCY_RETENTION_HOURS
+            step_minutes: Optionally also report each consecutive window of
+                this many minutes
+
+        Long spans are read from the rollup histograms, so their start and
+        steps are rounded to USAGE_LATENCY_ROLLUP_SECONDS; the response's
+        start and step_minutes are the ones actually used.
+
+        Returns:
+            Routes with requests in the span, busiest first; none if Redis
+            is unavailable
+        """
+        windows, rollup = _latency_span(minutes)
+        step = max(1, (step_minutes or 0) * 60 // windows.step)
+        response = LatencyStatsResponse(
+            start=datetime.fromtimestamp(windows.start, timezone.utc),
+            end=datetime.fromtimestamp(windows.stop, timezone.utc),
+            step_minutes=step * windows.step // 60 if step_minutes else None,
+        )
+
+        try:
+            redis = redis_publisher._redis
+            if not redis:
+                return response
+
+            # Include the current window
+            await self.flush()
+            if service:
+                services = [service]
+            else:
+                services = sorted(await redis.smembers(USAGE_SERVICE_KEY))
+            endpoint_keys = []
+            for svc in services:
+                keys = await redis.smembers(f"{USAGE_KEY_PREFIX}{svc}:endpoints")
+                endpoint_keys.extend(sorted(keys))
+
+            # One round-trip for every route's metadata and histograms
+            pipe = redis.pipeline(transaction=False)
+            for key in endpoint_keys:
+                pipe.hmget(key, "service", "method", "endpoint")
+                for window in windows:
+                    pipe.hgetall(_latency_key(key, window, rollup))
+            results = await pipe.execute()
+
+        except Exception as e:
+            logger.error(f"Failed to get latency stats: {e}")
+            return response
+
+        per_route = len(windows) + 1
+        for i in range(len(endpoint_keys)):
+            route, *histograms = results[i * per_route : (i + 1) * per_route]
+            if any(histograms):
+                response.routes.append(
+                    _route_latency(route, histograms, windows, step if step_minutes else None)
+                )
+
+        response.routes.sort(key=lambda route: route.overall.count, reverse=True)
+        return response
+
     def _get_local_stats(self, service: str | None = None) -> UsageStatsResponse:
         """Get statistics from local cache when Redis is unavailable."""
         response = UsageStatsResponse(
@@ -316,19 +618,38 @@ class UsageTracker:
 
         return response
 
-    async def _queue_pipe_delete(self, pipe, key: str) -> None:
+    async def _queue_pipe_delete(self, pipe, *keys: str) -> None:
         """Queue a delete on a Redis pipeline for clients that may return awaitables."""
-        result = pipe.delete(key)
+        result = pipe.delete(*keys)
         if isawaitable(result):
             await result
 
+    @staticmethod
+    def _latency_keys(endpoint_key: str) -> list[str]:
+        """Every latency histogram key of an endpoint that retention can have kept."""
+        now = int(datetime.now(timezone.utc).timestamp())
+        retention = settings.usage_latency_retention_hours * 3600
+        keys = []
+        for width, rollup in (
+            (settings.usage_latency_window_seconds, False),
+            (settings.usage_latency_rollup_seconds, True),
+        ):
+            end = now // width * width
+            keys.extend(
+                _latency_key(endpoint_key, window, rollup)
+                for window in range(end - retention - width, end + width, width)
+            )
+        return keys
+
     async def _reset_service_stats_in_redis(self, redis, pipe, service: str) -> None:
         """Queue deletion of all Redis keys for a single service."""
         # Note: Redis client uses decode_responses=True, so keys are already strings
         endpoint_keys = await redis.smembers(f"{USAGE_KEY_PREFIX}{service}:endpoints")
 
         for key in endpoint_keys:
-            await self._queue_pipe_delete(pipe, key)
+            # Histogram windows are known, so they are deleted by name rather
+            # than by scanning the keyspace
+            await self._queue_pipe_delete(pipe, key, *self._latency_keys(key))
 
         await self._queue_pipe_delete(pipe, f"{USAGE_KEY_PREFIX}{service}:endpoints")
         await self._queue_pipe_delete(pipe, f"{USAGE_KEY_PREFIX}{service}:summary")
@@ -354,12 +675,14 @@ class UsageTracker:
         await pipe.execute()
 
     def _reset_local_service_stats(self, service: str) -> None:
-        """Delete local cache for a single service."""
+        """Delete local cache and pending usage for a single service."""
         self._local_cache.pop(service, None)
+        self._pending = {key: usage for key, usage in self._pending.items() if key[0] != service}
 
     def _reset_all_local_stats(self) -> None:
         """Clear local usage stats and reset timestamps."""
         self._local_cache = {}
+        self._pending = {}
         self._collection_started = None
         self._last_updated = None
 
@@ -0,0 +1,203 @@
+"""
+WebSocket Fan-out Hub
+
+One hub per process sits between Redis and the WebSocket clients of the
+metrics router:
+
+- Redis channels are subscribed once, while any client needs them: a
+  network's topology channel while someone watches that network, and the
+  health and speed test channels while anyone is connected
+- Each event is serialized once per encoding and the same frame is queued for
+  every client of the channel that uses it. Clients get JSON text frames
+  unless they negotiated msgpack or msgpack+zstd binary frames by offering it
+  as a WebSocket subprotocol (see payload_codec)
+- Every client has a bounded send queue drained by its own task. A client
+  whose queue is full stops receiving deltas for that network until the next
+  keyframe gets through; one that overflows again before catching up is
+  disconnected
+"""
+
+import asyncio
+import logging
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+from fastapi import WebSocket
+
+from ..config import settings
+from ..models import MetricsEvent, MetricsEventType
+from . import payload_codec
+from .redis_publisher import CHANNEL_HEALTH, CHANNEL_SPEED_TEST, redis_publisher, topology_channel
+
+logger = logging.getLogger(__name__)
+
+# Close code for clients dropped for not keeping up ("try again later")
+CLOSE_SLOW_CONSUMER = 1013
+
+_GLOBAL_CHANNELS = (CHANNEL_HEALTH, CHANNEL_SPEED_TEST)
+
+
+@dataclass(eq=False)
+class HubClient:
+    """A connected WebSocket and what it is sent"""
+
+    websocket: WebSocket
+    queue: asyncio.Queue
+    encoding: str = payload_codec.ENCODING_JSON
+    # Networks whose deltas are skipped until a keyframe gets through
+    keyframes_only: set[str | None] = field(default_factory=set)
+    overflows: int = 0
+    dropped: bool = False
+    sender: asyncio.Task | None = None
+
+
+class WebSocketHub:
+    """Fans Redis events out to WebSocket clients, serializing each event once."""
+
+    def __init__(self):
+        self._clients: set[HubClient] = set()
+        # Channel -> clients receiving it
+        self._channels: dict[str, set[HubClient]] = {}
+        self._handlers: dict[str, Callable] = {}
+        self._stats = {"events": 0, "frames": 0, "skipped_deltas": 0, "dropped_clients": 0}
+
+    async def connect(self, websocket: WebSocket) -> HubClient:
+        """Accept a WebSocket, with the encoding it offered as subprotocol, and start its sender."""
+        subprotocol = payload_codec.negotiate(websocket.scope.get("subprotocols", []))
+        await websocket.accept(subprotocol=subprotocol)
+        client = HubClient(
+            websocket=websocket,
+            queue=asyncio.Queue(maxsize=settings.websocket_send_queue_size),
+            encoding=subprotocol or payload_codec.ENCODING_JSON,
+        )
+        client.sender = asyncio.create_task(self._send_loop(client))
+        self._clients.add(client)
+        for channel in _GLOBAL_CHANNELS:
+            await self._join(client, channel)
+        logger.info(f"WebSocket client connected. Total: {len(self._clients)}")
+        return client
+
+    async def disconnect(self, client: HubClient):
+        """Forget a client and unsubscribe from channels nobody needs anymore."""
+        if client not in self._clients:
+            return
+        self._clients.discard(client)
+        for channel in [c for c, members in self._channels.items() if client in members]:
+            await self._leave(client, channel)
+        if client.sender and client.sender is not asyncio.current_task():
+            client.sender.cancel()
+        logger.info(f"WebSocket client disconnected. Total: {len(self._clients)}")
+
+    async def subscribe(self, client: HubClient, network_id: str | None):
+        """Send a client a network's topology events (None for single-tenant mode)."""
+        await self._join(client, topology_channel(network_id))
+
+    def send(self, client: HubClient, message: dict[str, Any]) -> bool:
+        """Queue a message for one client, such as a reply to its request."""
+        return self._enqueue(client, payload_codec.encode(message, client.encoding))
+
+    async def _join(self, client: HubClient, channel: str):
+        members = self._channels.setdefault(channel, set())
+        members.add(client)
+        if channel not in self._handlers:
+
+            async def handler(event: MetricsEvent, channel: str = channel):
+                self.deliver(channel, event)
+
+            self._handlers[channel] = handler
+            redis_publisher.add_handler(channel, handler)
+            await redis_publisher.subscribe(channel)
+
+    async def _leave(self, client: HubClient, channel: str):
+        members = self._channels.get(channel)
+        if members is None:
+            return
+        members.discard(client)
+        if not members:
+            del self._channels[channel]
+            redis_publisher.remove_handler(channel, self._handlers.pop(channel))
+            await redis_publisher.unsubscribe(channel)
+
+    def deliver(self, channel: str, event: MetricsEvent):
+        """Queue one event for every client of its channel."""
+        members = self._channels.get(channel)
+        if not members:
+            return
+        self._stats["events"] += 1
+
+        network_id = event.payload.get("network_id") if channel not in _GLOBAL_CHANNELS else None
+        is_delta = event.event_type == MetricsEventType.SNAPSHOT_DELTA
+        is_keyframe = event.event_type == MetricsEventType.FULL_SNAPSHOT
+        message = {
+            "type": event.event_type.value,
+            "timestamp": event.timestamp.isoformat(),
+            "payload": event.payload,
+        }
+        frames: dict[str, str | bytes] = {}
+
+        for client in list(members):
+            if is_delta and network_id in client.keyframes_only:
+                self._stats["skipped_deltas"] += 1
+                continue
+            frame = frames.get(client.encoding)
+            if frame is None:
+                frame = frames[client.encoding] = payload_codec.encode(message, client.encoding)
+            if self._enqueue(client, frame):
+                if is_keyframe and network_id in client.keyframes_only:
+                    # Caught up
+                    client.keyframes_only.discard(network_id)
+                    client.overflows = 0
+            elif is_delta or is_keyframe:
+                # Later deltas would not apply on top of the missed one
+                client.keyframes_only.add(network_id)
+
+    def _enqueue(self, client: HubClient, frame: str | bytes) -> bool:
+        if client.dropped:
+            return False
+        try:
+            client.queue.put_nowait(frame)
+            self._stats["frames"] += 1
+            return True
+        except asyncio.QueueFull:
+            client.overflows += 1
+            if client.overflows > settings.websocket_max_overflows:
+                self._drop(client)
+            return False
+
+    def _drop(self, client: HubClient):
+        client.dropped = True
+        self._stats["dropped_clients"] += 1
+        # Make room for the sentinel; nothing queued will be sent anyway
+        while not client.queue.empty():
+            client.queue.get_nowait()
+        client.queue.put_nowait(None)
+        logger.warning("Dropping WebSocket client that is not keeping up")
+
+    async def _send_loop(self, client: HubClient):
+        try:
+            while True:
+                frame = await client.queue.get()
+                if frame is None:
+                    await client.websocket.close(code=CLOSE_SLOW_CONSUMER)
+                    return
+                if isinstance(frame, bytes):
+                    await client.websocket.send_bytes(frame)
+                else:
+                    await client.websocket.send_text(frame)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.debug(f"WebSocket send failed: {e}")
+
+    def get_stats(self) -> dict:
+        return {
+            "clients": len(self._clients),
+            "channels": len(self._channels),
+            "queued": sum(client.queue.qsize() for client in self._clients),
+            **self._stats,
+        }
+
+
+# Singleton instance
+websocket_hub = WebSocketHub()
@@ -0,0 +1,108 @@
+"""
+Benchmark check history in snapshots, full history vs downsampled sparklines.
+
+Builds the node metrics of a network from health service data where every
+device has a day of checks (one a minute), then compares:
+
+- full: every check copied into the snapshot (how snapshots used to carry
+  history)
+- sparkline: checks summarized into HISTORY_SPARKLINE_POINTS buckets
+
+for the time to build the nodes from health data, the snapshot's JSON size and
+the time to serialize it.
+
+Run from the metrics-service directory:
+
+    python -m benchmarks.bench_history_sparkline --devices 50 200 1000
+"""
+
+import argparse
+import gc
+import random
+import time
+import uuid
+from collections.abc import Callable
+from datetime import datetime, timedelta, timezone
+
+from app.models import CheckHistoryEntry, NetworkTopologySnapshot, NodeMetrics
+from app.services.history_sparkline import summarize_history
+from app.services.metrics_aggregator import MetricsAggregator
+
+
+class _FullHistoryNode(NodeMetrics):
+    check_history: list[CheckHistoryEntry] = []
+
+
+class _FullHistorySnapshot(NetworkTopologySnapshot):
+    nodes: dict[str, _FullHistoryNode] = {}
+
+
+def _health_data(devices: int, checks: int) -> dict[str, list[dict]]:
+    # A fixed seed keeps runs comparable
+    rng = random.Random(devices)
+    now = datetime.now(timezone.utc)
+    return {
+        f"10.0.{d // 250}.{d % 250 + 2}": [
+            {
+                "timestamp": (now - timedelta(minutes=m)).isoformat(),
+                "success": rng.random() > 0.02,
+                "latency_ms": rng.uniform(0.3, 40.0),
+            }
+            for m in range(checks)
+        ]
+        for d in range(devices)
+    }
+
+
+def _build(health: dict[str, list[dict]], full: bool) -> NetworkTopologySnapshot:
+    aggregator = MetricsAggregator()
+    nodes = {}
+    for ip, history in health.items():
+        if full:
+            node = _FullHistoryNode(
+                id=ip, name=ip, ip=ip, check_history=aggregator._transform_check_history(history)
+            )
+        else:
+            node = NodeMetrics(id=ip, name=ip, ip=ip, history=summarize_history(history))
+        nodes[ip] = node
+    model = _FullHistorySnapshot if full else NetworkTopologySnapshot
+    return model(
+        snapshot_id=str(uuid.uuid4()),
+        timestamp=datetime.now(timezone.utc),
+        total_nodes=len(nodes),
+        nodes=nodes,
+    )
+
+
+def _time(fn: Callable, repeat: int) -> tuple[float, object]:
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--devices", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--checks", type=int, default=1440, help="checks per device")
+    parser.add_argument("--repeat", type=int, default=3, help="best of N timings")
+    args = parser.parse_args()
+
+    for devices in args.devices:
+        health = _health_data(devices, args.checks)
+        print(f"\n{devices} devices, {args.checks} checks each")
+        print(f"{'history':<10}  {'build':>9}  {'size':>10}  {'serialize':>9}")
+        for mode in ("full", "sparkline"):
+            build_seconds, snapshot = _time(lambda: _build(health, mode == "full"), args.repeat)
+            dump_seconds, raw = _time(snapshot.model_dump_json, args.repeat)
+            print(
+                f"{mode:<10}  {build_seconds * 1000:>6.1f} ms  {len(raw) / 1024:>7.1f} KB  "
+                f"{dump_seconds * 1000:>6.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Benchmark layout fetching across publish cycles, uncached vs the layout cache.
+
+Builds snapshots for a number of networks over several cycles against a fake
+backend that serves each layout as JSON, with ETags and 304s for matching
+If-None-Match headers. One network's layout is saved between cycles. Compares:
+
+- uncached: every cycle downloads, parses and walks every layout (how
+  snapshot generation used to work)
+- cached: layouts are revalidated conditionally and reused, pre-walked, unless
+  the backend announced a save
+
+Run from the metrics-service directory:
+
+    python -m benchmarks.bench_layout_cache --networks 200 --devices 200 --cycles 10
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import time
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+from app.models import MetricsEvent, MetricsEventType
+from app.services.metrics_aggregator import MetricsAggregator, SnapshotCycle
+
+
+def _layout(network: int, devices: int, revision: int) -> dict:
+    children = [
+        {
+            "id": f"n{network}-d{d}",
+            "name": f"Device {d} r{revision}",
+            "ip": f"10.{network % 256}.{d // 256}.{d % 256}",
+            "role": "server",
+            "children": [],
+        }
+        for d in range(devices)
+    ]
+    gateway = {"id": f"n{network}-gw", "role": "gateway/router", "children": children}
+    return {"root": {"id": f"n{network}-root", "role": "group", "children": [gateway]}}
+
+
+class _Response:
+    def __init__(self, status_code: int, body: bytes = b"", etag: str | None = None):
+        self.status_code = status_code
+        self.content = body
+        self.headers = {"ETag": etag} if etag else {}
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class _Backend:
+    """Serves layouts as JSON, answering matching If-None-Match with 304"""
+
+    def __init__(self, networks: int, devices: int):
+        self.devices = devices
+        self.revisions = {f"net-{n}": 0 for n in range(networks)}
+        self.bodies: dict[str, bytes] = {}
+        self.requests = 0
+        self.sent = 0
+        for network_id in self.revisions:
+            self.save(network_id)
+
+    def etag(self, network_id: str) -> str:
+        return f'"{network_id}-{self.revisions[network_id]}"'
+
+    def save(self, network_id: str):
+        self.revisions[network_id] += 1
+        network = int(network_id.split("-")[1])
+        layout = _layout(network, self.devices, self.revisions[network_id])
+        self.bodies[network_id] = json.dumps({"layout_data": layout}).encode()
+
+    async def get(self, url: str, headers: dict | None = None, **kwargs):
+        self.requests += 1
+        network_id = url.split("/")[-2]
+        etag = self.etag(network_id)
+        if (headers or {}).get("If-None-Match") == etag:
+            return _Response(304, etag=etag)
+        body = self.bodies[network_id]
+        self.sent += len(body)
+        return _Response(200, body, etag)
+
+
+async def _cycles(args, cached: bool) -> dict:
+    backend = _Backend(args.networks, args.devices)
+    aggregator = MetricsAggregator()
+    elapsed = layout = 0.0
+    with patch("app.services.metrics_aggregator.http_client", backend):
+        for cycle_number in range(args.cycles):
+            if cycle_number:
+                network_id = f"net-{cycle_number % args.networks}"
+                backend.save(network_id)
+                if cached:
+                    event = MetricsEvent(
+                        event_type=MetricsEventType.LAYOUT_SAVED,
+                        timestamp=datetime.now(timezone.utc),
+                        payload={"network_id": network_id, "etag": backend.etag(network_id)},
+                    )
+                    await aggregator.on_layout_saved(event)
+                    await asyncio.gather(*aggregator._layout_refreshes.values())
+            if not cached:
+                aggregator._layout_cache = type(aggregator._layout_cache)()
+
+            cycle = SnapshotCycle({}, {}, {})
+            # Collection pauses would otherwise land in whichever phase they interrupt
+            gc.collect()
+            started = time.perf_counter()
+            for network_id in backend.revisions:
+                await aggregator.generate_snapshot(network_id, cycle=cycle)
+            elapsed += time.perf_counter() - started
+            layout += cycle.timings["layout"]
+    return {
+        "elapsed": elapsed,
+        "layout": layout,
+        "requests": backend.requests,
+        "sent": backend.sent,
+        "stats": aggregator._layout_cache.get_stats(),
+    }
+
+
+async def _run(args):
+    print(
+        f"{args.networks} networks x {args.devices} devices, {args.cycles} cycles, "
+        f"one layout saved per cycle, revalidating every {args.revalidate_seconds}s"
+    )
+    print(
+        f"{'mode':<9}  {'elapsed':>8}  {'ms/cycle':>9}  {'layout ms/cycle':>15}  "
+        f"{'requests':>8}  {'downloaded':>10}"
+    )
+    with patch(
+        "app.services.layout_cache.settings.layout_revalidate_seconds", args.revalidate_seconds
+    ):
+        for mode in ("uncached", "cached"):
+            result = await _cycles(args, cached=mode == "cached")
+            print(
+                f"{mode:<9}  {result['elapsed']:>7.2f}s  "
+                f"{result['elapsed'] / args.cycles * 1000:>9.1f}  "
+                f"{result['layout'] / args.cycles * 1000:>15.1f}  {result['requests']:>8,}  "
+                f"{result['sent'] / 1024 / 1024:>7.1f} MB"
+            )
+    print(f"cached: {result['stats']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--networks", type=int, default=200)
+    parser.add_argument("--devices", type=int, default=200, help="devices per layout")
+    parser.add_argument("--cycles", type=int, default=10)
+    parser.add_argument(
+        "--revalidate-seconds",
+        type=int,
+        default=0,
+        help="LAYOUT_REVALIDATE_SECONDS; 0 sends a conditional request every cycle",
+    )
+    args = parser.parse_args()
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Benchmark /metrics scrape time for many devices, rendered fresh vs from cache.
+
+Generates snapshots for a number of networks, each with devices reporting
+ping and uptime, and times three kinds of scrape:
+
+- cold: every network rendered, as on the first scrape (and how the whole
+  exposition would be built if nothing were kept)
+- warm: no snapshot regenerated since the last scrape
+- changed: one network regenerated since the last scrape
+
+Run from the metrics-service directory:
+
+    python -m benchmarks.bench_openmetrics --devices 10000 --networks 1 20 100
+"""
+
+import argparse
+import time
+import uuid
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+from app.models import (
+    DeviceRole,
+    HealthStatus,
+    NetworkTopologySnapshot,
+    NodeMetrics,
+    PingMetrics,
+    UptimeMetrics,
+)
+from app.services.metrics_aggregator import MetricsAggregator
+from app.services.metrics_exporter import MetricsExporter
+
+
+def _generate(network: int, devices: int) -> NetworkTopologySnapshot:
+    now = datetime.now(timezone.utc)
+    nodes = {}
+    for d in range(devices):
+        node_id = f"device-{network}-{d}"
+        nodes[node_id] = NodeMetrics(
+            id=node_id,
+            name=f"Device {d}",
+            ip=f"10.{network % 250}.{d // 250}.{d % 250 + 2}",
+            role=DeviceRole.CLIENT,
+            status=HealthStatus.HEALTHY,
+            last_check=now,
+            ping=PingMetrics(success=True, latency_ms=4.0 + d % 7, packet_loss_percent=0.0),
+            uptime=UptimeMetrics(uptime_percent_24h=99.9, consecutive_failures=0),
+        )
+    return NetworkTopologySnapshot(
+        snapshot_id=str(uuid.uuid4()),
+        timestamp=now,
+        total_nodes=devices,
+        healthy_nodes=devices,
+        nodes=nodes,
+    )
+
+
+def _best_ms(scrape, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        scrape()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def _run(devices: int, networks: int, repeat: int):
+    aggregator = MetricsAggregator()
+    per_network = max(1, devices // networks)
+    aggregator._snapshots = {f"net-{n}": _generate(n, per_network) for n in range(networks)}
+
+    with patch("app.services.metrics_exporter.metrics_aggregator", aggregator):
+        exporter = MetricsExporter()
+        size = len(exporter.render().encode())
+
+        def cold():
+            MetricsExporter().render()
+
+        def changed():
+            # A regenerated snapshot is a new object
+            aggregator._snapshots["net-0"] = aggregator._snapshots["net-0"].model_copy()
+            exporter.render()
+
+        timings = {
+            "cold": _best_ms(cold, repeat),
+            "warm": _best_ms(exporter.render, repeat),
+            "changed": _best_ms(changed, repeat),
+        }
+
+    print(f"\n{per_network * networks:,} devices in {networks} networks, {size / 1e6:.1f} MB")
+    print(f"{'scrape':<8}  {'ms':>8}")
+    for name, ms in timings.items():
+        print(f"{name:<8}  {ms:>8.2f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--devices", type=int, default=10_000)
+    parser.add_argument("--networks", type=int, nargs="+", default=[1, 20, 100])
+    parser.add_argument("--repeat", type=int, default=5, help="best of N timings")
+    args = parser.parse_args()
+    for networks in args.networks:
+        _run(args.devices, networks, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Benchmark payload encodings of topology snapshots: size and encode/decode time.
+
+Builds representative snapshots (every device with ping, DNS and uptime
+metrics and a check history sparkline) and measures each encoding from the
+snapshot model to bytes and back:
+
+- json: how snapshots are published by default
+- json+deflate: JSON compressed as permessage-deflate would, per message
+  without context takeover (approximated with raw zlib)
+- msgpack, msgpack+zstd: the compact encodings of payload_codec, the latter at
+  each --zstd-levels level
+
+Run from the metrics-service directory:
+
+    python -m benchmarks.bench_payload_encoding --devices 50 200 1000 --history 1440
+"""
+
+import argparse
+import random
+import time
+import uuid
+import zlib
+from collections.abc import Callable
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+from app.models import (
+    DeviceRole,
+    DnsMetrics,
+    HealthStatus,
+    NetworkTopologySnapshot,
+    NodeConnection,
+    NodeMetrics,
+    PingMetrics,
+    UptimeMetrics,
+)
+from app.services import payload_codec
+from app.services.history_sparkline import summarize_history
+
+
+def _snapshot(devices: int, history: int) -> NetworkTopologySnapshot:
+    # Measured values vary, as they do in real networks; a fixed seed keeps
+    # runs comparable
+    rng = random.Random(devices)
+    now = datetime.now(timezone.utc)
+    nodes = {}
+    for d in range(devices):
+        node_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        latency = rng.uniform(0.3, 40.0)
+        nodes[node_id] = NodeMetrics(
+            id=node_id,
+            name=f"Device {d}",
+            ip=f"192.168.{d // 250}.{d % 250 + 2}",
+            hostname=f"device-{d}.lan",
+            role=DeviceRole.CLIENT,
+            status=HealthStatus.HEALTHY,
+            last_check=now,
+            ping=PingMetrics(
+                success=True,
+                latency_ms=latency,
+                min_latency_ms=latency * 0.8,
+                max_latency_ms=latency * 1.6,
+                avg_latency_ms=latency,
+                jitter_ms=rng.uniform(0.0, 3.0),
+            ),
+            dns=DnsMetrics(
+                success=True,
+                resolved_hostname=f"device-{d}.lan",
+                resolution_time_ms=rng.uniform(0.5, 20.0),
+            ),
+            uptime=UptimeMetrics(
+                uptime_percent_24h=rng.uniform(95.0, 100.0),
+                avg_latency_24h_ms=latency,
+                checks_passed_24h=2870,
+                checks_failed_24h=10,
+                last_seen_online=now,
+            ),
+            history=summarize_history(
+                [
+                    {
+                        "timestamp": now - timedelta(minutes=m, seconds=rng.uniform(0, 30)),
+                        "success": rng.random() > 0.02,
+                        "latency_ms": latency * rng.uniform(0.7, 1.5),
+                    }
+                    for m in range(history)
+                ]
+            ),
+        )
+    ids = list(nodes)
+    return NetworkTopologySnapshot(
+        snapshot_id=str(uuid.UUID(int=rng.getrandbits(128))),
+        timestamp=now,
+        network_id=str(uuid.UUID(int=rng.getrandbits(128))),
+        total_nodes=devices,
+        healthy_nodes=devices,
+        nodes=nodes,
+        connections=[
+            NodeConnection(source_id=ids[0], target_id=node_id, connection_speed="1GbE")
+            for node_id in ids[1:]
+        ],
+    )
+
+
+def _deflate(data: bytes) -> bytes:
+    compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+
+def _inflate(data: bytes) -> bytes:
+    return zlib.decompressobj(wbits=-zlib.MAX_WBITS).decompress(data)
+
+
+def _codecs(levels: list[int]) -> dict[str, tuple[Callable, Callable]]:
+    model = NetworkTopologySnapshot
+    codecs = {
+        "json": (
+            lambda s: s.model_dump_json().encode(),
+            lambda raw: model.model_validate_json(raw),
+        ),
+        "json+deflate": (
+            lambda s: _deflate(s.model_dump_json().encode()),
+            lambda raw: model.model_validate_json(_inflate(raw)),
+        ),
+        "msgpack": (
+            lambda s: payload_codec.encode(s.model_dump(mode="json"), "msgpack"),
+            lambda raw: model.model_validate(payload_codec.decode(raw)),
+        ),
+    }
+    for level in levels:
+        codecs[f"msgpack+zstd-{level}"] = (
+            lambda s, level=level: _zstd(s, level),
+            lambda raw: model.model_validate(payload_codec.decode(raw)),
+        )
+    return codecs
+
+
+def _zstd(snapshot: NetworkTopologySnapshot, level: int) -> bytes:
+    with patch("app.services.payload_codec.settings.payload_zstd_level", level):
+        return payload_codec.encode(snapshot.model_dump(mode="json"), "msgpack+zstd")
+
+
+def _time(fn: Callable, arg, repeat: int) -> tuple[float, object]:  # noqa: ANN001
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(arg)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--devices", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument(
+        "--history", type=int, default=1440, help="checks summarized per device, one a minute"
+    )
+    parser.add_argument("--zstd-levels", type=int, nargs="+", default=[1, 3, 9])
+    parser.add_argument("--repeat", type=int, default=5, help="best of N timings")
+    args = parser.parse_args()
+
+    codecs = _codecs(args.zstd_levels)
+    for devices in args.devices:
+        snapshot = _snapshot(devices, args.history)
+        print(f"\n{devices} devices, {args.history} checks summarized each")
+        print(f"{'encoding':<16}  {'size':>10}  {'ratio':>6}  {'encode':>9}  {'decode':>9}")
+        json_size = None
+        for name, (encode, decode) in codecs.items():
+            encode_seconds, raw = _time(encode, snapshot, args.repeat)
+            decode_seconds, restored = _time(decode, raw, args.repeat)
+            assert restored == snapshot
+            json_size = json_size or len(raw)
+            print(
+                f"{name:<16}  {len(raw) / 1024:>7.1f} KB  {len(raw) / json_size:>6.1%}  "
+                f"{encode_seconds * 1000:>6.2f} ms  {decode_seconds * 1000:>6.2f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Benchmark Redis fan-out of topology snapshots, one shared channel vs per-network channels.
+
+Publishes one snapshot per network per round through the real publisher to a
+local Redis, while a sample of subscribers (one pubsub connection each, each
+interested in a single network) drain what they are sent. Compares:
+
+- shared: every network on `metrics:topology`, subscribers filtering out other
+  networks' payloads after decoding them (how publishing used to work)
+- per-network: each network on `metrics:topology:{network_id}`, subscribers
+  only on their own channel
+
+Needs a Redis server; nothing else is mocked. Run from the metrics-service
+directory:
+
+    python -m benchmarks.bench_redis_fanout --networks 1000 --subscribers 100 --rounds 5
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import redis.asyncio as redis
+
+from app.models import (
+    HealthStatus,
+    MetricsEventType,
+    NetworkTopologySnapshot,
+    NodeMetrics,
+    PingMetrics,
+)
+from app.services.redis_publisher import CHANNEL_TOPOLOGY, RedisPublisher, topology_channel
+
+
+def _snapshot(network_id: str, devices: int) -> NetworkTopologySnapshot:
+    nodes = {
+        f"{network_id}-{d}": NodeMetrics(
+            id=f"{network_id}-{d}",
+            name=f"Device {d}",
+            status=HealthStatus.HEALTHY,
+            ping=PingMetrics(success=True, avg_latency_ms=4.0),
+        )
+        for d in range(devices)
+    }
+    return NetworkTopologySnapshot(
+        snapshot_id=str(uuid.uuid4()),
+        timestamp=datetime.now(timezone.utc),
+        network_id=network_id,
+        total_nodes=devices,
+        healthy_nodes=devices,
+        nodes=nodes,
+    )
+
+
+async def _subscribe(url: str, channel: str, network_id: str, expected: int, stats: dict):
+    client = redis.Redis.from_url(url, decode_responses=True)
+    pubsub = client.pubsub()
+    await pubsub.subscribe(channel)
+    stats["ready"] += 1
+    own = 0
+    try:
+        while own < expected:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=5.0)
+            if message is None:
+                break
+            stats["messages"] += 1
+            stats["bytes"] += len(message["data"])
+            if json.loads(message["data"])["payload"]["network_id"] == network_id:
+                own += 1
+    finally:
+        await pubsub.aclose()
+        await client.aclose()
+
+
+async def _run_mode(args, mode: str, snapshots: list[NetworkTopologySnapshot]) -> dict:
+    stats = {"ready": 0, "messages": 0, "bytes": 0}
+    watched = [s.network_id for s in snapshots[: args.subscribers]]
+    subscribers = [
+        asyncio.create_task(
+            _subscribe(
+                args.redis_url,
+                CHANNEL_TOPOLOGY if mode == "shared" else topology_channel(network_id),
+                network_id,
+                args.rounds,
+                stats,
+            )
+        )
+        for network_id in watched
+    ]
+    while stats["ready"] < len(subscribers):
+        if any(task.done() for task in subscribers):
+            # Surfaces a subscriber that could not connect
+            await asyncio.gather(*subscribers)
+        await asyncio.sleep(0.01)
+
+    publisher = RedisPublisher()
+    with patch("app.services.redis_publisher.settings.redis_url", args.redis_url):
+        await publisher.connect()
+    started = time.perf_counter()
+    for _ in range(args.rounds):
+        for snapshot in snapshots:
+            if mode == "shared":
+                await publisher.publish(CHANNEL_TOPOLOGY, MetricsEventType.FULL_SNAPSHOT, snapshot)
+            else:
+                await publisher.publish_topology_snapshot(snapshot)
+    published = time.perf_counter() - started
+    await asyncio.gather(*subscribers)
+    delivered = time.perf_counter() - started
+    await publisher.disconnect()
+    return {"publish": published, "delivered": delivered, **stats}
+
+
+async def _run(args):
+    snapshots = [
+        _snapshot(f"00000000-0000-0000-0000-{n:012d}", args.devices) for n in range(args.networks)
+    ]
+    print(
+        f"{args.networks} networks x {args.devices} devices, {args.rounds} rounds, "
+        f"{args.subscribers} subscribers"
+    )
+    print(
+        f"{'mode':<11}  {'publish':>8}  {'delivered':>9}  {'received':>9}  "
+        f"{'per subscriber':>14}  {'bytes received':>14}"
+    )
+    for mode in ("shared", "per-network"):
+        result = await _run_mode(args, mode, snapshots)
+        print(
+            f"{mode:<11}  {result['publish']:>7.2f}s  {result['delivered']:>8.2f}s  "
+            f"{result['messages']:>9,}  {result['messages'] // args.subscribers:>14,}  "
+            f"{result['bytes'] / 1024 / 1024:>11.1f} MB"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--redis-url", default="redis://localhost:6379")
+    parser.add_argument("--networks", type=int, default=1000)
+    parser.add_argument("--devices", type=int, default=10, help="devices per network")
+    parser.add_argument(
+        "--subscribers", type=int, default=100, help="networks with a subscriber attached"
+    )
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Benchmark one all-network snapshot cycle against stub upstreams.
+
+The backend (network list and layouts) and the health service (cached metrics,
+gateway test IPs, speed tests) are replaced with an httpx mock transport that
+serves generated JSON after a fixed latency, so the numbers include payload
+encoding and decoding but no real network. Compares:
+
+- sequential: every network in turn, each refetching the shared health payloads
+  alongside its layout (how cycles used to run)
+- planned: the shared payloads fetched once, then networks built concurrently
+
+Run from the metrics-service directory:
+
+    python -m benchmarks.bench_snapshot_cycle --networks 500 --devices 10
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import httpx
+
+from app.services.http_client import http_client
+from app.services.metrics_aggregator import MetricsAggregator
+
+
+def _generate(networks: int, devices: int) -> dict:
+    now = datetime.now(timezone.utc).isoformat()
+    layouts, health, test_ips, speed_tests = {}, {}, {}, {}
+    for n in range(networks):
+        network_id = f"00000000-0000-0000-0000-{n:012d}"
+        gateway_ip = f"10.{n // 256}.{n % 256}.1"
+        children = []
+        for d in range(devices):
+            ip = f"10.{n // 256}.{n % 256}.{d + 2}"
+            children.append({"id": f"{network_id}-{d}", "name": f"device-{d}", "ip": ip})
+            health[ip] = {
+                "ip": ip,
+                "status": "healthy",
+                "last_check": now,
+                "ping": {"success": True, "avg_latency_ms": 4.2, "packet_loss_percent": 0.0},
+                "uptime_percent_24h": 99.9,
+                "check_history": [
+                    {"timestamp": now, "success": True, "latency_ms": 4.0} for _ in range(24)
+                ],
+            }
+        layouts[network_id] = {
+            "root": {
+                "id": f"{network_id}-gw",
+                "name": "Gateway",
+                "ip": gateway_ip,
+                "role": "gateway/router",
+                "children": children,
+            }
+        }
+        test_ips[gateway_ip] = {
+            "gateway_ip": gateway_ip,
+            "test_ips": [{"ip": "1.1.1.1", "label": "Cloudflare", "status": "healthy"}],
+        }
+        speed_tests[gateway_ip] = {"success": True, "timestamp": now, "download_mbps": 500.0}
+    return {"layouts": layouts, "health": health, "test_ips": test_ips, "speed": speed_tests}
+
+
+def _transport(data: dict, latency: float, counts: dict) -> httpx.MockTransport:
+    # Encode once; each response still ships and decodes the full body
+    bodies = {
+        "/api/networks": json.dumps([{"id": network_id} for network_id in data["layouts"]]),
+        "/api/health/cached": json.dumps(data["health"]),
+        "/api/health/gateway/test-ips/all/metrics": json.dumps(data["test_ips"]),
+        "/api/health/speedtest/all": json.dumps(data["speed"]),
+    }
+    layouts = {
+        f"/api/networks/{network_id}/layout": json.dumps({"layout_data": layout})
+        for network_id, layout in data["layouts"].items()
+    }
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency)
+        path = request.url.path
+        body = bodies.get(path) or layouts.get(path)
+        if body is None:
+            return httpx.Response(404)
+        counts["requests"] += 1
+        counts["bytes"] += len(body)
+        return httpx.Response(200, content=body, headers={"content-type": "application/json"})
+
+    return httpx.MockTransport(handler)
+
+
+async def _sequential(aggregator: MetricsAggregator, network_ids: list[str]) -> int:
+    generated = 0
+    for network_id in network_ids:
+        if await aggregator.generate_snapshot(network_id):
+            generated += 1
+    return generated
+
+
+async def _run(args):
+    data = _generate(args.networks, args.devices)
+    network_ids = list(data["layouts"])
+    print(
+        f"{args.networks} networks x {args.devices} devices, "
+        f"{args.latency_ms:.0f} ms upstream latency, concurrency {args.concurrency}"
+    )
+    print(f"{'mode':<11}  {'cycle':>8}  {'requests':>8}  {'downloaded':>10}  {'snapshots':>9}")
+
+    for mode in ("sequential", "planned"):
+        counts = {"requests": 0, "bytes": 0}
+        http_client._client = httpx.AsyncClient(
+            transport=_transport(data, args.latency_ms / 1000, counts)
+        )
+        aggregator = MetricsAggregator()
+        try:
+            with patch(
+                "app.services.metrics_aggregator.settings.snapshot_concurrency", args.concurrency
+            ):
+                started = time.perf_counter()
+                if mode == "sequential":
+                    generated = await _sequential(aggregator, network_ids)
+                else:
+                    generated = len(await aggregator.generate_all_snapshots())
+                elapsed = time.perf_counter() - started
+        finally:
+            await http_client.close()
+
+        print(
+            f"{mode:<11}  {elapsed:>7.2f}s  {counts['requests']:>8}  "
+            f"{counts['bytes'] / 1024 / 1024:>7.1f} MB  {generated:>9}"
+        )
+        if mode == "planned":
+            print(f"phases (ms): {aggregator.get_config()['last_cycle']['timings_ms']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--networks", type=int, default=500)
+    parser.add_argument("--devices", type=int, default=10, help="devices per network")
+    parser.add_argument("--latency-ms", type=float, default=2.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
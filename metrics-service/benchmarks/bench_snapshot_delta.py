@@ -0,0 +1,141 @@
+"""
+Benchmark bytes published for live topology updates, full snapshots vs deltas.
+
+Generates one network of devices and publishes it for a number of cycles, each
+cycle changing the ping latency of a fraction of the devices (and, now and
+then, a device going degraded). Compares the Redis messages of:
+
+- full: the whole snapshot every cycle (how publishing used to work)
+- delta: the snapshot sequencer, sending keyframes and only what changed
+
+Messages are serialized by the real publisher over a Redis client that only
+counts what it is handed. Run from the metrics-service directory:
+
+    python -m benchmarks.bench_snapshot_delta --devices 200 --cycles 60 --changed 0.05
+"""
+
+import argparse
+import asyncio
+import random
+import time
+import uuid
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, patch
+
+from app.models import (
+    DeviceRole,
+    HealthStatus,
+    NetworkTopologySnapshot,
+    NodeConnection,
+    NodeMetrics,
+    PingMetrics,
+)
+from app.services.history_sparkline import summarize_history
+from app.services.metrics_aggregator import MetricsAggregator
+from app.services.redis_publisher import RedisPublisher
+
+
+def _generate(devices: int) -> NetworkTopologySnapshot:
+    now = datetime.now(timezone.utc)
+    history = summarize_history(
+        [{"timestamp": now.isoformat(), "success": True, "latency_ms": 4.0}] * 24
+    )
+    nodes = {
+        "gw": NodeMetrics(id="gw", name="Gateway", ip="10.0.0.1", role=DeviceRole.GATEWAY_ROUTER)
+    }
+    connections = []
+    for d in range(devices):
+        node_id = f"device-{d}"
+        nodes[node_id] = NodeMetrics(
+            id=node_id,
+            name=f"Device {d}",
+            ip=f"10.0.{d // 250}.{d % 250 + 2}",
+            role=DeviceRole.CLIENT,
+            parent_id="gw",
+            depth=1,
+            status=HealthStatus.HEALTHY,
+            last_check=now,
+            ping=PingMetrics(success=True, latency_ms=4.0, avg_latency_ms=4.0),
+            history=history,
+        )
+        connections.append(NodeConnection(source_id="gw", target_id=node_id))
+    return NetworkTopologySnapshot(
+        snapshot_id=str(uuid.uuid4()),
+        timestamp=now,
+        total_nodes=len(nodes),
+        healthy_nodes=devices,
+        unknown_nodes=1,
+        nodes=nodes,
+        connections=connections,
+        root_node_id="gw",
+    )
+
+
+def _cycles(devices: int, cycles: int, changed: float, seed: int):
+    rng = random.Random(seed)
+    snapshot = _generate(devices)
+    yield snapshot
+    for _ in range(cycles - 1):
+        snapshot = snapshot.model_copy(
+            deep=True,
+            update={"snapshot_id": str(uuid.uuid4()), "timestamp": datetime.now(timezone.utc)},
+        )
+        for d in rng.sample(range(devices), int(devices * changed)):
+            node = snapshot.nodes[f"device-{d}"]
+            node.ping.avg_latency_ms = round(rng.uniform(1, 40), 1)
+            if rng.random() < 0.1:
+                node.status = HealthStatus.DEGRADED
+        statuses = [node.status for node in snapshot.nodes.values()]
+        snapshot.healthy_nodes = statuses.count(HealthStatus.HEALTHY)
+        snapshot.degraded_nodes = statuses.count(HealthStatus.DEGRADED)
+        yield snapshot
+
+
+async def _run(args):
+    snapshots = list(_cycles(args.devices, args.cycles, args.changed, args.seed))
+    print(
+        f"{args.devices} devices, {args.cycles} cycles, "
+        f"{args.changed:.0%} of devices changing per cycle"
+    )
+    print(f"{'mode':<6}  {'published':>9}  {'bytes':>12}  {'per cycle':>10}  {'time':>8}")
+
+    for mode in ("full", "delta"):
+        publisher = RedisPublisher()
+        publisher._redis = AsyncMock()
+        publisher._redis.publish = AsyncMock(return_value=1)
+        publisher._connected = True
+        aggregator = MetricsAggregator()
+
+        with patch("app.services.metrics_aggregator.redis_publisher", publisher):
+            started = time.perf_counter()
+            for snapshot in snapshots:
+                snapshot = snapshot.model_copy(deep=True)
+                if mode == "full":
+                    await publisher.publish_topology_snapshot(snapshot)
+                else:
+                    await aggregator.publish_snapshots({"net-1": snapshot})
+            elapsed = time.perf_counter() - started
+
+        published = sum(publisher._bytes_published.values())
+        print(
+            f"{mode:<6}  {publisher._redis.publish.await_count:>9}  {published:>12,}  "
+            f"{published // len(snapshots):>10,}  {elapsed:>7.2f}s"
+        )
+        if mode == "delta":
+            print(f"sequencer: {aggregator.get_config()['publishing']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--devices", type=int, default=200)
+    parser.add_argument("--cycles", type=int, default=60)
+    parser.add_argument(
+        "--changed", type=float, default=0.05, help="fraction of devices changing per cycle"
+    )
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
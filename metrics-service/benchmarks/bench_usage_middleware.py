@@ -0,0 +1,154 @@
+"""
+Benchmark request throughput with and without the usage tracking middleware.
+
+Sends requests to a trivial FastAPI endpoint by calling the ASGI app directly
+(no server or socket, so the middleware's cost is not hidden behind network
+time) and compares:
+
+- none: the app without usage tracking
+- base-http: tracking wrapped in Starlette's BaseHTTPMiddleware (how the
+  middleware used to be built)
+- asgi: the pure ASGI middleware
+
+Both tracking modes buffer the same usage records; only the wrapping differs.
+Run from the metrics-service directory:
+
+    python -m benchmarks.bench_usage_middleware --requests 20000 --concurrency 1 10
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+
+from cartographer_usage import UsageTrackingMiddleware
+from cartographer_usage.middleware import _is_user_generated_request
+from fastapi import FastAPI
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.config import settings
+from app.services.usage_tracker import usage_tracker
+
+PATH = "/api/metrics/ping"
+MODES = ("none", "base-http", "asgi")
+
+
+class _BaseHTTPUsageMiddleware(BaseHTTPMiddleware):
+    """The same tracking, around call_next."""
+
+    def __init__(self, app, **options):
+        super().__init__(app)
+        self._tracking = UsageTrackingMiddleware(app, **options)
+
+    async def dispatch(self, request, call_next):
+        if not self._tracking._running:
+            await self._tracking._start_flush_task()
+        start_time = time.perf_counter()
+        is_user_generated = _is_user_generated_request(request)
+        response = await call_next(request)
+        self._tracking._track(
+            request,
+            request.url.path,
+            response.status_code,
+            (time.perf_counter() - start_time) * 1000,
+            is_user_generated,
+        )
+        return response
+
+
+def _app(mode: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get(PATH)
+    async def ping():
+        return {"status": "ok"}
+
+    options = {
+        "service_name": "metrics-service",
+        "settings": settings,
+        "reporter": usage_tracker.record_reported,
+    }
+    if mode == "base-http":
+        app.add_middleware(_BaseHTTPUsageMiddleware, **options)
+    elif mode == "asgi":
+        app.add_middleware(UsageTrackingMiddleware, **options)
+    return app
+
+
+async def _request(app: FastAPI) -> None:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": PATH,
+        "raw_path": PATH.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"bench"), (b"x-service-name", b"bench")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+    received = False
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Stay connected until the response is done
+        await asyncio.Event().wait()
+
+    async def send(message):
+        pass
+
+    await app(scope, receive, send)
+
+
+async def _run_mode(mode: str, requests: int, concurrency: int, repeat: int) -> float:
+    app = _app(mode)
+    # Warm up: builds the middleware stack and starts the flush task
+    await _request(app)
+
+    async def worker(count: int):
+        for _ in range(count):
+            await _request(app)
+
+    best = float("inf")
+    for _ in range(repeat):
+        per_worker = requests // concurrency
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(per_worker) for _ in range(concurrency)))
+        best = min(best, time.perf_counter() - started)
+    return per_worker * concurrency / best
+
+
+async def _run(args):
+    # Flushed records go to the usage tracker, which keeps them locally without Redis
+    logging.getLogger("app.services.usage_tracker").setLevel(logging.ERROR)
+    for concurrency in args.concurrency:
+        print(f"\n{args.requests:,} requests, concurrency {concurrency}")
+        print(f"{'middleware':<10}  {'requests/s':>10}  {'overhead':>11}")
+        baseline = None
+        for mode in MODES:
+            rps = await _run_mode(mode, args.requests, concurrency, args.repeat)
+            if baseline is None:
+                baseline = rps
+                overhead = "-"
+            else:
+                overhead = f"{(1 / rps - 1 / baseline) * 1e6:.1f} us/req"
+            print(f"{mode:<10}  {rps:>10,.0f}  {overhead:>11}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10])
+    parser.add_argument("--repeat", type=int, default=3, help="best of N timings")
+    args = parser.parse_args()
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Benchmark usage recording throughput, per-request writes vs aggregated windows.
+
+Records a stream of endpoint usage (a mix of services, endpoints and status
+codes, as the usage middleware of every service reports them) through the real
+tracker to a local Redis, and compares:
+
+- per-request: every record written as soon as it arrives, one pipeline
+  round-trip each (the tracker used to make two)
+- windowed: records aggregated in memory and flushed once per --window
+  seconds, one pipeline per window
+
+Needs a Redis server; nothing else is mocked. Usage keys are reset before each
+mode. Run from the metrics-service directory:
+
+    python -m benchmarks.bench_usage_tracker --records 100000 --window 1.0
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import redis.asyncio as redis
+
+from app.models import EndpointUsageRecord
+from app.services.usage_tracker import UsageTracker
+
+SERVICES = ("backend", "health-service", "metrics-service", "notification-service")
+STATUS_CODES = (200, 200, 200, 200, 201, 304, 404, 500)
+
+
+def _records(count: int, endpoints: int) -> list[EndpointUsageRecord]:
+    # A fixed seed keeps runs comparable
+    rng = random.Random(count)
+    now = datetime.now(timezone.utc)
+    return [
+        EndpointUsageRecord(
+            endpoint=f"/api/endpoint-{rng.randrange(endpoints)}",
+            method=rng.choice(("GET", "GET", "POST")),
+            service=rng.choice(SERVICES),
+            status_code=rng.choice(STATUS_CODES),
+            response_time_ms=rng.uniform(0.5, 200.0),
+            timestamp=now,
+        )
+        for _ in range(count)
+    ]
+
+
+async def _run_mode(args, client, records: list[EndpointUsageRecord], windowed: bool) -> dict:
+    tracker = UsageTracker()
+    await tracker.reset_stats()
+    pipelines = 0
+    make_pipeline = client.pipeline
+
+    def pipeline(*a, **kw):
+        nonlocal pipelines
+        pipelines += 1
+        return make_pipeline(*a, **kw)
+
+    with (
+        patch.object(client, "pipeline", pipeline),
+        patch("app.services.usage_tracker.settings.usage_flush_interval_seconds", args.window),
+    ):
+        started = time.perf_counter()
+        if windowed:
+            tracker.start_flushing()
+            for i, record in enumerate(records):
+                await tracker.record_usage(record)
+                # Requests arrive between other work; let the flush task run
+                if i % 100 == 0:
+                    await asyncio.sleep(0)
+            await tracker.stop_flushing()
+        else:
+            for record in records:
+                await tracker.record_usage(record)
+                await tracker.flush()
+        elapsed = time.perf_counter() - started
+
+    stats = await tracker.get_usage_stats()
+    return {"elapsed": elapsed, "pipelines": pipelines, "stored": stats.total_requests}
+
+
+async def _run(args):
+    client = redis.Redis.from_url(args.redis_url, decode_responses=True)
+    records = _records(args.records, args.endpoints)
+    print(
+        f"{args.records:,} records over {len(SERVICES)} services x {args.endpoints} endpoints, "
+        f"{args.window}s windows"
+    )
+    print(f"{'mode':<11}  {'elapsed':>8}  {'records/s':>10}  {'pipelines':>9}  {'stored':>8}")
+    with patch("app.services.usage_tracker.redis_publisher") as publisher:
+        publisher._redis = client
+        for mode in ("per-request", "windowed"):
+            result = await _run_mode(args, client, records, windowed=mode == "windowed")
+            print(
+                f"{mode:<11}  {result['elapsed']:>7.2f}s  "
+                f"{args.records / result['elapsed']:>10,.0f}  {result['pipelines']:>9,}  "
+                f"{result['stored']:>8,}"
+            )
+        await UsageTracker().reset_stats()
+    await client.aclose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--redis-url", default="redis://localhost:6379")
+    parser.add_argument("--records", type=int, default=100_000)
+    parser.add_argument("--endpoints", type=int, default=50, help="endpoints per service")
+    parser.add_argument("--window", type=float, default=1.0, help="USAGE_FLUSH_INTERVAL_SECONDS")
+    args = parser.parse_args()
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Benchmark WebSocket fan-out of topology events, per-connection broadcast vs the hub.
+
+Connects simulated clients spread over a number of networks, a fraction of them
+slow (each send sleeps), and delivers a stream of events: a keyframe per
+network followed by deltas. Compares:
+
+- broadcast: every connection registers its own handler and every handler
+  sends each event to every connection, serializing it per send (how the
+  WebSocket endpoint used to work). Far too slow to run the whole stream, so
+  only the first --broadcast-events events are delivered, with no client
+  slowed down (sends were sequential, so one slow client would hold up
+  everyone), and the cost is reported per event
+- hub: one subscription per network, each event serialized once and queued
+  only for that network's clients, slow clients downgraded or dropped
+
+Client websockets only count what they are sent. Run from the metrics-service
+directory:
+
+    python -m benchmarks.bench_websocket_fanout --clients 1000 --networks 50
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, patch
+
+from app.models import MetricsEvent, MetricsEventType
+from app.services.redis_publisher import topology_channel
+from app.services.websocket_hub import WebSocketHub
+
+
+class _Client:
+    """A websocket that counts frames, sleeping per send when slow"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.scope = {"subprotocols": []}
+        self.frames = 0
+        self.bytes = 0
+        self.closed = False
+
+    async def accept(self, subprotocol: str | None = None):
+        pass
+
+    async def _sent(self, size: int):
+        self.frames += 1
+        self.bytes += size
+        if self.delay:
+            await asyncio.sleep(self.delay)
+
+    async def send_json(self, message: dict):
+        await self._sent(len(json.dumps(message)))
+
+    async def send_text(self, frame: str):
+        await self._sent(len(frame))
+
+    async def close(self, code: int = 1000):
+        self.closed = True
+
+
+def _events(networks: list[str], rounds: int, devices: int) -> list[tuple[str, MetricsEvent]]:
+    now = datetime.now(timezone.utc)
+    nodes = {
+        f"device-{d}": {"id": f"device-{d}", "status": "healthy", "ping": {"avg_latency_ms": 4.0}}
+        for d in range(devices)
+    }
+    events = []
+    for sequence in range(1, rounds + 1):
+        for network_id in networks:
+            if sequence == 1:
+                event_type, payload = MetricsEventType.FULL_SNAPSHOT, {"nodes": nodes}
+            else:
+                event_type = MetricsEventType.SNAPSHOT_DELTA
+                payload = {"nodes_changed": {"device-0": nodes["device-0"]}}
+            payload.update(network_id=network_id, sequence=sequence)
+            events.append(
+                (
+                    topology_channel(network_id),
+                    MetricsEvent(event_type=event_type, timestamp=now, payload=payload),
+                )
+            )
+    return events
+
+
+def _clients(args) -> list[tuple[str, _Client]]:
+    slow_every = int(1 / args.slow) if args.slow else 0
+    return [
+        (
+            f"network-{c % args.networks}",
+            _Client(args.slow_delay_ms / 1000 if slow_every and c % slow_every == 0 else 0),
+        )
+        for c in range(args.clients)
+    ]
+
+
+async def _broadcast(args, events) -> dict:
+    clients = _clients(args)
+    for _, websocket in clients:
+        websocket.delay = 0
+    connections = [websocket for _, websocket in clients]
+    started = time.perf_counter()
+    for _, event in events[: args.broadcast_events]:
+        message = {
+            "type": event.event_type.value,
+            "timestamp": event.timestamp.isoformat(),
+            "payload": event.payload,
+        }
+        # One handler per connection, each broadcasting to every connection
+        for _ in connections:
+            for websocket in connections:
+                await websocket.send_json(message)
+    elapsed = time.perf_counter() - started
+    return {"events": args.broadcast_events, "elapsed": elapsed, "clients": clients}
+
+
+async def _hub(args, events) -> dict:
+    clients = _clients(args)
+    hub = WebSocketHub()
+    with patch("app.services.websocket_hub.redis_publisher") as redis:
+        redis.subscribe = AsyncMock(return_value=True)
+        redis.unsubscribe = AsyncMock(return_value=True)
+        connected = []
+        for network_id, websocket in clients:
+            client = await hub.connect(websocket)
+            await hub.subscribe(client, network_id)
+            connected.append(client)
+        subscriptions = redis.subscribe.await_count
+
+        started = time.perf_counter()
+        for channel, event in events:
+            hub.deliver(channel, event)
+            # Redis hands over one message at a time; let senders run in between
+            await asyncio.sleep(0)
+        while any(not c.queue.empty() and not c.websocket.closed for c in connected):
+            await asyncio.sleep(0.001)
+        elapsed = time.perf_counter() - started
+
+        stats = hub.get_stats()
+        for client in connected:
+            await hub.disconnect(client)
+    return {
+        "events": len(events),
+        "elapsed": elapsed,
+        "clients": clients,
+        "subscriptions": subscriptions,
+        "stats": stats,
+    }
+
+
+def _report(mode: str, result: dict):
+    clients = [websocket for _, websocket in result["clients"]]
+    frames = sum(c.frames for c in clients)
+    sent = sum(c.bytes for c in clients)
+    events = result["events"]
+    print(
+        f"{mode:<10}  {events:>7}  {result['elapsed']:>8.2f}s  "
+        f"{result['elapsed'] / events * 1000:>9.2f}  {frames // events:>12,}  "
+        f"{sent / events / 1024:>10.0f} KB"
+    )
+
+
+async def _run(args):
+    networks = [f"network-{n}" for n in range(args.networks)]
+    events = _events(networks, args.rounds, args.devices)
+    print(
+        f"{args.clients} clients over {args.networks} networks, {args.slow:.0%} slow "
+        f"({args.slow_delay_ms:.0f} ms per send), {len(events)} events"
+    )
+    print(
+        f"{'mode':<10}  {'events':>7}  {'elapsed':>9}  {'ms/event':>9}  "
+        f"{'frames/event':>12}  {'sent/event':>13}"
+    )
+    hub = await _hub(args, events)
+    broadcast = await _broadcast(args, events)
+    _report("broadcast", broadcast)
+    _report("hub", hub)
+    print(f"hub: {hub['subscriptions']} Redis subscriptions, {hub['stats']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--networks", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=20, help="events per network")
+    parser.add_argument("--devices", type=int, default=20, help="devices per keyframe")
+    parser.add_argument("--slow", type=float, default=0.02, help="fraction of slow clients")
+    parser.add_argument("--slow-delay-ms", type=float, default=50.0)
+    parser.add_argument("--broadcast-events", type=int, default=1)
+    args = parser.parse_args()
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
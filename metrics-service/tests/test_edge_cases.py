@@ -588,6 +588,7 @@ class TestLifespan:
 
             with patch("app.main.redis_publisher") as mock_redis:
                 mock_redis.connect = AsyncMock(return_value=True)
+                mock_redis.subscribe = AsyncMock(return_value=True)
                 mock_redis.store_last_snapshot = AsyncMock(return_value=True)
                 mock_redis.publish_topology_snapshot = AsyncMock(return_value=True)
                 mock_redis.disconnect = AsyncMock()
@@ -601,6 +602,7 @@ class TestLifespan:
                         pass
 
         mock_redis.connect.assert_called_once()
+        mock_redis.subscribe.assert_awaited_once_with("networks:layout_saved")
         mock_aggregator.start_publishing.assert_called_once()
         mock_aggregator.stop_publishing.assert_called_once()
         mock_redis.disconnect.assert_called_once()
@@ -619,6 +621,7 @@ class TestLifespan:
 
             with patch("app.main.redis_publisher") as mock_redis:
                 mock_redis.connect = AsyncMock(return_value=False)
+                mock_redis.subscribe = AsyncMock(return_value=True)
                 mock_redis.disconnect = AsyncMock()
 
                 with patch("app.main.metrics_aggregator") as mock_aggregator:
@@ -654,6 +657,7 @@ class TestLifespan:
 
             with patch("app.main.redis_publisher") as mock_redis:
                 mock_redis.connect = AsyncMock(return_value=True)
+                mock_redis.subscribe = AsyncMock(return_value=True)
                 mock_redis.store_last_snapshot = AsyncMock(return_value=True)
                 mock_redis.publish_topology_snapshot = AsyncMock(return_value=True)
                 mock_redis.disconnect = AsyncMock()
@@ -661,14 +665,15 @@ class TestLifespan:
                 with patch("app.main.metrics_aggregator") as mock_aggregator:
                     # generate_all_snapshots returns a dict of network_id -> snapshot
                     mock_aggregator.generate_all_snapshots = AsyncMock(return_value=snapshots)
+                    mock_aggregator.publish_snapshots = AsyncMock(return_value=1)
                     mock_aggregator.start_publishing = MagicMock()
                     mock_aggregator.stop_publishing = MagicMock()
 
                     async with lifespan(app):
                         pass
 
-        mock_redis.store_last_snapshot.assert_called_once()
-        mock_redis.publish_topology_snapshot.assert_called_once()
+        # Published through the aggregator so the sequencer sees the first keyframe
+        mock_aggregator.publish_snapshots.assert_awaited_once_with(snapshots)
 
     async def test_lifespan_snapshot_error(self):
         """Should handle snapshot generation error"""
@@ -684,6 +689,7 @@ class TestLifespan:
 
             with patch("app.main.redis_publisher") as mock_redis:
                 mock_redis.connect = AsyncMock(return_value=True)
+                mock_redis.subscribe = AsyncMock(return_value=True)
                 mock_redis.disconnect = AsyncMock()
 
                 with patch("app.main.metrics_aggregator") as mock_aggregator:
@@ -0,0 +1,84 @@
+"""
+Unit tests for check history sparklines.
+"""
+
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+
+from app.services.history_sparkline import summarize_history
+
+# 2024-01-01 12:30 UTC, halfway through an hour bucket
+NOW = datetime(2024, 1, 1, 12, 30, tzinfo=timezone.utc)
+
+
+def _check(minutes_ago, success=True, latency_ms=5.0):
+    return {
+        "timestamp": (NOW - timedelta(minutes=minutes_ago)).isoformat(),
+        "success": success,
+        "latency_ms": latency_ms,
+    }
+
+
+@pytest.fixture(autouse=True)
+def hourly_buckets():
+    with (
+        patch("app.services.history_sparkline.settings.history_sparkline_points", 24),
+        patch("app.services.history_sparkline.settings.history_sparkline_hours", 24),
+    ):
+        yield
+
+
+class TestSummarizeHistory:
+    """Tests for downsampling check history"""
+
+    def test_buckets_are_aligned_and_counted(self):
+        history = [
+            _check(0, latency_ms=4.0),
+            _check(10, latency_ms=6.0),
+            _check(45, success=False, latency_ms=None),
+        ]
+
+        sparkline = summarize_history(history, now=NOW.timestamp())
+
+        assert sparkline.bucket_seconds == 3600
+        # The last bucket is the hour now falls in
+        assert sparkline.start == datetime(2023, 12, 31, 13, tzinfo=timezone.utc)
+        assert len(sparkline.checks) == 24
+        assert sparkline.checks[-1] == 2
+        assert sparkline.checks[-2] == 1
+        assert sparkline.failed[-2:] == [1, 0]
+        assert sparkline.avg_latency_ms[-2:] == [None, 5.0]
+        assert sparkline.checks[:-2] == [0] * 22
+
+    def test_unchanged_history_gives_equal_sparkline(self):
+        history = [_check(m) for m in range(60)]
+
+        first = summarize_history(history, now=NOW.timestamp())
+        later = summarize_history(history, now=NOW.timestamp() + 60)
+
+        assert later == first
+
+    def test_skips_old_and_invalid_entries(self):
+        history = [
+            _check(25 * 60),
+            {"timestamp": "invalid", "success": True},
+            {"success": True},
+            _check(5),
+        ]
+
+        sparkline = summarize_history(history, now=NOW.timestamp())
+
+        assert sum(sparkline.checks) == 1
+
+    def test_naive_timestamps_are_utc(self):
+        naive = (NOW - timedelta(minutes=5)).replace(tzinfo=None).isoformat()
+
+        sparkline = summarize_history([{"timestamp": naive, "success": True}], now=NOW.timestamp())
+
+        assert sparkline.checks[-1] == 1
+
+    @pytest.mark.parametrize("history", [None, [], [_check(48 * 60)]])
+    def test_no_checks_in_window(self, history):
+        assert summarize_history(history, now=NOW.timestamp()) is None
@@ -0,0 +1,47 @@
+"""
+Unit tests for fixed-bucket latency histograms.
+"""
+
+import random
+
+import pytest
+
+from app.services.latency_histogram import LAST_BUCKET, bucket_of, bucket_value, merge, percentiles
+
+
+class TestBuckets:
+    """Tests for bucketing response times"""
+
+    @pytest.mark.parametrize("response_time_ms", [0.15, 1.0, 42.0, 999.0, 60_000.0])
+    def test_bucket_value_within_error_bound(self, response_time_ms):
+        value = bucket_value(bucket_of(response_time_ms))
+
+        assert value == pytest.approx(response_time_ms, rel=0.045)
+
+    def test_out_of_range_values_are_clamped(self):
+        assert bucket_of(0.0) == 0
+        assert bucket_of(10_000_000.0) == LAST_BUCKET
+
+
+class TestPercentiles:
+    """Tests for reading percentiles back"""
+
+    def test_matches_exact_percentiles(self):
+        rng = random.Random(7)
+        samples = sorted(rng.lognormvariate(3, 1) for _ in range(10_000))
+        histogram: dict[int, int] = {}
+        for sample in samples:
+            histogram[bucket_of(sample)] = histogram.get(bucket_of(sample), 0) + 1
+
+        result = percentiles(histogram)
+
+        assert result["p50"] == pytest.approx(samples[4999], rel=0.05)
+        assert result["p99"] == pytest.approx(samples[9899], rel=0.05)
+
+    def test_merge_of_redis_hashes(self):
+        merged = merge([{"3": "2", "5": "1"}, {"5": "4"}, {}])
+
+        assert merged == {3: 2, 5: 5}
+
+    def test_empty(self):
+        assert percentiles({}) == {"p50": None, "p90": None, "p95": None, "p99": None}
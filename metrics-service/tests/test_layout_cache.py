@@ -0,0 +1,153 @@
+"""
+Unit tests for the layout cache and conditional layout fetching.
+"""
+
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.models import MetricsEvent, MetricsEventType
+from app.services.layout_cache import LayoutCache, walk_layout
+
+
+def _response(status_code, layout=None, etag=None):
+    response = MagicMock()
+    response.status_code = status_code
+    response.json.return_value = {"layout_data": layout}
+    response.headers = {"ETag": etag} if etag else {}
+    return response
+
+
+def _saved(network_id, etag):
+    return MetricsEvent(
+        event_type=MetricsEventType.LAYOUT_SAVED,
+        timestamp=datetime.now(timezone.utc),
+        payload={"network_id": network_id, "etag": etag},
+    )
+
+
+class TestWalkLayout:
+    """Tests for pre-walking layout trees"""
+
+    def test_breadth_first_with_depth_and_parent(self, sample_layout):
+        walk = walk_layout(sample_layout["root"])
+
+        assert [(node["id"], depth, parent) for node, depth, parent in walk] == [
+            ("root-1", 0, None),
+            ("gateway-1", 1, "root-1"),
+            ("switch-1", 2, "gateway-1"),
+            ("server-1", 2, "gateway-1"),
+        ]
+
+
+class TestConditionalFetch:
+    """Tests for fetching layouts through the cache"""
+
+    @pytest.fixture
+    def stale_after_fetch(self):
+        # Every cached layout needs revalidating on its next use
+        with patch("app.services.layout_cache.settings.layout_revalidate_seconds", 0):
+            yield
+
+    async def test_not_modified_reuses_parsed_layout_and_walk(
+        self, metrics_aggregator_instance, sample_layout, mock_http_client, stale_after_fetch
+    ):
+        aggregator = metrics_aggregator_instance
+        mock_http_client.get.return_value = _response(200, sample_layout, '"v1"')
+        first = await aggregator._fetch_network_layout("net-1")
+        walk = aggregator._layout_cache.walk_for("net-1", first)
+
+        mock_http_client.get.return_value = _response(304)
+        second = await aggregator._fetch_network_layout("net-1")
+
+        assert second is first
+        assert aggregator._layout_cache.walk_for("net-1", second) is walk
+        headers = mock_http_client.get.await_args.kwargs["headers"]
+        assert headers["If-None-Match"] == '"v1"'
+        assert aggregator._layout_cache.get_stats()["not_modified"] == 1
+
+    async def test_recently_validated_layout_skips_backend(
+        self, metrics_aggregator_instance, sample_layout, mock_http_client
+    ):
+        aggregator = metrics_aggregator_instance
+        mock_http_client.get.return_value = _response(200, sample_layout, '"v1"')
+
+        first = await aggregator._fetch_network_layout("net-1")
+        assert await aggregator._fetch_network_layout("net-1") is first
+        assert mock_http_client.get.await_count == 1
+
+    async def test_saved_layout_is_refetched(
+        self, metrics_aggregator_instance, sample_layout, mock_http_client
+    ):
+        aggregator = metrics_aggregator_instance
+        mock_http_client.get.return_value = _response(200, sample_layout, '"v1"')
+        await aggregator._fetch_network_layout("net-1")
+
+        # Our own version announced back to us changes nothing
+        await aggregator.on_layout_saved(_saved("net-1", '"v1"'))
+        assert aggregator._regeneration.get_stats()["pending"] == 0
+
+        changed = {"root": {"id": "root-2", "children": []}}
+        mock_http_client.get.return_value = _response(200, changed, '"v2"')
+        await aggregator.on_layout_saved(_saved("net-1", '"v2"'))
+        assert aggregator._regeneration.get_stats()["pending"] == 1
+
+        # The scheduled regeneration fetches the saved version
+        assert await aggregator._fetch_network_layout("net-1") == changed
+        assert mock_http_client.get.await_count == 2
+        assert aggregator._layout_cache.get("net-1").etag == '"v2"'
+
+    async def test_save_of_uncached_layout_regenerates(
+        self, metrics_aggregator_instance, sample_layout, mock_http_client, stale_after_fetch
+    ):
+        aggregator = metrics_aggregator_instance
+
+        # A new network's first save
+        await aggregator.on_layout_saved(_saved("net-new", '"v1"'))
+        assert aggregator._regeneration.get_stats()["pending"] == 1
+
+        # A network whose layout was discarded after the backend stopped serving it
+        mock_http_client.get.return_value = _response(200, sample_layout, '"v0"')
+        await aggregator._fetch_network_layout("net-1")
+        mock_http_client.get.return_value = _response(404)
+        assert await aggregator._fetch_network_layout("net-1") is None
+        assert aggregator._layout_cache.get("net-1") is None
+        await aggregator.on_layout_saved(_saved("net-1", '"v1"'))
+        assert aggregator._regeneration.get_stats()["pending"] == 2
+
+    async def test_saves_before_regeneration_join_it(
+        self, metrics_aggregator_instance, sample_layout, mock_http_client
+    ):
+        aggregator = metrics_aggregator_instance
+        mock_http_client.get.return_value = _response(200, sample_layout, '"v1"')
+        await aggregator._fetch_network_layout("net-1")
+
+        # The second save finds the layout already stale and still asks for it
+        await aggregator.on_layout_saved(_saved("net-1", '"v2"'))
+        await aggregator.on_layout_saved(_saved("net-1", '"v3"'))
+
+        stats = aggregator._regeneration.get_stats()
+        assert stats["pending"] == 1
+        assert stats["changes"] == 2
+
+
+class TestLayoutCache:
+    """Tests for cache bookkeeping"""
+
+    def test_revalidate_window_and_retain(self, sample_layout):
+        now = [0.0]
+        cache = LayoutCache(clock=lambda: now[0])
+        cache.store("net-1", sample_layout, '"v1"')
+        cache.store("net-2", sample_layout, None)
+
+        with patch("app.services.layout_cache.settings.layout_revalidate_seconds", 60):
+            assert cache.is_fresh("net-1")
+            now[0] = 61.0
+            assert not cache.is_fresh("net-1")
+            cache.revalidated("net-1")
+            assert cache.is_fresh("net-1")
+
+        cache.retain(["net-1"])
+        assert cache.get("net-2") is None
+        assert cache.get_stats()["cached"] == 1
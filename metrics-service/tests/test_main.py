@@ -78,6 +78,25 @@ class TestHealthzEndpoint:
             assert data["status"] == "healthy"
 
 
+class TestOpenMetricsEndpoint:
+    """Tests for the /metrics scrape endpoint"""
+
+    def test_metrics_returns_openmetrics_exposition(self):
+        """Should serve the exposition with the OpenMetrics content type"""
+        with patch("app.main.lifespan"):
+            test_app = create_app()
+            client = TestClient(test_app)
+
+            with patch("app.main.metrics_exporter") as mock_exporter:
+                mock_exporter.render.return_value = "# EOF\n"
+
+                response = client.get("/metrics")
+
+            assert response.status_code == 200
+            assert response.headers["content-type"].startswith("application/openmetrics-text")
+            assert response.text == "# EOF\n"
+
+
 class TestReadyEndpoint:
     """Tests for ready endpoint"""
 
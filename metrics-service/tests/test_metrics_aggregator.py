@@ -13,6 +13,7 @@ from app.models import DeviceRole, HealthStatus, PoeStatus, PortStatus, PortType
 from app.services.metrics_aggregator import (
     SERVICE_TOKEN,
     MetricsAggregator,
+    SnapshotCycle,
     _generate_service_token,
 )
 
@@ -36,7 +37,7 @@ class TestMetricsAggregatorInit:
 
     def test_init_defaults(self, metrics_aggregator_instance):
         """Should initialize with default values"""
-        assert metrics_aggregator_instance._publish_interval == 30
+        assert metrics_aggregator_instance._publish_interval == 300
         assert metrics_aggregator_instance._publishing_enabled is True
         assert metrics_aggregator_instance._publish_task is None
         assert metrics_aggregator_instance._last_snapshot is None
@@ -194,6 +195,55 @@ class TestDataFetching:
 
         assert status is None
 
+    async def test_fetch_check_history(self, metrics_aggregator_instance, mock_http_client):
+        """Should fetch a page of history with the given bounds"""
+        since = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = {
+            "ip": "192.168.1.1",
+            "entries": [{"timestamp": "2024-01-01T00:01:00Z", "success": True}],
+            "next_since": None,
+        }
+        mock_http_client.get.return_value = mock_response
+
+        page = await metrics_aggregator_instance.fetch_check_history(
+            "8.8.8.8", since=since, limit=10, gateway_ip="192.168.1.1"
+        )
+
+        assert len(page.entries) == 1
+        url = mock_http_client.get.await_args.args[0]
+        assert url.endswith("/api/health/gateway/192.168.1.1/test-ips/8.8.8.8/history")
+        assert mock_http_client.get.await_args.kwargs["params"] == {
+            "limit": 10,
+            "since": since.isoformat(),
+        }
+
+    async def test_fetch_check_history_for_network(
+        self, metrics_aggregator_instance, mock_http_client
+    ):
+        """Should ask for the network's own history of a device"""
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = {"ip": "192.168.1.1", "entries": []}
+        mock_http_client.get.return_value = mock_response
+
+        await metrics_aggregator_instance.fetch_check_history("192.168.1.1", network_id="net-a")
+
+        assert mock_http_client.get.await_args.args[0].endswith("/api/health/history/192.168.1.1")
+        assert mock_http_client.get.await_args.kwargs["params"] == {
+            "limit": 500,
+            "network_id": "net-a",
+        }
+
+    async def test_fetch_check_history_connect_error(
+        self, metrics_aggregator_instance, mock_http_client
+    ):
+        """Should return None when the health service is unreachable"""
+        mock_http_client.get.side_effect = httpx.ConnectError("Connection failed")
+
+        assert await metrics_aggregator_instance.fetch_check_history("192.168.1.1") is None
+
 
 class TestDataTransformation:
     """Tests for data transformation methods"""
@@ -413,6 +463,10 @@ class TestSnapshotGeneration:
         assert snapshot.total_nodes >= 0
         assert len(snapshot.nodes) > 0
         assert snapshot.root_node_id is not None
+        # Check history is summarized, not copied
+        gateway = snapshot.nodes["gateway-1"]
+        assert sum(gateway.history.checks) == 1
+        assert "check_history" not in gateway.model_dump()
 
     async def test_generate_snapshot_no_layout(self, metrics_aggregator_instance):
         """Should return None when no layout available"""
@@ -489,7 +543,7 @@ class TestPublishing:
         assert result is False
 
     def test_start_publishing(self, metrics_aggregator_instance):
-        """Should start publishing task"""
+        """Should start the fallback publish loop and the regeneration loop"""
         with patch("asyncio.create_task") as mock_create_task:
             mock_task = MagicMock()
             mock_task.done.return_value = False
@@ -497,7 +551,8 @@ class TestPublishing:
 
             metrics_aggregator_instance.start_publishing()
 
-            mock_create_task.assert_called_once()
+            assert mock_create_task.call_count == 2
+            assert metrics_aggregator_instance._regeneration_task is mock_task
 
     def test_start_publishing_already_running(self, metrics_aggregator_instance):
         """Should not start if already running"""
@@ -750,6 +805,15 @@ class TestMultiTenantLayout:
 class TestGenerateAllSnapshots:
     """Tests for generate_all_snapshots method"""
 
+    @pytest.fixture(autouse=True)
+    def shared_inputs(self, metrics_aggregator_instance):
+        with patch.object(
+            metrics_aggregator_instance,
+            "_fetch_cycle_inputs",
+            AsyncMock(side_effect=lambda: SnapshotCycle({}, {}, {})),
+        ) as fetch:
+            yield fetch
+
     async def test_generate_all_snapshots_success(
         self, metrics_aggregator_instance, sample_snapshot
     ):
@@ -794,7 +858,7 @@ class TestGenerateAllSnapshots:
     ):
         """Should continue generating even if some networks fail"""
 
-        async def generate_snapshot_with_error(network_id):
+        async def generate_snapshot_with_error(network_id, cycle=None):
             if network_id == "network-fail":
                 raise Exception("Failed")
             return sample_snapshot
@@ -830,6 +894,97 @@ class TestGenerateAllSnapshots:
 
         assert result == {}
 
+    async def test_shared_inputs_fetched_once_per_cycle(
+        self, metrics_aggregator_instance, sample_layout, sample_health_metrics, shared_inputs
+    ):
+        """Should fetch the health payload once and reuse it for every network"""
+        shared_inputs.side_effect = lambda: SnapshotCycle(sample_health_metrics, {}, {})
+        network_ids = [f"network-{i}" for i in range(5)]
+        with (
+            patch.object(
+                metrics_aggregator_instance,
+                "_fetch_all_network_ids",
+                AsyncMock(return_value=network_ids),
+            ),
+            patch.object(
+                metrics_aggregator_instance,
+                "_fetch_network_layout",
+                AsyncMock(return_value=sample_layout),
+            ) as fetch_layout,
+        ):
+            result = await metrics_aggregator_instance.generate_all_snapshots()
+
+        assert sorted(result) == network_ids
+        assert shared_inputs.await_count == 1
+        assert fetch_layout.await_count == 5
+        assert result["network-0"].healthy_nodes > 0
+
+        cycle = metrics_aggregator_instance.get_config()["last_cycle"]
+        assert (cycle["networks"], cycle["snapshots"]) == (5, 5)
+        assert set(cycle["timings_ms"]) == {
+            "networks",
+            "shared_inputs",
+            "layout",
+            "build",
+            "snapshots",
+            "total",
+        }
+
+    async def test_agent_metrics_override_per_network(
+        self, metrics_aggregator_instance, sample_layout, sample_health_metrics, shared_inputs
+    ):
+        """A network's own agent-reported metrics should win over the IP-keyed entry"""
+        down = {**sample_health_metrics["192.168.1.1"], "status": "unhealthy"}
+        shared_inputs.side_effect = lambda: SnapshotCycle(
+            sample_health_metrics, {}, {}, {"network-1": {"192.168.1.1": down}}
+        )
+        with (
+            patch.object(
+                metrics_aggregator_instance,
+                "_fetch_all_network_ids",
+                AsyncMock(return_value=["network-0", "network-1"]),
+            ),
+            patch.object(
+                metrics_aggregator_instance,
+                "_fetch_network_layout",
+                AsyncMock(return_value=sample_layout),
+            ),
+        ):
+            result = await metrics_aggregator_instance.generate_all_snapshots()
+
+        def status_of(snapshot):
+            return next(n.status for n in snapshot.nodes.values() if n.ip == "192.168.1.1")
+
+        assert status_of(result["network-0"]) == HealthStatus.HEALTHY
+        assert status_of(result["network-1"]) == HealthStatus.UNHEALTHY
+
+    async def test_concurrency_is_bounded(self, metrics_aggregator_instance, sample_snapshot):
+        """Should generate at most SNAPSHOT_CONCURRENCY networks at once"""
+        running = {"now": 0, "max": 0}
+
+        async def generate(network_id, cycle=None):
+            running["now"] += 1
+            running["max"] = max(running["max"], running["now"])
+            await asyncio.sleep(0.01)
+            running["now"] -= 1
+            return sample_snapshot
+
+        with (
+            patch("app.services.metrics_aggregator.settings.snapshot_concurrency", 3),
+            patch.object(
+                metrics_aggregator_instance,
+                "_fetch_all_network_ids",
+                AsyncMock(return_value=[f"network-{i}" for i in range(10)]),
+            ),
+            patch.object(
+                metrics_aggregator_instance, "generate_snapshot", AsyncMock(side_effect=generate)
+            ),
+        ):
+            result = await metrics_aggregator_instance.generate_all_snapshots()
+
+        assert len(result) == 10
+        assert running["max"] == 3
+
 
 class TestPublishAllSnapshots:
     """Tests for publish_all_snapshots method"""
@@ -892,3 +1047,63 @@ class TestPublishAllSnapshots:
                 result = await metrics_aggregator_instance.publish_all_snapshots()
 
         assert result == 0
+
+
+class TestChangeDrivenRegeneration:
+    """Tests for regenerating the networks that changed"""
+
+    def test_on_changes_finds_networks_showing_ips(
+        self, metrics_aggregator_instance, sample_snapshot
+    ):
+        """Should schedule named networks and those whose snapshot shows a changed IP"""
+        aggregator = metrics_aggregator_instance
+        aggregator._snapshots = {"network-1": sample_snapshot, "network-2": None}
+
+        count = aggregator.on_changes(["health"], ["192.168.1.10"], ["network-3"])
+
+        assert count == 2
+        assert aggregator.networks_showing({"192.168.1.10"}) == {"network-1"}
+        assert aggregator.networks_showing({"10.0.0.1"}) == set()
+
+    def test_repeated_changes_are_coalesced(self, metrics_aggregator_instance):
+        """Should schedule one regeneration for a burst of changes to a network"""
+        aggregator = metrics_aggregator_instance
+
+        for _ in range(5):
+            aggregator.on_changes(["health"], [], ["network-1"])
+
+        stats = aggregator._regeneration.get_stats()
+        assert stats == {
+            "changes": 5,
+            "coalesced": 4,
+            "regenerated": 0,
+            "batches": 0,
+            "pending": 1,
+        }
+
+    async def test_regeneration_loop_publishes_only_changed_networks(
+        self, metrics_aggregator_instance
+    ):
+        """Should regenerate just the changed network once its debounce elapses"""
+        aggregator = metrics_aggregator_instance
+        published = asyncio.Event()
+
+        async def publish_networks(network_ids):
+            published.network_ids = network_ids
+            published.set()
+            return len(network_ids)
+
+        with (
+            patch("app.services.snapshot_scheduler.settings.snapshot_debounce_seconds", 0.01),
+            patch.object(aggregator, "publish_networks", side_effect=publish_networks),
+            patch.object(aggregator, "_publish_loop", AsyncMock()),
+        ):
+            aggregator.start_publishing()
+            try:
+                aggregator.request_regeneration("network-1", "layout saved")
+                await asyncio.wait_for(published.wait(), 1.0)
+            finally:
+                aggregator.stop_publishing()
+
+        assert published.network_ids == ["network-1"]
+        assert aggregator._regeneration.get_stats()["pending"] == 0
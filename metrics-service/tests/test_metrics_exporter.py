@@ -0,0 +1,161 @@
+"""
+Unit tests for the OpenMetrics exposition.
+"""
+
+from unittest.mock import patch
+
+import pytest
+
+from app.models import PingMetrics, ServiceUsageSummary, UptimeMetrics
+from app.services.metrics_exporter import MetricsExporter, render_network
+from app.services.openmetrics import Histogram, labels, sample
+
+
+@pytest.fixture
+def exporter(metrics_aggregator_instance):
+    with patch("app.services.metrics_exporter.metrics_aggregator", metrics_aggregator_instance):
+        yield MetricsExporter()
+
+
+@pytest.fixture
+def monitored_snapshot(sample_snapshot):
+    gateway = sample_snapshot.nodes["gateway-1"]
+    gateway.ping = PingMetrics(success=True, latency_ms=5.0, packet_loss_percent=10.0)
+    gateway.uptime = UptimeMetrics(uptime_percent_24h=99.5, consecutive_failures=2)
+    return sample_snapshot
+
+
+def _family(exposition: str, name: str) -> list[str]:
+    """The sample lines of one family."""
+    lines = exposition.splitlines()
+    start = lines.index(next(line for line in lines if line.startswith(f"# TYPE {name} ")))
+    family = []
+    for line in lines[start + 1 :]:
+        if line.startswith("# TYPE") or line == "# EOF":
+            break
+        if not line.startswith("#"):
+            family.append(line)
+    return family
+
+
+class TestOpenMetrics:
+    """Tests for the exposition primitives"""
+
+    def test_label_values_are_escaped(self):
+        assert labels(name='Rack "A"\\B\nC', ip=None) == 'name="Rack \\"A\\"\\\\B\\nC",ip=""'
+
+    def test_sample_values(self):
+        assert sample("up", True) == "up 1\n"
+        assert sample("devices", 3, 'status="healthy"') == 'devices{status="healthy"} 3\n'
+        assert sample("latency_seconds", 0.005) == "latency_seconds 0.005\n"
+        assert sample("ratio", float("inf")) == "ratio +Inf\n"
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram((0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value)
+
+        assert histogram.render("op_seconds").splitlines() == [
+            'op_seconds_bucket{le="0.1"} 2',
+            'op_seconds_bucket{le="1.0"} 3',
+            'op_seconds_bucket{le="+Inf"} 4',
+            "op_seconds_count 4",
+            "op_seconds_sum 3.65",
+        ]
+
+
+class TestRenderNetwork:
+    """Tests for rendering a network's device samples"""
+
+    def test_device_samples(self, monitored_snapshot):
+        families = render_network("net-1", monitored_snapshot)
+        gateway = 'network="net-1",node="gateway-1",name="Main Router",ip="192.168.1.1"'
+
+        status = families["cartographer_device_status"].splitlines()
+        # One sample per state for each of the three devices
+        assert len(status) == 12
+        assert (
+            f'cartographer_device_status{{{gateway},cartographer_device_status="healthy"}} 1'
+            in status
+        )
+        assert (
+            f'cartographer_device_status{{{gateway},cartographer_device_status="unhealthy"}} 0'
+            in status
+        )
+        assert families["cartographer_device_latency_seconds"] == (
+            f"cartographer_device_latency_seconds{{{gateway}}} 0.005\n"
+        )
+        assert families["cartographer_device_packet_loss_ratio"] == (
+            f"cartographer_device_packet_loss_ratio{{{gateway}}} 0.1\n"
+        )
+        assert families["cartographer_device_uptime_ratio"] == (
+            f"cartographer_device_uptime_ratio{{{gateway}}} 0.995\n"
+        )
+        assert families["cartographer_device_consecutive_failures"] == (
+            f"cartographer_device_consecutive_failures{{{gateway}}} 2\n"
+        )
+        assert 'cartographer_network_devices{network="net-1",status="degraded"} 1' in (
+            families["cartographer_network_devices"]
+        )
+
+
+class TestMetricsExporter:
+    """Tests for rendering scrapes from cached state"""
+
+    def test_scrape_is_well_formed(self, exporter, metrics_aggregator_instance, monitored_snapshot):
+        metrics_aggregator_instance._snapshots = {"net-1": monitored_snapshot}
+        metrics_aggregator_instance.get_timings()["publish"].observe(0.002)
+
+        exposition = exporter.render()
+
+        assert exposition.endswith("# EOF\n")
+        names = [line.split()[2] for line in exposition.splitlines() if line.startswith("# TYPE")]
+        assert len(names) == len(set(names))
+        assert len(_family(exposition, "cartographer_device_status")) == 12
+        assert 'cartographer_snapshot_publish_seconds_bucket{le="0.0025"} 1' in exposition
+        assert "cartographer_websocket_clients 0" in exposition
+        assert _family(exposition, "cartographer_snapshots_published") == [
+            'cartographer_snapshots_published_total{kind="keyframe"} 0',
+            'cartographer_snapshots_published_total{kind="delta"} 0',
+        ]
+
+    def test_networks_are_rendered_once_per_snapshot(
+        self, exporter, metrics_aggregator_instance, monitored_snapshot, sample_snapshot
+    ):
+        aggregator = metrics_aggregator_instance
+        aggregator._snapshots = {"net-1": monitored_snapshot, "net-2": sample_snapshot.model_copy()}
+
+        first = exporter.render()
+        assert exporter.render() == first
+        assert exporter.get_stats()["networks_rendered"] == 2
+
+        # Only the regenerated network is rendered again
+        changed = aggregator._snapshots["net-2"].model_copy(deep=True)
+        changed.nodes["server-1"].name = "Backup Server"
+        aggregator._snapshots["net-2"] = changed
+        exposition = exporter.render()
+
+        assert exporter.get_stats()["networks_rendered"] == 3
+        assert 'network="net-2",node="server-1",name="Backup Server"' in exposition
+        assert 'network="net-1",node="server-1",name="File Server"' in exposition
+
+        del aggregator._snapshots["net-1"]
+        exposition = exporter.render()
+        assert 'network="net-1"' not in exposition
+        assert exporter.get_stats()["networks"] == 1
+
+    def test_usage_counters(self, exporter):
+        totals = {
+            "health-service": ServiceUsageSummary(
+                service="health-service", total_requests=10, total_errors=1
+            )
+        }
+        with patch("app.services.metrics_exporter.usage_tracker") as mock_tracker:
+            mock_tracker.get_local_totals.return_value = totals
+            mock_tracker.get_pending_count.return_value = 3
+
+            exposition = exporter.render()
+
+        assert 'cartographer_service_requests_total{service="health-service"} 10' in exposition
+        assert 'cartographer_service_errors_total{service="health-service"} 1' in exposition
+        assert "cartographer_usage_pending_records 3" in exposition
@@ -11,11 +11,13 @@ from fastapi import FastAPI
 from fastapi.testclient import TestClient
 
 from app.models import (
+    CheckHistoryPage,
     DeviceRole,
     EndpointUsage,
     EndpointUsageRecord,
     GatewayISPInfo,
     HealthStatus,
+    LatencyStatsResponse,
     NetworkTopologySnapshot,
     NodeConnection,
     NodeMetrics,
@@ -26,7 +28,7 @@ from app.models import (
     UsageRecordBatch,
     UsageStatsResponse,
 )
-from app.routers.metrics import ConnectionManager, connection_manager, router
+from app.routers.metrics import router
 
 
 @pytest.fixture
@@ -270,6 +272,24 @@ class TestSpeedTestEndpoint:
         assert response.status_code == 500
 
 
+class TestChangeEventsEndpoint:
+    """Tests for the change events endpoint"""
+
+    def test_report_changes_schedules_regeneration(self, client):
+        """Should pass reported changes to the aggregator"""
+        with patch("app.routers.metrics.metrics_aggregator") as mock_aggregator:
+            mock_aggregator.on_changes.return_value = 2
+
+            response = client.post(
+                "/api/metrics/events/changes",
+                json={"reasons": ["health"], "ips": ["192.168.1.10"], "network_ids": ["net-1"]},
+            )
+
+        assert response.status_code == 200
+        assert response.json()["success"] is True
+        mock_aggregator.on_changes.assert_called_once_with(["health"], ["192.168.1.10"], ["net-1"])
+
+
 class TestRedisEndpoints:
     """Tests for Redis endpoints"""
 
@@ -367,6 +387,30 @@ class TestSummaryEndpoints:
 
         assert response.status_code == 404
 
+    def test_get_node_history(self, client, mock_snapshot):
+        """Should serve the node's history from the health service"""
+        page = CheckHistoryPage(ip="192.168.1.1")
+        with patch("app.routers.metrics.metrics_aggregator") as mock_aggregator:
+            mock_aggregator.get_last_snapshot.return_value = mock_snapshot
+            mock_aggregator.fetch_check_history = AsyncMock(return_value=page)
+
+            response = client.get("/api/metrics/nodes/gateway-1/history?limit=10")
+
+        assert response.status_code == 200
+        assert response.json()["ip"] == "192.168.1.1"
+        mock_aggregator.fetch_check_history.assert_awaited_once_with(
+            "192.168.1.1", None, None, 10, network_id=None
+        )
+
+    def test_get_node_history_unavailable(self, client, mock_snapshot):
+        """Should return 502 when the health service cannot serve history"""
+        with patch("app.routers.metrics.metrics_aggregator") as mock_aggregator:
+            mock_aggregator.get_last_snapshot.return_value = mock_snapshot
+            mock_aggregator.fetch_check_history = AsyncMock(return_value=None)
+
+            assert client.get("/api/metrics/nodes/gateway-1/history").status_code == 502
+            assert client.get("/api/metrics/nodes/nonexistent/history").status_code == 404
+
     def test_get_connections(self, client, mock_snapshot):
         """Should get connections"""
         with patch("app.routers.metrics.metrics_aggregator") as mock_aggregator:
@@ -445,78 +489,26 @@ class TestDebugEndpoints:
         assert data["error"] == "Failed to fetch layout for network_id=None"
 
 
-class TestConnectionManager:
-    """Tests for WebSocket ConnectionManager"""
-
-    async def test_connect(self):
-        """Should accept and add connection"""
-        manager = ConnectionManager()
-        mock_websocket = AsyncMock()
-
-        await manager.connect(mock_websocket)
-
-        mock_websocket.accept.assert_called_once()
-        assert mock_websocket in manager.active_connections
-
-    def test_disconnect(self):
-        """Should remove connection"""
-        manager = ConnectionManager()
-        mock_websocket = MagicMock()
-        manager.active_connections.append(mock_websocket)
-
-        manager.disconnect(mock_websocket)
-
-        assert mock_websocket not in manager.active_connections
-
-    def test_disconnect_not_in_list(self):
-        """Should handle disconnecting non-existent connection"""
-        manager = ConnectionManager()
-        mock_websocket = MagicMock()
-
-        # Should not raise
-        manager.disconnect(mock_websocket)
-
-    async def test_broadcast(self):
-        """Should broadcast to all connections"""
-        manager = ConnectionManager()
-        mock_ws1 = AsyncMock()
-        mock_ws2 = AsyncMock()
-        manager.active_connections = [mock_ws1, mock_ws2]
-
-        await manager.broadcast({"message": "test"})
-
-        mock_ws1.send_json.assert_called_once()
-        mock_ws2.send_json.assert_called_once()
-
-    async def test_broadcast_handles_disconnected(self):
-        """Should handle disconnected clients during broadcast"""
-        manager = ConnectionManager()
-        mock_ws1 = AsyncMock()
-        mock_ws1.send_json = AsyncMock(side_effect=Exception("Disconnected"))
-        mock_ws2 = AsyncMock()
-        manager.active_connections = [mock_ws1, mock_ws2]
-
-        await manager.broadcast({"message": "test"})
-
-        # Disconnected client should be removed
-        assert mock_ws1 not in manager.active_connections
-        assert mock_ws2 in manager.active_connections
-
-
 class TestWebSocketEndpoint:
     """Tests for WebSocket endpoint"""
 
+    @pytest.fixture(autouse=True)
+    def hub_redis(self):
+        """Channel subscriptions made by the fan-out hub"""
+        with patch("app.services.websocket_hub.redis_publisher") as mock_redis:
+            mock_redis.subscribe = AsyncMock(return_value=True)
+            mock_redis.unsubscribe = AsyncMock(return_value=True)
+            yield mock_redis
+
     def test_websocket_connection(self, app, mock_snapshot):
         """Should accept WebSocket connection"""
         from starlette.testclient import TestClient
 
         with patch("app.routers.metrics.metrics_aggregator") as mock_aggregator:
-            mock_aggregator.get_last_snapshot.return_value = mock_snapshot
+            mock_aggregator.get_published_snapshot.return_value = mock_snapshot
 
             with patch("app.routers.metrics.redis_publisher") as mock_redis:
-                mock_redis.add_handler = MagicMock()
-                mock_redis.remove_handler = MagicMock()
-                mock_redis.subscribe = AsyncMock(return_value=True)
+                mock_redis.get_last_snapshot = AsyncMock(return_value=None)
 
                 client = TestClient(app)
 
@@ -525,17 +517,36 @@ class TestWebSocketEndpoint:
                     data = websocket.receive_json()
                     assert data["type"] == "initial_snapshot"
 
+    def test_websocket_msgpack_subprotocol(self, app, mock_snapshot):
+        """Should send binary frames in the encoding the client offered"""
+        from starlette.testclient import TestClient
+
+        from app.services import payload_codec
+
+        with patch("app.routers.metrics.metrics_aggregator") as mock_aggregator:
+            mock_aggregator.get_published_snapshot.return_value = mock_snapshot
+
+            with patch("app.routers.metrics.redis_publisher") as mock_redis:
+                mock_redis.get_last_snapshot = AsyncMock(return_value=None)
+
+                client = TestClient(app)
+
+                with client.websocket_connect(
+                    "/api/metrics/ws", subprotocols=["msgpack+zstd"]
+                ) as websocket:
+                    assert websocket.accepted_subprotocol == "msgpack+zstd"
+                    data = payload_codec.decode(websocket.receive_bytes())
+                    assert data["type"] == "initial_snapshot"
+
     def test_websocket_no_initial_snapshot(self, app):
         """Should handle no initial snapshot"""
         from starlette.testclient import TestClient
 
         with patch("app.routers.metrics.metrics_aggregator") as mock_aggregator:
-            mock_aggregator.get_last_snapshot.return_value = None
+            mock_aggregator.get_published_snapshot.return_value = None
 
             with patch("app.routers.metrics.redis_publisher") as mock_redis:
-                mock_redis.add_handler = MagicMock()
-                mock_redis.remove_handler = MagicMock()
-                mock_redis.subscribe = AsyncMock(return_value=True)
+                mock_redis.get_last_snapshot = AsyncMock(return_value=None)
 
                 client = TestClient(app)
 
@@ -550,12 +561,10 @@ class TestWebSocketEndpoint:
 
         with patch("app.routers.metrics.metrics_aggregator") as mock_aggregator:
             # First call returns snapshot for initial, second for request
-            mock_aggregator.get_last_snapshot.return_value = mock_snapshot
+            mock_aggregator.get_published_snapshot.return_value = mock_snapshot
 
             with patch("app.routers.metrics.redis_publisher") as mock_redis:
-                mock_redis.add_handler = MagicMock()
-                mock_redis.remove_handler = MagicMock()
-                mock_redis.subscribe = AsyncMock(return_value=True)
+                mock_redis.get_last_snapshot = AsyncMock(return_value=None)
 
                 client = TestClient(app)
 
@@ -569,6 +578,48 @@ class TestWebSocketEndpoint:
                     data = websocket.receive_json()
                     assert data["type"] == "snapshot"
 
+    def test_websocket_resync(self, app, mock_snapshot):
+        """Should answer a resync with the last published snapshot of the network"""
+        from starlette.testclient import TestClient
+
+        with patch("app.routers.metrics.metrics_aggregator") as mock_aggregator:
+            mock_aggregator.get_published_snapshot.return_value = mock_snapshot
+
+            with patch("app.routers.metrics.redis_publisher") as mock_redis:
+                mock_redis.get_last_snapshot = AsyncMock(return_value=None)
+
+                client = TestClient(app)
+
+                with client.websocket_connect("/api/metrics/ws") as websocket:
+                    websocket.receive_json()
+
+                    websocket.send_json({"action": "resync", "network_id": "network-1"})
+                    data = websocket.receive_json()
+
+                    assert data["type"] == "snapshot"
+                    assert data["network_id"] == "network-1"
+                    mock_aggregator.get_published_snapshot.assert_called_with("network-1")
+
+    def test_websocket_subscribe_network_falls_back_to_redis(self, app, mock_snapshot):
+        """Should serve a cold client its network's snapshot from Redis"""
+        from starlette.testclient import TestClient
+
+        with patch("app.routers.metrics.metrics_aggregator") as mock_aggregator:
+            mock_aggregator.get_published_snapshot.return_value = None
+
+            with patch("app.routers.metrics.redis_publisher") as mock_redis:
+                mock_redis.get_last_snapshot = AsyncMock(side_effect=[None, mock_snapshot])
+
+                client = TestClient(app)
+
+                with client.websocket_connect("/api/metrics/ws") as websocket:
+                    websocket.send_json({"action": "subscribe_network", "network_id": "network-1"})
+                    data = websocket.receive_json()
+
+                    assert data["type"] == "initial_snapshot"
+                    assert data["network_id"] == "network-1"
+                    mock_redis.get_last_snapshot.assert_awaited_with("network-1")
+
 
 class TestUsageEndpoints:
     """Tests for usage statistics endpoints"""
@@ -720,6 +771,21 @@ class TestUsageEndpoints:
 
             assert response.status_code == 500
 
+    def test_get_latency_stats(self, client):
+        """Should get per-route latency percentiles"""
+        now = datetime.now(timezone.utc)
+        stats = LatencyStatsResponse(start=now, end=now, step_minutes=5)
+        with patch("app.routers.metrics.usage_tracker") as mock_tracker:
+            mock_tracker.get_latency_stats = AsyncMock(return_value=stats)
+
+            response = client.get(
+                "/api/metrics/usage/latency?service=health-service&minutes=30&step_minutes=5"
+            )
+
+            assert response.status_code == 200
+            assert response.json()["step_minutes"] == 5
+            mock_tracker.get_latency_stats.assert_called_once_with("health-service", 30, 5)
+
     def test_reset_usage_stats_all(self, client):
         """Should reset all usage stats"""
         with patch("app.routers.metrics.usage_tracker") as mock_tracker:
@@ -0,0 +1,101 @@
+"""
+Unit tests for payload encodings.
+"""
+
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.models import MetricsEventType
+from app.services import payload_codec
+from app.services.payload_codec import PayloadDecodeError
+from app.services.redis_publisher import RedisPublisher
+
+ENCODINGS = payload_codec.ENCODINGS
+
+
+class TestPayloadCodec:
+    """Tests for encoding round trips and format detection"""
+
+    @pytest.mark.parametrize("encoding", ENCODINGS)
+    def test_round_trip(self, encoding, sample_snapshot):
+        data = sample_snapshot.model_dump(mode="json")
+        assert payload_codec.decode(payload_codec.encode(data, encoding)) == data
+
+    def test_binary_read_back_as_surrogate_escaped_text(self, sample_snapshot):
+        data = sample_snapshot.model_dump(mode="json")
+        raw = payload_codec.encode(data, payload_codec.ENCODING_MSGPACK_ZSTD)
+
+        # What a Redis client with decode_responses and surrogateescape returns
+        text = raw.decode("utf-8", "surrogateescape")
+        assert payload_codec.decode(text) == data
+
+    def test_values_without_native_type_become_strings(self):
+        when = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        raw = payload_codec.encode({"at": when}, payload_codec.ENCODING_MSGPACK)
+        assert payload_codec.decode(raw) == {"at": str(when)}
+
+    def test_garbage_is_rejected(self):
+        with pytest.raises(PayloadDecodeError):
+            payload_codec.decode(b"\x28\xb5\x2f\xfd not zstd")
+        with pytest.raises(ValueError):
+            payload_codec.decode("invalid json {")
+
+    def test_negotiate_takes_first_supported_offer(self):
+        assert payload_codec.negotiate(["v2.chat", "msgpack", "json"]) == "msgpack"
+        assert payload_codec.negotiate(["v2.chat"]) is None
+        assert payload_codec.negotiate([]) is None
+
+
+class TestRedisEncoding:
+    """Tests for the configured Redis payload encoding"""
+
+    @pytest.fixture
+    def publisher(self):
+        publisher = RedisPublisher()
+        publisher._redis = AsyncMock()
+        publisher._connected = True
+        with patch(
+            "app.services.redis_publisher.settings.redis_payload_encoding",
+            payload_codec.ENCODING_MSGPACK_ZSTD,
+        ):
+            yield publisher
+
+    async def test_events_and_last_snapshot_use_configured_encoding(
+        self, publisher, sample_snapshot
+    ):
+        assert await publisher.publish_topology_snapshot(sample_snapshot)
+        message = publisher._redis.publish.await_args.args[1]
+        event = payload_codec.decode(message)
+        assert event["event_type"] == MetricsEventType.FULL_SNAPSHOT.value
+        assert event["payload"]["snapshot_id"] == sample_snapshot.snapshot_id
+
+        await publisher.store_last_snapshot(sample_snapshot)
+        stored = publisher._redis.set.await_args.args[1]
+        assert isinstance(stored, bytes)
+
+        publisher._redis.get = AsyncMock(return_value=stored.decode("utf-8", "surrogateescape"))
+        restored = await publisher.get_last_snapshot(sample_snapshot.network_id)
+        assert restored.model_dump() == sample_snapshot.model_dump()
+
+    async def test_listener_decodes_binary_messages(self, publisher, sample_snapshot):
+        await publisher.publish_topology_snapshot(sample_snapshot)
+        message = publisher._redis.publish.await_args.args[1]
+        handler = MagicMock()
+        publisher.add_handler("metrics:topology", handler)
+
+        pubsub = AsyncMock()
+        pubsub.get_message.side_effect = [
+            {
+                "type": "message",
+                "channel": "metrics:topology",
+                "data": message.decode("utf-8", "surrogateescape"),
+            },
+            Exception("stop"),
+        ]
+        publisher._pubsub = pubsub
+        await publisher._listen_for_messages()
+
+        event = handler.call_args.args[0]
+        assert event.event_type == MetricsEventType.FULL_SNAPSHOT
@@ -22,6 +22,7 @@ from app.services.redis_publisher import (
     CHANNEL_HEALTH,
     CHANNEL_SPEED_TEST,
     CHANNEL_TOPOLOGY,
+    CHANNEL_TOPOLOGY_PATTERN,
     RedisPublisher,
 )
 
@@ -416,6 +417,21 @@ class TestUtilityMethods:
 
         assert result is False
 
+    async def test_refresh_last_snapshot_resets_ttl(self, redis_publisher_instance):
+        """Should extend the stored snapshot's expiry without rewriting it"""
+        mock_redis = AsyncMock()
+        mock_redis.expire = AsyncMock(return_value=1)
+
+        redis_publisher_instance._redis = mock_redis
+        redis_publisher_instance._connected = True
+
+        with patch("app.services.redis_publisher.settings.snapshot_ttl_seconds", 600):
+            result = await redis_publisher_instance.refresh_last_snapshot("net-1")
+
+        assert result is True
+        mock_redis.expire.assert_awaited_once_with("metrics:last_snapshot:net-1", 600)
+        mock_redis.set.assert_not_called()
+
     async def test_get_connection_info(self, redis_publisher_instance):
         """Should return connection info"""
         redis_publisher_instance._message_handlers = {"test:channel": []}
@@ -428,6 +444,86 @@ class TestUtilityMethods:
         assert "channels" in info
 
 
+class TestPerNetworkChannels:
+    """Tests for per-network topology channels and last-snapshot keys"""
+
+    @pytest.fixture
+    def connected(self, redis_publisher_instance):
+        redis_publisher_instance._redis = AsyncMock()
+        redis_publisher_instance._connected = True
+        return redis_publisher_instance
+
+    async def test_snapshot_published_to_its_network_channel(self, connected, sample_snapshot):
+        """Should publish a network's snapshot only to that network's channel"""
+        sample_snapshot.network_id = "net-1"
+
+        await connected.publish_topology_snapshot(sample_snapshot)
+
+        assert connected._redis.publish.await_args.args[0] == "metrics:topology:net-1"
+
+    async def test_snapshot_without_network_uses_legacy_channel(self, connected, sample_snapshot):
+        """Should keep single-tenant snapshots on the legacy channel"""
+        await connected.publish_topology_snapshot(sample_snapshot)
+
+        assert connected._redis.publish.await_args.args[0] == CHANNEL_TOPOLOGY
+
+    async def test_last_snapshot_keyed_per_network(self, connected, sample_snapshot):
+        """Should store each network under its own key with the configured TTL"""
+        sample_snapshot.network_id = "net-1"
+        connected._redis.get = AsyncMock(return_value=sample_snapshot.model_dump_json())
+
+        with patch("app.services.redis_publisher.settings.snapshot_ttl_seconds", 120):
+            await connected.store_last_snapshot(sample_snapshot)
+        snapshot = await connected.get_last_snapshot("net-1")
+
+        connected._redis.set.assert_awaited_once()
+        assert connected._redis.set.await_args.args[0] == "metrics:last_snapshot:net-1"
+        assert connected._redis.set.await_args.kwargs["ex"] == 120
+        connected._redis.get.assert_awaited_once_with("metrics:last_snapshot:net-1")
+        assert snapshot.network_id == "net-1"
+
+    async def test_psubscribe(self, connected):
+        """Should subscribe to channel patterns"""
+        mock_pubsub = AsyncMock()
+        connected._redis.pubsub = MagicMock(return_value=mock_pubsub)
+
+        with patch("asyncio.create_task"):
+            assert await connected.psubscribe(CHANNEL_TOPOLOGY_PATTERN) is True
+
+        mock_pubsub.psubscribe.assert_awaited_once_with(CHANNEL_TOPOLOGY_PATTERN)
+
+    async def test_pattern_messages_go_to_pattern_handlers(self, redis_publisher_instance):
+        """Should dispatch pmessages to handlers registered for the pattern"""
+        message = {
+            "type": "pmessage",
+            "pattern": CHANNEL_TOPOLOGY_PATTERN,
+            "channel": "metrics:topology:net-1",
+            "data": json.dumps(
+                {
+                    "event_type": "full_snapshot",
+                    "timestamp": datetime.now(timezone.utc).isoformat(),
+                    "payload": {"network_id": "net-1"},
+                }
+            ),
+        }
+        messages = [message]
+
+        async def get_message(*args, **kwargs):
+            if messages:
+                return messages.pop()
+            redis_publisher_instance._pubsub = None
+            return None
+
+        redis_publisher_instance._pubsub = MagicMock(get_message=get_message)
+        received = []
+        redis_publisher_instance.add_handler(CHANNEL_TOPOLOGY_PATTERN, received.append)
+        redis_publisher_instance.add_handler("metrics:topology:net-2", received.append)
+
+        await redis_publisher_instance._listen_for_messages()
+
+        assert [event.payload["network_id"] for event in received] == ["net-1"]
+
+
 class TestSerialization:
     """Tests for serialization methods"""
 
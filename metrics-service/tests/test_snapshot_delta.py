@@ -0,0 +1,164 @@
+"""
+Unit tests for snapshot sequencing and delta encoding.
+"""
+
+import asyncio
+from datetime import timedelta
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.models import HealthStatus, NodeConnection, PingMetrics
+from app.services.metrics_aggregator import MetricsAggregator
+from app.services.snapshot_delta import SnapshotSequencer
+
+
+def _next(snapshot, **changes):
+    """A regenerated copy of the snapshot, as the next publish cycle would build it"""
+    return snapshot.model_copy(deep=True, update={"snapshot_id": "next", **changes})
+
+
+def _publish(sequencer, network_id, snapshot):
+    update = sequencer.plan(network_id, snapshot)
+    if update is not None:
+        sequencer.commit(update)
+    return update
+
+
+class TestSnapshotSequencer:
+    """Tests for keyframes, deltas and unchanged snapshots"""
+
+    def test_first_publish_is_a_keyframe(self, sample_snapshot):
+        update = _publish(SnapshotSequencer(), "net-1", sample_snapshot)
+
+        assert update.delta is None
+        assert (sample_snapshot.network_id, sample_snapshot.sequence) == ("net-1", 1)
+
+    def test_delta_holds_only_what_changed(self, sample_snapshot):
+        sequencer = SnapshotSequencer()
+        _publish(sequencer, "net-1", sample_snapshot)
+
+        current = _next(sample_snapshot, healthy_nodes=1, degraded_nodes=2)
+        current.nodes["switch-1"].status = HealthStatus.DEGRADED
+        current.nodes["switch-1"].ping = PingMetrics(success=True, avg_latency_ms=12.5)
+        del current.nodes["server-1"]
+        current.connections = [
+            NodeConnection(source_id="gateway-1", target_id="switch-1", connection_speed="1GbE")
+        ]
+        delta = _publish(sequencer, "net-1", current).delta
+
+        assert (delta.sequence, delta.base_sequence) == (2, 1)
+        assert delta.summary == {"healthy_nodes": 1, "degraded_nodes": 2}
+        assert list(delta.nodes_changed) == ["switch-1"]
+        assert delta.nodes_removed == ["server-1"]
+        assert [c.connection_speed for c in delta.connections_changed] == ["1GbE"]
+        assert [c.target_id for c in delta.connections_removed] == ["server-1"]
+        assert delta.gateways is None
+
+    def test_unchanged_snapshot_is_not_published(self, sample_snapshot):
+        sequencer = SnapshotSequencer()
+        _publish(sequencer, "net-1", sample_snapshot)
+
+        current = _next(sample_snapshot)
+        assert sequencer.plan("net-1", current) is None
+        assert current.sequence == 1
+        assert sequencer.get_stats()["unchanged"] == 1
+
+    def test_keyframe_every_interval(self, sample_snapshot):
+        sequencer = SnapshotSequencer()
+        _publish(sequencer, "net-1", sample_snapshot)
+
+        kinds = []
+        with patch("app.services.snapshot_delta.settings.snapshot_keyframe_interval", 3):
+            for healthy in range(3, 9):
+                update = _publish(sequencer, "net-1", _next(sample_snapshot, healthy_nodes=healthy))
+                kinds.append("key" if update.delta is None else "delta")
+
+        assert kinds == ["delta", "delta", "key", "delta", "delta", "key"]
+
+    def test_networks_are_sequenced_independently(self, sample_snapshot):
+        sequencer = SnapshotSequencer()
+        _publish(sequencer, "net-1", sample_snapshot)
+        _publish(sequencer, "net-1", _next(sample_snapshot, healthy_nodes=1))
+
+        other = _next(sample_snapshot)
+        assert _publish(sequencer, "net-2", other).delta is None
+        assert other.sequence == 1
+        assert sequencer.get_published_snapshot("net-1").sequence == 2
+
+    def test_older_snapshot_is_not_published(self, sample_snapshot):
+        sequencer = SnapshotSequencer()
+        _publish(sequencer, "net-1", sample_snapshot)
+
+        late = _next(sample_snapshot, healthy_nodes=1)
+        late.timestamp = sample_snapshot.timestamp - timedelta(seconds=5)
+        assert sequencer.plan("net-1", late) is None
+        assert sequencer.get_stats()["stale"] == 1
+
+
+class TestAggregatorPublish:
+    """Tests for publishing through the sequencer"""
+
+    @pytest.fixture
+    def redis(self):
+        with patch("app.services.metrics_aggregator.redis_publisher") as redis:
+            redis.publish_topology_snapshot = AsyncMock(return_value=True)
+            redis.publish_topology_delta = AsyncMock(return_value=True)
+            redis.store_last_snapshot = AsyncMock(return_value=True)
+            redis.refresh_last_snapshot = AsyncMock(return_value=True)
+            yield redis
+
+    async def test_failed_publish_does_not_advance_sequence(self, redis, sample_snapshot):
+        aggregator = MetricsAggregator()
+        assert await aggregator.publish_snapshots({"net-1": sample_snapshot}) == 1
+
+        changed = {"net-1": _next(sample_snapshot, healthy_nodes=1)}
+        redis.publish_topology_delta.return_value = False
+        assert await aggregator.publish_snapshots(changed) == 0
+        assert aggregator.get_published_snapshot("net-1").sequence == 1
+
+        redis.publish_topology_delta.return_value = True
+        await aggregator.publish_snapshots({"net-1": _next(sample_snapshot, healthy_nodes=1)})
+        delta = redis.publish_topology_delta.await_args.args[0]
+        assert (delta.sequence, delta.base_sequence) == (2, 1)
+
+    async def test_only_keyframes_are_stored(self, redis, sample_snapshot):
+        """Deltas and unchanged cycles refresh the stored keyframe instead of rewriting it"""
+        aggregator = MetricsAggregator()
+        await aggregator.publish_snapshots({"net-1": sample_snapshot})
+        await aggregator.publish_snapshots({"net-1": _next(sample_snapshot, healthy_nodes=1)})
+        await aggregator.publish_snapshots({"net-1": _next(sample_snapshot, healthy_nodes=1)})
+
+        redis.publish_topology_delta.assert_awaited_once()
+        stored = redis.store_last_snapshot.await_args.args[0]
+        assert (redis.store_last_snapshot.await_count, stored.sequence) == (1, 1)
+        assert [c.args for c in redis.refresh_last_snapshot.await_args_list] == [
+            ("net-1",),
+            ("net-1",),
+        ]
+
+    async def test_unchanged_snapshot_skips_redis(self, redis, sample_snapshot):
+        aggregator = MetricsAggregator()
+        await aggregator.publish_snapshots({"net-1": sample_snapshot})
+
+        assert await aggregator.publish_snapshots({"net-1": _next(sample_snapshot)}) == 0
+        redis.publish_topology_snapshot.assert_awaited_once()
+        redis.publish_topology_delta.assert_not_awaited()
+
+    async def test_concurrent_publishers_do_not_share_a_base(self, redis, sample_snapshot):
+        aggregator = MetricsAggregator()
+        await aggregator.publish_snapshots({"net-1": sample_snapshot})
+
+        async def slow_delta(delta):
+            await asyncio.sleep(0.01)
+            return True
+
+        redis.publish_topology_delta.side_effect = slow_delta
+        await asyncio.gather(
+            aggregator.publish_snapshots({"net-1": _next(sample_snapshot, healthy_nodes=1)}),
+            aggregator.publish_snapshots({"net-1": _next(sample_snapshot, healthy_nodes=2)}),
+        )
+
+        deltas = [call.args[0] for call in redis.publish_topology_delta.await_args_list]
+        assert [(d.base_sequence, d.sequence) for d in deltas] == [(1, 2), (2, 3)]
+        assert aggregator.get_published_snapshot("net-1").sequence == 3
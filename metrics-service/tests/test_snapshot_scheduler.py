@@ -0,0 +1,117 @@
+"""
+Unit tests for the change-driven snapshot regeneration schedule.
+"""
+
+from unittest.mock import patch
+
+import pytest
+
+from app.services.snapshot_scheduler import RegenerationSchedule
+
+
+@pytest.fixture
+def now():
+    return [0.0]
+
+
+@pytest.fixture
+def schedule(now):
+    with (
+        patch("app.services.snapshot_scheduler.settings.snapshot_debounce_seconds", 0.5),
+        patch("app.services.snapshot_scheduler.settings.snapshot_min_interval_seconds", 2.0),
+        patch(
+            "app.services.snapshot_scheduler.settings.snapshot_shared_fetch_interval_seconds", 1.0
+        ),
+    ):
+        yield RegenerationSchedule(clock=lambda: now[0])
+
+
+class TestRegenerationSchedule:
+    """Tests for debouncing and rate limiting regenerations"""
+
+    def test_changes_are_debounced_and_coalesced(self, schedule, now):
+        assert schedule.seconds_until_due() is None
+        assert schedule.mark("net-1") is True
+
+        now[0] = 0.3
+        assert schedule.mark("net-1") is False
+        assert schedule.pop_due() == []
+        assert schedule.seconds_until_due() == pytest.approx(0.2)
+
+        now[0] = 0.5
+        assert schedule.pop_due() == ["net-1"]
+        assert schedule.seconds_until_due() is None
+        assert schedule.get_stats() == {
+            "changes": 2,
+            "coalesced": 1,
+            "regenerated": 1,
+            "batches": 1,
+            "pending": 0,
+        }
+
+    def test_networks_are_scheduled_independently(self, schedule, now):
+        schedule.mark("net-1")
+        now[0] = 0.4
+        schedule.mark("net-2")
+
+        now[0] = 0.5
+        assert schedule.pop_due() == ["net-1"]
+        now[0] = 1.5
+        assert schedule.pop_due() == ["net-2"]
+
+    def test_batches_share_fetches_across_networks(self, schedule, now):
+        schedule.mark("net-1")
+        now[0] = 0.5
+        assert schedule.pop_due() == ["net-1"]
+
+        # Other networks changing right after wait for the next shared fetch, together
+        now[0] = 0.6
+        schedule.mark("net-2")
+        now[0] = 0.8
+        schedule.mark("net-3")
+        now[0] = 1.3
+        assert schedule.pop_due() == []
+        assert schedule.seconds_until_due() == pytest.approx(0.2)
+
+        now[0] = 1.5
+        assert set(schedule.pop_due()) == {"net-2", "net-3"}
+        assert schedule.get_stats()["batches"] == 2
+
+    def test_fallback_cycle_counts_as_a_shared_fetch(self, schedule, now):
+        schedule.ran(["net-1"])
+        schedule.mark("net-2")
+
+        now[0] = 0.5
+        assert schedule.pop_due() == []
+        now[0] = 1.0
+        assert schedule.pop_due() == ["net-2"]
+
+    def test_min_interval_between_regenerations(self, schedule, now):
+        schedule.mark("net-1")
+        now[0] = 0.5
+        schedule.pop_due()
+
+        # Changed again right after: held back until the minimum interval has passed
+        now[0] = 0.6
+        schedule.mark("net-1")
+        now[0] = 1.1
+        assert schedule.pop_due() == []
+        assert schedule.seconds_until_due() == pytest.approx(1.4)
+        now[0] = 2.5
+        assert schedule.pop_due() == ["net-1"]
+
+    def test_fallback_cycle_counts_as_a_run(self, schedule, now):
+        schedule.ran(["net-1"])
+        schedule.mark("net-1")
+
+        assert schedule.seconds_until_due() == pytest.approx(2.0)
+
+    def test_retain_forgets_removed_networks(self, schedule, now):
+        schedule.mark("net-1")
+        schedule.mark("net-2")
+        schedule.mark(None)
+
+        schedule.retain(["net-2"])
+
+        now[0] = 1.0
+        assert set(schedule.pop_due()) == {"net-2", None}
@@ -10,6 +10,7 @@ from unittest.mock import AsyncMock, MagicMock, patch
 import pytest
 
 from app.models import EndpointUsageRecord, ServiceUsageSummary, UsageStatsResponse
+from app.services.latency_histogram import bucket_of
 from app.services.usage_tracker import UsageTracker, usage_tracker
 
 
@@ -238,14 +239,79 @@ class TestUsageTrackerRedisIntegration:
         return mock
 
     async def test_record_usage_with_redis(self, tracker, sample_record, mock_redis):
-        """Should record usage to Redis"""
+        """Should record usage to Redis when the window is flushed"""
         with patch("app.services.usage_tracker.redis_publisher") as mock_publisher:
             mock_publisher._redis = mock_redis
 
             result = await tracker.record_usage(sample_record)
+            mock_redis.pipeline.assert_not_called()
 
-            # Should call pipeline
-            mock_redis.pipeline.assert_called()
+            assert await tracker.flush() == 1
+
+            assert result is True
+            mock_redis.pipeline.assert_called_once()
+            mock_redis.pipeline.return_value.execute.assert_awaited_once()
+
+    async def test_flush_aggregates_window_into_one_pipeline(self, tracker):
+        """Should write a window of records with one pipeline, summed per key"""
+        now = datetime.now(timezone.utc)
+        records = [
+            EndpointUsageRecord(
+                endpoint="/api/test",
+                method="GET",
+                service="test-service",
+                status_code=status_code,
+                response_time_ms=response_time_ms,
+                timestamp=now,
+            )
+            for status_code, response_time_ms in [(200, 10.0), (200, 30.0), (500, 5.0)]
+        ]
+        mock_redis = MagicMock()
+        pipe = mock_redis.pipeline.return_value
+        pipe.execute = AsyncMock(return_value=[])
+
+        with patch("app.services.usage_tracker.redis_publisher") as mock_publisher:
+            mock_publisher._redis = mock_redis
+            assert await tracker.record_batch(records) == 3
+
+            assert await tracker.flush() == 3
+            assert await tracker.flush() == 0
+
+        mock_redis.pipeline.assert_called_once()
+        pipe.execute.assert_awaited_once()
+        endpoint_key = "usage:test-service:GET:api_test"
+        pipe.hincrby.assert_any_call(endpoint_key, "status:200", 2)
+        pipe.hincrby.assert_any_call(endpoint_key, "error_count", 1)
+        pipe.hincrby.assert_any_call("usage:test-service:summary", "total_requests", 3)
+        pipe.hincrby.assert_any_call("usage:test-service:summary", "total_successes", 2)
+        # Min and max of the whole window are applied server-side
+        assert pipe.eval.call_args.args[2:] == (endpoint_key, "5.0", "30.0")
+        # Latency histogram of the route's window, expiring after retention
+        window = int(now.timestamp()) // 60 * 60
+        latency_key = f"{endpoint_key}:latency:{window}"
+        pipe.hincrby.assert_any_call(latency_key, str(bucket_of(30.0)), 1)
+        pipe.expire.assert_any_call(latency_key, 24 * 3600)
+        # ...and of its hourly rollup
+        rollup_key = f"{endpoint_key}:latency_rollup:{window // 3600 * 3600}"
+        pipe.hincrby.assert_any_call(rollup_key, str(bucket_of(30.0)), 1)
+        pipe.expire.assert_any_call(rollup_key, 25 * 3600)
+        assert pipe.expire.call_count == 2
+
+    async def test_failed_flush_is_retried_with_next_window(self, tracker, sample_record):
+        """Should keep a window that could not be written"""
+        mock_redis = MagicMock()
+        pipe = mock_redis.pipeline.return_value
+        pipe.execute = AsyncMock(side_effect=[Exception("Redis error"), []])
+
+        with patch("app.services.usage_tracker.redis_publisher") as mock_publisher:
+            mock_publisher._redis = mock_redis
+            await tracker.record_usage(sample_record)
+            assert await tracker.flush() == 0
+
+            await tracker.record_usage(sample_record)
+            assert await tracker.flush() == 2
+
+        pipe.hincrby.assert_any_call("usage:health-service:summary", "total_requests", 2)
 
     async def test_record_usage_without_redis(self, tracker, sample_record):
         """Should fall back to local cache when Redis unavailable"""
@@ -279,6 +345,27 @@ class TestUsageTrackerRedisIntegration:
             # All should be recorded (locally)
             assert tracker._local_cache["test-service"].total_requests == 5
 
+    async def test_record_reported(self, tracker):
+        """Should record batches handed over by this service's usage middleware"""
+        records = [
+            {
+                "endpoint": "/api/metrics/snapshot",
+                "method": "GET",
+                "service": "metrics-service",
+                "status_code": 200,
+                "response_time_ms": 12.5,
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+            }
+            for _ in range(3)
+        ]
+
+        with patch("app.services.usage_tracker.redis_publisher") as mock_publisher:
+            mock_publisher._redis = None  # Force local only
+
+            assert await tracker.record_reported(records) is True
+
+            assert tracker._local_cache["metrics-service"].total_requests == 3
+
     async def test_get_usage_stats_from_redis(self, tracker, mock_redis):
         """Should get stats from Redis"""
         # Redis client uses decode_responses=True, so returns strings not bytes
@@ -412,18 +499,20 @@ class TestUsageTrackerErrorHandling:
         )
 
     async def test_record_usage_handles_redis_error(self, tracker, sample_record):
-        """Should fall back to local cache on Redis error"""
+        """Should keep local cache and pending usage on Redis error"""
         mock_redis = AsyncMock()
         mock_redis.pipeline = MagicMock(side_effect=Exception("Redis error"))
 
         with patch("app.services.usage_tracker.redis_publisher") as mock_publisher:
             mock_publisher._redis = mock_redis
 
-            result = await tracker.record_usage(sample_record)
+            await tracker.record_usage(sample_record)
+            result = await tracker.flush()
 
-            assert result is False
+            assert result == 0
             # Should still update local cache
             assert "test-service" in tracker._local_cache
+            assert tracker._pending
 
     async def test_get_usage_stats_handles_redis_error(self, tracker, sample_record):
         """Should return local stats on Redis error"""
@@ -691,6 +780,14 @@ class TestResetStatsWithService:
             result = await tracker.reset_stats(service="service-a")
 
             assert result is True
+            mock_redis.scan_iter.assert_not_called()
+            # The endpoint hash and its histogram windows within retention, by name
+            deleted = mock_pipe.delete.call_args_list[0].args
+            window = int(datetime.now(timezone.utc).timestamp()) // 60 * 60
+            assert deleted[0] == "usage:service-a:GET:api_test"
+            assert f"usage:service-a:GET:api_test:latency:{window}" in deleted
+            assert f"usage:service-a:GET:api_test:latency:{window - 24 * 3600}" in deleted
+            assert f"usage:service-a:GET:api_test:latency_rollup:{window // 3600 * 3600}" in deleted
             assert "service-a" not in tracker._local_cache
             assert "service-b" in tracker._local_cache
 
@@ -713,3 +810,78 @@ class TestResetStatsErrors:
             result = await tracker.reset_stats()
 
             assert result is False
+
+
+class TestLatencyStats:
+    """Tests for per-route latency percentiles"""
+
+    async def test_percentiles_per_route_and_step(self):
+        """Should merge each route's histograms over the span and per step"""
+        tracker = UsageTracker()
+        endpoint_key = "usage:health-service:GET:api_health_check_{ip}"
+        mock_redis = MagicMock()
+        mock_redis.smembers = AsyncMock(
+            side_effect=[{"health-service"}, {endpoint_key, "usage:health-service:GET:idle"}]
+        )
+        pipe = mock_redis.pipeline.return_value
+        busy = {str(bucket_of(10.0)): "90", str(bucket_of(200.0)): "10"}
+        pipe.execute = AsyncMock(
+            return_value=[
+                ["health-service", "GET", "/api/health/check/{ip}"],
+                {},
+                busy,
+                ["health-service", "GET", "/idle"],
+                {},
+                {},
+            ]
+        )
+
+        with (
+            patch("app.services.usage_tracker.redis_publisher") as mock_publisher,
+            patch("app.services.usage_tracker.settings.usage_latency_window_seconds", 60),
+        ):
+            mock_publisher._redis = mock_redis
+            stats = await tracker.get_latency_stats(minutes=2, step_minutes=1)
+
+        assert len(stats.routes) == 1
+        route = stats.routes[0]
+        assert route.endpoint == "/api/health/check/{ip}"
+        assert route.overall.count == 100
+        assert route.overall.p50_ms == pytest.approx(10.0, rel=0.05)
+        assert route.overall.p90_ms == pytest.approx(10.0, rel=0.05)
+        assert route.overall.p95_ms == pytest.approx(200.0, rel=0.05)
+        assert [window.count for window in route.windows] == [0, 100]
+        assert route.windows[1].end == stats.end
+
+    async def test_long_span_reads_rollups(self):
+        """Should read hourly rollups instead of one histogram per minute for a day"""
+        tracker = UsageTracker()
+        endpoint_key = "usage:health-service:GET:api_health"
+        mock_redis = MagicMock()
+        mock_redis.smembers = AsyncMock(side_effect=[{"health-service"}, {endpoint_key}])
+        pipe = mock_redis.pipeline.return_value
+        busy = {str(bucket_of(10.0)): "5"}
+        pipe.execute = AsyncMock(
+            return_value=[["health-service", "GET", "/api/health"], *([busy] * 24)]
+        )
+
+        with patch("app.services.usage_tracker.redis_publisher") as mock_publisher:
+            mock_publisher._redis = mock_redis
+            stats = await tracker.get_latency_stats(minutes=24 * 60, step_minutes=30)
+
+        keys = [call.args[0] for call in pipe.hgetall.call_args_list]
+        assert len(keys) == 24
+        assert all(":latency_rollup:" in key for key in keys)
+        assert stats.step_minutes == 60
+        assert stats.routes[0].overall.count == 120
+        assert len(stats.routes[0].windows) == 24
+        assert (stats.end - stats.start).total_seconds() == 24 * 3600
+
+    async def test_without_redis(self):
+        """Should report no routes when Redis is unavailable"""
+        with patch("app.services.usage_tracker.redis_publisher") as mock_publisher:
+            mock_publisher._redis = None
+
+            stats = await UsageTracker().get_latency_stats()
+
+        assert stats.routes == []
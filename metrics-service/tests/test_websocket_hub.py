@@ -0,0 +1,162 @@
+"""
+Unit tests for the WebSocket fan-out hub.
+
+Redis subscriptions are mocked. Client websockets are mocks whose sends block
+until released, so queued frames stay in place while a test inspects them.
+"""
+
+import asyncio
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.models import MetricsEvent, MetricsEventType
+from app.services import payload_codec
+from app.services.websocket_hub import CLOSE_SLOW_CONSUMER, WebSocketHub
+
+
+def _event(event_type, network_id="net-1", sequence=1):
+    return MetricsEvent(
+        event_type=event_type,
+        timestamp=datetime.now(timezone.utc),
+        payload={"network_id": network_id, "sequence": sequence},
+    )
+
+
+def _websocket(release: asyncio.Event, subprotocols: list[str] | None = None):
+    websocket = AsyncMock()
+    websocket.scope = {"subprotocols": subprotocols or []}
+
+    async def send(frame):
+        await release.wait()
+
+    websocket.send_text = send
+    websocket.send_bytes = send
+    return websocket
+
+
+@pytest.fixture
+def redis():
+    with patch("app.services.websocket_hub.redis_publisher") as redis:
+        redis.subscribe = AsyncMock(return_value=True)
+        redis.unsubscribe = AsyncMock(return_value=True)
+        yield redis
+
+
+@pytest.fixture
+def release():
+    return asyncio.Event()
+
+
+@pytest.fixture
+async def hub(redis, release):
+    hub = WebSocketHub()
+    yield hub
+    release.set()
+    for client in list(hub._clients):
+        await hub.disconnect(client)
+
+
+def _queued(client):
+    return list(client.queue._queue)
+
+
+class TestFanOut:
+    """Tests for channel subscriptions and per-network delivery"""
+
+    async def test_one_redis_subscription_per_network(self, hub, redis, release):
+        first = await hub.connect(_websocket(release))
+        second = await hub.connect(_websocket(release))
+        await hub.subscribe(first, "net-1")
+        await hub.subscribe(second, "net-1")
+
+        topology_calls = [c for c in redis.subscribe.await_args_list if "topology" in c.args[0]]
+        assert [c.args[0] for c in topology_calls] == ["metrics:topology:net-1"]
+
+        await hub.disconnect(first)
+        redis.unsubscribe.assert_not_awaited()
+        await hub.disconnect(second)
+        unsubscribed = {c.args[0] for c in redis.unsubscribe.await_args_list}
+        assert "metrics:topology:net-1" in unsubscribed
+        assert hub.get_stats()["channels"] == 0
+
+    async def test_event_serialized_once_for_its_network_only(self, hub, release):
+        watchers = [await hub.connect(_websocket(release)) for _ in range(3)]
+        other = await hub.connect(_websocket(release))
+        for client in watchers:
+            await hub.subscribe(client, "net-1")
+        await hub.subscribe(other, "net-2")
+        await asyncio.sleep(0)
+
+        hub.deliver("metrics:topology:net-1", _event(MetricsEventType.FULL_SNAPSHOT))
+
+        frames = [_queued(client)[-1] for client in watchers]
+        assert all(frame is frames[0] for frame in frames)
+        assert '"type": "full_snapshot"' in frames[0]
+        assert _queued(other) == []
+
+    async def test_negotiated_encodings_get_their_own_frames(self, hub, release):
+        plain = await hub.connect(_websocket(release))
+        compact = await hub.connect(_websocket(release, ["graphql-ws", "msgpack+zstd", "msgpack"]))
+        packed = await hub.connect(_websocket(release, ["msgpack"]))
+        compact.websocket.accept.assert_awaited_once_with(subprotocol="msgpack+zstd")
+        plain.websocket.accept.assert_awaited_once_with(subprotocol=None)
+        for client in (plain, compact, packed):
+            await hub.subscribe(client, "net-1")
+        await asyncio.sleep(0)
+
+        hub.deliver("metrics:topology:net-1", _event(MetricsEventType.FULL_SNAPSHOT))
+
+        text, compressed, binary = (_queued(c)[-1] for c in (plain, compact, packed))
+        assert isinstance(text, str)
+        assert compressed.startswith(b"\x28\xb5\x2f\xfd")
+        assert payload_codec.decode(compressed) == payload_codec.decode(binary)
+        assert payload_codec.decode(binary) == payload_codec.decode(text)
+
+
+class TestSlowConsumers:
+    """Tests for bounded queues, keyframe downgrade and dropping"""
+
+    @pytest.fixture(autouse=True)
+    def small_queues(self):
+        with (
+            patch("app.services.websocket_hub.settings.websocket_send_queue_size", 2),
+            patch("app.services.websocket_hub.settings.websocket_max_overflows", 1),
+        ):
+            yield
+
+    async def test_full_queue_downgrades_to_keyframes(self, hub, release):
+        client = await hub.connect(_websocket(release))
+        await hub.subscribe(client, "net-1")
+        await asyncio.sleep(0)  # sender takes the first frame and blocks on it
+
+        channel = "metrics:topology:net-1"
+        for sequence in range(1, 5):
+            hub.deliver(channel, _event(MetricsEventType.SNAPSHOT_DELTA, sequence=sequence))
+
+        # Two queued, one missed; the one after was not worth sending
+        assert len(_queued(client)) == 2
+        assert client.keyframes_only == {"net-1"}
+        assert hub.get_stats()["skipped_deltas"] == 1
+
+        client.queue.get_nowait()
+        hub.deliver(channel, _event(MetricsEventType.FULL_SNAPSHOT, sequence=5))
+        assert client.keyframes_only == set()
+        assert client.overflows == 0
+
+    async def test_client_that_keeps_overflowing_is_dropped(self, hub, release):
+        websocket = _websocket(release)
+        client = await hub.connect(websocket)
+        await asyncio.sleep(0)
+
+        for _ in range(5):
+            hub.send(client, {"type": "ping"})
+
+        assert client.dropped is True
+        assert _queued(client) == [None]
+        assert hub.send(client, {"type": "ping"}) is False
+
+        release.set()
+        await asyncio.wait_for(client.sender, 1)
+        websocket.close.assert_awaited_once_with(code=CLOSE_SLOW_CONSUMER)
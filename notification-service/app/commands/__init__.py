@@ -0,0 +1,5 @@
+"""
+Maintenance commands for the notification service.
+
+Run with ``python -m app.commands``; see ``__main__.py`` for usage.
+"""
@@ -0,0 +1,81 @@
+"""
+CLI entrypoint for notification service maintenance commands.
+
+Usage:
+    python -m app.commands [command] [options]
+
+Commands:
+    rebuild-stats   - Rebuild notification stats buckets from notification history
+                      Options: --network-id ID   only rebuild one network
+                               --since DATE      only rebuild from this date (UTC, ISO 8601)
+
+Examples:
+    python -m app.commands rebuild-stats
+    python -m app.commands rebuild-stats --network-id 3f2a... --since 2026-01-01
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+from datetime import datetime
+
+from ..services.notification_stats import notification_stats
+
+# Configure logging for CLI
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+
+def print_usage() -> None:
+    """Print CLI usage information."""
+    print(__doc__)
+
+
+def main(argv: list[str] | None = None) -> int:
+    """
+    Main CLI entrypoint.
+
+    Returns:
+        Exit code (0 for success, 1 for error)
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ("-h", "--help", "help"):
+        print_usage()
+        return 0 if argv else 1
+
+    command = argv[0].lower()
+
+    try:
+        if command == "rebuild-stats":
+            parser = argparse.ArgumentParser(prog="python -m app.commands rebuild-stats")
+            parser.add_argument("--network-id")
+            parser.add_argument("--since", type=datetime.fromisoformat)
+            args = parser.parse_args(argv[1:])
+
+            buckets = asyncio.run(
+                notification_stats.rebuild(network_id=args.network_id, since=args.since)
+            )
+            print(f"\n✅ Rebuilt {buckets} notification stats buckets")
+
+        else:
+            print(f"Unknown command: {command}")
+            print_usage()
+            return 1
+
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Command cancelled by user")
+        return 130
+    except Exception as e:
+        logger.exception(f"Command failed: {e}")
+        print(f"\n❌ Command failed: {e}")
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
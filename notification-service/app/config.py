@@ -31,7 +31,8 @@ class Settings(BaseSettings):
     # Database - must be set via DATABASE_URL environment variable
     database_url: str = ""
 
-    # Data persistence directory for JSON state files
+    # Data directory for ML model state; legacy JSON state files found here are imported
+    # into the database once and renamed to *.json.imported
     notification_data_dir: str = "/app/data"
 
     # Discord Bot Configuration
@@ -40,14 +41,77 @@ class Settings(BaseSettings):
     discord_client_secret: str = ""
     discord_redirect_uri: str = "http://localhost:8005/api/auth/discord/callback"
 
+    # Discord DM delivery: alerts for one user within this window share a message
+    discord_dm_coalesce_window_seconds: float = 1.0
+    discord_dm_channel_ttl_seconds: float = 3600.0
+
     # Email Configuration (Resend)
     resend_api_key: str = ""
     email_from: str = "Cartographer <notifications@cartographer.app>"
 
+    # Email outbox: queued delivery through the Resend batch API
+    email_outbox_enabled: bool = True
+    email_outbox_workers: int = 2
+    email_outbox_batch_size: int = 50
+    email_outbox_poll_interval_seconds: float = 5.0
+    email_outbox_lease_seconds: float = 60.0
+    email_outbox_max_attempts: int = 6
+    email_outbox_backoff_base_seconds: float = 10.0
+    email_outbox_backoff_max_seconds: float = 900.0
+    email_outbox_sent_retention_days: int = 7
+    email_outbox_retention_batch_size: int = 5000
+
+    # Notification fan-out: max concurrent sends per channel and a per-send deadline
+    # that starts once the send holds its channel slot
+    dispatch_email_concurrency: int = 10
+    dispatch_discord_concurrency: int = 5
+    dispatch_user_timeout_seconds: float = 30.0
+
+    # Notification history: batched writes to PostgreSQL and age-based retention
+    history_batch_size: int = 200
+    history_flush_interval_seconds: float = 2.0
+    history_retention_days: int = 90
+    history_retention_batch_size: int = 5000
+
+    # Notification stats: minute/hour buckets are kept this long, day buckets indefinitely
+    stats_flush_interval_seconds: float = 2.0
+    stats_minute_retention_hours: int = 48
+    stats_hour_retention_days: int = 35
+
+    # Rate limiting: token buckets shared through Redis (empty REDIS_URL keeps them in-process).
+    # A bucket holds max_notifications_per_hour + burst tokens and refills over an hour.
+    redis_url: str = ""
+    redis_db: int = 3  # DB 3 for notification rate limits (0=metrics, 1=assistant, 2=backend)
+    rate_limit_network_burst: int = 2
+    rate_limit_user_per_hour: int = 60
+    rate_limit_user_burst: int = 10
+
+    # Preference cache: resolved per-network preferences, invalidated across replicas over
+    # Redis pub/sub. The TTL bounds staleness if an invalidation is missed.
+    preference_cache_ttl_seconds: float = 300.0
+    preference_cache_max_networks: int = 5000
+    preference_cache_email_ttl_seconds: float = 60.0
+
+    # Broadcast jobs: recipients are paged in chunks with progress saved after each chunk,
+    # and sends are paced per channel (0 = unthrottled)
+    broadcast_chunk_size: int = 100
+    broadcast_lease_seconds: float = 120.0
+    broadcast_email_per_second: float = 10.0
+    broadcast_discord_per_second: float = 5.0
+
+    # Keyed state (preferences, broadcasts, subscriptions): changed keys are upserted in
+    # batches by a background flusher; repeated changes to a key between flushes coalesce
+    state_batch_size: int = 500
+    state_flush_interval_seconds: float = 1.0
+
     # External Service URLs
     application_url: str = "http://localhost:5173"
     metrics_service_url: str = "http://localhost:8003"
 
+    # Usage tracking
+    usage_batch_size: int = 10
+    usage_batch_interval_seconds: float = 5.0
+
     # Version Information
     cartographer_version: str = "0.1.1"
 
@@ -16,6 +16,7 @@ from contextlib import asynccontextmanager
 from datetime import datetime
 from pathlib import Path
 
+from cartographer_usage import UsageTrackingMiddleware
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy import text
@@ -33,16 +34,25 @@ from .models import (
 )
 from .routers.cartographer_status import router as cartographer_status_router
 from .routers.discord_oauth import router as discord_oauth_router
+from .routers.notifications import dispatch_buffered_event
 from .routers.notifications import router as notifications_router
 from .routers.user_notifications import router as user_notifications_router
 from .routers.user_notifications_send import router as user_notifications_send_router
 from .services.anomaly_detector import anomaly_detector
+from .services.broadcast_jobs import broadcast_jobs
 from .services.cartographer_status import cartographer_status_service
+from .services.discord_delivery import discord_delivery_queue
 from .services.discord_service import discord_service, send_discord_notification
+from .services.email_outbox import email_outbox
 from .services.email_service import send_notification_email
+from .services.mass_outage_detector import mass_outage_detector
 from .services.network_anomaly_detector import network_anomaly_detector_manager
+from .services.notification_history import notification_history
 from .services.notification_manager import notification_manager
-from .services.usage_middleware import UsageTrackingMiddleware
+from .services.notification_stats import notification_stats
+from .services.rate_limiter import rate_limiter
+from .services.state_store import state_repository
+from .services.user_preferences import user_preferences_service
 from .services.version_checker import version_checker
 
 # Configure logging
@@ -387,9 +397,43 @@ async def lifespan(app: FastAPI):
                 logger.warning("Discord bot failed to start")
         except Exception as e:
             logger.error(f"Error starting Discord bot: {e}")
+
+        # DMs are delivered over REST and don't depend on the gateway connection
+        await discord_delivery_queue.start()
     else:
         logger.info("Discord bot not configured (DISCORD_BOT_TOKEN not set)")
 
+    # Start email outbox workers
+    if settings.is_email_configured and settings.email_outbox_enabled:
+        logger.info("Starting email outbox...")
+        await email_outbox.start()
+
+    # Connect the shared rate limiter (in-process buckets when REDIS_URL is unset)
+    # and subscribe to preference cache invalidations from other replicas
+    await rate_limiter.start()
+    await user_preferences_service.cache.start()
+
+    # Load preferences, broadcasts and subscriptions from the state table, importing
+    # any legacy JSON state files first
+    await state_repository.start()
+    try:
+        await notification_manager.load_state()
+        await cartographer_status_service.load_state()
+        await version_checker.load_state()
+    except Exception as e:
+        logger.error(f"Failed to load notification state: {e}", exc_info=True)
+
+    # Start notification history and stats writers, then import any legacy JSON history
+    await notification_history.start()
+    await notification_stats.start()
+    await notification_manager.import_legacy_history()
+
+    # Resume chunked broadcasts interrupted by the last shutdown
+    await broadcast_jobs.start()
+
+    # Flush buffered offline/online events when their aggregation windows expire
+    await mass_outage_detector.start(dispatch_buffered_event)
+
     # Start scheduled broadcast scheduler
     logger.info("Starting scheduled broadcast scheduler...")
     await notification_manager.start_scheduler()
@@ -426,6 +470,8 @@ async def lifespan(app: FastAPI):
     network_anomaly_detector_manager.save_all()
     logger.info("ML model state saved")
 
+    await mass_outage_detector.stop()
+
     # Stop scheduled broadcast scheduler
     await notification_manager.stop_scheduler()
     logger.info("Scheduled broadcast scheduler stopped")
@@ -434,11 +480,28 @@ async def lifespan(app: FastAPI):
     await version_checker.stop()
     logger.info("Version checker stopped")
 
-    # Stop Discord bot
+    # Stop broadcasts between chunks; they resume on the next start
+    await broadcast_jobs.stop()
+
+    # Stop email outbox (drains what it can, including the shutdown notification)
+    await email_outbox.stop()
+
+    # Write out buffered history and stats, including the shutdown notification
+    await notification_history.stop()
+    await notification_stats.stop()
+    await state_repository.stop()
+
+    # Flush queued Discord DMs, then stop the bot
+    if discord_delivery_queue.is_running:
+        await discord_delivery_queue.stop()
+
     if discord_service._running:
         await discord_service.stop()
         logger.info("Discord bot stopped")
 
+    await rate_limiter.stop()
+    await user_preferences_service.cache.stop()
+
     # Mark clean shutdown
     _save_service_state(clean_shutdown=True)
 
@@ -467,7 +530,13 @@ def create_app() -> FastAPI:
     )
 
     # Usage tracking middleware - reports endpoint usage to metrics service
-    app.add_middleware(UsageTrackingMiddleware, service_name="notification-service")
+    # Only the backend gateway calls this service, so no request is user-generated
+    app.add_middleware(
+        UsageTrackingMiddleware,
+        service_name="notification-service",
+        settings=settings,
+        user_facing=False,
+    )
 
     # Include routers
     app.include_router(notifications_router, prefix="/api/notifications")
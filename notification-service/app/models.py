@@ -279,12 +279,14 @@ class NotificationRecord(BaseModel):
 
 
 class NotificationHistoryResponse(BaseModel):
-    """Response with notification history"""
+    """Response with one page of notification history, newest first"""
 
     notifications: List[NotificationRecord]
+    # Number of notifications in this page; history is paged by cursor, not counted
     total_count: int
-    page: int = 1
     per_page: int = 50
+    # Pass back as ``cursor`` to fetch the next (older) page; None on the last page
+    next_cursor: Optional[str] = None
 
 
 # ==================== Discord Bot Configuration ====================
@@ -422,6 +424,13 @@ class MLModelStatus(BaseModel):
     training_status: str = "initializing"
 
 
+class DeviceSyncDelta(BaseModel):
+    """Devices added to and removed from a network since the last sync"""
+
+    added: list[str] = Field(default_factory=list)
+    removed: list[str] = Field(default_factory=list)
+
+
 # ==================== Scheduled Broadcasts ====================
 
 
@@ -452,6 +461,8 @@ class ScheduledBroadcast(BaseModel):
     seen_at: Optional[datetime] = None  # When a user first viewed this after it was sent
     users_notified: int = 0
     error_message: Optional[str] = None
+    # Set (and persisted) just before sending, so a restart mid-send never sends it twice
+    dispatch_started_at: Optional[datetime] = None
 
 
 class ScheduledBroadcastCreate(BaseModel):
@@ -510,10 +521,80 @@ class NotificationStatsResponse(BaseModel):
     total_sent_7d: int = 0
     by_channel: Dict[str, int] = Field(default_factory=dict)
     by_type: Dict[str, int] = Field(default_factory=dict)
+    by_priority: Dict[str, int] = Field(default_factory=dict)
     success_rate: float = 1.0
     anomalies_detected_24h: int = 0
 
 
+class NotificationStatsRange(BaseModel):
+    """Notification counts over a time range"""
+
+    network_id: Optional[str] = None
+    # Effective bounds after aligning to the stored bucket sizes
+    since: datetime
+    until: datetime
+    total: int = 0
+    successful: int = 0
+    failed: int = 0
+    success_rate: float = 1.0
+    by_channel: Dict[str, int] = Field(default_factory=dict)
+    by_type: Dict[str, int] = Field(default_factory=dict)
+    by_priority: Dict[str, int] = Field(default_factory=dict)
+
+
+class DeadLetterEmail(BaseModel):
+    """Notification email that exhausted its delivery attempts"""
+
+    id: str
+    notification_id: str
+    event_id: Optional[str] = None
+    network_id: Optional[str] = None
+    to_email: str
+    subject: str
+    attempts: int
+    last_error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    model_config = {"from_attributes": True}
+
+
+class DeadLetterEmailResponse(BaseModel):
+    """Response with dead-lettered emails"""
+
+    emails: List[DeadLetterEmail]
+    total_count: int
+
+
+# ==================== Broadcast Jobs ====================
+
+
+class BroadcastJobProgress(BaseModel):
+    """Delivery progress of a chunked broadcast"""
+
+    id: str
+    kind: str
+    status: str
+    title: str
+    event_type: NotificationType
+    total: int
+    sent: int
+    failed: int
+    skipped: int  # Recipients whose preferences filtered the notification out
+    remaining: int
+    last_error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+
+
+class BroadcastJobListResponse(BaseModel):
+    """Recent broadcast jobs, newest first"""
+
+    jobs: List[BroadcastJobProgress]
+    total_count: int
+
+
 # ==================== Discord OAuth ====================
 
 
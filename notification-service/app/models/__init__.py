@@ -9,8 +9,14 @@ import importlib.util
 import os
 
 from .database import (
+    BroadcastJob,
     DiscordUserLink,
+    EmailOutboxMessage,
+    NotificationHistoryEntry,
+    NotificationHistoryRecipient,
     NotificationPriorityEnum,
+    NotificationState,
+    NotificationStatsBucket,
     UserGlobalNotificationPrefs,
     UserNetworkNotificationPrefs,
 )
@@ -44,6 +50,11 @@ if os.path.exists(_models_py_path):
         "NotificationRecord",
         "NotificationHistoryResponse",
         "NotificationStatsResponse",
+        "NotificationStatsRange",
+        "DeadLetterEmail",
+        "DeadLetterEmailResponse",
+        "BroadcastJobProgress",
+        "BroadcastJobListResponse",
         "TestNotificationRequest",
         "TestNotificationResponse",
         "DiscordBotInfo",
@@ -55,6 +66,7 @@ if os.path.exists(_models_py_path):
         "DeviceBaseline",
         "AnomalyDetectionResult",
         "MLModelStatus",
+        "DeviceSyncDelta",
         "ScheduledBroadcastStatus",
         "ScheduledBroadcast",
         "ScheduledBroadcastCreate",
@@ -76,8 +88,14 @@ else:
 
 __all__ = [
     # Database models
+    "BroadcastJob",
     "UserNetworkNotificationPrefs",
     "UserGlobalNotificationPrefs",
     "DiscordUserLink",
+    "EmailOutboxMessage",
+    "NotificationHistoryEntry",
+    "NotificationHistoryRecipient",
     "NotificationPriorityEnum",
+    "NotificationState",
+    "NotificationStatsBucket",
 ] + _pydantic_all
@@ -7,7 +7,7 @@ import enum
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import JSON, Boolean, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy import JSON, Boolean, DateTime, ForeignKey, Index, Integer, String, Text
 from sqlalchemy.dialects.postgresql import ENUM as PgEnum
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column
@@ -161,3 +161,179 @@ class DiscordUserLink(Base):
         # For global: (user_id, "global", null) must be unique
         {"comment": "Discord OAuth links for users - per context (network or global)"},
     )
+
+
+class EmailOutboxMessage(Base):
+    """Rendered notification email waiting to be delivered through the email provider"""
+
+    __tablename__ = "email_outbox"
+
+    id: Mapped[str] = mapped_column(UUID(as_uuid=False), primary_key=True)
+    notification_id: Mapped[str] = mapped_column(String(255))
+    event_id: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    network_id: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+
+    # Rendered message
+    to_email: Mapped[str] = mapped_column(String(320))
+    subject: Mapped[str] = mapped_column(Text)
+    html: Mapped[str] = mapped_column(Text)
+    text: Mapped[str] = mapped_column(Text)
+
+    # Delivery state: "pending", "sent" or "dead" (dead-lettered after exhausting retries)
+    status: Mapped[str] = mapped_column(String(20), default="pending")
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    provider_message_id: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+
+    # Timestamps
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
+
+    __table_args__ = (
+        # Workers claim due messages by (status, next_attempt_at)
+        Index("idx_email_outbox_status_next_attempt", "status", "next_attempt_at"),
+        {"comment": "Durable outbox for notification emails"},
+    )
+
+
+class NotificationHistoryEntry(Base):
+    """One delivery attempt of a notification on one channel"""
+
+    __tablename__ = "notification_history"
+
+    id: Mapped[str] = mapped_column(UUID(as_uuid=False), primary_key=True)
+    notification_id: Mapped[str] = mapped_column(String(255))
+    event_id: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    network_id: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    user_id: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    event_type: Mapped[Optional[str]] = mapped_column(String(50), nullable=True)
+
+    channel: Mapped[str] = mapped_column(String(20))
+    success: Mapped[bool] = mapped_column(Boolean)
+    error_message: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+
+    # Notification content
+    title: Mapped[str] = mapped_column(Text)
+    message: Mapped[str] = mapped_column(Text)
+    priority: Mapped[str] = mapped_column(String(20))
+
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # Keyset pagination walks (created_at, id) backwards within a network or user
+        Index("idx_notification_history_network_created", "network_id", "created_at", "id"),
+        Index("idx_notification_history_user_created", "user_id", "created_at", "id"),
+        # Retention deletes and unfiltered listings scan by age
+        Index("idx_notification_history_created", "created_at"),
+        {"comment": "Sent notification history, one row per channel attempt"},
+    )
+
+
+class NotificationHistoryRecipient(Base):
+    """A network member a shared delivery in notification_history was made for"""
+
+    __tablename__ = "notification_history_recipients"
+
+    history_id: Mapped[str] = mapped_column(
+        UUID(as_uuid=False),
+        ForeignKey("notification_history.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    user_id: Mapped[str] = mapped_column(String(255), primary_key=True)
+
+    __table_args__ = (
+        # A user's history looks up the shared deliveries made for them
+        Index("idx_notification_history_recipients_user", "user_id", "history_id"),
+        {"comment": "Members a shared notification delivery was made for"},
+    )
+
+
+class NotificationStatsBucket(Base):
+    """Notification count for one network, time bucket and combination of dimensions"""
+
+    __tablename__ = "notification_stats_buckets"
+
+    # Empty string for notifications that don't belong to a network
+    network_key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    # "minute", "hour" or "day"
+    granularity: Mapped[str] = mapped_column(String(10), primary_key=True)
+    bucket_start: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+
+    # Empty string when the event type is unknown (e.g. imported legacy history)
+    event_type: Mapped[str] = mapped_column(String(50), primary_key=True)
+    priority: Mapped[str] = mapped_column(String(20), primary_key=True)
+    channel: Mapped[str] = mapped_column(String(20), primary_key=True)
+    success: Mapped[bool] = mapped_column(Boolean, primary_key=True)
+
+    count: Mapped[int] = mapped_column(Integer, default=0)
+
+    __table_args__ = (
+        # Retention deletes expire whole granularities by age
+        Index("idx_notification_stats_granularity_start", "granularity", "bucket_start"),
+        {"comment": "Pre-aggregated notification counts in minute/hour/day buckets"},
+    )
+
+
+class BroadcastJob(Base):
+    """Broadcast sent to many recipients in chunks, with durable progress"""
+
+    __tablename__ = "broadcast_jobs"
+
+    id: Mapped[str] = mapped_column(UUID(as_uuid=False), primary_key=True)
+    # "networks" (every network with notifications enabled) or "global_users"
+    kind: Mapped[str] = mapped_column(String(20))
+    # Serialized NetworkEvent sent to every recipient
+    event: Mapped[dict] = mapped_column(JSON)
+
+    # "running", "completed" or "failed"
+    status: Mapped[str] = mapped_column(String(20), default="running")
+    # Recipients are processed in sorted order; everything up to the cursor is done
+    cursor: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    total: Mapped[int] = mapped_column(Integer, default=0)
+    sent: Mapped[int] = mapped_column(Integer, default=0)
+    failed: Mapped[int] = mapped_column(Integer, default=0)
+    skipped: Mapped[int] = mapped_column(Integer, default=0)
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+
+    # Replica currently running the job; another replica takes over once the lease expires
+    owner: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    lease_expires_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+
+    # Timestamps
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
+    completed_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # Replicas look for running jobs whose lease has expired
+        Index("idx_broadcast_jobs_status_lease", "status", "lease_expires_at"),
+        {"comment": "Chunked broadcast jobs and their delivery progress"},
+    )
+
+
+class NotificationState(Base):
+    """One keyed piece of service state (preferences, broadcasts, subscriptions, ...)"""
+
+    __tablename__ = "notification_state"
+
+    # e.g. "network_preferences"; key is the network, user, broadcast or device within it
+    namespace: Mapped[str] = mapped_column(String(64), primary_key=True)
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    value: Mapped[dict] = mapped_column(JSON)
+
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
+
+    # The (namespace, key) primary key serves both whole-namespace range scans and
+    # per-key lookups, so no secondary index is needed
+    __table_args__ = ({"comment": "Keyed notification service state, formerly JSON files"},)
@@ -124,6 +124,10 @@ async def discord_oauth_callback(
             logger.info("Linked Discord account for global context")
 
         await db.commit()
+        if context_type == "network" and context_id is not None:
+            await user_preferences_service.invalidate_network(context_id)
+        else:
+            await user_preferences_service.invalidate_global()
 
         # Include context in redirect for frontend to know which link was updated
         context_param = f"&context_type={context_type}"
@@ -182,6 +186,10 @@ async def unlink_discord(
             logger.info("Unlinked Discord account for global context")
 
         await db.commit()
+        if context_type == "network" and context_id is not None:
+            await user_preferences_service.invalidate_network(context_id)
+        else:
+            await user_preferences_service.invalidate_global()
 
     return {"success": success}
 
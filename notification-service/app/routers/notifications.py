@@ -4,15 +4,20 @@ API router for notification service endpoints.
 
 import logging
 import uuid
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import List, Optional
 
 from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..database import get_db
+from ..database import async_session_maker, get_db
 from ..models import (
+    BroadcastJobListResponse,
+    BroadcastJobProgress,
+    DeadLetterEmail,
+    DeadLetterEmailResponse,
     DeviceBaseline,
+    DeviceSyncDelta,
     DiscordBotInfo,
     DiscordChannelsResponse,
     DiscordGuildsResponse,
@@ -20,10 +25,12 @@ from ..models import (
     GlobalUserPreferencesUpdate,
     MLModelStatus,
     NetworkEvent,
+    NotificationChannel,
     NotificationHistoryResponse,
     NotificationPreferences,
     NotificationPreferencesUpdate,
     NotificationPriority,
+    NotificationStatsRange,
     NotificationStatsResponse,
     NotificationType,
     ScheduledBroadcast,
@@ -35,10 +42,19 @@ from ..models import (
     get_default_priority_for_type,
 )
 from ..services.anomaly_detector import anomaly_detector
+from ..services.broadcast_jobs import NETWORKS, STATUS_SUBSCRIBERS, broadcast_jobs
+from ..services.discord_delivery import discord_delivery_queue
 from ..services.discord_service import discord_service, get_bot_invite_url, is_discord_configured
+from ..services.email_outbox import email_outbox
 from ..services.email_service import is_email_configured
+from ..services.mass_outage_detector import mass_outage_detector
 from ..services.network_anomaly_detector import network_anomaly_detector_manager
+from ..services.notification_history import InvalidCursorError, notification_history
 from ..services.notification_manager import notification_manager
+from ..services.notification_stats import notification_stats
+from ..services.rate_limiter import rate_limiter
+from ..services.state_store import state_repository
+from ..services.user_preferences import user_preferences_service
 from ..services.version_checker import version_checker
 
 logger = logging.getLogger(__name__)
@@ -55,6 +71,7 @@ async def get_network_preferences(
     x_user_id: str = Header(..., description="User ID from auth service"),
 ):
     """Get notification preferences for a specific network"""
+    await notification_manager.ensure_preferences_loaded([network_id])
     return notification_manager.get_preferences(network_id)
 
 
@@ -65,6 +82,7 @@ async def update_network_preferences(
     x_user_id: str = Header(..., description="User ID from auth service"),
 ):
     """Update notification preferences for a specific network"""
+    await notification_manager.ensure_preferences_loaded([network_id])
     return notification_manager.update_preferences(network_id, update)
 
 
@@ -74,6 +92,7 @@ async def delete_network_preferences(
     x_user_id: str = Header(..., description="User ID from auth service"),
 ):
     """Delete notification preferences for a network (reset to defaults)"""
+    await notification_manager.ensure_preferences_loaded([network_id])
     success = notification_manager.delete_preferences(network_id)
     return {"success": success}
 
@@ -102,11 +121,55 @@ async def get_service_status():
         "discord_bot_connected": (
             discord_service._ready.is_set() if discord_service._client else False
         ),
+        "discord_delivery": discord_delivery_queue.get_status(),
+        "email_outbox": email_outbox.get_status(),
+        "notification_history": notification_history.get_status(),
+        "notification_stats": notification_stats.get_status(),
+        "rate_limiter": rate_limiter.get_status(),
+        "preference_cache": user_preferences_service.cache.get_status(),
+        "mass_outage_detector": mass_outage_detector.get_status(),
+        "broadcast_jobs": broadcast_jobs.get_status(),
+        "state_store": state_repository.get_status(),
         "ml_model_status": anomaly_detector.get_model_status().model_dump(),
         "version_checker": version_checker.get_status(),
     }
 
 
+# ==================== Email Outbox ====================
+
+
+@router.get("/email-outbox/dead-letters", response_model=DeadLetterEmailResponse)
+async def get_dead_letter_emails(limit: int = Query(50, ge=1, le=500)):
+    """List notification emails that exhausted their delivery attempts"""
+    messages = await email_outbox.get_dead_letters(limit)
+    emails = [DeadLetterEmail.model_validate(message) for message in messages]
+    return DeadLetterEmailResponse(emails=emails, total_count=len(emails))
+
+
+@router.post("/email-outbox/dead-letters/{message_id}/retry")
+async def retry_dead_letter_email(message_id: str):
+    """Requeue a dead-lettered email for another round of delivery attempts"""
+    if not await email_outbox.requeue_dead_letter(message_id):
+        raise HTTPException(status_code=404, detail="Dead-lettered email not found")
+    return {"success": True, "message_id": message_id}
+
+
+@router.get("/broadcast-jobs", response_model=BroadcastJobListResponse)
+async def list_broadcast_jobs(limit: int = Query(20, ge=1, le=200)):
+    """List recent chunked broadcasts with their delivery progress"""
+    jobs = await broadcast_jobs.list_recent(limit)
+    return BroadcastJobListResponse(jobs=jobs, total_count=len(jobs))
+
+
+@router.get("/broadcast-jobs/{job_id}", response_model=BroadcastJobProgress)
+async def get_broadcast_job(job_id: str):
+    """Get sent/failed/remaining counts for a chunked broadcast"""
+    progress = await broadcast_jobs.get_progress(job_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Broadcast job not found")
+    return progress
+
+
 # ==================== Discord Integration ====================
 
 
@@ -162,15 +225,56 @@ async def send_test_notification(
 # ==================== History & Stats (per-network) ====================
 
 
+async def _get_history_page(**filters) -> NotificationHistoryResponse:
+    try:
+        return await notification_manager.get_history(**filters)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.get("/networks/{network_id}/history", response_model=NotificationHistoryResponse)
 async def get_network_notification_history(
     network_id: str,
-    page: int = Query(1, ge=1),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
     per_page: int = Query(50, ge=1, le=100),
+    channel: Optional[NotificationChannel] = Query(None),
+    success: Optional[bool] = Query(None),
+    since: Optional[datetime] = Query(None),
+    until: Optional[datetime] = Query(None),
     x_user_id: str = Header(..., description="User ID from auth service"),
 ):
-    """Get notification history for a specific network"""
-    return notification_manager.get_history(network_id=network_id, page=page, per_page=per_page)
+    """Get notification history for a specific network, newest first"""
+    return await _get_history_page(
+        network_id=network_id,
+        cursor=cursor,
+        per_page=per_page,
+        channel=channel,
+        success=success,
+        since=since,
+        until=until,
+    )
+
+
+@router.get("/history", response_model=NotificationHistoryResponse)
+async def get_user_notification_history(
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    per_page: int = Query(50, ge=1, le=100),
+    channel: Optional[NotificationChannel] = Query(None),
+    success: Optional[bool] = Query(None),
+    since: Optional[datetime] = Query(None),
+    until: Optional[datetime] = Query(None),
+    x_user_id: str = Header(..., description="User ID from auth service"),
+):
+    """Get notification history for the current user (owned networks and global notifications)"""
+    return await _get_history_page(
+        user_id=x_user_id,
+        cursor=cursor,
+        per_page=per_page,
+        channel=channel,
+        success=success,
+        since=since,
+        until=until,
+    )
 
 
 @router.get("/networks/{network_id}/stats", response_model=NotificationStatsResponse)
@@ -179,7 +283,29 @@ async def get_network_notification_stats(
     x_user_id: str = Header(..., description="User ID from auth service"),
 ):
     """Get notification statistics for a specific network"""
-    return notification_manager.get_stats(network_id=network_id)
+    return await notification_manager.get_stats(network_id=network_id)
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+@router.get("/networks/{network_id}/stats/range", response_model=NotificationStatsRange)
+async def get_network_notification_stats_range(
+    network_id: str,
+    since: datetime = Query(..., description="Start of the range (inclusive)"),
+    until: Optional[datetime] = Query(
+        None, description="End of the range (exclusive, default now)"
+    ),
+    x_user_id: str = Header(..., description="User ID from auth service"),
+):
+    """Get notification statistics for a network over an arbitrary time range"""
+    # Naive query params are UTC; comparing them with aware ones would raise
+    since = _as_utc(since)
+    until = _as_utc(until) if until is not None else None
+    if until is not None and until <= since:
+        raise HTTPException(status_code=400, detail="until must be after since")
+    return await notification_manager.get_stats_range(network_id, since, until)
 
 
 # ==================== Anomaly Detection ====================
@@ -283,6 +409,31 @@ async def sync_current_devices(
     }
 
 
+@router.post("/ml/sync-devices/delta")
+async def sync_device_changes(
+    delta: DeviceSyncDelta,
+    network_id: str = Query(..., description="Network ID (UUID) these devices belong to"),
+):
+    """
+    Apply devices added to or removed from a network.
+
+    The health service sends only what changed when a network's device set is
+    updated, so the cost follows the size of the change rather than the network.
+    Until a full list has been synced (e.g. after a restart) the change has no
+    base to apply to, so it is refused and the health service resends the list.
+    """
+    detector = network_anomaly_detector_manager.get_detector(network_id)
+    if not detector.devices_synced:
+        raise HTTPException(status_code=409, detail="Full device list required")
+    detector.update_current_devices(delta.added, delta.removed)
+    return {
+        "success": True,
+        "devices_added": len(delta.added),
+        "devices_removed": len(delta.removed),
+        "network_id": network_id,
+    }
+
+
 # ==================== Health Check Processing ====================
 
 
@@ -297,7 +448,6 @@ async def _dispatch_event_to_network(
     Returns the number of users successfully notified.
     """
     from ..services.notification_dispatch import notification_dispatch_service
-    from ..services.user_preferences import user_preferences_service
 
     user_ids = await user_preferences_service.get_network_member_user_ids(db, network_id)
 
@@ -320,6 +470,22 @@ async def _dispatch_event_to_network(
     return successful
 
 
+async def dispatch_buffered_event(network_id: str, event: NetworkEvent) -> int:
+    """Dispatch an event flushed from the mass outage buffers in its own session."""
+    if event.event_type in (NotificationType.MASS_OUTAGE, NotificationType.MASS_RECOVERY):
+        logger.info(
+            f"{event.title} for network {network_id}: "
+            f"{event.details.get('total_affected', event.details.get('total_recovered', 0))} devices"
+        )
+    else:
+        logger.info(
+            f"Dispatching expired individual {event.event_type.value} notification for "
+            f"{event.device_ip} in network {network_id}"
+        )
+    async with async_session_maker() as db:
+        return await _dispatch_event_to_network(db, network_id, event)
+
+
 @router.post("/process-health-check")
 async def process_health_check(
     device_ip: str,
@@ -337,9 +503,10 @@ async def process_health_check(
     This endpoint should be called by the health service after each check.
     It will train the ML model and potentially send notifications.
 
-    Mass outage detection: When 3+ devices go offline within 60 seconds,
-    notifications are aggregated into a single "mass outage" notification
-    instead of individual alerts for each device.
+    Mass outage detection: When 3+ devices go offline within the collection
+    window, notifications are aggregated into a single "mass outage" notification
+    instead of individual alerts for each device. Offline and online events are
+    buffered and dispatched by the detector's flush timer, not by this request.
 
     Args:
         device_ip: IP address of the device
@@ -350,7 +517,6 @@ async def process_health_check(
         device_name: Optional device name
         previous_state: Optional previous state (online/offline)
     """
-    from ..services.mass_outage_detector import mass_outage_detector
     from ..services.network_anomaly_detector import network_anomaly_detector_manager
 
     # Process health check with per-network detector
@@ -400,8 +566,9 @@ async def process_health_check(
         )
 
         try:
+            # Offline/online events are buffered for mass outage aggregation; the
+            # detector's flush timer dispatches them once their window or grace period ends
             if event.event_type == NotificationType.DEVICE_OFFLINE:
-                # Record offline event for potential mass outage aggregation
                 mass_outage_detector.record_offline_event(
                     network_id=network_id,
                     device_ip=device_ip,
@@ -409,22 +576,7 @@ async def process_health_check(
                     event=event,
                 )
 
-                # Check if threshold is reached (this tracks when it was first reached)
-                mass_outage_detector.should_aggregate(network_id)
-
-                # Only flush after grace period to allow concurrent arrivals
-                if mass_outage_detector.is_ready_to_flush_offline(network_id):
-                    mass_event = mass_outage_detector.flush_and_create_mass_outage_event(network_id)
-                    if mass_event:
-                        logger.info(
-                            f"Mass outage detected for network {network_id}: "
-                            f"{mass_event.details.get('total_affected', 0)} devices affected"
-                        )
-                        await _dispatch_event_to_network(db, network_id, mass_event)
-                        events_dispatched = 1
-
             elif event.event_type == NotificationType.DEVICE_ONLINE:
-                # Record online event for potential mass recovery aggregation
                 mass_outage_detector.record_online_event(
                     network_id=network_id,
                     device_ip=device_ip,
@@ -432,22 +584,6 @@ async def process_health_check(
                     event=event,
                 )
 
-                # Check if threshold is reached (this tracks when it was first reached)
-                mass_outage_detector.should_aggregate_online(network_id)
-
-                # Only flush after grace period to allow concurrent arrivals
-                if mass_outage_detector.is_ready_to_flush_online(network_id):
-                    mass_event = mass_outage_detector.flush_and_create_mass_recovery_event(
-                        network_id
-                    )
-                    if mass_event:
-                        logger.info(
-                            f"Mass recovery detected for network {network_id}: "
-                            f"{mass_event.details.get('total_recovered', 0)} devices recovered"
-                        )
-                        await _dispatch_event_to_network(db, network_id, mass_event)
-                        events_dispatched = 1
-
             else:
                 # Other events (HIGH_LATENCY, PACKET_LOSS, etc.) dispatch immediately
                 await _dispatch_event_to_network(db, network_id, event)
@@ -458,56 +594,6 @@ async def process_health_check(
                 f"Failed to dispatch notification for network {network_id}: {e}", exc_info=True
             )
 
-    # Always check for expired/ready-to-flush events on every health check
-    # This ensures buffered events are dispatched even when no new events are created
-    try:
-        # Check if we should flush mass offline event (grace period passed)
-        if mass_outage_detector.is_ready_to_flush_offline(network_id):
-            mass_event = mass_outage_detector.flush_and_create_mass_outage_event(network_id)
-            if mass_event:
-                logger.info(
-                    f"Mass outage detected for network {network_id}: "
-                    f"{mass_event.details.get('total_affected', 0)} devices affected"
-                )
-                await _dispatch_event_to_network(db, network_id, mass_event)
-                events_dispatched += 1
-        else:
-            # Check expired offline events (only if not flushing mass event)
-            expired_offline = mass_outage_detector.get_expired_events(network_id)
-            for expired_event in expired_offline:
-                logger.info(
-                    f"Dispatching expired individual offline notification for "
-                    f"{expired_event.device_ip} in network {network_id}"
-                )
-                await _dispatch_event_to_network(db, network_id, expired_event)
-                events_dispatched += 1
-
-        # Check if we should flush mass online event (grace period passed)
-        if mass_outage_detector.is_ready_to_flush_online(network_id):
-            mass_event = mass_outage_detector.flush_and_create_mass_recovery_event(network_id)
-            if mass_event:
-                logger.info(
-                    f"Mass recovery detected for network {network_id}: "
-                    f"{mass_event.details.get('total_recovered', 0)} devices recovered"
-                )
-                await _dispatch_event_to_network(db, network_id, mass_event)
-                events_dispatched += 1
-        else:
-            # Check expired online events (only if not flushing mass event)
-            expired_online = mass_outage_detector.get_expired_online_events(network_id)
-            for expired_event in expired_online:
-                logger.info(
-                    f"Dispatching expired individual online notification for "
-                    f"{expired_event.device_ip} in network {network_id}"
-                )
-                await _dispatch_event_to_network(db, network_id, expired_event)
-                events_dispatched += 1
-
-    except Exception as e:
-        logger.error(
-            f"Failed to dispatch expired events for network {network_id}: {e}", exc_info=True
-        )
-
     return {
         "success": True,
         "event_created": event is not None,
@@ -627,10 +713,12 @@ async def send_manual_notification(
             "error": "user_id parameter is deprecated, use network_id instead",
         }
     else:
-        results = await notification_manager.broadcast_notification(event)
+        # Sent to every enabled network in chunks by a background job
+        job = await broadcast_jobs.submit(NETWORKS, event)
         return {
             "success": True,
-            "users_notified": len(results),
+            "users_notified": job.total if job else 0,
+            "broadcast_job_id": job.id if job else None,
         }
 
 
@@ -823,6 +911,20 @@ async def update_global_preferences(
 # ==================== Cartographer Service Status Notifications ====================
 
 
+async def _submit_status_broadcast(event: NetworkEvent) -> dict:
+    """Start a job emailing a Cartographer up/down alert to every status subscriber"""
+    job = await broadcast_jobs.submit(STATUS_SUBSCRIBERS, event)
+    if job is None:
+        return {"success": False, "subscribers_notified": 0, "total_subscribers": 0}
+    return {
+        "success": True,
+        # Subscribers queued; the job's progress reports how many were reached
+        "subscribers_notified": job.total,
+        "total_subscribers": job.total,
+        "broadcast_job_id": job.id,
+    }
+
+
 @router.post("/service-status/up")
 async def notify_cartographer_up(
     message: Optional[str] = None,
@@ -842,8 +944,6 @@ async def notify_cartographer_up(
         NotificationType,
         get_default_priority_for_type,
     )
-    from ..services.cartographer_status import cartographer_status_service
-    from ..services.email_service import is_email_configured, send_notification_email
 
     if not is_email_configured():
         return {
@@ -869,29 +969,7 @@ async def notify_cartographer_up(
         },
     )
 
-    subscribers = cartographer_status_service.get_subscribers_for_event(
-        NotificationType.CARTOGRAPHER_UP
-    )
-    notification_id = str(uuid.uuid4())
-    successful = 0
-
-    for subscriber in subscribers:
-        try:
-            record = await send_notification_email(
-                to_email=subscriber.email_address,
-                event=event,
-                notification_id=notification_id,
-            )
-            if record.success:
-                successful += 1
-        except Exception as e:
-            logger.error(f"Failed to send to {subscriber.email_address}: {e}")
-
-    return {
-        "success": successful > 0,
-        "subscribers_notified": successful,
-        "total_subscribers": len(subscribers),
-    }
+    return await _submit_status_broadcast(event)
 
 
 @router.post("/service-status/down")
@@ -915,8 +993,6 @@ async def notify_cartographer_down(
         NotificationType,
         get_default_priority_for_type,
     )
-    from ..services.cartographer_status import cartographer_status_service
-    from ..services.email_service import is_email_configured, send_notification_email
 
     if not is_email_configured():
         return {
@@ -942,29 +1018,7 @@ async def notify_cartographer_down(
         },
     )
 
-    subscribers = cartographer_status_service.get_subscribers_for_event(
-        NotificationType.CARTOGRAPHER_DOWN
-    )
-    notification_id = str(uuid.uuid4())
-    successful = 0
-
-    for subscriber in subscribers:
-        try:
-            record = await send_notification_email(
-                to_email=subscriber.email_address,
-                event=event,
-                notification_id=notification_id,
-            )
-            if record.success:
-                successful += 1
-        except Exception as e:
-            logger.error(f"Failed to send to {subscriber.email_address}: {e}")
-
-    return {
-        "success": successful > 0,
-        "subscribers_notified": successful,
-        "total_subscribers": len(subscribers),
-    }
+    return await _submit_status_broadcast(event)
 
 
 # ==================== Version Update Notifications ====================
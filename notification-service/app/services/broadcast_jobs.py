@@ -0,0 +1,487 @@
+"""
+Chunked, resumable broadcast delivery.
+
+A broadcast to every network (version updates and manual broadcasts) or to
+every Cartographer status subscriber (up/down alerts) is stored as a job
+instead of being sent in one pass. The
+job pages through its recipients in sorted order, ``broadcast_chunk_size``
+at a time, and after each chunk writes its cursor (the last recipient
+handled) and sent/failed/skipped counters. Recipients are resolved once when
+a replica starts or resumes the job, and the job continues strictly after
+the cursor, so nobody before the cursor is sent twice.
+
+A job is owned by one replica through a lease that is renewed with every
+saved chunk. A chunk is cut short once half the lease has passed, so paced
+sends can never outlast the lease and let another replica adopt the job
+mid-chunk. If the owner dies, the lease expires and any replica picks the
+job up from its last saved chunk; at most that one chunk is sent again.
+
+Sends are paced per channel (``broadcast_email_per_second``,
+``broadcast_discord_per_second``) so a large user base becomes a steady
+stream rather than one long burst.
+"""
+
+import asyncio
+import bisect
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+
+from sqlalchemy import or_, select, update
+
+from ..config import settings
+from ..database import async_session_maker
+from ..models import BroadcastJobProgress, NetworkEvent, NotificationChannel, NotificationRecord
+from ..models.database import BroadcastJob
+from .preference_cache import detached_copy
+
+logger = logging.getLogger(__name__)
+
+# Recipient kinds
+NETWORKS = "networks"
+STATUS_SUBSCRIBERS = "status_subscribers"
+
+
+def _channel_rate(channel: NotificationChannel) -> float:
+    if channel == NotificationChannel.EMAIL:
+        return settings.broadcast_email_per_second
+    if channel == NotificationChannel.DISCORD:
+        return settings.broadcast_discord_per_second
+    return 0.0
+
+
+class ChannelThrottle:
+    """Paces sends so each channel stays at or below its configured rate"""
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic, sleep=asyncio.sleep):
+        self._clock = clock
+        self._sleep = sleep
+        self._next_slot: dict[NotificationChannel, float] = {}
+
+    async def acquire(self, channel: NotificationChannel):
+        rate = _channel_rate(channel)
+        if rate <= 0:
+            return
+        now = self._clock()
+        slot = max(now, self._next_slot.get(channel, now))
+        self._next_slot[channel] = slot + 1.0 / rate
+        if slot > now:
+            await self._sleep(slot - now)
+
+
+def to_progress(job: BroadcastJob) -> BroadcastJobProgress:
+    processed = job.sent + job.failed + job.skipped
+    return BroadcastJobProgress(
+        id=job.id,
+        kind=job.kind,
+        status=job.status,
+        title=job.event.get("title", ""),
+        event_type=job.event["event_type"],
+        total=job.total,
+        sent=job.sent,
+        failed=job.failed,
+        skipped=job.skipped,
+        remaining=max(0, job.total - processed),
+        last_error=job.last_error,
+        created_at=job.created_at,
+        updated_at=job.updated_at,
+        completed_at=job.completed_at,
+    )
+
+
+# ==================== Stores ====================
+
+
+def _progress_values(job: BroadcastJob, lease_expires_at: datetime | None) -> dict:
+    return {
+        "status": job.status,
+        "cursor": job.cursor,
+        "total": job.total,
+        "sent": job.sent,
+        "failed": job.failed,
+        "skipped": job.skipped,
+        "last_error": job.last_error,
+        "completed_at": job.completed_at,
+        "lease_expires_at": lease_expires_at,
+    }
+
+
+class SqlBroadcastJobStore:
+    """PostgreSQL-backed job storage"""
+
+    def __init__(self, session_maker=async_session_maker):
+        self._session_maker = session_maker
+
+    async def add(self, job: BroadcastJob):
+        async with self._session_maker() as session:
+            session.add(job)
+            await session.commit()
+
+    async def get(self, job_id: str) -> BroadcastJob | None:
+        async with self._session_maker() as session:
+            return await session.get(BroadcastJob, job_id)
+
+    async def recent(self, limit: int) -> list[BroadcastJob]:
+        async with self._session_maker() as session:
+            result = await session.execute(
+                select(BroadcastJob).order_by(BroadcastJob.created_at.desc()).limit(limit)
+            )
+            return list(result.scalars().all())
+
+    async def claim_orphaned(self, owner: str, lease_seconds: float) -> list[BroadcastJob]:
+        """Take over running jobs whose owner's lease has expired"""
+        now = datetime.now(timezone.utc)
+        orphaned_ids = (
+            select(BroadcastJob.id)
+            .where(
+                BroadcastJob.status == "running",
+                or_(BroadcastJob.lease_expires_at.is_(None), BroadcastJob.lease_expires_at <= now),
+            )
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        async with self._session_maker() as session:
+            result = await session.execute(
+                update(BroadcastJob)
+                .where(BroadcastJob.id.in_(orphaned_ids))
+                .values(owner=owner, lease_expires_at=now + timedelta(seconds=lease_seconds))
+                .returning(BroadcastJob)
+                .execution_options(synchronize_session=False)
+            )
+            jobs = list(result.scalars().all())
+            await session.commit()
+            return jobs
+
+    async def save_progress(self, job: BroadcastJob, lease_seconds: float) -> bool:
+        """Persist progress and renew the lease. False if another replica took the job."""
+        lease_expires_at = None
+        if job.status == "running":
+            lease_expires_at = datetime.now(timezone.utc) + timedelta(seconds=lease_seconds)
+        async with self._session_maker() as session:
+            result = await session.execute(
+                update(BroadcastJob)
+                .where(BroadcastJob.id == job.id, BroadcastJob.owner == job.owner)
+                .values(**_progress_values(job, lease_expires_at))
+            )
+            await session.commit()
+            return result.rowcount > 0
+
+    async def release(self, job: BroadcastJob):
+        """Give up the lease so the job can be resumed immediately"""
+        async with self._session_maker() as session:
+            await session.execute(
+                update(BroadcastJob)
+                .where(BroadcastJob.id == job.id, BroadcastJob.owner == job.owner)
+                .values(lease_expires_at=None)
+            )
+            await session.commit()
+
+
+class InMemoryBroadcastJobStore:
+    """
+    Non-durable job storage for tests and benchmarks.
+
+    Like the database, it hands out copies, so only saved progress is visible.
+    """
+
+    def __init__(self):
+        self.jobs: dict[str, BroadcastJob] = {}
+
+    async def add(self, job: BroadcastJob):
+        job.created_at = job.updated_at = datetime.now(timezone.utc)
+        self.jobs[job.id] = detached_copy(job)
+
+    async def get(self, job_id: str) -> BroadcastJob | None:
+        job = self.jobs.get(job_id)
+        return detached_copy(job) if job is not None else None
+
+    async def recent(self, limit: int) -> list[BroadcastJob]:
+        jobs = sorted(self.jobs.values(), key=lambda j: j.created_at, reverse=True)[:limit]
+        return [detached_copy(job) for job in jobs]
+
+    async def claim_orphaned(self, owner: str, lease_seconds: float) -> list[BroadcastJob]:
+        now = datetime.now(timezone.utc)
+        claimed = []
+        for job in self.jobs.values():
+            if job.status == "running" and (
+                job.lease_expires_at is None or job.lease_expires_at <= now
+            ):
+                job.owner = owner
+                job.lease_expires_at = now + timedelta(seconds=lease_seconds)
+                claimed.append(detached_copy(job))
+        return claimed
+
+    async def save_progress(self, job: BroadcastJob, lease_seconds: float) -> bool:
+        stored = self.jobs.get(job.id)
+        if stored is None or stored.owner != job.owner:
+            return False
+        lease_expires_at = None
+        if job.status == "running":
+            lease_expires_at = datetime.now(timezone.utc) + timedelta(seconds=lease_seconds)
+        for key, value in _progress_values(job, lease_expires_at).items():
+            setattr(stored, key, value)
+        stored.updated_at = datetime.now(timezone.utc)
+        return True
+
+    async def release(self, job: BroadcastJob):
+        stored = self.jobs.get(job.id)
+        if stored is not None and stored.owner == job.owner:
+            stored.lease_expires_at = None
+
+
+# ==================== Runner ====================
+
+
+class BroadcastJobRunner:
+    """Creates broadcast jobs and runs them chunk by chunk in the background"""
+
+    def __init__(
+        self,
+        store=None,
+        throttle: ChannelThrottle | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._store = store or SqlBroadcastJobStore()
+        self._throttle = throttle or ChannelThrottle()
+        self._clock = clock
+        self._owner = uuid.uuid4().hex
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._jobs: dict[str, BroadcastJob] = {}
+        # Sorted recipients per job this replica is running, resolved once per run
+        self._recipient_lists: dict[str, list[str]] = {}
+        self._supervisor: asyncio.Task | None = None
+        self._stats = {"created": 0, "resumed": 0, "completed": 0, "chunks": 0}
+
+    @property
+    def is_running(self) -> bool:
+        return self._supervisor is not None
+
+    # ==================== Recipients ====================
+
+    async def _recipients(self, kind: str, event: NetworkEvent) -> list[str]:
+        """Current recipients in the stable order jobs page through"""
+        from .cartographer_status import cartographer_status_service
+        from .notification_manager import notification_manager
+
+        if kind == NETWORKS:
+            await notification_manager.load_all_preferences()
+            recipients = notification_manager.get_all_networks_with_notifications_enabled()
+        else:
+            recipients = [
+                subscriber.user_id
+                for subscriber in cartographer_status_service.get_subscribers_for_event(
+                    event.event_type, channel=NotificationChannel.EMAIL
+                )
+            ]
+        return sorted({str(r) for r in recipients})
+
+    async def _job_recipients(self, job: BroadcastJob, event: NetworkEvent) -> list[str]:
+        recipients = self._recipient_lists.get(job.id)
+        if recipients is None:
+            recipients = await self._recipients(job.kind, event)
+            self._recipient_lists[job.id] = recipients
+        return recipients
+
+    async def _send(
+        self, kind: str, event: NetworkEvent, recipient: str, notification_id: str
+    ) -> list[NotificationRecord]:
+        from .notification_manager import notification_manager
+
+        if kind == NETWORKS:
+            network_event = event.model_copy(update={"network_id": recipient})
+            return await notification_manager.send_notification(recipient, network_event)
+
+        record = await notification_manager.send_status_notification_to_subscriber(
+            recipient, event, notification_id
+        )
+        return [record] if record is not None else []
+
+    # ==================== Jobs ====================
+
+    async def submit(self, kind: str, event: NetworkEvent) -> BroadcastJob | None:
+        """Persist a broadcast job and start running it. None if there are no recipients."""
+        recipients = await self._recipients(kind, event)
+        total = len(recipients)
+        if total == 0:
+            logger.warning(f"No recipients for {kind} broadcast: {event.title}")
+            return None
+
+        job = BroadcastJob(
+            id=str(uuid.uuid4()),
+            kind=kind,
+            event=event.model_dump(mode="json"),
+            status="running",
+            cursor=None,
+            total=total,
+            sent=0,
+            failed=0,
+            skipped=0,
+            owner=self._owner,
+            lease_expires_at=datetime.now(timezone.utc)
+            + timedelta(seconds=settings.broadcast_lease_seconds),
+        )
+        await self._store.add(job)
+        self._stats["created"] += 1
+        logger.info(f"Broadcast job {job.id} created: {kind}, {total} recipients, {event.title}")
+        self._recipient_lists[job.id] = recipients
+        self._spawn(job)
+        return job
+
+    def _spawn(self, job: BroadcastJob):
+        if job.id in self._tasks:
+            return
+        task = asyncio.create_task(self._run(job))
+        self._tasks[job.id] = task
+        self._jobs[job.id] = job
+
+        def _done(_):
+            self._tasks.pop(job.id, None)
+            self._jobs.pop(job.id, None)
+            self._recipient_lists.pop(job.id, None)
+
+        task.add_done_callback(_done)
+
+    async def wait(self, job_id: str):
+        """Wait for a job running on this replica to finish"""
+        task = self._tasks.get(job_id)
+        if task is not None:
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def _run(self, job: BroadcastJob):
+        event = NetworkEvent(**job.event)
+        try:
+            while await self.run_chunk(job, event):
+                pass
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Progress up to the last chunk is saved; the lease expiring lets a replica retry
+            logger.error(f"Broadcast job {job.id} stopped: {e}", exc_info=True)
+
+    async def run_chunk(self, job: BroadcastJob, event: NetworkEvent) -> bool:
+        """Send the next chunk and save progress. Returns False once the job is finished."""
+        recipients = await self._job_recipients(job, event)
+        start = bisect.bisect_right(recipients, job.cursor) if job.cursor is not None else 0
+        chunk = recipients[start : start + settings.broadcast_chunk_size]
+        job.total = job.sent + job.failed + job.skipped + len(recipients) - start
+
+        if not chunk:
+            job.status = "completed"
+            job.completed_at = datetime.now(timezone.utc)
+            await self._store.save_progress(job, settings.broadcast_lease_seconds)
+            self._stats["completed"] += 1
+            self._recipient_lists.pop(job.id, None)
+            logger.info(
+                f"Broadcast job {job.id} complete: {job.sent} sent, {job.failed} failed, "
+                f"{job.skipped} skipped"
+            )
+            return False
+
+        # Save (and so renew the lease) well before it can expire mid-chunk
+        deadline = self._clock() + settings.broadcast_lease_seconds / 2
+        for recipient in chunk:
+            await self._deliver(job, event, recipient)
+            job.cursor = recipient
+            if self._clock() >= deadline:
+                break
+
+        self._stats["chunks"] += 1
+        if not await self._store.save_progress(job, settings.broadcast_lease_seconds):
+            logger.warning(f"Broadcast job {job.id} was taken over by another replica")
+            self._recipient_lists.pop(job.id, None)
+            return False
+        logger.info(
+            f"Broadcast job {job.id}: {job.sent + job.failed + job.skipped}/{job.total} processed"
+        )
+        return True
+
+    async def _deliver(self, job: BroadcastJob, event: NetworkEvent, recipient: str):
+        """Send to one recipient, count the outcome and pace its channels"""
+        try:
+            records = await self._send(job.kind, event, recipient, job.id)
+        except Exception as e:
+            logger.error(f"Broadcast job {job.id} failed for {recipient}: {e}")
+            job.last_error = str(e)
+            job.failed += 1
+            return
+
+        if not records:
+            job.skipped += 1
+        elif any(record.success for record in records):
+            job.sent += 1
+        else:
+            job.failed += 1
+            job.last_error = next((r.error_message for r in records if r.error_message), None)
+
+        for channel in {record.channel for record in records}:
+            await self._throttle.acquire(channel)
+
+    async def get_progress(self, job_id: str) -> BroadcastJobProgress | None:
+        job = await self._store.get(job_id)
+        return to_progress(job) if job is not None else None
+
+    async def list_recent(self, limit: int = 20) -> list[BroadcastJobProgress]:
+        return [to_progress(job) for job in await self._store.recent(limit)]
+
+    # ==================== Lifecycle ====================
+
+    async def start(self):
+        """Resume unfinished jobs now and keep adopting orphaned ones"""
+        if self._supervisor is not None:
+            return
+        self._supervisor = asyncio.create_task(self._supervise())
+
+    async def stop(self):
+        """
+        Stop running jobs. Progress up to the last finished chunk is saved and the
+        leases are released, so the jobs resume as soon as any replica starts.
+        """
+        jobs = list(self._jobs.values())
+        tasks = list(self._tasks.values())
+        if self._supervisor is not None:
+            tasks.append(self._supervisor)
+            self._supervisor = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+        self._jobs.clear()
+
+        for job in jobs:
+            if job.status != "running":
+                continue
+            try:
+                await self._store.release(job)
+            except Exception as e:
+                logger.warning(f"Could not release broadcast job {job.id}: {e}")
+
+    async def _supervise(self):
+        while True:
+            try:
+                for job in await self._store.claim_orphaned(
+                    self._owner, settings.broadcast_lease_seconds
+                ):
+                    logger.info(
+                        f"Resuming broadcast job {job.id} after {job.sent + job.failed + job.skipped}"
+                        f"/{job.total} recipients"
+                    )
+                    self._stats["resumed"] += 1
+                    self._spawn(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Could not check for orphaned broadcast jobs: {e}")
+            await asyncio.sleep(settings.broadcast_lease_seconds)
+
+    def get_status(self) -> dict:
+        return {
+            "running": self.is_running,
+            "active_jobs": len(self._tasks),
+            **self._stats,
+        }
+
+
+# Singleton instance
+broadcast_jobs = BroadcastJobRunner()
@@ -18,10 +18,11 @@ from ..models import (
     NotificationRecord,
     NotificationType,
 )
+from .state_store import CARTOGRAPHER_SUBSCRIPTIONS, state_repository
 
 logger = logging.getLogger(__name__)
 
-# Persistence
+# Legacy JSON subscriptions, imported into the state table once on startup
 SUBSCRIPTIONS_FILE = settings.data_dir / "cartographer_status_subscriptions.json"
 
 
@@ -132,27 +133,85 @@ class CartographerStatusService:
     This is completely separate from network-scoped notifications.
     """
 
-    def __init__(self):
+    def __init__(self, state=None):
+        self._state = state or state_repository
         self._subscriptions: dict[str, CartographerStatusSubscription] = {}
-        self._load_subscriptions()
-        self._migrate_from_global_preferences()
-
-    def _save_subscriptions(self):
-        """Save subscriptions to disk"""
-        try:
-            settings.data_dir.mkdir(parents=True, exist_ok=True)
+        # event type -> channel -> user IDs reachable for that event on that channel.
+        # Kept in step with _subscriptions on every write so lookups cost O(matches).
+        # Inner dicts are used as insertion-ordered sets.
+        self._index: dict[NotificationType, dict[NotificationChannel, dict[str, None]]] = {
+            event_type: {NotificationChannel.EMAIL: {}, NotificationChannel.DISCORD: {}}
+            for event_type in (NotificationType.CARTOGRAPHER_UP, NotificationType.CARTOGRAPHER_DOWN)
+        }
 
-            data = {user_id: sub.to_dict() for user_id, sub in self._subscriptions.items()}
+    async def load_state(self):
+        """
+        Load subscriptions from the state table on startup.
+
+        A legacy JSON subscriptions file is imported first and renamed to
+        *.json.imported. Network owners among the legacy network preferences
+        imported by the notification manager are then migrated, so this must run
+        after notification_manager.load_state().
+        """
+        legacy = SUBSCRIPTIONS_FILE.exists()
+        if legacy:
+            self._load_subscriptions()
+            for user_id in self._subscriptions:
+                self._save_subscriptions(user_id)
+
+        for user_id, sub_data in (await self._state.load(CARTOGRAPHER_SUBSCRIPTIONS)).items():
+            try:
+                self._subscriptions[user_id] = CartographerStatusSubscription.from_dict(sub_data)
+            except Exception as e:
+                logger.warning(
+                    f"Failed to load Cartographer status subscription for user {user_id}: {e}"
+                )
+        for user_id in self._subscriptions:
+            self._reindex(user_id)
+        logger.info(f"Loaded {len(self._subscriptions)} Cartographer status subscriptions")
 
-            with open(SUBSCRIPTIONS_FILE, "w") as f:
-                json.dump(data, f, indent=2, default=str)
+        self._migrate_from_global_preferences()
 
-            logger.debug(f"Saved {len(self._subscriptions)} Cartographer status subscriptions")
-        except Exception as e:
-            logger.error(f"Failed to save Cartographer status subscriptions: {e}")
+        if legacy:
+            try:
+                await self._state.flush_all()
+                SUBSCRIPTIONS_FILE.rename(SUBSCRIPTIONS_FILE.with_suffix(".json.imported"))
+            except Exception as e:
+                logger.error(f"Failed to import legacy Cartographer status subscriptions: {e}")
+
+    def _reindex(self, user_id: str):
+        """Update the lookup index for one user after their subscription changed"""
+        sub = self._subscriptions.get(user_id)
+        for event_type, by_channel in self._index.items():
+            enabled = sub is not None and (
+                sub.cartographer_up_enabled
+                if event_type == NotificationType.CARTOGRAPHER_UP
+                else sub.cartographer_down_enabled
+            )
+            reachable = {
+                NotificationChannel.EMAIL: enabled
+                and sub.email_enabled
+                and bool(sub.email_address),
+                NotificationChannel.DISCORD: enabled
+                and sub.discord_enabled
+                and bool(sub.discord_channel_id or sub.discord_user_id),
+            }
+            for channel, user_ids in by_channel.items():
+                if reachable[channel]:
+                    user_ids[user_id] = None
+                else:
+                    user_ids.pop(user_id, None)
+
+    def _save_subscriptions(self, user_id: str):
+        """Write one user's subscription (or its removal) to the state table"""
+        sub = self._subscriptions.get(user_id)
+        if sub is not None:
+            self._state.put(CARTOGRAPHER_SUBSCRIPTIONS, user_id, sub.to_dict())
+        else:
+            self._state.delete(CARTOGRAPHER_SUBSCRIPTIONS, user_id)
 
     def _load_subscriptions(self):
-        """Load subscriptions from disk"""
+        """Read the legacy JSON subscriptions file"""
         try:
             if not SUBSCRIPTIONS_FILE.exists():
                 return
@@ -285,7 +344,8 @@ class CartographerStatusService:
             )
             self._subscriptions[user_id] = sub
 
-        self._save_subscriptions()
+        self._reindex(user_id)
+        self._save_subscriptions(user_id)
         logger.info(f"Updated Cartographer status subscription for user {user_id}")
         return sub
 
@@ -295,7 +355,8 @@ class CartographerStatusService:
             return False
 
         del self._subscriptions[user_id]
-        self._save_subscriptions()
+        self._reindex(user_id)
+        self._save_subscriptions(user_id)
         logger.info(f"Deleted Cartographer status subscription for user {user_id}")
         return True
 
@@ -304,30 +365,24 @@ class CartographerStatusService:
         return list(self._subscriptions.values())
 
     def get_subscribers_for_event(
-        self, event_type: NotificationType
+        self, event_type: NotificationType, channel: NotificationChannel | None = None
     ) -> list[CartographerStatusSubscription]:
-        """Get all subscribers for a specific event type who have at least one notification channel enabled"""
-        if event_type == NotificationType.CARTOGRAPHER_UP:
-            return [
-                sub
-                for sub in self._subscriptions.values()
-                if sub.cartographer_up_enabled
-                and (
-                    (sub.email_enabled and sub.email_address)
-                    or (sub.discord_enabled and (sub.discord_channel_id or sub.discord_user_id))
-                )
-            ]
-        elif event_type == NotificationType.CARTOGRAPHER_DOWN:
-            return [
-                sub
-                for sub in self._subscriptions.values()
-                if sub.cartographer_down_enabled
-                and (
-                    (sub.email_enabled and sub.email_address)
-                    or (sub.discord_enabled and (sub.discord_channel_id or sub.discord_user_id))
-                )
-            ]
-        return []
+        """
+        Get all subscribers for a specific event type who have at least one notification
+        channel enabled, or only those reachable on ``channel`` if given
+        """
+        by_channel = self._index.get(event_type)
+        if by_channel is None:
+            return []
+        if channel is not None:
+            user_ids = by_channel.get(channel, {})
+        else:
+            # Subscribers reachable on both channels are returned once
+            user_ids = {
+                **by_channel[NotificationChannel.EMAIL],
+                **by_channel[NotificationChannel.DISCORD],
+            }
+        return [self._subscriptions[user_id] for user_id in user_ids]
 
     def _migrate_from_global_preferences(self):
         """Migrate users from old global preferences system to new subscription system"""
@@ -0,0 +1,442 @@
+"""
+Rate-limit-aware Discord DM delivery.
+
+Direct messages are sent over the Discord REST API instead of through
+discord.py's ``fetch_user`` + ``user.send`` pair, which costs two REST calls
+per notification and hides rate limiting inside the library.
+
+- DM channel ids are cached per Discord user with a TTL, so a steady-state
+  notification is a single ``POST /channels/{id}/messages``. Expired channels,
+  and buckets whose limit has reset, are swept out as new ones are added.
+- Rate-limit buckets are tracked from the ``X-RateLimit-*`` response headers.
+  Requests wait for their bucket (or the global limit) to reset instead of
+  running into 429s; a 429 that slips through is retried after ``retry_after``.
+- Alerts queued for the same user within the coalesce window, or while that
+  user's previous message is waiting on a rate limit, are merged into a single
+  message with one embed per alert.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+
+import httpx
+
+from ..config import settings
+from ..models import NetworkEvent, NotificationChannel, NotificationRecord
+
+logger = logging.getLogger(__name__)
+
+DISCORD_API_URL = "https://discord.com/api/v10"
+
+# Discord allows at most 10 embeds per message
+MAX_EMBEDS_PER_MESSAGE = 10
+
+# Discord JSON error code for a channel that no longer exists
+UNKNOWN_CHANNEL_CODE = 10003
+
+# Buckets and DM channels are keyed per user, so expired entries are swept out
+# at most this often when new ones are added
+PRUNE_INTERVAL_SECONDS = 60.0
+
+
+class DiscordDeliveryError(Exception):
+    """Raised when Discord rejects a delivery"""
+
+    def __init__(self, message: str, status_code: int | None = None, code: int | None = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.code = code
+
+
+@dataclass
+class RateLimitBucket:
+    """Remaining requests and reset deadline for one rate-limit bucket"""
+
+    remaining: int = 1
+    reset_at: float = 0.0
+    bucket_hash: str | None = None
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+
+class DiscordRestClient:
+    """Minimal Discord REST client that schedules requests around rate-limit buckets"""
+
+    def __init__(
+        self,
+        token: str | None = None,
+        base_url: str = DISCORD_API_URL,
+        transport: httpx.AsyncBaseTransport | None = None,
+        max_retries: int = 3,
+        clock=time.monotonic,
+    ):
+        self._token = token
+        self._base_url = base_url
+        self._transport = transport
+        self._max_retries = max_retries
+        self._clock = clock
+        self._client: httpx.AsyncClient | None = None
+        self._buckets: dict[str, RateLimitBucket] = {}
+        self._global_reset_at = 0.0
+        self._next_prune = 0.0
+
+        self.rate_limit_waits = 0
+        self.rate_limited_responses = 0
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self._base_url,
+                headers={"Authorization": f"Bot {self._token or settings.discord_bot_token}"},
+                timeout=httpx.Timeout(15.0, connect=5.0),
+                transport=self._transport,
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _wait_until(self, deadline: float):
+        delay = deadline - self._clock()
+        if delay > 0:
+            self.rate_limit_waits += 1
+            await asyncio.sleep(delay)
+
+    def _update_bucket(self, bucket: RateLimitBucket, response: httpx.Response):
+        headers = response.headers
+        if "X-RateLimit-Bucket" in headers:
+            bucket.bucket_hash = headers["X-RateLimit-Bucket"]
+        if "X-RateLimit-Remaining" in headers:
+            bucket.remaining = int(headers["X-RateLimit-Remaining"])
+        if "X-RateLimit-Reset-After" in headers:
+            bucket.reset_at = self._clock() + float(headers["X-RateLimit-Reset-After"])
+
+    async def request(
+        self, method: str, path: str, route: str, major: str = "", json: dict | None = None
+    ) -> httpx.Response:
+        """
+        Send a request, waiting for its bucket first.
+
+        ``route`` is the path template (e.g. ``/channels/{channel_id}/messages``)
+        and ``major`` the major parameter; together they identify the bucket.
+        Requests in the same bucket are serialized so ``remaining`` stays exact.
+        """
+        key = f"{method} {route}:{major}"
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            self._prune_buckets()
+            bucket = self._buckets[key] = RateLimitBucket()
+
+        async with bucket.lock:
+            for _ in range(self._max_retries + 1):
+                await self._wait_until(self._global_reset_at)
+                if bucket.remaining <= 0:
+                    await self._wait_until(bucket.reset_at)
+                    bucket.remaining = 1
+
+                response = await self._get_client().request(method, path, json=json)
+                self._update_bucket(bucket, response)
+
+                if response.status_code != 429:
+                    return response
+
+                self.rate_limited_responses += 1
+                body = _json_body(response)
+                retry_after = float(
+                    body.get("retry_after") or response.headers.get("Retry-After") or 1.0
+                )
+                if body.get("global") or response.headers.get("X-RateLimit-Global"):
+                    self._global_reset_at = self._clock() + retry_after
+                else:
+                    bucket.remaining = 0
+                    bucket.reset_at = self._clock() + retry_after
+                logger.warning(
+                    f"Discord rate limited on {method} {route}; retrying in {retry_after}s"
+                )
+
+        return response
+
+    def _prune_buckets(self):
+        """Drop idle buckets whose limit has reset; they behave like new ones"""
+        now = self._clock()
+        if now < self._next_prune:
+            return
+        self._next_prune = now + PRUNE_INTERVAL_SECONDS
+        self._buckets = {
+            key: bucket
+            for key, bucket in self._buckets.items()
+            if bucket.lock.locked() or bucket.reset_at > now
+        }
+
+    def get_bucket_status(self) -> dict[str, dict]:
+        """Current view of tracked buckets, for diagnostics"""
+        now = self._clock()
+        return {
+            key: {
+                "bucket": bucket.bucket_hash,
+                "remaining": bucket.remaining,
+                "reset_after": max(0.0, bucket.reset_at - now),
+            }
+            for key, bucket in self._buckets.items()
+        }
+
+
+@dataclass
+class _PendingAlert:
+    event: NetworkEvent
+    notification_id: str
+    future: asyncio.Future
+
+
+class DiscordDeliveryQueue:
+    """Coalescing, rate-limit-aware queue for Discord DMs"""
+
+    def __init__(self, rest: DiscordRestClient | None = None, clock=time.monotonic):
+        self._rest = rest or DiscordRestClient(clock=clock)
+        self._clock = clock
+        self._dm_channels: dict[str, tuple[str, float]] = {}
+        self._next_prune = 0.0
+        self._pending: dict[str, list[_PendingAlert]] = {}
+        self._flush_tasks: dict[str, asyncio.Task] = {}
+        self._running = False
+
+        self._stats = {
+            "messages_sent": 0,
+            "alerts_delivered": 0,
+            "alerts_coalesced": 0,
+            "alerts_failed": 0,
+            "dm_channel_cache_hits": 0,
+            "dm_channel_cache_misses": 0,
+        }
+
+    @property
+    def is_running(self) -> bool:
+        return self._running
+
+    async def start(self):
+        self._running = True
+        logger.info("Discord delivery queue started")
+
+    async def stop(self):
+        """Stop accepting alerts and wait for queued ones to be delivered"""
+        self._running = False
+        if self._flush_tasks:
+            await asyncio.gather(*self._flush_tasks.values(), return_exceptions=True)
+        await self._rest.aclose()
+        logger.info("Discord delivery queue stopped")
+
+    async def send_dm(
+        self, discord_user_id: str, event: NetworkEvent, notification_id: str
+    ) -> NotificationRecord:
+        """Queue an alert for a user and wait for the message that carries it"""
+        if not self._running:
+            # After stop() nothing would flush the alert or own the REST client
+            return NotificationRecord(
+                notification_id=notification_id,
+                event_id=event.event_id,
+                network_id=event.network_id,
+                channel=NotificationChannel.DISCORD,
+                title=event.title,
+                message=event.message,
+                priority=event.priority,
+                success=False,
+                error_message="Discord delivery queue is not running",
+            )
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.setdefault(discord_user_id, []).append(
+            _PendingAlert(event=event, notification_id=notification_id, future=future)
+        )
+        if discord_user_id not in self._flush_tasks:
+            self._flush_tasks[discord_user_id] = asyncio.create_task(
+                self._flush_user(discord_user_id)
+            )
+        try:
+            return await future
+        except asyncio.CancelledError:
+            # A caller that gives up must not leave its alert behind to be sent
+            self.withdraw(discord_user_id, notification_id)
+            raise
+
+    def withdraw(self, discord_user_id: str, notification_id: str) -> bool:
+        """
+        Remove a queued alert that has not been handed to Discord yet.
+
+        Returns False when the alert is not queued, e.g. because its message is
+        already being sent.
+        """
+        pending = self._pending.get(discord_user_id, [])
+        for i, alert in enumerate(pending):
+            if alert.notification_id == notification_id:
+                del pending[i]
+                if not alert.future.done():
+                    alert.future.cancel()
+                return True
+        return False
+
+    async def _flush_user(self, discord_user_id: str):
+        try:
+            # Give closely spaced alerts for this user a chance to join the message
+            await asyncio.sleep(settings.discord_dm_coalesce_window_seconds)
+
+            while self._pending.get(discord_user_id):
+                pending = self._pending[discord_user_id]
+                batch = pending[:MAX_EMBEDS_PER_MESSAGE]
+                del pending[:MAX_EMBEDS_PER_MESSAGE]
+
+                error = None
+                try:
+                    await self._deliver(discord_user_id, [alert.event for alert in batch])
+                except Exception as e:
+                    error = str(e)
+                    logger.error(f"Failed to send Discord DM to user {discord_user_id}: {e}")
+
+                self._resolve(batch, error)
+        finally:
+            self._flush_tasks.pop(discord_user_id, None)
+            if not self._pending.get(discord_user_id):
+                self._pending.pop(discord_user_id, None)
+
+    def _resolve(self, batch: list[_PendingAlert], error: str | None):
+        if error is None:
+            self._stats["messages_sent"] += 1
+            self._stats["alerts_delivered"] += len(batch)
+            self._stats["alerts_coalesced"] += len(batch) - 1
+        else:
+            self._stats["alerts_failed"] += len(batch)
+
+        for alert in batch:
+            if alert.future.done():
+                continue
+            alert.future.set_result(
+                NotificationRecord(
+                    notification_id=alert.notification_id,
+                    event_id=alert.event.event_id,
+                    network_id=alert.event.network_id,
+                    channel=NotificationChannel.DISCORD,
+                    title=alert.event.title,
+                    message=alert.event.message,
+                    priority=alert.event.priority,
+                    success=error is None,
+                    error_message=error,
+                )
+            )
+
+    async def _get_dm_channel(self, discord_user_id: str) -> str:
+        cached = self._dm_channels.get(discord_user_id)
+        if cached and cached[1] > self._clock():
+            self._stats["dm_channel_cache_hits"] += 1
+            return cached[0]
+
+        self._stats["dm_channel_cache_misses"] += 1
+        response = await self._rest.request(
+            "POST",
+            "/users/@me/channels",
+            route="/users/@me/channels",
+            json={"recipient_id": discord_user_id},
+        )
+        self._raise_for_status(response, f"open DM channel for user {discord_user_id}")
+        channel_id = str(response.json()["id"])
+        self._prune_dm_channels()
+        self._dm_channels[discord_user_id] = (
+            channel_id,
+            self._clock() + settings.discord_dm_channel_ttl_seconds,
+        )
+        return channel_id
+
+    def _prune_dm_channels(self):
+        """Drop DM channel ids whose TTL has passed"""
+        now = self._clock()
+        if now < self._next_prune:
+            return
+        self._next_prune = now + PRUNE_INTERVAL_SECONDS
+        self._dm_channels = {
+            user_id: cached for user_id, cached in self._dm_channels.items() if cached[1] > now
+        }
+
+    async def _deliver(self, discord_user_id: str, events: list[NetworkEvent]):
+        payload = _build_message_payload(events)
+
+        for attempt in range(2):
+            channel_id = await self._get_dm_channel(discord_user_id)
+            response = await self._rest.request(
+                "POST",
+                f"/channels/{channel_id}/messages",
+                route="/channels/{channel_id}/messages",
+                major=channel_id,
+                json=payload,
+            )
+            try:
+                self._raise_for_status(response, f"send DM to user {discord_user_id}")
+                return
+            except DiscordDeliveryError as e:
+                # A cached DM channel can disappear; reopen it once
+                if attempt == 0 and e.code == UNKNOWN_CHANNEL_CODE:
+                    self._dm_channels.pop(discord_user_id, None)
+                    continue
+                raise
+
+    @staticmethod
+    def _raise_for_status(response: httpx.Response, action: str):
+        if response.status_code < 400:
+            return
+        code = _json_body(response).get("code")
+        raise DiscordDeliveryError(
+            f"Discord failed to {action} ({response.status_code}): {response.text}",
+            status_code=response.status_code,
+            code=code,
+        )
+
+    def invalidate_user(self, discord_user_id: str):
+        """Drop a cached DM channel, e.g. after the user unlinks their account"""
+        self._dm_channels.pop(discord_user_id, None)
+
+    def get_status(self) -> dict:
+        return {
+            "running": self._running,
+            "pending_users": len(self._pending),
+            "pending_alerts": sum(len(p) for p in self._pending.values()),
+            "cached_dm_channels": len(self._dm_channels),
+            "rate_limit_waits": self._rest.rate_limit_waits,
+            "rate_limited_responses": self._rest.rate_limited_responses,
+            **self._stats,
+        }
+
+
+def _json_body(response: httpx.Response) -> dict:
+    """Decode a JSON object body, or return {} for empty, HTML or otherwise non-JSON bodies"""
+    try:
+        body = response.json()
+    except ValueError:
+        return {}
+    return body if isinstance(body, dict) else {}
+
+
+def _build_message_payload(events: list[NetworkEvent]) -> dict:
+    """Build one message carrying an embed per event and a link button"""
+    from .discord_service import _build_discord_embed
+
+    network_ids = {event.network_id for event in events}
+    if len(network_ids) == 1 and events[0].network_id:
+        url = f"{settings.application_url}/network/{events[0].network_id}"
+        label = "Open Network Map"
+    else:
+        url = settings.application_url
+        label = "Open Cartographer"
+
+    payload = {
+        "embeds": [_build_discord_embed(event) for event in events],
+        "components": [
+            {"type": 1, "components": [{"type": 2, "style": 5, "label": label, "url": url}]}
+        ],
+    }
+    if len(events) > 1:
+        payload["content"] = f"**{len(events)} new alerts**"
+    return payload
+
+
+# Singleton instance
+discord_delivery_queue = DiscordDeliveryQueue()
@@ -14,6 +14,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..config import settings
 from ..models.database import DiscordUserLink
+from .discord_delivery import discord_delivery_queue
 
 logger = logging.getLogger(__name__)
 
@@ -246,6 +247,7 @@ class DiscordOAuthService:
         if link:
             await db.delete(link)
             await db.commit()
+            discord_delivery_queue.invalidate_user(link.discord_id)
             return True
         return False
 
@@ -23,6 +23,7 @@ from ..models import (
     NotificationType,
 )
 from ..utils import get_notification_icon, get_priority_color_discord
+from .discord_delivery import discord_delivery_queue
 
 logger = logging.getLogger(__name__)
 
@@ -278,6 +279,16 @@ class DiscordNotificationService:
             record.error_message = "Discord not configured - DISCORD_BOT_TOKEN not set"
             return record
 
+        # DMs go over REST through the coalescing, rate-limit-aware queue
+        if (
+            config.delivery_method == DiscordDeliveryMethod.DM
+            and config.discord_user_id
+            and discord_delivery_queue.is_running
+        ):
+            return await discord_delivery_queue.send_dm(
+                config.discord_user_id, event, notification_id
+            )
+
         if not self._client or not self._ready.is_set():
             record.error_message = "Discord bot not connected"
             return record
@@ -0,0 +1,548 @@
+"""
+Durable outbox for notification emails.
+
+Callers enqueue an already-rendered email and return immediately. Background
+workers claim due messages in batches, deliver them through the Resend batch
+API over a pooled HTTP client, and retry failures with exponential backoff.
+Messages that exhaust their retries (or are rejected outright) are kept as
+dead letters so they can be inspected and requeued.
+
+Claiming uses a visibility timeout: a claimed message has its
+``next_attempt_at`` pushed out by a lease, so if a worker dies mid-send the
+message simply becomes due again once the lease expires.
+
+Resend rejects a whole batch when a single message in it is invalid, so a
+rejected batch is split in halves and resent until the offending messages are
+isolated; only those are dead-lettered. Sent messages are purged once they are
+older than the retention window, in bounded batches.
+"""
+
+import asyncio
+import logging
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import httpx
+from sqlalchemy import delete, func, select, update
+
+from ..config import settings
+from ..database import async_session_maker
+from ..models.database import EmailOutboxMessage
+
+logger = logging.getLogger(__name__)
+
+RESEND_API_URL = "https://api.resend.com"
+
+# Resend accepts at most 100 emails per batch request
+RESEND_MAX_BATCH_SIZE = 100
+
+# How often the first worker purges sent messages past their retention
+RETENTION_INTERVAL_SECONDS = 3600.0
+
+
+class EmailProviderError(Exception):
+    """Raised when the email provider rejects or fails a batch"""
+
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+# ==================== Providers ====================
+
+
+class ResendBatchProvider:
+    """Sends batches through the Resend batch API using a pooled async client"""
+
+    def __init__(self, api_key: str | None = None, base_url: str = RESEND_API_URL):
+        self._api_key = api_key
+        self._base_url = base_url
+        self._client: httpx.AsyncClient | None = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self._base_url,
+                headers={"Authorization": f"Bearer {self._api_key or settings.resend_api_key}"},
+                timeout=httpx.Timeout(15.0, connect=5.0),
+                limits=httpx.Limits(max_connections=10, max_keepalive_connections=10),
+            )
+        return self._client
+
+    async def send_batch(self, payloads: list[dict]) -> list[str | None]:
+        """Send a batch of emails, returning provider ids in the same order"""
+        try:
+            response = await self._get_client().post("/emails/batch", json=payloads)
+        except httpx.HTTPError as e:
+            raise EmailProviderError(f"Resend request failed: {e}") from e
+
+        if response.status_code == 429 or response.status_code >= 500:
+            raise EmailProviderError(f"Resend returned {response.status_code}: {response.text}")
+        if response.status_code >= 400:
+            raise EmailProviderError(
+                f"Resend rejected batch ({response.status_code}): {response.text}",
+                retryable=False,
+            )
+
+        data = response.json().get("data") or []
+        return [item.get("id") for item in data] + [None] * (len(payloads) - len(data))
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class FakeEmailProvider:
+    """
+    In-process provider for tests and benchmarks.
+
+    Records every delivered payload. ``fail_next`` queues exceptions to raise on
+    upcoming batches, ``rejected_addresses`` makes any batch containing one of
+    them fail permanently (as Resend does), and ``latency`` simulates the
+    provider round-trip.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.sent: list[dict] = []
+        self.batches: list[list[dict]] = []
+        self.fail_next: list[Exception] = []
+        self.rejected_addresses: set[str] = set()
+
+    async def send_batch(self, payloads: list[dict]) -> list[str | None]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.fail_next:
+            raise self.fail_next.pop(0)
+        if any(to in self.rejected_addresses for p in payloads for to in p["to"]):
+            raise EmailProviderError("Invalid `to` field", retryable=False)
+        self.batches.append(payloads)
+        self.sent.extend(payloads)
+        return [f"fake-{uuid.uuid4()}" for _ in payloads]
+
+    async def aclose(self):
+        pass
+
+
+# ==================== Stores ====================
+
+
+class SqlOutboxStore:
+    """PostgreSQL-backed outbox storage"""
+
+    def __init__(self, session_maker=async_session_maker):
+        self._session_maker = session_maker
+
+    async def add(self, message: EmailOutboxMessage):
+        async with self._session_maker() as session:
+            session.add(message)
+            await session.commit()
+
+    async def claim_due(self, limit: int, lease_seconds: float) -> list[EmailOutboxMessage]:
+        """Claim up to ``limit`` due messages, skipping rows locked by other workers"""
+        now = datetime.now(timezone.utc)
+        due_ids = (
+            select(EmailOutboxMessage.id)
+            .where(
+                EmailOutboxMessage.status == "pending",
+                EmailOutboxMessage.next_attempt_at <= now,
+            )
+            .order_by(EmailOutboxMessage.next_attempt_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        async with self._session_maker() as session:
+            result = await session.execute(
+                update(EmailOutboxMessage)
+                .where(EmailOutboxMessage.id.in_(due_ids))
+                .values(
+                    attempts=EmailOutboxMessage.attempts + 1,
+                    next_attempt_at=now + timedelta(seconds=lease_seconds),
+                )
+                .returning(EmailOutboxMessage)
+                .execution_options(synchronize_session=False)
+            )
+            messages = list(result.scalars().all())
+            await session.commit()
+            return messages
+
+    async def mark_sent(self, provider_ids: dict[str, str | None]):
+        async with self._session_maker() as session:
+            for message_id, provider_id in provider_ids.items():
+                await session.execute(
+                    update(EmailOutboxMessage)
+                    .where(EmailOutboxMessage.id == message_id)
+                    .values(status="sent", provider_message_id=provider_id, last_error=None)
+                )
+            await session.commit()
+
+    async def mark_failed(
+        self, message_ids: list[str], error: str, next_attempt_at: dict[str, datetime | None]
+    ):
+        """Reschedule failed messages, or dead-letter those with no next attempt"""
+        async with self._session_maker() as session:
+            for message_id in message_ids:
+                retry_at = next_attempt_at.get(message_id)
+                values = {"last_error": error}
+                if retry_at is None:
+                    values["status"] = "dead"
+                else:
+                    values["next_attempt_at"] = retry_at
+                await session.execute(
+                    update(EmailOutboxMessage)
+                    .where(EmailOutboxMessage.id == message_id)
+                    .values(**values)
+                )
+            await session.commit()
+
+    async def dead_letters(self, limit: int) -> list[EmailOutboxMessage]:
+        async with self._session_maker() as session:
+            result = await session.execute(
+                select(EmailOutboxMessage)
+                .where(EmailOutboxMessage.status == "dead")
+                .order_by(EmailOutboxMessage.updated_at.desc())
+                .limit(limit)
+            )
+            return list(result.scalars().all())
+
+    async def requeue(self, message_id: str) -> bool:
+        async with self._session_maker() as session:
+            result = await session.execute(
+                update(EmailOutboxMessage)
+                .where(EmailOutboxMessage.id == message_id, EmailOutboxMessage.status == "dead")
+                .values(status="pending", attempts=0, next_attempt_at=func.now())
+            )
+            await session.commit()
+            return result.rowcount > 0
+
+    async def delete_sent_before(self, cutoff: datetime, batch_size: int) -> int:
+        """Delete up to ``batch_size`` sent messages last updated before ``cutoff``"""
+        expired_ids = (
+            select(EmailOutboxMessage.id)
+            .where(EmailOutboxMessage.status == "sent", EmailOutboxMessage.updated_at < cutoff)
+            .limit(batch_size)
+            .scalar_subquery()
+        )
+        async with self._session_maker() as session:
+            result = await session.execute(
+                delete(EmailOutboxMessage)
+                .where(EmailOutboxMessage.id.in_(expired_ids))
+                .execution_options(synchronize_session=False)
+            )
+            await session.commit()
+            return result.rowcount
+
+
+class InMemoryOutboxStore:
+    """Non-durable outbox storage for tests and benchmarks"""
+
+    def __init__(self):
+        self.messages: dict[str, EmailOutboxMessage] = {}
+
+    async def add(self, message: EmailOutboxMessage):
+        self.messages[message.id] = message
+
+    async def claim_due(self, limit: int, lease_seconds: float) -> list[EmailOutboxMessage]:
+        now = datetime.now(timezone.utc)
+        due = sorted(
+            (
+                m
+                for m in self.messages.values()
+                if m.status == "pending" and m.next_attempt_at <= now
+            ),
+            key=lambda m: m.next_attempt_at,
+        )[:limit]
+        for message in due:
+            message.attempts += 1
+            message.next_attempt_at = now + timedelta(seconds=lease_seconds)
+        return due
+
+    async def mark_sent(self, provider_ids: dict[str, str | None]):
+        for message_id, provider_id in provider_ids.items():
+            message = self.messages[message_id]
+            message.status = "sent"
+            message.provider_message_id = provider_id
+            message.last_error = None
+            message.updated_at = datetime.now(timezone.utc)
+
+    async def mark_failed(
+        self, message_ids: list[str], error: str, next_attempt_at: dict[str, datetime | None]
+    ):
+        for message_id in message_ids:
+            message = self.messages[message_id]
+            message.last_error = error
+            retry_at = next_attempt_at.get(message_id)
+            if retry_at is None:
+                message.status = "dead"
+            else:
+                message.next_attempt_at = retry_at
+
+    async def dead_letters(self, limit: int) -> list[EmailOutboxMessage]:
+        return [m for m in self.messages.values() if m.status == "dead"][:limit]
+
+    async def requeue(self, message_id: str) -> bool:
+        message = self.messages.get(message_id)
+        if message is None or message.status != "dead":
+            return False
+        message.status = "pending"
+        message.attempts = 0
+        message.next_attempt_at = datetime.now(timezone.utc)
+        return True
+
+    async def delete_sent_before(self, cutoff: datetime, batch_size: int) -> int:
+        expired = [
+            m.id
+            for m in self.messages.values()
+            if m.status == "sent" and m.updated_at is not None and m.updated_at < cutoff
+        ][:batch_size]
+        for message_id in expired:
+            del self.messages[message_id]
+        return len(expired)
+
+
+# ==================== Outbox ====================
+
+
+class EmailOutbox:
+    """Queues rendered emails and delivers them from background workers"""
+
+    def __init__(self, store=None, provider=None):
+        self._store = store or SqlOutboxStore()
+        self._provider = provider or ResendBatchProvider()
+        self._workers: list[asyncio.Task] = []
+        self._wakeup: asyncio.Event | None = None
+        self._running = False
+        self._last_retention: float | None = None  # loop time of the last purge
+
+        # Process-local counters for status reporting
+        self._stats = {"queued": 0, "sent": 0, "retried": 0, "dead_lettered": 0, "purged": 0}
+        self._last_error: str | None = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._running
+
+    async def enqueue(
+        self,
+        to_email: str,
+        subject: str,
+        html: str,
+        text: str,
+        notification_id: str,
+        event_id: str | None = None,
+        network_id: str | None = None,
+    ) -> str:
+        """Persist a rendered email for delivery and return its outbox id"""
+        message = EmailOutboxMessage(
+            id=str(uuid.uuid4()),
+            notification_id=notification_id,
+            event_id=event_id,
+            network_id=network_id,
+            to_email=to_email,
+            subject=subject,
+            html=html,
+            text=text,
+            status="pending",
+            attempts=0,
+            next_attempt_at=datetime.now(timezone.utc),
+        )
+        await self._store.add(message)
+        self._stats["queued"] += 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return message.id
+
+    async def start(self):
+        """Start the background delivery workers"""
+        if self._running:
+            return
+        self._running = True
+        self._wakeup = asyncio.Event()
+        self._workers = [
+            asyncio.create_task(self._worker_loop(i))
+            for i in range(max(1, settings.email_outbox_workers))
+        ]
+        logger.info(f"Email outbox started with {len(self._workers)} workers")
+
+    async def stop(self, drain_timeout: float = 5.0):
+        """Stop the workers, then make one last bounded attempt to drain due messages"""
+        if not self._running:
+            return
+        self._running = False
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+        try:
+            await asyncio.wait_for(self._drain(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Email outbox drain timed out; remaining messages stay queued")
+        except Exception as e:
+            logger.error(f"Email outbox drain failed: {e}")
+
+        await self._provider.aclose()
+        logger.info("Email outbox stopped")
+
+    async def _drain(self):
+        while await self.process_once():
+            pass
+
+    async def _worker_loop(self, worker_id: int):
+        while self._running:
+            try:
+                processed = await self.process_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Email outbox worker {worker_id} error: {e}", exc_info=True)
+                processed = 0
+
+            if worker_id == 0:
+                await self._maybe_enforce_retention()
+
+            if processed:
+                continue
+
+            # Idle: sleep until something is enqueued or the poll interval passes
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), timeout=settings.email_outbox_poll_interval_seconds
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    async def process_once(self) -> int:
+        """Claim and deliver one batch of due messages. Returns the batch size."""
+        batch_size = min(settings.email_outbox_batch_size, RESEND_MAX_BATCH_SIZE)
+        messages = await self._store.claim_due(batch_size, settings.email_outbox_lease_seconds)
+        if not messages:
+            return 0
+
+        await self._deliver(messages)
+        return len(messages)
+
+    async def _deliver(self, messages: list[EmailOutboxMessage]):
+        """Send one batch, splitting it when the provider rejects it outright"""
+        payloads = [
+            {
+                "from": settings.email_from,
+                "to": [message.to_email],
+                "subject": message.subject,
+                "html": message.html,
+                "text": message.text,
+            }
+            for message in messages
+        ]
+
+        try:
+            provider_ids = await self._provider.send_batch(payloads)
+        except Exception as e:
+            retryable = getattr(e, "retryable", True)
+            if not retryable and len(messages) > 1:
+                # One bad message rejects the whole batch; bisect to isolate it
+                logger.info(f"Email outbox batch of {len(messages)} rejected ({e}); splitting")
+                middle = len(messages) // 2
+                await self._deliver(messages[:middle])
+                await self._deliver(messages[middle:])
+                return
+            await self._handle_failure(messages, str(e), retryable)
+            return
+
+        await self._store.mark_sent(
+            {message.id: provider_id for message, provider_id in zip(messages, provider_ids)}
+        )
+        self._stats["sent"] += len(messages)
+        logger.info(f"✓ Email outbox delivered batch of {len(messages)}")
+
+    async def _handle_failure(
+        self, messages: list[EmailOutboxMessage], error: str, retryable: bool
+    ):
+        self._last_error = error
+        now = datetime.now(timezone.utc)
+        next_attempt_at = {}
+        for message in messages:
+            if retryable and message.attempts < settings.email_outbox_max_attempts:
+                next_attempt_at[message.id] = now + timedelta(
+                    seconds=self._backoff_seconds(message.attempts)
+                )
+            else:
+                next_attempt_at[message.id] = None
+
+        dead = sum(1 for retry_at in next_attempt_at.values() if retry_at is None)
+        self._stats["retried"] += len(messages) - dead
+        self._stats["dead_lettered"] += dead
+        logger.warning(
+            f"✗ Email outbox batch of {len(messages)} failed ({error}); "
+            f"{len(messages) - dead} rescheduled, {dead} dead-lettered"
+        )
+        await self._store.mark_failed([m.id for m in messages], error, next_attempt_at)
+
+    @staticmethod
+    def _backoff_seconds(attempts: int) -> float:
+        """Exponential backoff with jitter: base * 2^(attempts-1), capped, scaled by 0.5-1.0"""
+        delay = min(
+            settings.email_outbox_backoff_max_seconds,
+            settings.email_outbox_backoff_base_seconds * (2 ** max(0, attempts - 1)),
+        )
+        return delay * (0.5 + random.random() / 2)
+
+    async def _maybe_enforce_retention(self):
+        loop_time = asyncio.get_running_loop().time()
+        if (
+            self._last_retention is not None
+            and loop_time - self._last_retention < RETENTION_INTERVAL_SECONDS
+        ):
+            return
+        self._last_retention = loop_time
+        try:
+            await self.enforce_retention()
+        except Exception as e:
+            logger.error(f"Email outbox retention failed: {e}")
+
+    async def enforce_retention(self) -> int:
+        """Delete sent messages older than the retention window, one bounded batch at a time"""
+        if settings.email_outbox_sent_retention_days <= 0:
+            return 0
+        cutoff = datetime.now(timezone.utc) - timedelta(
+            days=settings.email_outbox_sent_retention_days
+        )
+        deleted = 0
+        while True:
+            count = await self._store.delete_sent_before(
+                cutoff, settings.email_outbox_retention_batch_size
+            )
+            deleted += count
+            if count < settings.email_outbox_retention_batch_size:
+                break
+            await asyncio.sleep(0)
+        if deleted:
+            self._stats["purged"] += deleted
+            logger.info(f"Deleted {deleted} sent outbox emails older than {cutoff}")
+        return deleted
+
+    async def get_dead_letters(self, limit: int = 50) -> list[EmailOutboxMessage]:
+        return await self._store.dead_letters(limit)
+
+    async def requeue_dead_letter(self, message_id: str) -> bool:
+        requeued = await self._store.requeue(message_id)
+        if requeued and self._wakeup is not None:
+            self._wakeup.set()
+        return requeued
+
+    def get_status(self) -> dict:
+        """Process-local outbox status for the service status endpoint"""
+        return {
+            "running": self._running,
+            "workers": len(self._workers),
+            **self._stats,
+            "last_error": self._last_error,
+        }
+
+
+# Singleton instance
+email_outbox = EmailOutbox()
@@ -4,6 +4,7 @@ Email notification service using Resend.
 Sends notification emails for network events and anomalies.
 """
 
+import asyncio
 import logging
 from datetime import datetime
 
@@ -16,6 +17,7 @@ from ..models import (
     NotificationType,
 )
 from ..utils import get_notification_icon, get_priority_color_hex
+from .email_outbox import email_outbox
 
 logger = logging.getLogger(__name__)
 
@@ -274,14 +276,29 @@ Cartographer Network Monitoring
     return text_content
 
 
+def _build_notification_email_subject(event: NetworkEvent) -> str:
+    """Build the subject line for a network event notification"""
+    if event.priority == NotificationPriority.CRITICAL:
+        return f"🚨 CRITICAL: {event.title}"
+    if event.priority == NotificationPriority.HIGH:
+        return f"⚠️ {event.title}"
+    return f"{get_notification_icon(event.event_type)} {event.title}"
+
+
 async def send_notification_email(
     to_email: str,
     event: NetworkEvent,
     notification_id: str,
+    immediate: bool = False,
 ) -> NotificationRecord:
     """
     Send a notification email for a network event.
 
+    When the email outbox is running the rendered email is queued and this
+    returns as soon as it is persisted; delivery and retries happen in the
+    background. Pass ``immediate=True`` (or run without the outbox) to send
+    inline, off the event loop.
+
     Returns a NotificationRecord with the result.
     """
     record = NotificationRecord(
@@ -302,6 +319,27 @@ async def send_notification_email(
         )
         return record
 
+    subject = _build_notification_email_subject(event)
+    html_content = _build_notification_email_html(event)
+    text_content = _build_notification_email_text(event)
+
+    if email_outbox.is_running and not immediate:
+        try:
+            await email_outbox.enqueue(
+                to_email=to_email,
+                subject=subject,
+                html=html_content,
+                text=text_content,
+                notification_id=notification_id,
+                event_id=event.event_id,
+                network_id=event.network_id,
+            )
+            record.success = True
+            logger.info(f"✓ Notification email queued for {to_email} - {event.title}")
+            return record
+        except Exception as e:
+            logger.warning(f"Failed to queue email for {to_email}, sending directly: {e}")
+
     resend = _get_resend()
     if not resend:
         record.error_message = "Resend module not available"
@@ -309,17 +347,6 @@ async def send_notification_email(
         return record
 
     try:
-        icon = get_notification_icon(event.event_type)
-        subject = f"{icon} {event.title}"
-
-        if event.priority == NotificationPriority.CRITICAL:
-            subject = f"🚨 CRITICAL: {event.title}"
-        elif event.priority == NotificationPriority.HIGH:
-            subject = f"⚠️ {event.title}"
-
-        html_content = _build_notification_email_html(event)
-        text_content = _build_notification_email_text(event)
-
         params = {
             "from": settings.email_from,
             "to": [to_email],
@@ -329,7 +356,8 @@ async def send_notification_email(
         }
 
         logger.info(f"Attempting to send email via Resend to {to_email} with subject: {subject}")
-        result = resend.Emails.send(params)
+        # The Resend SDK is synchronous; keep its HTTPS round-trip off the event loop
+        result = await asyncio.to_thread(resend.Emails.send, params)
         email_id = result.get("id") if isinstance(result, dict) else getattr(result, "id", None)
 
         if email_id:
@@ -364,7 +392,10 @@ async def send_test_email(to_email: str) -> dict[str, any]:
         },
     )
 
-    record = await send_notification_email(to_email, test_event, "test-notification")
+    # Test emails bypass the outbox so the caller sees the real delivery result
+    record = await send_notification_email(
+        to_email, test_event, "test-notification", immediate=True
+    )
 
     return {
         "success": record.success,
@@ -3,10 +3,20 @@ Mass outage and recovery detection service.
 
 Detects when multiple devices go offline or come back online within a short time
 window and aggregates notifications to prevent spam during network-wide events.
+
+Buffered events are flushed by timers rather than by the next event to arrive:
+every non-empty buffer has a deadline in a shared heap (the oldest event's
+window expiry, or the end of the grace period once the threshold is reached),
+and one background task sleeps until the earliest deadline and flushes exactly
+the buffers that are due.
 """
 
+import asyncio
+import heapq
+import itertools
 import logging
 import uuid
+from collections.abc import Awaitable, Callable
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 
@@ -14,6 +24,10 @@ from ..models import NetworkEvent, NotificationPriority, NotificationType
 
 logger = logging.getLogger(__name__)
 
+# Buffer kinds, as stored in the timer heap
+OFFLINE = "offline"
+ONLINE = "online"
+
 
 @dataclass
 class PendingDeviceEvent:
@@ -32,6 +46,10 @@ class NetworkEventBuffer:
     pending_events: dict[str, PendingDeviceEvent] = field(default_factory=dict)
     # Timestamp when threshold was first reached (for grace period before flushing)
     threshold_reached_at: datetime | None = None
+    # Deadline currently scheduled in the timer heap for this buffer
+    deadline: datetime | None = None
+    # Devices not buffered because the buffer was full (still counted in the mass event)
+    overflow: int = 0
 
 
 class MassOutageDetector:
@@ -51,13 +69,26 @@ class MassOutageDetector:
     MIN_DEVICES_FOR_MASS_EVENT = 3  # Minimum devices to trigger aggregation
     # Grace period after threshold reached before flushing (catch concurrent arrivals)
     THRESHOLD_GRACE_PERIOD_SECONDS = 1  # 1 second is enough for concurrent requests
+    # Cap on buffered devices per network and direction; extra devices are only counted
+    MAX_PENDING_EVENTS_PER_NETWORK = 500
 
-    def __init__(self):
+    def __init__(self, clock: Callable[[], datetime] = datetime.utcnow):
+        self._clock = clock
         # Per-network buffers for offline events: network_id -> NetworkEventBuffer
         self._offline_buffers: dict[str, NetworkEventBuffer] = {}
         # Per-network buffers for online events: network_id -> NetworkEventBuffer
         self._online_buffers: dict[str, NetworkEventBuffer] = {}
 
+        # Timer heap of (deadline, seq, network_id, kind). Entries whose deadline no
+        # longer matches the buffer's are stale and skipped when popped.
+        self._timers: list[tuple[datetime, int, str, str]] = []
+        self._timer_seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._dispatch: Callable[[str, NetworkEvent], Awaitable[None]] | None = None
+        self._dispatch_tasks: set[asyncio.Task] = set()
+        self.timer_flushes = 0
+
     def _get_offline_buffer(self, network_id: str) -> NetworkEventBuffer:
         """Get or create offline buffer for a network."""
         if network_id not in self._offline_buffers:
@@ -70,6 +101,194 @@ class MassOutageDetector:
             self._online_buffers[network_id] = NetworkEventBuffer()
         return self._online_buffers[network_id]
 
+    def _buffers(self, kind: str) -> dict[str, NetworkEventBuffer]:
+        return self._offline_buffers if kind == OFFLINE else self._online_buffers
+
+    def _buffer(self, kind: str, network_id: str) -> NetworkEventBuffer:
+        if kind == OFFLINE:
+            return self._get_offline_buffer(network_id)
+        return self._get_online_buffer(network_id)
+
+    def _window_seconds(self, kind: str) -> int:
+        if kind == OFFLINE:
+            return self.OFFLINE_COLLECTION_WINDOW_SECONDS
+        return self.ONLINE_COLLECTION_WINDOW_SECONDS
+
+    def _add_pending(
+        self,
+        kind: str,
+        network_id: str,
+        device_ip: str,
+        device_name: str | None,
+        event: NetworkEvent,
+    ) -> NetworkEventBuffer | None:
+        """Buffer an event, returning the buffer or None if it was a duplicate or overflow."""
+        buffer = self._buffer(kind, network_id)
+
+        # Don't duplicate events for the same device
+        if device_ip in buffer.pending_events:
+            logger.debug(
+                f"[Network {network_id}] Device {device_ip} already has pending {kind} event"
+            )
+            return None
+
+        if len(buffer.pending_events) >= self.MAX_PENDING_EVENTS_PER_NETWORK:
+            buffer.overflow += 1
+            logger.debug(
+                f"[Network {network_id}] {kind.capitalize()} buffer full, counting {device_ip} only"
+            )
+            return None
+
+        buffer.pending_events[device_ip] = PendingDeviceEvent(
+            device_ip=device_ip,
+            device_name=device_name,
+            timestamp=self._clock(),
+            original_event=event,
+        )
+        if len(buffer.pending_events) >= self.MIN_DEVICES_FOR_MASS_EVENT:
+            if buffer.threshold_reached_at is None:
+                buffer.threshold_reached_at = self._clock()
+        self._schedule(network_id, kind)
+        return buffer
+
+    # ==================== Flush Timers ====================
+
+    def _deadline_for(self, kind: str, buffer: NetworkEventBuffer) -> datetime | None:
+        """When a buffer next needs attention, or None if it is empty."""
+        if buffer.threshold_reached_at is not None:
+            return buffer.threshold_reached_at + timedelta(
+                seconds=self.THRESHOLD_GRACE_PERIOD_SECONDS
+            )
+        if not buffer.pending_events:
+            return None
+        oldest = min(p.timestamp for p in buffer.pending_events.values())
+        return oldest + timedelta(seconds=self._window_seconds(kind))
+
+    def _schedule(self, network_id: str, kind: str) -> None:
+        """Put the buffer's current deadline in the timer heap if it changed."""
+        buffer = self._buffer(kind, network_id)
+        deadline = self._deadline_for(kind, buffer)
+        if deadline == buffer.deadline:
+            return
+        buffer.deadline = deadline
+        if deadline is None:
+            return
+        heapq.heappush(self._timers, (deadline, next(self._timer_seq), network_id, kind))
+        if self._timers[0][0] == deadline:
+            self._wakeup.set()
+
+    def next_deadline(self) -> datetime | None:
+        """Earliest live deadline in the timer heap, dropping stale entries on the way."""
+        while self._timers:
+            deadline, _, network_id, kind = self._timers[0]
+            buffer = self._buffers(kind).get(network_id)
+            if buffer is not None and buffer.deadline == deadline:
+                return deadline
+            heapq.heappop(self._timers)
+        return None
+
+    def flush_due(self) -> list[tuple[str, NetworkEvent]]:
+        """
+        Flush every buffer whose deadline has passed.
+
+        A buffer past its grace period becomes one mass event; otherwise the
+        events older than the collection window are released individually.
+        Returns (network_id, event) pairs to dispatch.
+        """
+        now = self._clock()
+        due: list[tuple[str, NetworkEvent]] = []
+        while (deadline := self.next_deadline()) is not None and deadline <= now:
+            _, _, network_id, kind = heapq.heappop(self._timers)
+            buffer = self._buffer(kind, network_id)
+            buffer.deadline = None
+
+            if kind == OFFLINE:
+                if self.is_ready_to_flush_offline(network_id):
+                    mass_event = self.flush_and_create_mass_outage_event(network_id)
+                    events = [mass_event] if mass_event else []
+                else:
+                    events = self.get_expired_events(network_id)
+            else:
+                if self.is_ready_to_flush_online(network_id):
+                    mass_event = self.flush_and_create_mass_recovery_event(network_id)
+                    events = [mass_event] if mass_event else []
+                else:
+                    events = self.get_expired_online_events(network_id)
+
+            due.extend((network_id, event) for event in events)
+            self.timer_flushes += 1
+
+            if buffer.pending_events or buffer.threshold_reached_at is not None:
+                self._schedule(network_id, kind)
+            else:
+                self._buffers(kind).pop(network_id, None)
+        return due
+
+    async def start(self, dispatch: Callable[[str, NetworkEvent], Awaitable[None]]) -> None:
+        """Start the flush task; ``dispatch`` is called for every flushed event."""
+        self._dispatch = dispatch
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            if self._timers:
+                self._wakeup.set()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flush task and wait for in-flight dispatches."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._dispatch_tasks:
+            await asyncio.gather(*self._dispatch_tasks, return_exceptions=True)
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None
+
+    async def _run(self) -> None:
+        while True:
+            deadline = self.next_deadline()
+            self._wakeup.clear()
+            if deadline is None:
+                await self._wakeup.wait()
+            else:
+                delay = (deadline - self._clock()).total_seconds()
+                if delay > 0:
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                    except asyncio.TimeoutError:
+                        pass
+
+            for network_id, event in self.flush_due():
+                # Dispatch in the background so a slow send never delays the next deadline
+                task = asyncio.create_task(self._dispatch_flushed(network_id, event))
+                self._dispatch_tasks.add(task)
+                task.add_done_callback(self._dispatch_tasks.discard)
+
+    async def _dispatch_flushed(self, network_id: str, event: NetworkEvent) -> None:
+        try:
+            await self._dispatch(network_id, event)
+        except Exception as e:
+            logger.error(
+                f"[Network {network_id}] Failed to dispatch flushed {event.event_type.value} "
+                f"event: {e}",
+                exc_info=True,
+            )
+
+    def get_status(self) -> dict:
+        return {
+            "running": self.is_running,
+            "scheduled_timers": len(self._timers),
+            "next_deadline": (d.isoformat() if (d := self.next_deadline()) else None),
+            "pending_offline": sum(len(b.pending_events) for b in self._offline_buffers.values()),
+            "pending_online": sum(len(b.pending_events) for b in self._online_buffers.values()),
+            "timer_flushes": self.timer_flushes,
+        }
+
     def _cleanup_expired_events(
         self, buffer: NetworkEventBuffer, network_id: str, event_type: str, window_seconds: int
     ) -> list[NetworkEvent]:
@@ -78,7 +297,7 @@ class MassOutageDetector:
 
         Returns list of expired events that should be dispatched individually.
         """
-        now = datetime.utcnow()
+        now = self._clock()
 
         # Use <= to ensure events at exactly the cutoff time are expired
         cutoff = now - timedelta(seconds=window_seconds)
@@ -117,24 +336,10 @@ class MassOutageDetector:
             device_name: Name of the device (optional)
             event: The original NetworkEvent for this device going offline
         """
-        buffer = self._get_offline_buffer(network_id)
-
-        # Don't duplicate events for the same device
-        if device_ip in buffer.pending_events:
-            logger.debug(
-                f"[Network {network_id}] Device {device_ip} already has pending offline event"
-            )
+        buffer = self._add_pending(OFFLINE, network_id, device_ip, device_name, event)
+        if buffer is None:
             return
 
-        pending = PendingDeviceEvent(
-            device_ip=device_ip,
-            device_name=device_name,
-            timestamp=datetime.utcnow(),
-            original_event=event,
-        )
-
-        buffer.pending_events[device_ip] = pending
-
         logger.info(
             f"[Network {network_id}] Recorded offline event for {device_ip} "
             f"({len(buffer.pending_events)} devices now pending)"
@@ -166,6 +371,7 @@ class MassOutageDetector:
                     )
                     buffer.threshold_reached_at = None
 
+            self._schedule(network_id, OFFLINE)
             return pending.original_event
 
         return None
@@ -188,7 +394,8 @@ class MassOutageDetector:
 
         if should and buffer.threshold_reached_at is None:
             # First time reaching threshold - record timestamp
-            buffer.threshold_reached_at = datetime.utcnow()
+            buffer.threshold_reached_at = self._clock()
+            self._schedule(network_id, OFFLINE)
             logger.info(
                 f"[Network {network_id}] Mass outage threshold reached: "
                 f"{count} devices offline (threshold: {self.MIN_DEVICES_FOR_MASS_EVENT})"
@@ -207,7 +414,7 @@ class MassOutageDetector:
         if buffer.threshold_reached_at is None:
             return False
 
-        elapsed = (datetime.utcnow() - buffer.threshold_reached_at).total_seconds()
+        elapsed = (self._clock() - buffer.threshold_reached_at).total_seconds()
         return elapsed >= self.THRESHOLD_GRACE_PERIOD_SECONDS
 
     def get_pending_count(self, network_id: str) -> int:
@@ -243,29 +450,32 @@ class MassOutageDetector:
         first_detected = pending_list[0].timestamp
         last_detected = pending_list[-1].timestamp
 
+        # Devices dropped from a full buffer are still part of the total
+        total = len(pending_list) + buffer.overflow
+
         # Build device list for message
         device_names = [p.device_name or p.device_ip for p in pending_list]
-        if len(device_names) <= 5:
+        if total <= 5:
             device_list_str = ", ".join(device_names)
         else:
-            device_list_str = f"{', '.join(device_names[:5])}, and {len(device_names) - 5} more"
+            device_list_str = f"{', '.join(device_names[:5])}, and {total - 5} more"
 
         # Create aggregated event
         event = NetworkEvent(
             event_id=str(uuid.uuid4()),
-            timestamp=datetime.utcnow(),
+            timestamp=self._clock(),
             event_type=NotificationType.MASS_OUTAGE,
             priority=NotificationPriority.CRITICAL,
             network_id=network_id,
             title="Mass Device Outage Detected",
             message=(
-                f"We found {len(pending_list)} devices went offline. "
+                f"We found {total} devices went offline. "
                 f"Check your network configurations and we will notify you when they have been detected again.\n\n"
                 f"Affected devices: {device_list_str}"
             ),
             details={
                 "affected_devices": affected_devices,
-                "total_affected": len(pending_list),
+                "total_affected": total,
                 "first_detected": first_detected.isoformat(),
                 "last_detected": last_detected.isoformat(),
                 "detection_window_seconds": self.OFFLINE_COLLECTION_WINDOW_SECONDS,
@@ -275,6 +485,8 @@ class MassOutageDetector:
         # Clear the buffer and reset threshold tracking
         buffer.pending_events.clear()
         buffer.threshold_reached_at = None
+        buffer.overflow = 0
+        self._schedule(network_id, OFFLINE)
 
         logger.info(
             f"[Network {network_id}] Created mass outage event for {len(affected_devices)} devices"
@@ -290,9 +502,11 @@ class MassOutageDetector:
         that went offline but didn't reach the mass outage threshold.
         """
         buffer = self._get_offline_buffer(network_id)
-        return self._cleanup_expired_events(
+        expired = self._cleanup_expired_events(
             buffer, network_id, "offline", self.OFFLINE_COLLECTION_WINDOW_SECONDS
         )
+        self._schedule(network_id, OFFLINE)
+        return expired
 
     def get_all_pending_events(self, network_id: str) -> list[NetworkEvent]:
         """
@@ -313,6 +527,9 @@ class MassOutageDetector:
         buffer = self._get_offline_buffer(network_id)
         events = [p.original_event for p in buffer.pending_events.values()]
         buffer.pending_events.clear()
+        buffer.threshold_reached_at = None
+        buffer.overflow = 0
+        self._schedule(network_id, OFFLINE)
 
         if events:
             logger.info(f"[Network {network_id}] Flushed {len(events)} pending offline events")
@@ -337,24 +554,10 @@ class MassOutageDetector:
             device_name: Name of the device (optional)
             event: The original NetworkEvent for this device coming online
         """
-        buffer = self._get_online_buffer(network_id)
-
-        # Don't duplicate events for the same device
-        if device_ip in buffer.pending_events:
-            logger.debug(
-                f"[Network {network_id}] Device {device_ip} already has pending online event"
-            )
+        buffer = self._add_pending(ONLINE, network_id, device_ip, device_name, event)
+        if buffer is None:
             return
 
-        pending = PendingDeviceEvent(
-            device_ip=device_ip,
-            device_name=device_name,
-            timestamp=datetime.utcnow(),
-            original_event=event,
-        )
-
-        buffer.pending_events[device_ip] = pending
-
         logger.info(
             f"[Network {network_id}] Recorded online event for {device_ip} "
             f"({len(buffer.pending_events)} devices now pending recovery)"
@@ -385,6 +588,7 @@ class MassOutageDetector:
                     )
                     buffer.threshold_reached_at = None
 
+            self._schedule(network_id, ONLINE)
             return pending.original_event
 
         return None
@@ -402,7 +606,8 @@ class MassOutageDetector:
 
         if should and buffer.threshold_reached_at is None:
             # First time reaching threshold - record timestamp
-            buffer.threshold_reached_at = datetime.utcnow()
+            buffer.threshold_reached_at = self._clock()
+            self._schedule(network_id, ONLINE)
             logger.info(
                 f"[Network {network_id}] Mass recovery threshold reached: "
                 f"{count} devices online (threshold: {self.MIN_DEVICES_FOR_MASS_EVENT})"
@@ -421,7 +626,7 @@ class MassOutageDetector:
         if buffer.threshold_reached_at is None:
             return False
 
-        elapsed = (datetime.utcnow() - buffer.threshold_reached_at).total_seconds()
+        elapsed = (self._clock() - buffer.threshold_reached_at).total_seconds()
         return elapsed >= self.THRESHOLD_GRACE_PERIOD_SECONDS
 
     def get_pending_online_count(self, network_id: str) -> int:
@@ -457,29 +662,32 @@ class MassOutageDetector:
         first_detected = pending_list[0].timestamp
         last_detected = pending_list[-1].timestamp
 
+        # Devices dropped from a full buffer are still part of the total
+        total = len(pending_list) + buffer.overflow
+
         # Build device list for message
         device_names = [p.device_name or p.device_ip for p in pending_list]
-        if len(device_names) <= 5:
+        if total <= 5:
             device_list_str = ", ".join(device_names)
         else:
-            device_list_str = f"{', '.join(device_names[:5])}, and {len(device_names) - 5} more"
+            device_list_str = f"{', '.join(device_names[:5])}, and {total - 5} more"
 
         # Create aggregated event
         event = NetworkEvent(
             event_id=str(uuid.uuid4()),
-            timestamp=datetime.utcnow(),
+            timestamp=self._clock(),
             event_type=NotificationType.MASS_RECOVERY,
             priority=NotificationPriority.MEDIUM,
             network_id=network_id,
             title="Mass Device Recovery Detected",
             message=(
-                f"{len(pending_list)} devices came back online. "
+                f"{total} devices came back online. "
                 f"Network connectivity appears to be restored.\n\n"
                 f"Recovered devices: {device_list_str}"
             ),
             details={
                 "recovered_devices": recovered_devices,
-                "total_recovered": len(pending_list),
+                "total_recovered": total,
                 "first_detected": first_detected.isoformat(),
                 "last_detected": last_detected.isoformat(),
                 "detection_window_seconds": self.ONLINE_COLLECTION_WINDOW_SECONDS,
@@ -489,6 +697,8 @@ class MassOutageDetector:
         # Clear the buffer and reset threshold tracking
         buffer.pending_events.clear()
         buffer.threshold_reached_at = None
+        buffer.overflow = 0
+        self._schedule(network_id, ONLINE)
 
         logger.info(
             f"[Network {network_id}] Created mass recovery event for {len(recovered_devices)} devices"
@@ -504,9 +714,11 @@ class MassOutageDetector:
         that came online but didn't reach the mass recovery threshold.
         """
         buffer = self._get_online_buffer(network_id)
-        return self._cleanup_expired_events(
+        expired = self._cleanup_expired_events(
             buffer, network_id, "online", self.ONLINE_COLLECTION_WINDOW_SECONDS
         )
+        self._schedule(network_id, ONLINE)
+        return expired
 
     def get_all_pending_online_events(self, network_id: str) -> list[NetworkEvent]:
         """
@@ -527,6 +739,9 @@ class MassOutageDetector:
         buffer = self._get_online_buffer(network_id)
         events = [p.original_event for p in buffer.pending_events.values()]
         buffer.pending_events.clear()
+        buffer.threshold_reached_at = None
+        buffer.overflow = 0
+        self._schedule(network_id, ONLINE)
 
         if events:
             logger.info(f"[Network {network_id}] Flushed {len(events)} pending online events")
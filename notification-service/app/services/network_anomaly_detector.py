@@ -55,6 +55,9 @@ class NetworkAnomalyDetector:
         self._notified_offline: set = set()  # device_ips
         self._anomaly_timestamps: deque = deque(maxlen=10000)
         self._current_devices: set = set()  # device_ips
+        # Deltas only apply on top of a full list sent since this process started;
+        # the set restored from disk may predate changes made while it was down
+        self.devices_synced: bool = False
         # Lock to prevent race conditions when processing concurrent health checks
         self._lock = asyncio.Lock()
         # Track startup time for grace period
@@ -618,6 +621,12 @@ class NetworkAnomalyDetector:
     def sync_current_devices(self, device_ips: list):
         """Sync the list of devices currently in this network"""
         self._current_devices = set(device_ips)
+        self.devices_synced = True
+
+    def update_current_devices(self, added: list, removed: list):
+        """Apply a change to the devices currently in this network"""
+        self._current_devices.difference_update(removed)
+        self._current_devices.update(added)
 
 
 class NetworkAnomalyDetectorManager:
@@ -2,13 +2,17 @@
 Service for dispatching notifications to users based on their preferences.
 """
 
+import asyncio
 import logging
+import time
 import uuid
+from dataclasses import dataclass
 from datetime import datetime, timezone
 
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from ..config import settings
 from ..models import (
     DEFAULT_NOTIFICATION_TYPE_PRIORITIES,
     NetworkEvent,
@@ -23,8 +27,10 @@ from ..models.database import (
     UserGlobalNotificationPrefs,
     UserNetworkNotificationPrefs,
 )
+from ..services.discord_delivery import discord_delivery_queue
 from ..services.discord_service import is_discord_configured, send_discord_notification
 from ..services.email_service import is_email_configured, send_notification_email
+from ..services.rate_limiter import rate_limiter, user_rate_limit
 from ..services.user_preferences import user_preferences_service
 
 # Note: get_db is not used here - db session is passed as parameter
@@ -32,6 +38,24 @@ from ..services.user_preferences import user_preferences_service
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class DispatchLimits:
+    """Per-channel concurrency limits and per-user timeout for one dispatch fan-out"""
+
+    email: asyncio.Semaphore
+    discord: asyncio.Semaphore
+    user_timeout: float
+
+    @classmethod
+    def from_settings(cls) -> "DispatchLimits":
+        """Build limits from the configured dispatch settings"""
+        return cls(
+            email=asyncio.Semaphore(max(1, settings.dispatch_email_concurrency)),
+            discord=asyncio.Semaphore(max(1, settings.dispatch_discord_concurrency)),
+            user_timeout=settings.dispatch_user_timeout_seconds,
+        )
+
+
 class NotificationDispatchService:
     """Service for dispatching notifications to users"""
 
@@ -170,6 +194,14 @@ class NotificationDispatchService:
             logger.info(f"Skipping notification for user {user_id}: {reason}")
             return records
 
+        decision = await rate_limiter.acquire(user_rate_limit(user_id))
+        if not decision.allowed:
+            logger.info(
+                f"Skipping notification for user {user_id}: rate limit exceeded, "
+                f"retry in {decision.retry_after:.0f}s"
+            )
+            return records
+
         logger.info(f"Should notify user {user_id}, sending notification")
         notification_id = str(uuid.uuid4())
         logger.info(
@@ -264,7 +296,10 @@ class NotificationDispatchService:
         """
         Send notification to all users in a network.
 
-        Uses batch queries to fetch preferences and emails for all users at once.
+        Uses batch queries to fetch preferences and emails for all users at once,
+        then fans out delivery concurrently. Each channel has its own concurrency
+        limit and each user's delivery is bounded by a timeout, so one slow user
+        or provider cannot hold up the rest of the network.
         """
         results = {}
 
@@ -280,7 +315,9 @@ class NotificationDispatchService:
             db, user_ids, network_id
         )
 
-        # Send to each user (now with pre-fetched data)
+        # Resolve recipients first. This stays sequential because the session
+        # cannot be shared between concurrent tasks.
+        recipients = []
         for user_id in user_ids:
             # Get user email from batch results
             user_email = user_emails.get(user_id)
@@ -300,14 +337,45 @@ class NotificationDispatchService:
                 logger.info(f"Skipping notification for user {user_id}: {reason}")
                 continue
 
-            # Dispatch notifications (email/discord)
-            user_records = await self._dispatch_notifications_for_user(
-                prefs=prefs,
-                user_email=user_email,
-                network_id=network_id,
-                event=event,
+            recipients.append((user_id, prefs, user_email))
+
+        # Decide the whole fan-out against the shared per-user buckets in one call
+        decisions = await rate_limiter.acquire_many(
+            [[user_rate_limit(user_id)] for user_id, _, _ in recipients]
+        )
+        limited = [user_id for (user_id, _, _), d in zip(recipients, decisions) if not d.allowed]
+        if limited:
+            logger.info(f"Skipping {len(limited)} rate-limited users in network {network_id}")
+            recipients = [r for r, d in zip(recipients, decisions) if d.allowed]
+
+        if not recipients:
+            return results
+
+        # Dispatch notifications (email/discord) to all recipients concurrently
+        limits = DispatchLimits.from_settings()
+        started = time.monotonic()
+        user_records = await asyncio.gather(
+            *(
+                self._dispatch_notifications_for_user(
+                    prefs=prefs,
+                    user_email=user_email,
+                    network_id=network_id,
+                    event=event,
+                    limits=limits,
+                )
+                for _, prefs, user_email in recipients
             )
-            results[user_id] = user_records
+        )
+        for (user_id, _, _), records in zip(recipients, user_records):
+            results[user_id] = records
+
+        all_records = [record for records in user_records for record in records]
+        sent = sum(1 for record in all_records if record.success)
+        logger.info(
+            f"Dispatched event {event.event_id} to {len(recipients)} users in network "
+            f"{network_id}: {sent} sent, {len(all_records) - sent} failed "
+            f"in {time.monotonic() - started:.2f}s"
+        )
 
         return results
 
@@ -317,84 +385,176 @@ class NotificationDispatchService:
         user_email: str | None,
         network_id: str,
         event: NetworkEvent,
+        limits: DispatchLimits | None = None,
     ) -> list[NotificationRecord]:
         """
         Internal helper to dispatch notifications to email/discord channels.
 
-        Extracted from send_to_user to allow batch processing.
+        Extracted from send_to_user to allow batch processing. Enabled channels
+        are sent concurrently, each gated by its channel semaphore in ``limits``.
+        A send that does not finish within the user timeout of acquiring its
+        slot is reported as a failed record.
         """
+        if limits is None:
+            limits = DispatchLimits.from_settings()
+
         records = []
         notification_id = str(uuid.uuid4())
+        pending_sends: dict[asyncio.Task, NotificationChannel] = {}
 
         # Send email if enabled
         if prefs.email_enabled:
             if not is_email_configured():
-                record = NotificationRecord(
-                    notification_id=notification_id,
-                    event_id=event.event_id,
-                    network_id=network_id,
-                    channel=NotificationChannel.EMAIL,
-                    success=False,
-                    error_message="Email service not configured",
-                    title=event.title,
-                    message=event.message,
-                    priority=event.priority,
+                records.append(
+                    self._failed_record(
+                        notification_id,
+                        network_id,
+                        event,
+                        NotificationChannel.EMAIL,
+                        "Email service not configured",
+                    )
                 )
-                records.append(record)
             elif user_email:
-                record = await send_notification_email(
-                    to_email=user_email,
-                    event=event,
-                    notification_id=notification_id,
+                task = asyncio.create_task(
+                    self._send_email_limited(limits, user_email, event, notification_id)
                 )
-                record.network_id = network_id
-                records.append(record)
+                pending_sends[task] = NotificationChannel.EMAIL
             else:
                 logger.warning(f"User email not found, skipping email notification")
 
         # Send Discord if enabled
         if prefs.discord_enabled and prefs.discord_user_id:
             if not is_discord_configured():
-                record = NotificationRecord(
-                    notification_id=notification_id,
-                    event_id=event.event_id,
-                    network_id=network_id,
-                    channel=NotificationChannel.DISCORD,
-                    success=False,
-                    error_message="Discord service not configured",
-                    title=event.title,
-                    message=event.message,
-                    priority=event.priority,
+                records.append(
+                    self._failed_record(
+                        notification_id,
+                        network_id,
+                        event,
+                        NotificationChannel.DISCORD,
+                        "Discord service not configured",
+                    )
                 )
-                records.append(record)
             else:
-                try:
-                    from ..services.discord_service import send_discord_dm
-
-                    record = await send_discord_dm(
-                        discord_user_id=prefs.discord_user_id,
-                        event=event,
-                        notification_id=notification_id,
-                    )
-                    record.network_id = network_id
-                    records.append(record)
-                except Exception as e:
-                    logger.error(f"Failed to send Discord notification: {e}")
-                    record = NotificationRecord(
-                        notification_id=notification_id,
-                        event_id=event.event_id,
-                        network_id=network_id,
-                        channel=NotificationChannel.DISCORD,
-                        success=False,
-                        error_message=str(e),
-                        title=event.title,
-                        message=event.message,
-                        priority=event.priority,
+                task = asyncio.create_task(
+                    self._send_discord_limited(
+                        limits, prefs.discord_user_id, event, notification_id
                     )
-                    records.append(record)
+                )
+                pending_sends[task] = NotificationChannel.DISCORD
+
+        if not pending_sends:
+            return records
+
+        outcomes = await asyncio.gather(*pending_sends, return_exceptions=True)
+
+        # Preserve channel order (email before discord) in the returned records
+        for outcome, channel in zip(outcomes, pending_sends.values()):
+            if isinstance(outcome, asyncio.TimeoutError):
+                logger.warning(
+                    f"{channel.value} notification for event {event.event_id} timed out "
+                    f"after {limits.user_timeout}s"
+                )
+                record = self._failed_record(
+                    notification_id,
+                    network_id,
+                    event,
+                    channel,
+                    f"Timed out after {limits.user_timeout}s",
+                )
+            elif isinstance(outcome, BaseException):
+                logger.error(f"Failed to send {channel.value} notification: {outcome}")
+                record = self._failed_record(
+                    notification_id, network_id, event, channel, str(outcome)
+                )
+            else:
+                record = outcome
+            record.network_id = network_id
+            records.append(record)
 
         return records
 
+    async def _send_email_limited(
+        self,
+        limits: DispatchLimits,
+        user_email: str,
+        event: NetworkEvent,
+        notification_id: str,
+    ) -> NotificationRecord:
+        """
+        Send an email while holding the email channel's concurrency slot.
+
+        The user timeout starts once the slot is acquired, so time spent queued
+        behind other users' sends does not count against it.
+        """
+        async with limits.email:
+            return await asyncio.wait_for(
+                send_notification_email(
+                    to_email=user_email,
+                    event=event,
+                    notification_id=notification_id,
+                ),
+                timeout=limits.user_timeout,
+            )
+
+    async def _send_discord_limited(
+        self,
+        limits: DispatchLimits,
+        discord_user_id: str,
+        event: NetworkEvent,
+        notification_id: str,
+    ) -> NotificationRecord:
+        """
+        Send a Discord DM while holding the Discord channel's concurrency slot.
+
+        The user timeout starts once the slot is acquired. On timeout the alert
+        is withdrawn from the delivery queue if it has not been handed to
+        Discord yet; if it already has, the real outcome is awaited instead so
+        the record never reports a DM as failed that was in fact sent.
+        """
+        from ..services.discord_service import send_discord_dm
+
+        async with limits.discord:
+            send = asyncio.ensure_future(
+                send_discord_dm(
+                    discord_user_id=discord_user_id,
+                    event=event,
+                    notification_id=notification_id,
+                )
+            )
+            try:
+                return await asyncio.wait_for(asyncio.shield(send), timeout=limits.user_timeout)
+            except asyncio.TimeoutError:
+                if discord_delivery_queue.is_running and not discord_delivery_queue.withdraw(
+                    discord_user_id, notification_id
+                ):
+                    return await send
+                send.cancel()
+                raise
+            except asyncio.CancelledError:
+                send.cancel()
+                raise
+
+    def _failed_record(
+        self,
+        notification_id: str,
+        network_id: str | None,
+        event: NetworkEvent,
+        channel: NotificationChannel,
+        error_message: str,
+    ) -> NotificationRecord:
+        """Build a failed NotificationRecord for a channel that could not deliver"""
+        return NotificationRecord(
+            notification_id=notification_id,
+            event_id=event.event_id,
+            network_id=network_id,
+            channel=channel,
+            success=False,
+            error_message=error_message,
+            title=event.title,
+            message=event.message,
+            priority=event.priority,
+        )
+
     async def send_global_notification(
         self,
         db: AsyncSession,
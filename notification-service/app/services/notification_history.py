@@ -0,0 +1,482 @@
+"""
+Database-backed notification history.
+
+Every channel attempt made by the notification manager is recorded here, as
+one row. A send shared by a network's members lists them in
+notification_history_recipients, so it shows up in each member's history
+without being counted once per member. Recording is synchronous and only appends to an in-process buffer; a
+background flusher writes the buffer to PostgreSQL with one multi-row INSERT
+per batch, so sending a notification never waits on the database.
+
+Reads use keyset pagination over ``(created_at, id)`` with filters pushed
+down to SQL, backed by composite indexes on ``(network_id, created_at, id)``
+and ``(user_id, created_at, id)``. A page costs the same whether the table
+holds a thousand rows or millions; there is no OFFSET and no COUNT(*).
+Rows that are still buffered (or being written) are merged into the page in
+memory, so a caller sees its own sends without reads ever waiting on writes.
+
+Retention is enforced by deleting expired rows in bounded batches so a large
+backlog never turns into one long-running, lock-heavy DELETE.
+"""
+
+import asyncio
+import base64
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, insert, or_, select, tuple_
+
+from ..config import settings
+from ..database import async_session_maker
+from ..models import (
+    NotificationChannel,
+    NotificationHistoryResponse,
+    NotificationPriority,
+    NotificationRecord,
+    NotificationType,
+)
+from ..models.database import NotificationHistoryEntry, NotificationHistoryRecipient
+
+logger = logging.getLogger(__name__)
+
+# How often the flusher runs a retention pass
+RETENTION_INTERVAL_SECONDS = 3600.0
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+
+def encode_cursor(created_at: datetime, entry_id: str) -> str:
+    """Opaque cursor pointing just past the given row"""
+    raw = f"{created_at.isoformat()}|{entry_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, entry_id = base64.urlsafe_b64decode(padded).decode().split("|", 1)
+        return datetime.fromisoformat(created_at), entry_id
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursorError(f"Invalid history cursor: {cursor}") from e
+
+
+def _as_utc(value: datetime) -> datetime:
+    # NotificationRecord timestamps are naive UTC
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def _record_to_row(
+    record: NotificationRecord, user_id: str | None, event_type: NotificationType | None = None
+) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "notification_id": record.notification_id,
+        "event_id": record.event_id,
+        "network_id": record.network_id,
+        "user_id": user_id,
+        "event_type": event_type.value if event_type is not None else None,
+        "channel": record.channel.value,
+        "success": record.success,
+        "error_message": record.error_message,
+        "title": record.title,
+        "message": record.message,
+        "priority": record.priority.value,
+        "created_at": _as_utc(record.timestamp),
+    }
+
+
+def _entry_columns(row: dict) -> dict:
+    """A buffered row without its recipients, as stored in notification_history"""
+    return {key: value for key, value in row.items() if key != "recipient_ids"}
+
+
+def _recipient_rows(rows: list[dict]) -> list[dict]:
+    return [
+        {"history_id": row["id"], "user_id": user_id}
+        for row in rows
+        for user_id in row.get("recipient_ids", ())
+    ]
+
+
+def _row_matches(
+    row: dict,
+    network_id: str | None,
+    user_id: str | None,
+    channel: str | None,
+    success: bool | None,
+    since: datetime | None,
+    until: datetime | None,
+    after: tuple[datetime, str] | None,
+) -> bool:
+    """Whether a buffered row passes the same filters the store applies"""
+    return (
+        (network_id is None or row["network_id"] == network_id)
+        and (
+            user_id is None or row["user_id"] == user_id or user_id in row.get("recipient_ids", ())
+        )
+        and (channel is None or row["channel"] == channel)
+        and (success is None or row["success"] == success)
+        and (since is None or row["created_at"] >= since)
+        and (until is None or row["created_at"] < until)
+        and (after is None or (row["created_at"], row["id"]) < after)
+    )
+
+
+def _entry_to_record(entry: NotificationHistoryEntry) -> NotificationRecord:
+    return NotificationRecord(
+        notification_id=entry.notification_id,
+        event_id=entry.event_id or "",
+        network_id=entry.network_id,
+        channel=NotificationChannel(entry.channel),
+        timestamp=entry.created_at,
+        success=entry.success,
+        error_message=entry.error_message,
+        title=entry.title,
+        message=entry.message,
+        priority=NotificationPriority(entry.priority),
+    )
+
+
+# ==================== Stores ====================
+
+
+class SqlHistoryStore:
+    """PostgreSQL-backed history storage"""
+
+    def __init__(self, session_maker=async_session_maker):
+        self._session_maker = session_maker
+
+    async def insert_many(self, rows: list[dict]):
+        recipients = _recipient_rows(rows)
+        async with self._session_maker() as session:
+            await session.execute(
+                insert(NotificationHistoryEntry), [_entry_columns(row) for row in rows]
+            )
+            if recipients:
+                await session.execute(insert(NotificationHistoryRecipient), recipients)
+            await session.commit()
+
+    async def query(
+        self,
+        limit: int,
+        network_id: str | None = None,
+        user_id: str | None = None,
+        channel: str | None = None,
+        success: bool | None = None,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        after: tuple[datetime, str] | None = None,
+    ) -> list[NotificationHistoryEntry]:
+        """Newest-first rows matching the filters, strictly older than ``after``"""
+        stmt = select(NotificationHistoryEntry)
+        if network_id is not None:
+            stmt = stmt.where(NotificationHistoryEntry.network_id == network_id)
+        if user_id is not None:
+            shared = select(NotificationHistoryRecipient.history_id).where(
+                NotificationHistoryRecipient.user_id == user_id
+            )
+            stmt = stmt.where(
+                or_(
+                    NotificationHistoryEntry.user_id == user_id,
+                    NotificationHistoryEntry.id.in_(shared),
+                )
+            )
+        if channel is not None:
+            stmt = stmt.where(NotificationHistoryEntry.channel == channel)
+        if success is not None:
+            stmt = stmt.where(NotificationHistoryEntry.success == success)
+        if since is not None:
+            stmt = stmt.where(NotificationHistoryEntry.created_at >= since)
+        if until is not None:
+            stmt = stmt.where(NotificationHistoryEntry.created_at < until)
+        if after is not None:
+            stmt = stmt.where(
+                tuple_(NotificationHistoryEntry.created_at, NotificationHistoryEntry.id) < after
+            )
+        stmt = stmt.order_by(
+            NotificationHistoryEntry.created_at.desc(), NotificationHistoryEntry.id.desc()
+        ).limit(limit)
+
+        async with self._session_maker() as session:
+            result = await session.execute(stmt)
+            return list(result.scalars().all())
+
+    async def delete_older_than(self, cutoff: datetime, batch_size: int) -> int:
+        """Delete up to ``batch_size`` rows created before ``cutoff``"""
+        expired_ids = (
+            select(NotificationHistoryEntry.id)
+            .where(NotificationHistoryEntry.created_at < cutoff)
+            .limit(batch_size)
+            .scalar_subquery()
+        )
+        async with self._session_maker() as session:
+            result = await session.execute(
+                delete(NotificationHistoryEntry)
+                .where(NotificationHistoryEntry.id.in_(expired_ids))
+                .execution_options(synchronize_session=False)
+            )
+            await session.commit()
+            return result.rowcount
+
+
+class InMemoryHistoryStore:
+    """Non-durable history storage for tests and benchmarks"""
+
+    def __init__(self):
+        self.entries: list[NotificationHistoryEntry] = []
+        self.recipients: dict[str, set[str]] = {}  # history id -> member user ids
+
+    async def insert_many(self, rows: list[dict]):
+        self.entries.extend(NotificationHistoryEntry(**_entry_columns(row)) for row in rows)
+        for recipient in _recipient_rows(rows):
+            self.recipients.setdefault(recipient["history_id"], set()).add(recipient["user_id"])
+
+    async def query(
+        self,
+        limit: int,
+        network_id: str | None = None,
+        user_id: str | None = None,
+        channel: str | None = None,
+        success: bool | None = None,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        after: tuple[datetime, str] | None = None,
+    ) -> list[NotificationHistoryEntry]:
+        matches = [
+            e
+            for e in self.entries
+            if (network_id is None or e.network_id == network_id)
+            and (
+                user_id is None or e.user_id == user_id or user_id in self.recipients.get(e.id, ())
+            )
+            and (channel is None or e.channel == channel)
+            and (success is None or e.success == success)
+            and (since is None or e.created_at >= since)
+            and (until is None or e.created_at < until)
+            and (after is None or (e.created_at, e.id) < after)
+        ]
+        matches.sort(key=lambda e: (e.created_at, e.id), reverse=True)
+        return matches[:limit]
+
+    async def delete_older_than(self, cutoff: datetime, batch_size: int) -> int:
+        expired = [e for e in self.entries if e.created_at < cutoff][:batch_size]
+        expired_ids = {id(e) for e in expired}
+        self.entries = [e for e in self.entries if id(e) not in expired_ids]
+        for entry in expired:
+            self.recipients.pop(entry.id, None)
+        return len(expired)
+
+
+# ==================== History ====================
+
+
+class NotificationHistory:
+    """Buffers history records and writes them to the store in batches"""
+
+    def __init__(self, store=None):
+        self._store = store or SqlHistoryStore()
+        self._buffer: list[dict] = []
+        # Batch currently being written; still visible to queries until it lands
+        self._inflight: list[dict] = []
+        self._flush_lock = asyncio.Lock()
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self._running = False
+        self._last_retention = 0.0
+
+        self._stats = {"recorded": 0, "written": 0, "dropped": 0, "expired": 0}
+        self._last_error: str | None = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._running
+
+    @property
+    def _max_buffer(self) -> int:
+        return settings.history_batch_size * 20
+
+    def add(
+        self,
+        record: NotificationRecord,
+        user_id: str | None = None,
+        event_type: NotificationType | None = None,
+        recipient_ids: list[str] | None = None,
+    ):
+        """
+        Record a channel attempt. Never blocks; the row is written by the flusher.
+
+        ``recipient_ids`` lists the members a shared send was made for.
+        """
+        row = _record_to_row(record, user_id, event_type)
+        if recipient_ids:
+            row["recipient_ids"] = list(recipient_ids)
+        self._buffer.append(row)
+        self._stats["recorded"] += 1
+
+        # If the database is unreachable for a long time, keep the newest rows
+        overflow = len(self._buffer) - self._max_buffer
+        if overflow > 0:
+            del self._buffer[:overflow]
+            self._stats["dropped"] += overflow
+
+        if self._wakeup is not None and len(self._buffer) >= settings.history_batch_size:
+            self._wakeup.set()
+
+    async def import_records(self, records: list[NotificationRecord]) -> int:
+        """Write records straight to the store (used to import legacy history)"""
+        rows = [_record_to_row(record, None) for record in records]
+        for start in range(0, len(rows), settings.history_batch_size):
+            await self._store.insert_many(rows[start : start + settings.history_batch_size])
+        return len(rows)
+
+    async def start(self):
+        """Start the background flusher"""
+        if self._running:
+            return
+        self._running = True
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._flush_loop())
+        logger.info("Notification history writer started")
+
+    async def stop(self):
+        """Stop the flusher and write out whatever is still buffered"""
+        if not self._running:
+            return
+        self._running = False
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        try:
+            while self._buffer and await self.flush():
+                pass
+        except Exception as e:
+            logger.error(f"Failed to flush notification history on shutdown: {e}")
+        logger.info("Notification history writer stopped")
+
+    async def _flush_loop(self):
+        while self._running:
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), timeout=settings.history_flush_interval_seconds
+                )
+            except asyncio.TimeoutError:
+                pass
+
+            try:
+                while await self.flush() >= settings.history_batch_size:
+                    pass
+                loop_time = asyncio.get_running_loop().time()
+                if loop_time - self._last_retention >= RETENTION_INTERVAL_SECONDS:
+                    self._last_retention = loop_time
+                    await self.enforce_retention()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._last_error = str(e)
+                logger.error(f"Notification history flush failed: {e}")
+
+    async def flush(self) -> int:
+        """Write one batch from the buffer. Returns the number of rows written."""
+        async with self._flush_lock:
+            if not self._buffer:
+                return 0
+            batch = self._buffer[: settings.history_batch_size]
+            del self._buffer[: len(batch)]
+            self._inflight = batch
+            try:
+                await self._store.insert_many(batch)
+            except Exception:
+                # Put the batch back so the next pass retries it
+                self._buffer[:0] = batch
+                raise
+            finally:
+                self._inflight = []
+            self._stats["written"] += len(batch)
+            return len(batch)
+
+    async def enforce_retention(self) -> int:
+        """Delete rows older than the retention window, one bounded batch at a time"""
+        if settings.history_retention_days <= 0:
+            return 0
+        cutoff = datetime.now(timezone.utc) - timedelta(days=settings.history_retention_days)
+        deleted = 0
+        while True:
+            count = await self._store.delete_older_than(
+                cutoff, settings.history_retention_batch_size
+            )
+            deleted += count
+            if count < settings.history_retention_batch_size:
+                break
+            # Let other work (and other transactions) in between batches
+            await asyncio.sleep(0)
+        if deleted:
+            self._stats["expired"] += deleted
+            logger.info(f"Deleted {deleted} notification history rows older than {cutoff}")
+        return deleted
+
+    async def query(
+        self,
+        network_id: str | None = None,
+        user_id: str | None = None,
+        channel: NotificationChannel | None = None,
+        success: bool | None = None,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        cursor: str | None = None,
+        per_page: int = 50,
+    ) -> NotificationHistoryResponse:
+        """Get one newest-first page of history"""
+        filters = {
+            "network_id": network_id,
+            "user_id": user_id,
+            "channel": channel.value if channel is not None else None,
+            "success": success,
+            "since": _as_utc(since) if since else None,
+            "until": _as_utc(until) if until else None,
+            "after": decode_cursor(cursor) if cursor else None,
+        }
+
+        # Snapshot unwritten rows before reading so none can slip between the two
+        unwritten = [
+            row for row in (*self._inflight, *self._buffer) if _row_matches(row, **filters)
+        ]
+        entries = await self._store.query(limit=per_page + 1, **filters)
+
+        # Make recent sends visible to the caller that just made them. A row
+        # whose write committed during the read is in both; keep one copy.
+        if unwritten:
+            merged = {entry.id: entry for entry in entries}
+            for row in unwritten:
+                if row["id"] not in merged:
+                    merged[row["id"]] = NotificationHistoryEntry(**_entry_columns(row))
+            entries = sorted(merged.values(), key=lambda e: (e.created_at, e.id), reverse=True)
+            entries = entries[: per_page + 1]
+
+        next_cursor = None
+        if len(entries) > per_page:
+            entries = entries[:per_page]
+            next_cursor = encode_cursor(entries[-1].created_at, entries[-1].id)
+
+        return NotificationHistoryResponse(
+            notifications=[_entry_to_record(entry) for entry in entries],
+            total_count=len(entries),
+            per_page=per_page,
+            next_cursor=next_cursor,
+        )
+
+    def get_status(self) -> dict:
+        return {
+            "running": self._running,
+            "buffered": len(self._buffer),
+            **self._stats,
+            "last_error": self._last_error,
+        }
+
+
+# Singleton instance
+notification_history = NotificationHistory()
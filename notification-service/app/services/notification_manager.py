@@ -6,11 +6,14 @@ notifications across all channels (email, Discord).
 """
 
 import asyncio
+import heapq
+import itertools
 import json
 import logging
 import uuid
 from collections import deque
 from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
 from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 from ..config import settings
@@ -26,6 +29,7 @@ from ..models import (
     NotificationPreferencesUpdate,
     NotificationPriority,
     NotificationRecord,
+    NotificationStatsRange,
     NotificationStatsResponse,
     NotificationType,
     ScheduledBroadcast,
@@ -44,10 +48,20 @@ from .discord_service import (
     send_test_discord,
 )
 from .email_service import is_email_configured, send_notification_email, send_test_email
+from .notification_history import notification_history
+from .notification_stats import notification_stats
+from .rate_limiter import RateLimit, network_rate_limit, rate_limiter, user_rate_limit
+from .state_store import (
+    GLOBAL_PREFERENCES,
+    NETWORK_PREFERENCES,
+    SCHEDULED_BROADCASTS,
+    SILENCED_DEVICES,
+    state_repository,
+)
 
 logger = logging.getLogger(__name__)
 
-# Persistence
+# Legacy JSON state, imported into the state table once on startup
 PREFERENCES_FILE = settings.data_dir / "notification_preferences.json"
 GLOBAL_PREFERENCES_FILE = settings.data_dir / "global_user_preferences.json"
 HISTORY_FILE = settings.data_dir / "notification_history.json"
@@ -55,7 +69,17 @@ SCHEDULED_FILE = settings.data_dir / "scheduled_broadcasts.json"
 SILENCED_DEVICES_FILE = settings.data_dir / "silenced_devices.json"
 
 # Rate limiting
-MAX_HISTORY_SIZE = 1000  # Keep last 1000 notifications in memory
+MAX_HISTORY_SIZE = 1000  # Recent records kept in memory; full history is in the database
+
+# Upper bound on one scheduler sleep, so a wall clock jump is noticed eventually
+SCHEDULER_MAX_SLEEP_SECONDS = 300
+
+
+def _as_naive_utc(value: datetime) -> datetime:
+    """scheduled_at may be naive (UTC) or timezone-aware; compare as naive UTC"""
+    if value.tzinfo is not None:
+        return value.astimezone(dt_timezone.utc).replace(tzinfo=None)
+    return value
 
 
 class NotificationManager:
@@ -63,42 +87,143 @@ class NotificationManager:
     Manages notification preferences, rate limiting, and dispatching.
     """
 
-    def __init__(self):
+    def __init__(self, state=None):
+        self._state = state or state_repository
+        # Network preferences are loaded per network on first use. Networks looked up
+        # without a stored row are remembered so they aren't queried again.
         self._preferences: dict[str, NotificationPreferences] = {}
+        self._absent_preferences: set[str] = set()
+        self._all_preferences_loaded = False
         self._global_preferences: dict[str, GlobalUserPreferences] = {}  # user_id -> preferences
         self._history: deque = deque(maxlen=MAX_HISTORY_SIZE)
-        self._rate_limits: dict[str, deque] = {}  # network_id -> deque of timestamps
         self._scheduled_broadcasts: dict[str, ScheduledBroadcast] = {}
+        # Min-heap of (send time, seq, broadcast_id) for pending broadcasts. Cancelled,
+        # sent or rescheduled broadcasts leave stale entries that are dropped when popped.
+        self._broadcast_heap: list[tuple[datetime, int, str]] = []
+        self._broadcast_seq = itertools.count()
+        self._scheduler_wakeup: asyncio.Event | None = None
         self._scheduler_task: asyncio.Task | None = None
         self._silenced_devices: set = set()  # Device IPs with monitoring disabled
 
-        # Load persisted data
-        self._load_preferences()
-        self._load_global_preferences()
-        self._migrate_users_to_global_preferences()  # Auto-migrate existing users
+        # Legacy JSON history is read here and imported by import_legacy_history();
+        # everything else is loaded from the state table by load_state()
         self._load_history()
-        self._load_scheduled_broadcasts()
-        self._load_silenced_devices()
 
-    def _save_preferences(self):
-        """Save preferences to disk"""
+    # ==================== Persistence ====================
+
+    async def load_state(self):
+        """
+        Load state from the state table on startup.
+
+        Legacy JSON files are imported first. Global preferences, scheduled broadcasts
+        and silenced devices are loaded in full; network preferences are loaded per
+        network on first use (see ensure_preferences_loaded).
+        """
+        await self.import_legacy_state()
+
+        for user_id, prefs_data in (await self._state.load(GLOBAL_PREFERENCES)).items():
+            prefs = self._parse_global_preferences(user_id, prefs_data)
+            if prefs is not None:
+                self._global_preferences[user_id] = prefs
+        logger.info(f"Loaded {len(self._global_preferences)} global user preferences")
+
+        scheduled = await self._state.load(SCHEDULED_BROADCASTS)
+        self._restore_scheduled_broadcasts(scheduled)
+
+        self._silenced_devices = set(await self._state.load(SILENCED_DEVICES))
+        logger.info(f"Loaded {len(self._silenced_devices)} silenced devices")
+
+    async def import_legacy_state(self) -> int:
+        """
+        One-time import of the legacy JSON state files into the state table.
+
+        Each file is renamed to *.json.imported once its keys are written, so the
+        import doesn't repeat. On failure the files are left in place and the import
+        is retried on next startup.
+        """
+        files = [
+            (PREFERENCES_FILE, self._load_preferences),
+            (GLOBAL_PREFERENCES_FILE, self._load_global_preferences),
+            (SCHEDULED_FILE, self._load_scheduled_broadcasts),
+            (SILENCED_DEVICES_FILE, self._load_silenced_devices),
+        ]
+        found = [(path, loader) for path, loader in files if path.exists()]
+        if not found:
+            return 0
+
+        for _, loader in found:
+            loader()
+        for key in self._preferences:
+            self._save_preferences(key)
+        for user_id in self._global_preferences:
+            self._save_global_preferences(user_id)
+        for broadcast_id in self._scheduled_broadcasts:
+            self._save_scheduled_broadcasts(broadcast_id)
+        for device_ip in self._silenced_devices:
+            self._save_silenced_devices(device_ip)
+        # Network owners from before global preferences existed
+        self._migrate_users_to_global_preferences()
+
+        imported = (
+            len(self._preferences)
+            + len(self._global_preferences)
+            + len(self._scheduled_broadcasts)
+            + len(self._silenced_devices)
+        )
         try:
-            settings.data_dir.mkdir(parents=True, exist_ok=True)
+            await self._state.flush_all()
+            for path, _ in found:
+                path.rename(path.with_suffix(".json.imported"))
+        except Exception as e:
+            logger.error(f"Failed to import legacy notification state: {e}")
+            return 0
+
+        logger.info(f"Imported {imported} legacy notification state entries")
+        return imported
+
+    def _save_preferences(self, network_id: str):
+        """Write one network's preferences (or their removal) to the state table"""
+        key = str(network_id)
+        if key in self._preferences:
+            self._state.put(
+                NETWORK_PREFERENCES, key, self._preferences[key].model_dump(mode="json")
+            )
+        else:
+            self._state.delete(NETWORK_PREFERENCES, key)
+
+    @staticmethod
+    def _parse_preferences(key: str, prefs_data: dict) -> NotificationPreferences | None:
+        """Build network preferences from their stored JSON form"""
+        # Parse datetime strings
+        if "created_at" in prefs_data and isinstance(prefs_data["created_at"], str):
+            prefs_data["created_at"] = datetime.fromisoformat(
+                prefs_data["created_at"].replace("Z", "+00:00")
+            )
+        if "updated_at" in prefs_data and isinstance(prefs_data["updated_at"], str):
+            prefs_data["updated_at"] = datetime.fromisoformat(
+                prefs_data["updated_at"].replace("Z", "+00:00")
+            )
 
-            data = {
-                user_id: prefs.model_dump(mode="json")
-                for user_id, prefs in self._preferences.items()
-            }
+        # Handle migration from old user_id based preferences to network_id based
+        # Old format had 'user_id', new format has 'network_id'
+        if "user_id" in prefs_data and "network_id" not in prefs_data:
+            # Skip old user-based preferences (they'll be recreated per-network)
+            logger.info(f"Skipping old user-based preferences for key {key}")
+            return None
 
-            with open(PREFERENCES_FILE, "w") as f:
-                json.dump(data, f, indent=2, default=str)
+        # Ensure network_id exists (for new format)
+        if "network_id" not in prefs_data:
+            # Use key as network_id (UUID string)
+            prefs_data["network_id"] = key
 
-            logger.debug(f"Saved {len(self._preferences)} notification preferences")
+        try:
+            return NotificationPreferences(**prefs_data)
         except Exception as e:
-            logger.error(f"Failed to save notification preferences: {e}")
+            logger.warning(f"Failed to load preferences for key {key}: {e}")
+            return None
 
     def _load_preferences(self):
-        """Load preferences from disk"""
+        """Read the legacy JSON preferences file"""
         try:
             if not PREFERENCES_FILE.exists():
                 return
@@ -107,53 +232,95 @@ class NotificationManager:
                 data = json.load(f)
 
             for key, prefs_data in data.items():
-                # Parse datetime strings
-                if "created_at" in prefs_data and isinstance(prefs_data["created_at"], str):
-                    prefs_data["created_at"] = datetime.fromisoformat(
-                        prefs_data["created_at"].replace("Z", "+00:00")
-                    )
-                if "updated_at" in prefs_data and isinstance(prefs_data["updated_at"], str):
-                    prefs_data["updated_at"] = datetime.fromisoformat(
-                        prefs_data["updated_at"].replace("Z", "+00:00")
-                    )
-
-                # Handle migration from old user_id based preferences to network_id based
-                # Old format had 'user_id', new format has 'network_id'
-                if "user_id" in prefs_data and "network_id" not in prefs_data:
-                    # Skip old user-based preferences (they'll be recreated per-network)
-                    logger.info(f"Skipping old user-based preferences for key {key}")
-                    continue
-
-                # Ensure network_id exists (for new format)
-                if "network_id" not in prefs_data:
-                    # Use key as network_id (UUID string)
-                    prefs_data["network_id"] = key
-
-                try:
-                    self._preferences[key] = NotificationPreferences(**prefs_data)
-                except Exception as e:
-                    logger.warning(f"Failed to load preferences for key {key}: {e}")
-                    continue
+                prefs = self._parse_preferences(key, prefs_data)
+                if prefs is not None:
+                    self._preferences[key] = prefs
 
             logger.info(f"Loaded {len(self._preferences)} notification preferences")
 
         except Exception as e:
             logger.error(f"Failed to load notification preferences: {e}")
 
-    def _save_history(self):
-        """Save history to disk"""
-        try:
-            settings.data_dir.mkdir(parents=True, exist_ok=True)
+    def _preferences_known(self, key: str) -> bool:
+        """Whether the stored preferences for a network (or their absence) are in memory"""
+        return (
+            key in self._preferences
+            or key in self._absent_preferences
+            or self._all_preferences_loaded
+            or not self._state.is_running
+        )
+
+    async def ensure_preferences_loaded(self, network_ids) -> None:
+        """Load stored preferences for networks that haven't been looked up yet"""
+        missing = {str(n) for n in network_ids if not self._preferences_known(str(n))}
+        if not missing:
+            return
+        rows = await self._state.load_keys(NETWORK_PREFERENCES, missing)
+        for key in missing:
+            # A concurrent create may have filled the key while the query ran
+            if key in self._preferences:
+                continue
+            prefs = self._parse_preferences(key, rows[key]) if key in rows else None
+            if prefs is not None:
+                self._preferences[key] = prefs
+            else:
+                self._absent_preferences.add(key)
+
+    async def load_all_preferences(self) -> None:
+        """Load every network's preferences (needed to broadcast to all networks)"""
+        if self._all_preferences_loaded or not self._state.is_running:
+            return
+        rows = await self._state.load(NETWORK_PREFERENCES)
+        for key, prefs_data in rows.items():
+            if key not in self._preferences:
+                prefs = self._parse_preferences(key, prefs_data)
+                if prefs is not None:
+                    self._preferences[key] = prefs
+        self._absent_preferences.clear()
+        self._all_preferences_loaded = True
+        logger.info(f"Loaded {len(self._preferences)} notification preferences")
+
+    def _record_history(
+        self,
+        record: NotificationRecord,
+        user_id: str | None = None,
+        event_type: NotificationType | None = None,
+        recipient_ids: list[str] | None = None,
+    ):
+        """
+        Queue a record for the history table and count it in the stats buckets.
+
+        A send shared by several network members is one row, listing them as
+        ``recipient_ids`` so it appears in each member's history.
+        """
+        self._history.append(record)
+        notification_history.add(
+            record, user_id=user_id, event_type=event_type, recipient_ids=recipient_ids
+        )
+        notification_stats.record(record, event_type=event_type)
 
-            data = [record.model_dump(mode="json") for record in self._history]
+    async def import_legacy_history(self) -> int:
+        """
+        One-time import of the legacy JSON history file into the history table.
 
-            with open(HISTORY_FILE, "w") as f:
-                json.dump(data, f, indent=2, default=str)
+        The file is renamed afterwards so the import doesn't repeat. On failure
+        the file is left in place and the import is retried on next startup.
+        """
+        if not HISTORY_FILE.exists():
+            return 0
+        try:
+            imported = await notification_history.import_records(list(self._history))
+            for record in self._history:
+                notification_stats.record(record)
+            HISTORY_FILE.rename(HISTORY_FILE.with_suffix(".json.imported"))
+            logger.info(f"Imported {imported} legacy notification history records")
+            return imported
         except Exception as e:
-            logger.error(f"Failed to save notification history: {e}")
+            logger.error(f"Failed to import legacy notification history: {e}")
+            return 0
 
     def _load_history(self):
-        """Load history from disk"""
+        """Load legacy JSON history from disk"""
         try:
             if not HISTORY_FILE.exists():
                 return
@@ -191,32 +358,33 @@ class NotificationManager:
         except Exception as e:
             logger.error(f"Failed to load notification history: {e}")
 
-    def _save_scheduled_broadcasts(self):
-        """Save scheduled broadcasts to disk"""
-        try:
-            settings.data_dir.mkdir(parents=True, exist_ok=True)
-
-            data = {
-                broadcast_id: broadcast.model_dump(mode="json")
-                for broadcast_id, broadcast in self._scheduled_broadcasts.items()
-            }
-
-            with open(SCHEDULED_FILE, "w") as f:
-                json.dump(data, f, indent=2, default=str)
-        except Exception as e:
-            logger.error(f"Failed to save scheduled broadcasts: {e}")
+    def _save_scheduled_broadcasts(self, broadcast_id: str):
+        """Write one scheduled broadcast (or its removal) to the state table"""
+        broadcast = self._scheduled_broadcasts.get(broadcast_id)
+        if broadcast is not None:
+            self._state.put(SCHEDULED_BROADCASTS, broadcast_id, broadcast.model_dump(mode="json"))
+        else:
+            self._state.delete(SCHEDULED_BROADCASTS, broadcast_id)
 
     def _load_scheduled_broadcasts(self):
-        """Load scheduled broadcasts from disk"""
+        """Read the legacy JSON scheduled broadcasts file"""
         try:
             if not SCHEDULED_FILE.exists():
                 return
 
             with open(SCHEDULED_FILE, "r") as f:
                 data = json.load(f)
+        except Exception as e:
+            logger.error(f"Failed to load scheduled broadcasts: {e}", exc_info=True)
+            return
 
+        self._restore_scheduled_broadcasts(data)
+
+    def _restore_scheduled_broadcasts(self, data: dict):
+        """Rebuild scheduled broadcasts and the send-time heap from their stored JSON form"""
+        try:
             loaded_count = 0
-            skipped_count = 0
+            skipped_ids = []
 
             for broadcast_id, broadcast_data in data.items():
                 try:
@@ -239,7 +407,7 @@ class NotificationManager:
                             f"This is likely an old broadcast from before multi-tenant support. "
                             f"Please recreate it if needed."
                         )
-                        skipped_count += 1
+                        skipped_ids.append(broadcast_id)
                         continue
 
                     self._scheduled_broadcasts[broadcast_id] = ScheduledBroadcast(**broadcast_data)
@@ -248,34 +416,49 @@ class NotificationManager:
                     logger.warning(
                         f"Failed to load scheduled broadcast {broadcast_id}: {e}. Skipping."
                     )
-                    skipped_count += 1
+                    skipped_ids.append(broadcast_id)
                     continue
 
             if loaded_count > 0:
                 logger.info(f"Loaded {loaded_count} scheduled broadcasts")
-            if skipped_count > 0:
-                logger.warning(f"Skipped {skipped_count} invalid or outdated scheduled broadcasts")
+            if skipped_ids:
+                logger.warning(
+                    f"Skipped {len(skipped_ids)} invalid or outdated scheduled broadcasts"
+                )
+
+            # A pending broadcast that had started sending was interrupted by a restart.
+            # Some members may already have it, so fail it rather than send it twice.
+            interrupted_ids = []
+            for broadcast_id, broadcast in self._scheduled_broadcasts.items():
+                if (
+                    broadcast.status == ScheduledBroadcastStatus.PENDING
+                    and broadcast.dispatch_started_at is not None
+                ):
+                    broadcast.status = ScheduledBroadcastStatus.FAILED
+                    broadcast.error_message = "Interrupted by a restart while sending; not resent"
+                    interrupted_ids.append(broadcast_id)
+            if interrupted_ids:
+                logger.warning(
+                    f"Marked {len(interrupted_ids)} scheduled broadcast(s) interrupted mid-send as failed"
+                )
 
-            # If we skipped any, save the cleaned-up list
-            if skipped_count > 0:
-                self._save_scheduled_broadcasts()
+            # Drop the skipped entries and persist the failed ones
+            for broadcast_id in skipped_ids + interrupted_ids:
+                self._save_scheduled_broadcasts(broadcast_id)
         except Exception as e:
             logger.error(f"Failed to load scheduled broadcasts: {e}", exc_info=True)
 
-    def _save_silenced_devices(self):
-        """Save silenced devices list to disk"""
-        try:
-            settings.data_dir.mkdir(parents=True, exist_ok=True)
-
-            with open(SILENCED_DEVICES_FILE, "w") as f:
-                json.dump(list(self._silenced_devices), f, indent=2)
+        self._rebuild_broadcast_heap()
 
-            logger.debug(f"Saved {len(self._silenced_devices)} silenced devices")
-        except Exception as e:
-            logger.error(f"Failed to save silenced devices: {e}")
+    def _save_silenced_devices(self, device_ip: str):
+        """Write one device's silenced flag (or its removal) to the state table"""
+        if device_ip in self._silenced_devices:
+            self._state.put(SILENCED_DEVICES, device_ip, True)
+        else:
+            self._state.delete(SILENCED_DEVICES, device_ip)
 
     def _load_silenced_devices(self):
-        """Load silenced devices list from disk"""
+        """Read the legacy JSON silenced devices file"""
         try:
             if not SILENCED_DEVICES_FILE.exists():
                 return
@@ -300,7 +483,7 @@ class NotificationManager:
             return False
 
         self._silenced_devices.add(device_ip)
-        self._save_silenced_devices()
+        self._save_silenced_devices(device_ip)
         logger.info(f"Silenced device {device_ip}")
         return True
 
@@ -310,14 +493,16 @@ class NotificationManager:
             return False
 
         self._silenced_devices.discard(device_ip)
-        self._save_silenced_devices()
+        self._save_silenced_devices(device_ip)
         logger.info(f"Unsilenced device {device_ip}")
         return True
 
     def set_silenced_devices(self, device_ips: list[str]) -> None:
         """Set the full list of silenced devices"""
+        previous = self._silenced_devices
         self._silenced_devices = set(device_ips)
-        self._save_silenced_devices()
+        for device_ip in previous ^ self._silenced_devices:
+            self._save_silenced_devices(device_ip)
         logger.info(f"Set {len(self._silenced_devices)} silenced devices")
 
     def get_silenced_devices(self) -> list[str]:
@@ -326,11 +511,42 @@ class NotificationManager:
 
     # ==================== Scheduled Broadcast Scheduler ====================
 
+    def _rebuild_broadcast_heap(self):
+        """Rebuild the send-time heap from every pending broadcast"""
+        self._broadcast_heap = [
+            (_as_naive_utc(b.scheduled_at), next(self._broadcast_seq), broadcast_id)
+            for broadcast_id, b in self._scheduled_broadcasts.items()
+            if b.status == ScheduledBroadcastStatus.PENDING
+        ]
+        heapq.heapify(self._broadcast_heap)
+
+    def _schedule_broadcast(self, broadcast: ScheduledBroadcast):
+        """Add a broadcast at its current send time, waking the scheduler if it is now first"""
+        entry = (_as_naive_utc(broadcast.scheduled_at), next(self._broadcast_seq), broadcast.id)
+        heapq.heappush(self._broadcast_heap, entry)
+        if self._broadcast_heap[0] is entry and self._scheduler_wakeup is not None:
+            self._scheduler_wakeup.set()
+
+    def _next_due_broadcast(self) -> tuple[datetime, str] | None:
+        """Earliest live (send time, broadcast_id), discarding stale heap entries"""
+        while self._broadcast_heap:
+            due, _, broadcast_id = self._broadcast_heap[0]
+            broadcast = self._scheduled_broadcasts.get(broadcast_id)
+            if (
+                broadcast is not None
+                and broadcast.status == ScheduledBroadcastStatus.PENDING
+                and _as_naive_utc(broadcast.scheduled_at) == due
+            ):
+                return due, broadcast_id
+            heapq.heappop(self._broadcast_heap)
+        return None
+
     async def start_scheduler(self):
         """Start the background scheduler for processing scheduled broadcasts"""
         if self._scheduler_task is not None:
             return
 
+        self._scheduler_wakeup = asyncio.Event()
         self._scheduler_task = asyncio.create_task(self._scheduler_loop())
         logger.info("Scheduled broadcast scheduler started")
 
@@ -343,15 +559,27 @@ class NotificationManager:
             except asyncio.CancelledError:
                 pass
             self._scheduler_task = None
+            self._scheduler_wakeup = None
             logger.info("Scheduled broadcast scheduler stopped")
 
     async def _scheduler_loop(self):
-        """Background loop to check and send scheduled broadcasts"""
-        logger.info("Scheduler loop started - checking for due broadcasts every 30 seconds")
+        """Background loop that sleeps until the next broadcast is due and sends it"""
+        logger.info("Scheduler loop started")
         while True:
             try:
+                # Cleared before sending, so broadcasts scheduled meanwhile still wake us
+                self._scheduler_wakeup.clear()
                 await self._process_due_broadcasts()
-                await asyncio.sleep(30)  # Check every 30 seconds
+
+                timeout = SCHEDULER_MAX_SLEEP_SECONDS
+                next_due = self._next_due_broadcast()
+                if next_due is not None:
+                    seconds_until = (next_due[0] - datetime.utcnow()).total_seconds()
+                    timeout = min(max(seconds_until, 0), timeout)
+                try:
+                    await asyncio.wait_for(self._scheduler_wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
             except asyncio.CancelledError:
                 logger.info("Scheduler loop cancelled")
                 break
@@ -403,44 +631,19 @@ class NotificationManager:
             return []
 
     async def _process_due_broadcasts(self):
-        """Process any broadcasts that are due to be sent"""
+        """Send every pending broadcast whose send time has passed, earliest first"""
         now = datetime.utcnow()
-        pending_count = sum(
-            1
-            for b in self._scheduled_broadcasts.values()
-            if b.status == ScheduledBroadcastStatus.PENDING
-        )
-
-        if pending_count > 0:
-            logger.debug(f"Checking {pending_count} pending broadcast(s) at {now.isoformat()}")
-
-        for broadcast_id, broadcast in list(self._scheduled_broadcasts.items()):
-            if broadcast.status != ScheduledBroadcastStatus.PENDING:
-                continue
-
-            # Handle both timezone-aware and naive datetimes
-            # scheduled_at is stored as UTC, so we compare with utcnow()
-            scheduled_time = broadcast.scheduled_at
-
-            # If the datetime is timezone-aware, convert to UTC naive for comparison
-            if scheduled_time.tzinfo is not None:
-                # Convert to UTC then make naive
-                from datetime import timezone as dt_timezone
-
-                scheduled_time = scheduled_time.astimezone(dt_timezone.utc).replace(tzinfo=None)
 
-            # Log the comparison for debugging
-            time_until = (scheduled_time - now).total_seconds()
-            if time_until <= 60:  # Log if within 1 minute of sending
-                logger.info(
-                    f"Broadcast '{broadcast.title}' ({broadcast_id[:8]}...): "
-                    f"scheduled for {scheduled_time.isoformat()}Z, now is {now.isoformat()}Z, "
-                    f"{'SENDING NOW' if time_until <= 0 else f'sending in {int(time_until)}s'}"
-                )
-
-            if scheduled_time <= now:
-                logger.info(f"Sending scheduled broadcast: {broadcast.title} ({broadcast_id})")
-                await self._send_scheduled_broadcast(broadcast_id)
+        while (next_due := self._next_due_broadcast()) is not None and next_due[0] <= now:
+            heapq.heappop(self._broadcast_heap)
+            due, broadcast_id = next_due
+            broadcast = self._scheduled_broadcasts[broadcast_id]
+            logger.info(
+                f"Sending scheduled broadcast: {broadcast.title} ({broadcast_id}), "
+                f"scheduled for {due.isoformat()}Z, "
+                f"{(now - due).total_seconds():.1f}s late"
+            )
+            await self._send_scheduled_broadcast(broadcast_id)
 
     async def _send_scheduled_broadcast(self, broadcast_id: str, user_ids: list[str] | None = None):
         """
@@ -458,6 +661,17 @@ class NotificationManager:
         if not broadcast:
             return
 
+        # Claim the broadcast in the database before any member is notified
+        broadcast.dispatch_started_at = datetime.utcnow()
+        self._save_scheduled_broadcasts(broadcast_id)
+        if self._state.is_running:
+            try:
+                await self._state.flush_all()
+            except Exception as e:
+                logger.warning(
+                    f"Could not persist claim on scheduled broadcast {broadcast_id}: {e}"
+                )
+
         try:
             # If user_ids not provided, fetch them from the database
             if not user_ids:
@@ -468,7 +682,7 @@ class NotificationManager:
                     )
                     broadcast.status = ScheduledBroadcastStatus.FAILED
                     broadcast.error_message = "No users found for network"
-                    self._save_scheduled_broadcasts()
+                    self._save_scheduled_broadcasts(broadcast_id)
                     return
 
                 logger.info(f"Found {len(user_ids)} users for network {broadcast.network_id}")
@@ -516,7 +730,7 @@ class NotificationManager:
             broadcast.error_message = str(e)
             logger.error(f"Failed to send scheduled broadcast {broadcast_id}: {e}", exc_info=True)
 
-        self._save_scheduled_broadcasts()
+        self._save_scheduled_broadcasts(broadcast_id)
 
     # ==================== Scheduled Broadcast Management ====================
 
@@ -559,7 +773,8 @@ class NotificationManager:
         )
 
         self._scheduled_broadcasts[broadcast_id] = broadcast
-        self._save_scheduled_broadcasts()
+        self._save_scheduled_broadcasts(broadcast_id)
+        self._schedule_broadcast(broadcast)
 
         logger.info(
             f"Scheduled broadcast created: {broadcast_id} for network {network_id} "
@@ -572,8 +787,6 @@ class NotificationManager:
         include_completed: bool = False,
     ) -> ScheduledBroadcastResponse:
         """Get all scheduled broadcasts"""
-        from datetime import timezone as dt_timezone
-
         broadcasts = list(self._scheduled_broadcasts.values())
 
         if not include_completed:
@@ -624,7 +837,7 @@ class NotificationManager:
             return False
 
         broadcast.status = ScheduledBroadcastStatus.CANCELLED
-        self._save_scheduled_broadcasts()
+        self._save_scheduled_broadcasts(broadcast_id)
 
         logger.info(f"Scheduled broadcast cancelled: {broadcast_id}")
         return True
@@ -639,7 +852,7 @@ class NotificationManager:
             return False  # Must cancel first
 
         del self._scheduled_broadcasts[broadcast_id]
-        self._save_scheduled_broadcasts()
+        self._save_scheduled_broadcasts(broadcast_id)
 
         logger.info(f"Scheduled broadcast deleted: {broadcast_id}")
         return True
@@ -659,10 +872,8 @@ class NotificationManager:
 
         # Only set seen_at if not already set
         if broadcast.seen_at is None:
-            from datetime import timezone as dt_timezone
-
             broadcast.seen_at = datetime.now(dt_timezone.utc)
-            self._save_scheduled_broadcasts()
+            self._save_scheduled_broadcasts(broadcast_id)
             logger.info(
                 f"Broadcast {broadcast_id} marked as seen at {broadcast.seen_at.isoformat()}"
             )
@@ -704,12 +915,17 @@ class NotificationManager:
             broadcast.event_type = update_data["event_type"]
         if "priority" in update_data and update_data["priority"] is not None:
             broadcast.priority = update_data["priority"]
+        rescheduled = False
         if "scheduled_at" in update_data and update_data["scheduled_at"] is not None:
+            rescheduled = update_data["scheduled_at"] != broadcast.scheduled_at
             broadcast.scheduled_at = update_data["scheduled_at"]
         if "timezone" in update_data:
             broadcast.timezone = update_data["timezone"]
 
-        self._save_scheduled_broadcasts()
+        self._save_scheduled_broadcasts(broadcast_id)
+        if rescheduled:
+            # The old heap entry no longer matches scheduled_at and is skipped when reached
+            self._schedule_broadcast(broadcast)
 
         logger.info(f"Scheduled broadcast updated: {broadcast_id}")
         return broadcast
@@ -720,8 +936,13 @@ class NotificationManager:
         """Get notification preferences for a network (creates default if not exists)"""
         key = str(network_id)
         if key not in self._preferences:
+            if not self._preferences_known(key):
+                # Not looked up yet: don't cache or persist a default over a stored row
+                logger.warning(f"Preferences for network {key} read before being loaded")
+                return NotificationPreferences(network_id=network_id)
             self._preferences[key] = NotificationPreferences(network_id=network_id)
-            self._save_preferences()
+            self._absent_preferences.discard(key)
+            self._save_preferences(key)
 
         return self._preferences[key]
 
@@ -763,7 +984,8 @@ class NotificationManager:
         # Recreate the preferences model with validated data
         key = str(network_id)
         self._preferences[key] = NotificationPreferences(**current_data)
-        self._save_preferences()
+        self._absent_preferences.discard(key)
+        self._save_preferences(key)
 
         return self._preferences[key]
 
@@ -772,7 +994,8 @@ class NotificationManager:
         key = str(network_id)
         if key in self._preferences:
             del self._preferences[key]
-            self._save_preferences()
+            self._absent_preferences.add(key)
+            self._save_preferences(key)
             return True
         return False
 
@@ -786,25 +1009,35 @@ class NotificationManager:
 
     # ==================== Global User Preferences Management ====================
 
-    def _save_global_preferences(self):
-        """Save global preferences to disk"""
-        try:
-            settings.data_dir.mkdir(parents=True, exist_ok=True)
-
-            data = {
-                user_id: prefs.model_dump(mode="json")
-                for user_id, prefs in self._global_preferences.items()
-            }
-
-            with open(GLOBAL_PREFERENCES_FILE, "w") as f:
-                json.dump(data, f, indent=2, default=str)
+    def _save_global_preferences(self, user_id: str):
+        """Write one user's global preferences to the state table"""
+        prefs = self._global_preferences.get(user_id)
+        if prefs is not None:
+            self._state.put(GLOBAL_PREFERENCES, user_id, prefs.model_dump(mode="json"))
+        else:
+            self._state.delete(GLOBAL_PREFERENCES, user_id)
+
+    @staticmethod
+    def _parse_global_preferences(user_id: str, prefs_data: dict) -> GlobalUserPreferences | None:
+        """Build global preferences from their stored JSON form"""
+        # Parse datetime strings
+        if "created_at" in prefs_data and isinstance(prefs_data["created_at"], str):
+            prefs_data["created_at"] = datetime.fromisoformat(
+                prefs_data["created_at"].replace("Z", "+00:00")
+            )
+        if "updated_at" in prefs_data and isinstance(prefs_data["updated_at"], str):
+            prefs_data["updated_at"] = datetime.fromisoformat(
+                prefs_data["updated_at"].replace("Z", "+00:00")
+            )
 
-            logger.debug(f"Saved {len(self._global_preferences)} global user preferences")
+        try:
+            return GlobalUserPreferences(**prefs_data)
         except Exception as e:
-            logger.error(f"Failed to save global preferences: {e}")
+            logger.warning(f"Failed to load global preferences for user {user_id}: {e}")
+            return None
 
     def _load_global_preferences(self):
-        """Load global preferences from disk"""
+        """Read the legacy JSON global preferences file"""
         try:
             if not GLOBAL_PREFERENCES_FILE.exists():
                 return
@@ -813,21 +1046,9 @@ class NotificationManager:
                 data = json.load(f)
 
             for user_id, prefs_data in data.items():
-                # Parse datetime strings
-                if "created_at" in prefs_data and isinstance(prefs_data["created_at"], str):
-                    prefs_data["created_at"] = datetime.fromisoformat(
-                        prefs_data["created_at"].replace("Z", "+00:00")
-                    )
-                if "updated_at" in prefs_data and isinstance(prefs_data["updated_at"], str):
-                    prefs_data["updated_at"] = datetime.fromisoformat(
-                        prefs_data["updated_at"].replace("Z", "+00:00")
-                    )
-
-                try:
-                    self._global_preferences[user_id] = GlobalUserPreferences(**prefs_data)
-                except Exception as e:
-                    logger.warning(f"Failed to load global preferences for user {user_id}: {e}")
-                    continue
+                prefs = self._parse_global_preferences(user_id, prefs_data)
+                if prefs is not None:
+                    self._global_preferences[user_id] = prefs
 
             logger.info(f"Loaded {len(self._global_preferences)} global user preferences")
         except Exception as e:
@@ -871,6 +1092,7 @@ class NotificationManager:
                 )
 
                 self._global_preferences[network_prefs.owner_user_id] = global_prefs
+                self._save_global_preferences(network_prefs.owner_user_id)
                 migrated_count += 1
 
                 logger.info(
@@ -884,7 +1106,6 @@ class NotificationManager:
                 continue
 
         if migrated_count > 0:
-            self._save_global_preferences()
             logger.info(
                 f"Migration complete: {migrated_count} users migrated to global preferences, "
                 f"{skipped_count} already had global preferences"
@@ -896,7 +1117,7 @@ class NotificationManager:
         """Get global notification preferences for a user (creates default if not exists)"""
         if user_id not in self._global_preferences:
             self._global_preferences[user_id] = GlobalUserPreferences(user_id=user_id)
-            self._save_global_preferences()
+            self._save_global_preferences(user_id)
 
         return self._global_preferences[user_id]
 
@@ -922,7 +1143,7 @@ class NotificationManager:
 
         # Recreate the preferences model with validated data
         self._global_preferences[user_id] = GlobalUserPreferences(**current_data)
-        self._save_global_preferences()
+        self._save_global_preferences(user_id)
 
         return self._global_preferences[user_id]
 
@@ -953,32 +1174,22 @@ class NotificationManager:
 
     # ==================== Rate Limiting ====================
 
-    def _check_rate_limit(self, network_id: str, prefs: NotificationPreferences) -> bool:
-        """Check if network is within rate limit. Returns True if allowed."""
-        now = datetime.utcnow()
-        hour_ago = now - timedelta(hours=1)
-        key = str(network_id)
-
-        if key not in self._rate_limits:
-            self._rate_limits[key] = deque(maxlen=prefs.max_notifications_per_hour)
-
-        # Clean old entries
-        while self._rate_limits[key] and self._rate_limits[key][0] < hour_ago:
-            self._rate_limits[key].popleft()
-
-        # Check limit
-        if len(self._rate_limits[key]) >= prefs.max_notifications_per_hour:
-            return False
-
-        return True
-
-    def _record_rate_limit(self, network_id: str):
-        """Record a notification for rate limiting"""
-        now = datetime.utcnow()
-        key = str(network_id)
-        if key not in self._rate_limits:
-            self._rate_limits[key] = deque()
-        self._rate_limits[key].append(now)
+    def _rate_limits_for(self, prefs: NotificationPreferences) -> list[RateLimit]:
+        """Buckets a network notification draws from: the network and its owner"""
+        limits = [network_rate_limit(prefs.network_id, prefs.max_notifications_per_hour)]
+        if prefs.owner_user_id:
+            limits.append(user_rate_limit(prefs.owner_user_id))
+        return limits
+
+    async def _acquire_rate_limit(self, prefs: NotificationPreferences) -> bool:
+        """Take a token from the network's shared buckets. Returns True if allowed."""
+        decision = await rate_limiter.acquire(*self._rate_limits_for(prefs))
+        if not decision.allowed:
+            logger.info(
+                f"Rate limit exceeded for network {prefs.network_id}, "
+                f"retry in {decision.retry_after:.0f}s"
+            )
+        return decision.allowed
 
     def _is_quiet_hours(self, prefs: NotificationPreferences) -> bool:
         """
@@ -1092,10 +1303,6 @@ class NotificationManager:
             else:
                 return False, "Currently in quiet hours"
 
-        # Check rate limit
-        if not self._check_rate_limit(prefs.network_id, prefs):
-            return False, "Rate limit exceeded"
-
         return True, ""
 
     async def send_notification_to_network(
@@ -1115,6 +1322,7 @@ class NotificationManager:
         Returns:
             List of NotificationRecord for each channel attempted
         """
+        await self.ensure_preferences_loaded([network_id])
         prefs = self.get_preferences(network_id)
         records = []
 
@@ -1136,6 +1344,8 @@ class NotificationManager:
                     f"min_priority={prefs.minimum_priority.value}"
                 )
                 return records
+            if not await self._acquire_rate_limit(prefs):
+                return records
 
         notification_id = str(uuid.uuid4())
 
@@ -1162,7 +1372,9 @@ class NotificationManager:
                     priority=event.priority,
                 )
                 records.append(record)
-                self._history.append(record)
+                self._record_history(
+                    record, user_id=prefs.owner_user_id, event_type=event.event_type
+                )
             else:
                 logger.info(
                     f"Attempting to send email notification to {prefs.email.email_address} for network {network_id}"
@@ -1182,7 +1394,9 @@ class NotificationManager:
                         f"✗ Email notification failed for network {network_id}: {record.error_message}"
                     )
                 records.append(record)
-                self._history.append(record)
+                self._record_history(
+                    record, user_id=prefs.owner_user_id, event_type=event.event_type
+                )
         else:
             logger.debug(
                 f"Email notifications not enabled for network {network_id} (enabled={prefs.email.enabled}, address={'SET' if prefs.email.email_address else 'NOT SET'})"
@@ -1205,18 +1419,10 @@ class NotificationManager:
                     f"✗ Discord notification failed for network {network_id}: {record.error_message}"
                 )
             records.append(record)
-            self._history.append(record)
+            self._record_history(record, user_id=prefs.owner_user_id, event_type=event.event_type)
         else:
             logger.debug(f"Discord notifications not enabled for network {network_id}")
 
-        # Record for rate limiting
-        if records and not force:
-            self._record_rate_limit(network_id)
-
-        # Save history periodically
-        if len(self._history) % 50 == 0:
-            self._save_history()
-
         return records
 
     async def send_notification_to_network_members(
@@ -1249,6 +1455,7 @@ class NotificationManager:
             event.network_id = network_id
 
         # Get network preferences (shared preferences for all network members)
+        await self.ensure_preferences_loaded([network_id])
         network_prefs = self.get_preferences(network_id)
 
         # Check if we should send based on network preferences
@@ -1257,6 +1464,8 @@ class NotificationManager:
             if not should_notify:
                 logger.info(f"Skipping broadcast notification for network {network_id}: {reason}")
                 return results
+            if not await self._acquire_rate_limit(network_prefs):
+                return results
 
         notification_id = str(uuid.uuid4())
 
@@ -1339,8 +1548,10 @@ class NotificationManager:
                             priority=record.priority,
                         )
                         results[user_id].append(user_record)
-                    # Add one record to history (the actual sent notification)
-                    self._history.append(record)
+                    # One history row for the shared send, listing every member
+                    self._record_history(
+                        record, event_type=event.event_type, recipient_ids=user_ids
+                    )
                 except Exception as e:
                     logger.error(
                         f"Exception while sending email notification for network {network_id}: {e}",
@@ -1409,8 +1620,8 @@ class NotificationManager:
                         priority=record.priority,
                     )
                     results[user_id].append(user_record)
-                # Add one record to history (the actual sent notification)
-                self._history.append(record)
+                # One history row for the shared send, listing every member
+                self._record_history(record, event_type=event.event_type, recipient_ids=user_ids)
             except Exception as e:
                 logger.error(
                     f"Exception while sending Discord notification for network {network_id}: {e}",
@@ -1436,14 +1647,6 @@ class NotificationManager:
         else:
             logger.info(f"Discord notifications not enabled for network {network_id}")
 
-        # Record for rate limiting (once per network, not per user)
-        if results and not force:
-            self._record_rate_limit(network_id)
-
-        # Save history periodically
-        if len(self._history) % 50 == 0:
-            self._save_history()
-
         # Count successful sends
         successful_channels = 0
         failed_channels = 0
@@ -1501,6 +1704,7 @@ class NotificationManager:
         """
         results = {}
 
+        await self.load_all_preferences()
         enabled_networks = self.get_all_networks_with_notifications_enabled()
         logger.info(
             f"Broadcasting {event.event_type.value} notification to {len(enabled_networks)} networks"
@@ -1601,60 +1805,15 @@ class NotificationManager:
 
         # Send email to each user
         for user_id in user_ids:
-            prefs = self._global_preferences[user_id]
-
-            if not prefs.email_address:
-                logger.warning(
-                    f"Skipping user {user_id}: email_address not set in global preferences"
-                )
+            record = await self.send_global_notification_to_user(user_id, event, notification_id)
+            if record is None:
                 failed += 1
                 continue
-
-            try:
-                logger.info(
-                    f"Attempting to send global {event.event_type.value} notification to {prefs.email_address} (user {user_id})"
-                )
-                record = await send_notification_email(
-                    to_email=prefs.email_address,
-                    event=event,
-                    notification_id=notification_id,
-                )
-                # Use network_id=None for global notifications (not network-specific)
-                record.network_id = None
-
-                if record.success:
-                    logger.info(
-                        f"✓ Global {event.event_type.value} notification sent successfully to {prefs.email_address} (user {user_id})"
-                    )
-                    successful += 1
-                else:
-                    logger.error(
-                        f"✗ Global {event.event_type.value} notification failed for {prefs.email_address} (user {user_id}): {record.error_message}"
-                    )
-                    failed += 1
-
-                results[user_id] = [record]
-                self._history.append(record)
-            except Exception as e:
-                logger.error(
-                    f"✗ Exception while sending global notification to user {user_id} ({prefs.email_address}): {e}",
-                    exc_info=True,
-                )
+            results[user_id] = [record]
+            if record.success:
+                successful += 1
+            else:
                 failed += 1
-                # Create a failed record
-                record = NotificationRecord(
-                    notification_id=notification_id,
-                    event_id=event.event_id,
-                    network_id=None,  # Global notifications have no network_id
-                    channel=NotificationChannel.EMAIL,
-                    success=False,
-                    error_message=str(e),
-                    title=event.title,
-                    message=event.message,
-                    priority=event.priority,
-                )
-                results[user_id] = [record]
-                self._history.append(record)
 
         logger.info(
             f"Global {event.event_type.value} notification complete: "
@@ -1663,12 +1822,82 @@ class NotificationManager:
 
         return results
 
-        # Save history periodically
-        if len(self._history) % 50 == 0:
-            self._save_history()
+    async def send_global_notification_to_user(
+        self, user_id: str, event: NetworkEvent, notification_id: str
+    ) -> NotificationRecord | None:
+        """
+        Email a global notification to one user and record it in history.
 
-        logger.info(f"Broadcasted global notification to {len(results)} users: {event.title}")
-        return results
+        Returns None if the user has no global preferences or email address.
+        """
+        prefs = self._global_preferences.get(user_id)
+        if prefs is None or not prefs.email_address:
+            logger.warning(f"Skipping user {user_id}: email_address not set in global preferences")
+            return None
+        return await self._send_global_email(user_id, prefs.email_address, event, notification_id)
+
+    async def send_status_notification_to_subscriber(
+        self, user_id: str, event: NetworkEvent, notification_id: str
+    ) -> NotificationRecord | None:
+        """
+        Email a Cartographer up/down notification to one status subscriber.
+
+        Returns None if the user has unsubscribed or has no email address.
+        """
+        from .cartographer_status import cartographer_status_service
+
+        subscription = cartographer_status_service.get_subscription(user_id)
+        if subscription is None or not subscription.email_address:
+            logger.warning(f"Skipping status subscriber {user_id}: no email address")
+            return None
+        return await self._send_global_email(
+            user_id, subscription.email_address, event, notification_id
+        )
+
+    async def _send_global_email(
+        self, user_id: str, email_address: str, event: NetworkEvent, notification_id: str
+    ) -> NotificationRecord:
+        """Email a notification that belongs to no network and record it in history"""
+        try:
+            logger.info(
+                f"Attempting to send global {event.event_type.value} notification to {email_address} (user {user_id})"
+            )
+            record = await send_notification_email(
+                to_email=email_address,
+                event=event,
+                notification_id=notification_id,
+            )
+            # Use network_id=None for global notifications (not network-specific)
+            record.network_id = None
+
+            if record.success:
+                logger.info(
+                    f"✓ Global {event.event_type.value} notification sent successfully to {email_address} (user {user_id})"
+                )
+            else:
+                logger.error(
+                    f"✗ Global {event.event_type.value} notification failed for {email_address} (user {user_id}): {record.error_message}"
+                )
+        except Exception as e:
+            logger.error(
+                f"✗ Exception while sending global notification to user {user_id} ({email_address}): {e}",
+                exc_info=True,
+            )
+            # Create a failed record
+            record = NotificationRecord(
+                notification_id=notification_id,
+                event_id=event.event_id,
+                network_id=None,  # Global notifications have no network_id
+                channel=NotificationChannel.EMAIL,
+                success=False,
+                error_message=str(e),
+                title=event.title,
+                message=event.message,
+                priority=event.priority,
+            )
+
+        self._record_history(record, user_id=user_id, event_type=event.event_type)
+        return record
 
     async def send_test_notification(
         self,
@@ -1676,6 +1905,7 @@ class NotificationManager:
         request: TestNotificationRequest,
     ) -> TestNotificationResponse:
         """Send a test notification via a specific channel"""
+        await self.ensure_preferences_loaded([network_id])
         prefs = self.get_preferences(network_id)
 
         if request.channel == NotificationChannel.EMAIL:
@@ -1731,67 +1961,41 @@ class NotificationManager:
 
     # ==================== History and Stats ====================
 
-    def get_history(
+    async def get_history(
         self,
         network_id: str | None = None,
-        page: int = 1,
+        user_id: str | None = None,
+        channel: NotificationChannel | None = None,
+        success: bool | None = None,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        cursor: str | None = None,
         per_page: int = 50,
     ) -> NotificationHistoryResponse:
-        """Get notification history, optionally filtered by network"""
-        records = list(self._history)
-
-        if network_id is not None:
-            records = [r for r in records if r.network_id == network_id]
-
-        # Sort by timestamp descending
-        records.sort(key=lambda r: r.timestamp, reverse=True)
-
-        total = len(records)
-        start = (page - 1) * per_page
-        end = start + per_page
-
-        return NotificationHistoryResponse(
-            notifications=records[start:end],
-            total_count=total,
-            page=page,
+        """Get a page of notification history, newest first, filtered in the database"""
+        return await notification_history.query(
+            network_id=network_id,
+            user_id=user_id,
+            channel=channel,
+            success=success,
+            since=since,
+            until=until,
+            cursor=cursor,
             per_page=per_page,
         )
 
-    def get_stats(self, network_id: str | None = None) -> NotificationStatsResponse:
-        """Get notification statistics"""
-        now = datetime.utcnow()
-        day_ago = now - timedelta(days=1)
-        week_ago = now - timedelta(days=7)
-
-        records = list(self._history)
-
-        if network_id is not None:
-            records = [r for r in records if r.network_id == network_id]
-
-        records_24h = [r for r in records if r.timestamp > day_ago]
-        records_7d = [r for r in records if r.timestamp > week_ago]
-
-        by_channel = {}
-        by_type = {}
-        successful = 0
-        total = len(records_7d)
-
-        for record in records_7d:
-            by_channel[record.channel.value] = by_channel.get(record.channel.value, 0) + 1
-            if record.success:
-                successful += 1
+    async def get_stats(self, network_id: str | None = None) -> NotificationStatsResponse:
+        """Get last-24h and last-7d notification statistics from the stats buckets"""
+        return await notification_stats.get_summary(network_id)
 
-        # Get anomaly count from detector
-        anomalies_24h = len([r for r in records_24h if "anomaly" in r.title.lower()])
-
-        return NotificationStatsResponse(
-            total_sent_24h=len(records_24h),
-            total_sent_7d=len(records_7d),
-            by_channel=by_channel,
-            by_type=by_type,
-            success_rate=successful / total if total > 0 else 1.0,
-            anomalies_detected_24h=anomalies_24h,
-        )
+    async def get_stats_range(
+        self,
+        network_id: str | None,
+        since: datetime,
+        until: datetime | None = None,
+    ) -> NotificationStatsRange:
+        """Get notification statistics for an arbitrary time range"""
+        return await notification_stats.query(network_id, since, until)
 
     # ==================== Integration with Health Service ====================
 
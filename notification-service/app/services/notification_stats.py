@@ -0,0 +1,526 @@
+"""
+Pre-aggregated notification statistics.
+
+Counts are maintained incrementally as notifications are recorded, in
+per-network minute, hour and day buckets broken down by event type,
+priority, channel and success. Increments accumulate in memory and are
+upserted in one statement per flush.
+
+A time-range query is answered by covering the range with the fewest
+buckets: whole days in the middle, hours and then minutes at the edges.
+The cost depends on the number of buckets, not on how many notifications
+were sent. Minute and hour buckets expire after a while. Older ranges are
+widened to the next coarser bucket size.
+
+Buckets can be rebuilt from the notification_history table for backfills:
+
+    python -m app.commands rebuild-stats [--network-id ID] [--since DATE]
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import and_, delete, func, insert, literal, or_, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from ..config import settings
+from ..database import async_session_maker
+from ..models import (
+    NotificationRecord,
+    NotificationStatsRange,
+    NotificationStatsResponse,
+    NotificationType,
+)
+from ..models.database import NotificationHistoryEntry, NotificationStatsBucket
+
+logger = logging.getLogger(__name__)
+
+GRANULARITIES = ("minute", "hour", "day")
+
+BUCKET_SIZES = {
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+}
+
+# How often the flusher expires old minute/hour buckets
+RETENTION_INTERVAL_SECONDS = 3600.0
+
+# (network_key, granularity, bucket_start, event_type, priority, channel, success)
+BucketKey = tuple[str, str, datetime, str, str, str, bool]
+
+# (event_type, priority, channel, success, count)
+BucketCount = tuple[str, str, str, bool, int]
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def floor_bucket(value: datetime, granularity: str) -> datetime:
+    """Start of the bucket containing ``value``"""
+    if granularity == "minute":
+        return value.replace(second=0, microsecond=0)
+    if granularity == "hour":
+        return value.replace(minute=0, second=0, microsecond=0)
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def ceil_bucket(value: datetime, granularity: str) -> datetime:
+    floored = floor_bucket(value, granularity)
+    return floored if floored == value else floored + BUCKET_SIZES[granularity]
+
+
+def plan_ranges(
+    since: datetime, until: datetime, now: datetime
+) -> tuple[list[tuple[str, datetime, datetime]], datetime, datetime]:
+    """
+    Cover ``[since, until)`` with the fewest stored buckets.
+
+    Returns ``(granularity, start, end)`` ranges plus the effective bounds.
+    Bounds are aligned to minutes. Bounds older than the minute or hour
+    retention are widened to hours or days.
+    """
+    minute_horizon = now - timedelta(hours=settings.stats_minute_retention_hours)
+    hour_horizon = now - timedelta(days=settings.stats_hour_retention_days)
+
+    since = floor_bucket(since, "minute")
+    until = ceil_bucket(until, "minute")
+    if since < hour_horizon:
+        since = floor_bucket(since, "day")
+    elif since < minute_horizon:
+        since = floor_bucket(since, "hour")
+    if until < hour_horizon:
+        until = ceil_bucket(until, "day")
+    elif until < minute_horizon:
+        until = ceil_bucket(until, "hour")
+
+    if since >= until:
+        return [], since, until
+
+    first_hour, last_hour = ceil_bucket(since, "hour"), floor_bucket(until, "hour")
+    if first_hour >= last_hour:
+        return [("minute", since, until)], since, until
+
+    first_day, last_day = ceil_bucket(first_hour, "day"), floor_bucket(last_hour, "day")
+    if first_day < last_day:
+        middle = [
+            ("hour", first_hour, first_day),
+            ("day", first_day, last_day),
+            ("hour", last_day, last_hour),
+        ]
+    else:
+        middle = [("hour", first_hour, last_hour)]
+
+    ranges = [("minute", since, first_hour), *middle, ("minute", last_hour, until)]
+    return [r for r in ranges if r[1] < r[2]], since, until
+
+
+# ==================== Stores ====================
+
+
+class SqlStatsStore:
+    """PostgreSQL-backed bucket storage"""
+
+    def __init__(self, session_maker=async_session_maker):
+        self._session_maker = session_maker
+
+    async def increment(self, deltas: dict[BucketKey, int]):
+        # Sorted so concurrent flushes from several replicas lock rows in the same order
+        rows = [
+            {
+                "network_key": key[0],
+                "granularity": key[1],
+                "bucket_start": key[2],
+                "event_type": key[3],
+                "priority": key[4],
+                "channel": key[5],
+                "success": key[6],
+                "count": count,
+            }
+            for key, count in sorted(deltas.items(), key=lambda item: item[0])
+        ]
+        stmt = pg_insert(NotificationStatsBucket)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[
+                NotificationStatsBucket.network_key,
+                NotificationStatsBucket.granularity,
+                NotificationStatsBucket.bucket_start,
+                NotificationStatsBucket.event_type,
+                NotificationStatsBucket.priority,
+                NotificationStatsBucket.channel,
+                NotificationStatsBucket.success,
+            ],
+            set_={"count": NotificationStatsBucket.count + stmt.excluded.count},
+        )
+        async with self._session_maker() as session:
+            await session.execute(stmt, rows)
+            await session.commit()
+
+    async def query(
+        self, network_key: str | None, ranges: list[tuple[str, datetime, datetime]]
+    ) -> list[BucketCount]:
+        """Counts per dimension combination, summed over the given bucket ranges"""
+        bucket = NotificationStatsBucket
+        stmt = (
+            select(
+                bucket.event_type,
+                bucket.priority,
+                bucket.channel,
+                bucket.success,
+                func.sum(bucket.count),
+            )
+            .where(
+                or_(
+                    *(
+                        and_(
+                            bucket.granularity == granularity,
+                            bucket.bucket_start >= start,
+                            bucket.bucket_start < end,
+                        )
+                        for granularity, start, end in ranges
+                    )
+                )
+            )
+            .group_by(bucket.event_type, bucket.priority, bucket.channel, bucket.success)
+        )
+        if network_key is not None:
+            stmt = stmt.where(bucket.network_key == network_key)
+
+        async with self._session_maker() as session:
+            result = await session.execute(stmt)
+            return [tuple(row[:4]) + (int(row[4]),) for row in result.all()]
+
+    async def delete_before(self, granularity: str, cutoff: datetime, batch_size: int) -> int:
+        """Delete up to ``batch_size`` buckets of one granularity that start before ``cutoff``"""
+        async with self._session_maker() as session:
+            result = await session.execute(
+                text(
+                    "DELETE FROM notification_stats_buckets WHERE ctid IN ("
+                    "SELECT ctid FROM notification_stats_buckets "
+                    "WHERE granularity = :granularity AND bucket_start < :cutoff LIMIT :limit)"
+                ),
+                {"granularity": granularity, "cutoff": cutoff, "limit": batch_size},
+            )
+            await session.commit()
+            return result.rowcount
+
+    async def rebuild(
+        self, network_id: str | None, since: datetime | None, horizons: dict[str, datetime]
+    ) -> int:
+        """Replace buckets with counts aggregated from notification_history"""
+        bucket = NotificationStatsBucket
+        history = NotificationHistoryEntry
+        network_key = func.coalesce(history.network_id, "")
+
+        async with self._session_maker() as session:
+            clear = delete(bucket)
+            if network_id is not None:
+                clear = clear.where(bucket.network_key == network_id)
+            if since is not None:
+                clear = clear.where(bucket.bucket_start >= since)
+            await session.execute(clear)
+
+            inserted = 0
+            for granularity in GRANULARITIES:
+                start = max(filter(None, (since, horizons.get(granularity))), default=None)
+                bucket_start = func.timezone(
+                    "UTC", func.date_trunc(granularity, func.timezone("UTC", history.created_at))
+                )
+                # Grouped by position: the expressions carry bind parameters, which
+                # PostgreSQL can't match between the select list and GROUP BY
+                source = select(
+                    network_key,
+                    literal(granularity),
+                    bucket_start,
+                    func.coalesce(history.event_type, ""),
+                    history.priority,
+                    history.channel,
+                    history.success,
+                    func.count(),
+                ).group_by(text("1, 3, 4, 5, 6, 7"))
+                if network_id is not None:
+                    source = source.where(history.network_id == network_id)
+                if start is not None:
+                    source = source.where(history.created_at >= start)
+
+                result = await session.execute(
+                    insert(bucket).from_select(
+                        [
+                            "network_key",
+                            "granularity",
+                            "bucket_start",
+                            "event_type",
+                            "priority",
+                            "channel",
+                            "success",
+                            "count",
+                        ],
+                        source,
+                    )
+                )
+                inserted += result.rowcount
+            await session.commit()
+            return inserted
+
+
+class InMemoryStatsStore:
+    """Non-durable bucket storage for tests and benchmarks"""
+
+    def __init__(self, history_store=None):
+        self.buckets: dict[BucketKey, int] = {}
+        self._history_store = history_store
+
+    async def increment(self, deltas: dict[BucketKey, int]):
+        for key, count in deltas.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+
+    async def query(
+        self, network_key: str | None, ranges: list[tuple[str, datetime, datetime]]
+    ) -> list[BucketCount]:
+        totals: dict[tuple, int] = {}
+        for key, count in self.buckets.items():
+            if network_key is not None and key[0] != network_key:
+                continue
+            if not any(key[1] == g and start <= key[2] < end for g, start, end in ranges):
+                continue
+            totals[key[3:]] = totals.get(key[3:], 0) + count
+        return [dims + (count,) for dims, count in totals.items()]
+
+    async def delete_before(self, granularity: str, cutoff: datetime, batch_size: int) -> int:
+        expired = [k for k in self.buckets if k[1] == granularity and k[2] < cutoff][:batch_size]
+        for key in expired:
+            del self.buckets[key]
+        return len(expired)
+
+    async def rebuild(
+        self, network_id: str | None, since: datetime | None, horizons: dict[str, datetime]
+    ) -> int:
+        self.buckets = {
+            key: count
+            for key, count in self.buckets.items()
+            if (network_id is not None and key[0] != network_id)
+            or (since is not None and key[2] < since)
+        }
+        inserted = set()
+        for entry in self._history_store.entries:
+            if network_id is not None and entry.network_id != network_id:
+                continue
+            for granularity in GRANULARITIES:
+                start = max(filter(None, (since, horizons.get(granularity))), default=None)
+                if start is not None and entry.created_at < start:
+                    continue
+                key = (
+                    entry.network_id or "",
+                    granularity,
+                    floor_bucket(entry.created_at, granularity),
+                    entry.event_type or "",
+                    entry.priority,
+                    entry.channel,
+                    entry.success,
+                )
+                self.buckets[key] = self.buckets.get(key, 0) + 1
+                inserted.add(key)
+        return len(inserted)
+
+
+# ==================== Stats ====================
+
+
+class NotificationStats:
+    """Accumulates bucket increments and answers time-range queries from buckets"""
+
+    def __init__(self, store=None, clock=None):
+        self._store = store or SqlStatsStore()
+        self._clock = clock or (lambda: datetime.now(timezone.utc))
+        self._pending: dict[BucketKey, int] = {}
+        self._flush_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self._running = False
+        self._last_retention = 0.0
+
+        self._stats = {"recorded": 0, "flushes": 0, "expired": 0}
+        self._last_error: str | None = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._running
+
+    def record(self, record: NotificationRecord, event_type: NotificationType | None = None):
+        """Count a channel attempt in its minute, hour and day buckets"""
+        timestamp = _as_utc(record.timestamp)
+        dims = (
+            event_type.value if event_type is not None else "",
+            record.priority.value,
+            record.channel.value,
+            record.success,
+        )
+        for granularity in GRANULARITIES:
+            key = (
+                record.network_id or "",
+                granularity,
+                floor_bucket(timestamp, granularity),
+                *dims,
+            )
+            self._pending[key] = self._pending.get(key, 0) + 1
+        self._stats["recorded"] += 1
+
+    async def start(self):
+        """Start the background flusher"""
+        if self._running:
+            return
+        self._running = True
+        self._task = asyncio.create_task(self._flush_loop())
+        logger.info("Notification stats writer started")
+
+    async def stop(self):
+        """Stop the flusher and write out pending increments"""
+        if not self._running:
+            return
+        self._running = False
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Failed to flush notification stats on shutdown: {e}")
+        logger.info("Notification stats writer stopped")
+
+    async def _flush_loop(self):
+        while self._running:
+            await asyncio.sleep(settings.stats_flush_interval_seconds)
+            try:
+                await self.flush()
+                loop_time = asyncio.get_running_loop().time()
+                if loop_time - self._last_retention >= RETENTION_INTERVAL_SECONDS:
+                    self._last_retention = loop_time
+                    await self.enforce_retention()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._last_error = str(e)
+                logger.error(f"Notification stats flush failed: {e}")
+
+    async def flush(self) -> int:
+        """Upsert all pending increments. Returns the number of buckets touched."""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            pending, self._pending = self._pending, {}
+            try:
+                await self._store.increment(pending)
+            except Exception:
+                # Merge back so the increments are retried on the next flush
+                for key, count in pending.items():
+                    self._pending[key] = self._pending.get(key, 0) + count
+                raise
+            self._stats["flushes"] += 1
+            return len(pending)
+
+    def _horizons(self) -> dict[str, datetime]:
+        now = self._clock()
+        return {
+            "minute": now - timedelta(hours=settings.stats_minute_retention_hours),
+            "hour": now - timedelta(days=settings.stats_hour_retention_days),
+        }
+
+    async def enforce_retention(self, batch_size: int = 5000) -> int:
+        """Delete minute and hour buckets past their retention, in bounded batches"""
+        deleted = 0
+        for granularity, cutoff in self._horizons().items():
+            # Keep one extra bucket so ranges widened to the horizon still find their data
+            cutoff = floor_bucket(cutoff, "day" if granularity == "hour" else "hour")
+            while True:
+                count = await self._store.delete_before(granularity, cutoff, batch_size)
+                deleted += count
+                if count < batch_size:
+                    break
+                await asyncio.sleep(0)
+        self._stats["expired"] += deleted
+        return deleted
+
+    async def query(
+        self,
+        network_id: str | None,
+        since: datetime,
+        until: datetime | None = None,
+    ) -> NotificationStatsRange:
+        """Counts for ``[since, until)``; ``network_id=None`` covers every network"""
+        now = self._clock()
+        ranges, since, until = plan_ranges(_as_utc(since), _as_utc(until or now), now)
+
+        # Make recent sends visible to the caller that just made them
+        if self._pending:
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning(f"Could not flush notification stats before query: {e}")
+
+        counts = await self._store.query(network_id, ranges) if ranges else []
+
+        result = NotificationStatsRange(network_id=network_id, since=since, until=until)
+        for event_type, priority, channel, success, count in counts:
+            result.total += count
+            if success:
+                result.successful += count
+            else:
+                result.failed += count
+            result.by_channel[channel] = result.by_channel.get(channel, 0) + count
+            result.by_priority[priority] = result.by_priority.get(priority, 0) + count
+            if event_type:
+                result.by_type[event_type] = result.by_type.get(event_type, 0) + count
+        if result.total:
+            result.success_rate = result.successful / result.total
+        return result
+
+    async def get_summary(self, network_id: str | None = None) -> NotificationStatsResponse:
+        """Last-24h and last-7d summary used by the stats endpoints"""
+        now = self._clock()
+        day = await self.query(network_id, now - timedelta(days=1), now)
+        week = await self.query(network_id, now - timedelta(days=7), now)
+        return NotificationStatsResponse(
+            total_sent_24h=day.total,
+            total_sent_7d=week.total,
+            by_channel=week.by_channel,
+            by_type=week.by_type,
+            by_priority=week.by_priority,
+            success_rate=week.success_rate,
+            anomalies_detected_24h=day.by_type.get(NotificationType.ANOMALY_DETECTED.value, 0),
+        )
+
+    async def rebuild(self, network_id: str | None = None, since: datetime | None = None) -> int:
+        """
+        Recompute buckets from notification history.
+
+        ``since`` is aligned down to a day so rebuilt and untouched buckets don't
+        overlap. Minute and hour buckets are only rebuilt within their retention.
+        """
+        await self.flush()
+        if since is not None:
+            since = floor_bucket(_as_utc(since), "day")
+        horizons = {
+            granularity: floor_bucket(cutoff, "day" if granularity == "hour" else "hour")
+            for granularity, cutoff in self._horizons().items()
+        }
+        buckets = await self._store.rebuild(network_id, since, horizons)
+        logger.info(
+            f"Rebuilt {buckets} notification stats buckets"
+            f" for {'network ' + network_id if network_id else 'all networks'}"
+            f"{f' since {since.date()}' if since else ''}"
+        )
+        return buckets
+
+    def get_status(self) -> dict:
+        return {
+            "running": self._running,
+            "pending_buckets": len(self._pending),
+            **self._stats,
+            "last_error": self._last_error,
+        }
+
+
+# Singleton instance
+notification_stats = NotificationStats()
@@ -0,0 +1,248 @@
+"""
+In-process cache of resolved notification preferences.
+
+Dispatch reads the same network's preferences for every event, which during
+an outage storm means the same rows are fetched (and fixed up) over and over.
+This cache keeps detached copies of the resolved rows per scope (one scope
+per network plus one for global preferences), tagged with the scope's
+version counter at load time.
+
+Any write to a scope bumps its counter, which drops the cached entry, and
+broadcasts the bump over Redis pub/sub so other replicas drop theirs too. An
+entry loaded while a bump happened carries the old version and is discarded
+instead of stored, so a slow read cannot resurrect stale data. Entries also
+expire after a TTL, which bounds staleness if an invalidation message is
+lost while a replica is disconnected.
+"""
+
+import asyncio
+import copy
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy import inspect as sa_inspect
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "notify:prefs:invalidate"
+GLOBAL_SCOPE = "global"
+
+# Marks a key that was looked up and has no row, so it is not re-queried
+MISSING = object()
+
+
+def network_scope(network_id: str) -> str:
+    return f"network:{network_id}"
+
+
+def detached_copy(row: Any) -> Any:  # noqa: ANN401
+    """Column-only copy of an ORM row that is not attached to any session"""
+    mapper = sa_inspect(row).mapper
+    return mapper.class_(
+        **{attr.key: copy.deepcopy(getattr(row, attr.key)) for attr in mapper.column_attrs}
+    )
+
+
+@dataclass
+class _Entry:
+    version: int
+    loaded_at: float
+    rows: dict[str, Any] = field(default_factory=dict)
+
+
+class PreferenceCache:
+    """
+    Versioned per-scope cache with Redis pub/sub invalidation.
+
+    Cached rows are shared, read-only copies: callers must not modify them or
+    add them to a session.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._versions: dict[str, int] = {}
+        self._epoch = 0  # bumped by clear() so every scope's version moves
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._emails: dict[str, tuple[str, float]] = {}  # user_id -> (email, loaded_at)
+        self._origin = uuid.uuid4().hex
+        self._redis: Redis | None = None
+        self._listener: asyncio.Task | None = None
+
+        self.hits = 0
+        self.misses = 0
+        self.db_queries = 0
+        self.invalidations = 0
+        self.remote_invalidations = 0
+
+    # ==================== Lookups ====================
+
+    def version(self, scope: str) -> int:
+        return self._epoch + self._versions.get(scope, 0)
+
+    def lookup(self, scope: str, keys: list[str]) -> tuple[dict[str, Any], list[str], int]:
+        """
+        Return (cached rows, keys still to load, version to store them under).
+
+        Keys cached as missing are left out of both results.
+        """
+        version = self.version(scope)
+        entry = self._entries.get(scope)
+        if entry is not None and (
+            entry.version != version
+            or self._clock() - entry.loaded_at > settings.preference_cache_ttl_seconds
+        ):
+            del self._entries[scope]
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+            return {}, list(keys), version
+
+        self._entries.move_to_end(scope)
+        found = {}
+        missing = []
+        for key in keys:
+            row = entry.rows.get(key)
+            if row is None:
+                missing.append(key)
+            elif row is not MISSING:
+                found[key] = row
+        if missing:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return found, missing, version
+
+    def store(self, scope: str, version: int, rows: dict[str, Any]) -> None:
+        """Cache rows loaded at ``version``; dropped if the scope changed meanwhile"""
+        if version != self.version(scope):
+            return
+        entry = self._entries.get(scope)
+        if entry is None or entry.version != version:
+            entry = self._entries[scope] = _Entry(version=version, loaded_at=self._clock())
+        entry.rows.update(rows)
+        self._entries.move_to_end(scope)
+        while len(self._entries) > settings.preference_cache_max_networks:
+            self._entries.popitem(last=False)
+
+    def lookup_emails(self, user_ids: list[str]) -> tuple[dict[str, str], list[str]]:
+        """Return (cached emails, user ids still to load)"""
+        now = self._clock()
+        found, missing = {}, []
+        for user_id in user_ids:
+            cached = self._emails.get(user_id)
+            if cached and now - cached[1] <= settings.preference_cache_email_ttl_seconds:
+                found[user_id] = cached[0]
+            else:
+                missing.append(user_id)
+        if missing:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return found, missing
+
+    def store_emails(self, emails: dict[str, str]) -> None:
+        now = self._clock()
+        for user_id, email in emails.items():
+            self._emails[user_id] = (email, now)
+
+    # ==================== Invalidation ====================
+
+    def _bump(self, scope: str) -> None:
+        self._versions[scope] = self._versions.get(scope, 0) + 1
+        self._entries.pop(scope, None)
+
+    async def invalidate(self, scope: str) -> None:
+        """Drop a scope here and on every other replica"""
+        self._bump(scope)
+        self.invalidations += 1
+        if self._redis is None:
+            return
+        try:
+            await self._redis.publish(
+                INVALIDATION_CHANNEL, json.dumps({"scope": scope, "origin": self._origin})
+            )
+        except RedisError as e:
+            logger.warning(f"Could not broadcast preference invalidation for {scope}: {e}")
+
+    def clear(self) -> None:
+        """Drop every cached entry and discard loads that are still in flight"""
+        self._epoch += 1
+        self._entries.clear()
+        self._emails.clear()
+
+    def handle_message(self, data: str | bytes) -> None:
+        """Apply an invalidation broadcast from another replica"""
+        try:
+            message = json.loads(data)
+        except (TypeError, ValueError):
+            logger.warning(f"Ignoring malformed preference invalidation: {data!r}")
+            return
+        if message.get("origin") == self._origin or not message.get("scope"):
+            return
+        self._bump(message["scope"])
+        self.remote_invalidations += 1
+
+    # ==================== Lifecycle ====================
+
+    async def start(self) -> None:
+        """Subscribe to invalidations from other replicas if Redis is configured"""
+        if not settings.redis_url or self._listener is not None:
+            return
+        self._redis = Redis.from_url(settings.redis_url, db=settings.redis_db)
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                # Anything published while we were not subscribed was missed
+                self.clear()
+                logger.info("Subscribed to preference cache invalidations")
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        self.handle_message(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Preference invalidation subscription lost: {e}")
+                self.clear()
+                await asyncio.sleep(5)
+            finally:
+                await pubsub.close()
+
+    def get_status(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "subscribed": self._listener is not None,
+            "cached_scopes": len(self._entries),
+            "cached_emails": len(self._emails),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "db_queries": self.db_queries,
+            "invalidations": self.invalidations,
+            "remote_invalidations": self.remote_invalidations,
+        }
@@ -0,0 +1,245 @@
+"""
+Distributed notification rate limiting.
+
+Limits are token buckets: a bucket holds ``limit + burst`` tokens and refills
+at ``limit`` tokens per window, so a quiet network can absorb a short burst
+while the sustained rate stays at ``limit`` per window. Buckets live in Redis
+so every replica shares them and they survive restarts.
+
+Each decision is made by one Lua script call. A decision can span several
+buckets (for example the network and the user it notifies) and only takes a
+token from each of them when all of them have one. A batch of decisions, such
+as a whole dispatch fan-out, goes to Redis in a single round trip.
+
+Without ``REDIS_URL`` (or while Redis is unreachable) the same buckets are
+kept in-process instead.
+"""
+
+import logging
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "notify:rl:"
+
+# KEYS: every bucket of every decision, in order.
+# ARGV: decision count, then per decision its bucket count followed by
+# (limit, burst, window_ms) for each bucket.
+# Returns {allowed, retry_after_ms} per decision.
+TOKEN_BUCKET_LUA = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local results = {}
+local k = 1
+local a = 2
+for d = 1, tonumber(ARGV[1]) do
+  local n = tonumber(ARGV[a])
+  a = a + 1
+  local allowed = 1
+  local wait = 0
+  local buckets = {}
+  for i = 1, n do
+    local limit = tonumber(ARGV[a])
+    local capacity = limit + tonumber(ARGV[a + 1])
+    local rate = limit / tonumber(ARGV[a + 2])
+    a = a + 3
+    local state = redis.call('HMGET', KEYS[k], 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    if tokens < 1 then
+      allowed = 0
+      wait = math.max(wait, math.ceil((1 - tokens) / rate))
+    end
+    buckets[i] = {KEYS[k], tokens, capacity, rate}
+    k = k + 1
+  end
+  for i = 1, n do
+    local b = buckets[i]
+    local tokens = b[2] - allowed
+    redis.call('HSET', b[1], 'tokens', tostring(tokens), 'ts', now)
+    redis.call('PEXPIRE', b[1], math.ceil((b[3] - tokens) / b[4]) + 1000)
+  end
+  results[d] = {allowed, wait}
+end
+return results
+"""
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """One token bucket: ``limit`` tokens per window plus ``burst`` extra capacity"""
+
+    key: str
+    limit: int
+    burst: int = 0
+    window_seconds: float = 3600.0
+
+
+@dataclass(frozen=True)
+class RateLimitDecision:
+    """Outcome of one decision; retry_after is how long until it would be allowed"""
+
+    allowed: bool
+    retry_after: float = 0.0
+
+
+def network_rate_limit(network_id: str, max_per_hour: int) -> RateLimit:
+    """Bucket shared by every notification sent for a network"""
+    return RateLimit(f"network:{network_id}", max_per_hour, settings.rate_limit_network_burst)
+
+
+def user_rate_limit(user_id: str) -> RateLimit:
+    """Bucket shared by every notification delivered to a user, across networks"""
+    return RateLimit(
+        f"user:{user_id}", settings.rate_limit_user_per_hour, settings.rate_limit_user_burst
+    )
+
+
+# ==================== Backends ====================
+
+
+class RedisRateLimiter:
+    """Token buckets in Redis, decided by a single Lua script call per batch"""
+
+    def __init__(self, redis: Redis):
+        self._script = redis.register_script(TOKEN_BUCKET_LUA)
+
+    async def acquire_many(self, decisions: list[list[RateLimit]]) -> list[RateLimitDecision]:
+        keys: list[str] = []
+        args: list[int] = [len(decisions)]
+        for limits in decisions:
+            args.append(len(limits))
+            for limit in limits:
+                keys.append(f"{KEY_PREFIX}{limit.key}")
+                args.extend((limit.limit, limit.burst, int(limit.window_seconds * 1000)))
+
+        results = await self._script(keys=keys, args=args)
+        return [
+            RateLimitDecision(allowed=bool(int(allowed)), retry_after=int(wait) / 1000)
+            for allowed, wait in results
+        ]
+
+
+class LocalRateLimiter:
+    """In-process token buckets with the same semantics as the Lua script"""
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._buckets: dict[str, tuple[float, float]] = {}  # key -> (tokens, updated_at)
+
+    async def acquire_many(self, decisions: list[list[RateLimit]]) -> list[RateLimitDecision]:
+        now = self._clock()
+        results = []
+        for limits in decisions:
+            allowed, wait, levels = True, 0.0, []
+            for limit in limits:
+                capacity = limit.limit + limit.burst
+                rate = limit.limit / limit.window_seconds
+                tokens, updated_at = self._buckets.get(limit.key, (capacity, now))
+                tokens = min(capacity, tokens + max(0.0, now - updated_at) * rate)
+                if tokens < 1:
+                    allowed = False
+                    wait = max(wait, (1 - tokens) / rate)
+                levels.append((limit.key, tokens))
+            for key, tokens in levels:
+                self._buckets[key] = (tokens - 1 if allowed else tokens, now)
+            results.append(RateLimitDecision(allowed=allowed, retry_after=wait))
+        return results
+
+    def clear(self) -> None:
+        self._buckets.clear()
+
+
+# ==================== Limiter ====================
+
+
+class NotificationRateLimiter:
+    """
+    Shared rate limiter for notification sends.
+
+    Uses Redis when ``REDIS_URL`` is configured and falls back to in-process
+    buckets if it is not, or if a Redis call fails, so an outage degrades to
+    per-replica limits instead of blocking or flooding alerts.
+    """
+
+    def __init__(self, local: LocalRateLimiter | None = None):
+        self._local = local or LocalRateLimiter()
+        self._redis: Redis | None = None
+        self._remote: RedisRateLimiter | None = None
+        self.allowed = 0
+        self.denied = 0
+        self.redis_errors = 0
+
+    async def start(self) -> None:
+        """Connect to Redis if configured"""
+        if not settings.redis_url or self._redis is not None:
+            return
+        self._redis = Redis.from_url(settings.redis_url, db=settings.redis_db)
+        self._remote = RedisRateLimiter(self._redis)
+        logger.info("Notification rate limits are shared through Redis")
+
+    async def stop(self) -> None:
+        """Close the Redis connection"""
+        if self._redis is not None:
+            await self._redis.close()
+        self._redis = None
+        self._remote = None
+
+    async def acquire(self, *limits: RateLimit) -> RateLimitDecision:
+        """Take one token from every bucket, or from none of them"""
+        return (await self.acquire_many([list(limits)]))[0]
+
+    async def acquire_many(self, decisions: list[list[RateLimit]]) -> list[RateLimitDecision]:
+        """
+        Decide a batch of sends in one round trip.
+
+        Decisions are applied in order, so later ones see the tokens taken by
+        earlier ones when they share a bucket. Buckets with a non-positive
+        limit are unlimited and are skipped.
+        """
+        decisions = [[limit for limit in limits if limit.limit > 0] for limits in decisions]
+        if not any(decisions):
+            results = [RateLimitDecision(allowed=True) for _ in decisions]
+        elif self._remote is not None:
+            try:
+                results = await self._remote.acquire_many(decisions)
+            except RedisError as e:
+                self.redis_errors += 1
+                logger.warning(f"Redis rate limiter unavailable, using local buckets: {e}")
+                results = await self._local.acquire_many(decisions)
+        else:
+            results = await self._local.acquire_many(decisions)
+
+        for result in results:
+            if result.allowed:
+                self.allowed += 1
+            else:
+                self.denied += 1
+        return results
+
+    def reset(self) -> None:
+        """Forget local buckets and counters"""
+        self._local.clear()
+        self.allowed = 0
+        self.denied = 0
+        self.redis_errors = 0
+
+    def get_status(self) -> dict:
+        return {
+            "backend": "redis" if self._remote is not None else "local",
+            "allowed": self.allowed,
+            "denied": self.denied,
+            "redis_errors": self.redis_errors,
+        }
+
+
+# Singleton instance
+rate_limiter = NotificationRateLimiter()
@@ -0,0 +1,279 @@
+"""
+Keyed service state stored in PostgreSQL.
+
+Network and global preferences, scheduled broadcasts, silenced devices,
+Cartographer status subscriptions and version checker state used to be JSON
+files that were read in full at import time and rewritten in full on every
+change. They are now rows in ``notification_state`` keyed by
+``(namespace, key)``:
+
+- Writes are synchronous and only mark the key dirty. A background flusher
+  upserts dirty keys in batches, so a change never waits on the database and
+  several changes to one key between flushes cost a single write.
+- Reads fetch a whole namespace with a range scan of the primary key, or just
+  the requested keys, so owners can load what they need when they need it.
+- Pending writes, and the batch a flush is writing, are overlaid on every
+  read, so a caller always sees its own changes even before they are flushed.
+
+Owners keep their parsed objects in memory as before; this module only stores
+their JSON form.
+"""
+
+import asyncio
+import copy
+import itertools
+import logging
+from typing import Any
+
+from sqlalchemy import delete, func, select, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from ..config import settings
+from ..database import async_session_maker
+from ..models.database import NotificationState
+
+logger = logging.getLogger(__name__)
+
+# Namespaces
+NETWORK_PREFERENCES = "network_preferences"
+GLOBAL_PREFERENCES = "global_preferences"
+SCHEDULED_BROADCASTS = "scheduled_broadcasts"
+SILENCED_DEVICES = "silenced_devices"
+CARTOGRAPHER_SUBSCRIPTIONS = "cartographer_status_subscriptions"
+VERSION_CHECKER = "version_checker"
+
+# Marks a pending delete in the write buffer
+_DELETED = object()
+
+
+# ==================== Stores ====================
+
+
+class SqlStateStore:
+    """PostgreSQL-backed state storage"""
+
+    def __init__(self, session_maker=async_session_maker):
+        self._session_maker = session_maker
+
+    async def load(self, namespace: str, keys: list[str] | None = None) -> dict[str, Any]:
+        stmt = select(NotificationState.key, NotificationState.value).where(
+            NotificationState.namespace == namespace
+        )
+        if keys is not None:
+            stmt = stmt.where(NotificationState.key.in_(keys))
+        async with self._session_maker() as session:
+            result = await session.execute(stmt)
+            return {key: value for key, value in result.all()}
+
+    async def write(self, upserts: list[dict], deletes: list[tuple[str, str]]):
+        """Upsert and delete rows in one transaction"""
+        async with self._session_maker() as session:
+            if upserts:
+                stmt = pg_insert(NotificationState)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[NotificationState.namespace, NotificationState.key],
+                    set_={"value": stmt.excluded.value, "updated_at": func.now()},
+                )
+                await session.execute(stmt, upserts)
+            if deletes:
+                await session.execute(
+                    delete(NotificationState).where(
+                        tuple_(NotificationState.namespace, NotificationState.key).in_(deletes)
+                    )
+                )
+            await session.commit()
+
+
+class InMemoryStateStore:
+    """Non-durable state storage for tests and benchmarks"""
+
+    def __init__(self):
+        self.rows: dict[tuple[str, str], Any] = {}
+
+    async def load(self, namespace: str, keys: list[str] | None = None) -> dict[str, Any]:
+        if keys is None:
+            found = {k: v for (ns, k), v in self.rows.items() if ns == namespace}
+        else:
+            found = {k: self.rows[(namespace, k)] for k in keys if (namespace, k) in self.rows}
+        # The database hands out fresh objects on every read
+        return copy.deepcopy(found)
+
+    async def write(self, upserts: list[dict], deletes: list[tuple[str, str]]):
+        for row in upserts:
+            self.rows[(row["namespace"], row["key"])] = copy.deepcopy(row["value"])
+        for namespace_key in deletes:
+            self.rows.pop(namespace_key, None)
+
+
+# ==================== Repository ====================
+
+
+class StateRepository:
+    """Write-behind access to keyed state"""
+
+    def __init__(self, store=None):
+        self._store = store or SqlStateStore()
+        # (namespace, key) -> JSON value, or _DELETED. Insertion order is flush order.
+        self._pending: dict[tuple[str, str], Any] = {}
+        # Batch being written by flush(); cleared once the write has committed
+        self._inflight: dict[tuple[str, str], Any] = {}
+        self._flush_lock = asyncio.Lock()
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self._running = False
+
+        self._stats = {"written": 0, "deleted": 0, "coalesced": 0, "loaded": 0}
+        self._last_error: str | None = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._running
+
+    def put(self, namespace: str, key: str, value: Any):
+        """Store a JSON-serializable value. Never blocks; the row is written by the flusher."""
+        self._mark(namespace, key, value)
+
+    def delete(self, namespace: str, key: str):
+        """Remove a key. Never blocks."""
+        self._mark(namespace, key, _DELETED)
+
+    def _mark(self, namespace: str, key: str, value: Any):
+        pending_key = (namespace, str(key))
+        if pending_key in self._pending:
+            # Move to the end so the newest change isn't flushed ahead of older ones
+            del self._pending[pending_key]
+            self._stats["coalesced"] += 1
+        self._pending[pending_key] = value
+
+        if self._wakeup is not None and len(self._pending) >= settings.state_batch_size:
+            self._wakeup.set()
+
+    def _unwritten(self) -> dict[tuple[str, str], Any]:
+        """Writes not yet committed to the store, newest last"""
+        return {**self._inflight, **self._pending}
+
+    def _overlay(
+        self, namespace: str, rows: dict[str, Any], before: dict, keys=None
+    ) -> dict[str, Any]:
+        """
+        Apply unflushed writes for a namespace on top of rows read from the store.
+
+        ``before`` is the unwritten set captured before the read: a write that
+        committed while the read was running may be missing from ``rows`` and
+        is no longer pending or in flight, so it is applied from there.
+        """
+        for (ns, key), value in {**before, **self._unwritten()}.items():
+            if ns != namespace or (keys is not None and key not in keys):
+                continue
+            if value is _DELETED:
+                rows.pop(key, None)
+            else:
+                rows[key] = copy.deepcopy(value)
+        return rows
+
+    async def load(self, namespace: str) -> dict[str, Any]:
+        """Every key in a namespace"""
+        before = self._unwritten()
+        rows = await self._store.load(namespace)
+        self._stats["loaded"] += len(rows)
+        return self._overlay(namespace, rows, before)
+
+    async def load_keys(self, namespace: str, keys) -> dict[str, Any]:
+        """Only the requested keys of a namespace; missing keys are left out"""
+        wanted = sorted({str(k) for k in keys})
+        before = self._unwritten()
+        rows: dict[str, Any] = {}
+        for start in range(0, len(wanted), settings.state_batch_size):
+            rows.update(
+                await self._store.load(namespace, wanted[start : start + settings.state_batch_size])
+            )
+        self._stats["loaded"] += len(rows)
+        return self._overlay(namespace, rows, before, keys=set(wanted))
+
+    async def start(self):
+        """Start the background flusher"""
+        if self._running:
+            return
+        self._running = True
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._flush_loop())
+        logger.info("Notification state writer started")
+
+    async def stop(self):
+        """Stop the flusher and write out whatever is still pending"""
+        if not self._running:
+            return
+        self._running = False
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        try:
+            await self.flush_all()
+        except Exception as e:
+            logger.error(f"Failed to flush notification state on shutdown: {e}")
+        logger.info("Notification state writer stopped")
+
+    async def _flush_loop(self):
+        while self._running:
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), timeout=settings.state_flush_interval_seconds
+                )
+            except asyncio.TimeoutError:
+                pass
+
+            try:
+                await self.flush_all()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._last_error = str(e)
+                logger.error(f"Notification state flush failed: {e}")
+
+    async def flush(self) -> int:
+        """Write one batch of pending keys. Returns the number of keys written."""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            batch = list(itertools.islice(self._pending.items(), settings.state_batch_size))
+            for pending_key, _ in batch:
+                del self._pending[pending_key]
+            self._inflight = dict(batch)
+
+            upserts = [
+                {"namespace": ns, "key": key, "value": value}
+                for (ns, key), value in batch
+                if value is not _DELETED
+            ]
+            deletes = [pending_key for pending_key, value in batch if value is _DELETED]
+            try:
+                await self._store.write(upserts, deletes)
+            except Exception:
+                # Requeue, unless the key was changed again while the write was in flight
+                requeued = {k: v for k, v in batch if k not in self._pending}
+                self._pending = {**requeued, **self._pending}
+                raise
+            finally:
+                self._inflight = {}
+            self._stats["written"] += len(upserts)
+            self._stats["deleted"] += len(deletes)
+            return len(batch)
+
+    async def flush_all(self):
+        """Write every pending key"""
+        while self._pending and await self.flush():
+            pass
+
+    def get_status(self) -> dict:
+        return {
+            "running": self._running,
+            "pending": len(self._pending),
+            **self._stats,
+            "last_error": self._last_error,
+        }
+
+
+# Singleton instance
+state_repository = StateRepository()
@@ -23,6 +23,7 @@ from ..models.database import (
     UserGlobalNotificationPrefs,
     UserNetworkNotificationPrefs,
 )
+from .preference_cache import GLOBAL_SCOPE, MISSING, PreferenceCache, detached_copy, network_scope
 
 logger = logging.getLogger(__name__)
 DEVICE_ADD_REMOVE_DEFAULTS_MARKER = "__device_add_remove_defaults_v1"
@@ -51,7 +52,23 @@ DEFAULT_ENABLED_TYPES = [
 
 
 class UserPreferencesService:
-    """Service for managing user notification preferences"""
+    """
+    Service for managing user notification preferences.
+
+    The batch reads used by dispatch go through a versioned cache; every
+    method that writes preferences invalidates the affected scope.
+    """
+
+    def __init__(self, cache: PreferenceCache | None = None):
+        self.cache = cache or PreferenceCache()
+
+    async def invalidate_network(self, network_id: str) -> None:
+        """Drop cached preferences for a network on every replica"""
+        await self.cache.invalidate(network_scope(network_id))
+
+    async def invalidate_global(self) -> None:
+        """Drop cached global preferences on every replica"""
+        await self.cache.invalidate(GLOBAL_SCOPE)
 
     def _clean_type_priorities(self, prefs: "UserNetworkNotificationPrefs") -> bool:
         """
@@ -123,6 +140,10 @@ class UserPreferencesService:
         """
         Batch fetch network preferences for multiple users.
 
+        Served from the preference cache where possible; only users not cached
+        for the network's current version are read from the database. The
+        returned rows are detached, read-only copies.
+
         Args:
             db: Database session
             user_ids: List of user IDs to fetch preferences for
@@ -134,9 +155,15 @@ class UserPreferencesService:
         if not user_ids:
             return {}
 
+        scope = network_scope(network_id)
+        found, missing, version = self.cache.lookup(scope, user_ids)
+        if not missing:
+            return found
+
+        self.cache.db_queries += 1
         result = await db.execute(
             select(UserNetworkNotificationPrefs).where(
-                UserNetworkNotificationPrefs.user_id.in_(user_ids),
+                UserNetworkNotificationPrefs.user_id.in_(missing),
                 UserNetworkNotificationPrefs.network_id == network_id,
             )
         )
@@ -160,8 +187,15 @@ class UserPreferencesService:
 
         if needs_commit:
             await db.commit()
+            await self.cache.invalidate(scope)
+            # What we just read already includes the fix-ups
+            version = self.cache.version(scope)
 
-        return {prefs.user_id: prefs for prefs in prefs_list}
+        loaded = {prefs.user_id: detached_copy(prefs) for prefs in prefs_list}
+        self.cache.store(
+            scope, version, {user_id: loaded.get(user_id, MISSING) for user_id in missing}
+        )
+        return {**found, **loaded}
 
     async def get_user_emails_batch(
         self,
@@ -171,6 +205,9 @@ class UserPreferencesService:
         """
         Batch fetch user emails for multiple users.
 
+        Emails are cached per user for a short TTL. The users table is owned by
+        the auth service, so there is no invalidation for it.
+
         Args:
             db: Database session
             user_ids: List of user IDs to fetch emails for
@@ -181,16 +218,24 @@ class UserPreferencesService:
         if not user_ids:
             return {}
 
+        found, missing = self.cache.lookup_emails(user_ids)
+        if not missing:
+            return found
+
+        self.cache.db_queries += 1
         try:
             result = await db.execute(
                 text("SELECT id, email FROM users WHERE id = ANY(:user_ids) AND is_active = true"),
-                {"user_ids": user_ids},
+                {"user_ids": missing},
             )
             rows = result.fetchall()
-            return {row[0]: row[1] for row in rows if row[1]}
+            emails = {row[0]: row[1] for row in rows if row[1]}
         except Exception as e:
             logger.warning(f"Could not batch fetch user emails: {e}")
-            return {}
+            return found
+
+        self.cache.store_emails(emails)
+        return {**found, **emails}
 
     async def get_or_create_network_preferences(
         self,
@@ -216,6 +261,7 @@ class UserPreferencesService:
             db.add(prefs)
             await db.commit()
             await db.refresh(prefs)
+            await self.invalidate_network(network_id)
         else:
             needs_commit = False
             if self._migrate_device_add_remove_enabled_types(prefs):
@@ -231,6 +277,7 @@ class UserPreferencesService:
             if needs_commit:
                 await db.commit()
                 await db.refresh(prefs)
+                await self.invalidate_network(network_id)
 
         return prefs
 
@@ -263,6 +310,7 @@ class UserPreferencesService:
         prefs.updated_at = datetime.utcnow()
         await db.commit()
         await db.refresh(prefs)
+        await self.invalidate_network(network_id)
 
         return prefs
 
@@ -277,6 +325,7 @@ class UserPreferencesService:
         if prefs:
             await db.delete(prefs)
             await db.commit()
+            await self.invalidate_network(network_id)
             return True
         return False
 
@@ -315,6 +364,7 @@ class UserPreferencesService:
             db.add(prefs)
             await db.commit()
             await db.refresh(prefs)
+            await self.invalidate_global()
 
         return prefs
 
@@ -335,6 +385,7 @@ class UserPreferencesService:
         prefs.updated_at = datetime.utcnow()
         await db.commit()
         await db.refresh(prefs)
+        await self.invalidate_global()
 
         return prefs
 
@@ -398,6 +449,17 @@ class UserPreferencesService:
         notification_type: NotificationType,
     ) -> list[UserGlobalNotificationPrefs]:
         """Get all users who have global notifications enabled for this type"""
+        if notification_type not in (
+            NotificationType.CARTOGRAPHER_UP,
+            NotificationType.CARTOGRAPHER_DOWN,
+        ):
+            return []
+
+        found, missing, version = self.cache.lookup(GLOBAL_SCOPE, [notification_type.value])
+        if not missing:
+            return found.get(notification_type.value, [])
+
+        self.cache.db_queries += 1
         if notification_type == NotificationType.CARTOGRAPHER_UP:
             result = await db.execute(
                 select(UserGlobalNotificationPrefs).where(
@@ -409,7 +471,7 @@ class UserPreferencesService:
                     ),
                 )
             )
-        elif notification_type == NotificationType.CARTOGRAPHER_DOWN:
+        else:
             result = await db.execute(
                 select(UserGlobalNotificationPrefs).where(
                     UserGlobalNotificationPrefs.cartographer_down_enabled == True,
@@ -420,10 +482,10 @@ class UserPreferencesService:
                     ),
                 )
             )
-        else:
-            return []
 
-        return list(result.scalars().all())
+        users = [detached_copy(prefs) for prefs in result.scalars().all()]
+        self.cache.store(GLOBAL_SCOPE, version, {notification_type.value: users})
+        return users
 
     async def get_network_member_user_ids(
         self,
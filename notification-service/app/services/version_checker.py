@@ -14,6 +14,7 @@ import httpx
 
 from ..config import settings
 from ..models import NetworkEvent, NotificationPriority, NotificationType
+from .state_store import VERSION_CHECKER, state_repository
 
 logger = logging.getLogger(__name__)
 
@@ -21,7 +22,9 @@ logger = logging.getLogger(__name__)
 GITHUB_RAW_URL = "https://raw.githubusercontent.com/DevArtech/cartographer/main/VERSION"
 CHANGELOG_URL = "https://github.com/DevArtech/cartographer/blob/main/CHANGELOG.md"
 CHECK_INTERVAL_SECONDS = 60 * 60  # Check every hour
+# Legacy JSON state, imported into the state table once on startup
 VERSION_STATE_FILE = settings.data_dir / "version_state.json"
+STATE_KEY = "state"
 
 
 def parse_version(version: str) -> tuple[int, int, int] | None:
@@ -98,44 +101,60 @@ class VersionChecker:
     Checks for new Cartographer versions and notifies users.
     """
 
-    def __init__(self):
+    def __init__(self, state=None):
+        self._state = state or state_repository
         self._checker_task: asyncio.Task | None = None
         self._last_notified_version: str | None = None
         self._last_check_time: datetime | None = None
         self._http_client: httpx.AsyncClient | None = None
 
-        # Load previous state
-        self._load_state()
+    async def load_state(self):
+        """Load state from the state table, importing the legacy JSON file first"""
+        if VERSION_STATE_FILE.exists():
+            self._load_state()
+            self._save_state()
+            try:
+                await self._state.flush_all()
+                VERSION_STATE_FILE.rename(VERSION_STATE_FILE.with_suffix(".json.imported"))
+            except Exception as e:
+                logger.warning(f"Failed to import legacy version state: {e}")
+            return
+
+        try:
+            state = (await self._state.load_keys(VERSION_CHECKER, [STATE_KEY])).get(STATE_KEY)
+        except Exception as e:
+            logger.warning(f"Failed to load version state: {e}")
+            return
+        if state:
+            self._apply_state(state)
+
+    def _apply_state(self, state: dict):
+        self._last_notified_version = state.get("last_notified_version")
+        last_check = state.get("last_check_time")
+        if last_check:
+            self._last_check_time = datetime.fromisoformat(last_check)
+        logger.info(f"Loaded version state: last notified={self._last_notified_version}")
 
     def _load_state(self):
-        """Load version checker state from disk"""
+        """Read the legacy JSON state file"""
         try:
             if VERSION_STATE_FILE.exists():
                 with open(VERSION_STATE_FILE, "r") as f:
                     state = json.load(f)
-                self._last_notified_version = state.get("last_notified_version")
-                last_check = state.get("last_check_time")
-                if last_check:
-                    self._last_check_time = datetime.fromisoformat(last_check)
-                logger.info(f"Loaded version state: last notified={self._last_notified_version}")
+                self._apply_state(state)
         except Exception as e:
             logger.warning(f"Failed to load version state: {e}")
 
     def _save_state(self):
-        """Save version checker state to disk"""
-        try:
-            settings.data_dir.mkdir(parents=True, exist_ok=True)
-            state = {
-                "last_notified_version": self._last_notified_version,
-                "last_check_time": (
-                    self._last_check_time.isoformat() if self._last_check_time else None
-                ),
-                "current_version": settings.cartographer_version,
-            }
-            with open(VERSION_STATE_FILE, "w") as f:
-                json.dump(state, f, indent=2)
-        except Exception as e:
-            logger.warning(f"Failed to save version state: {e}")
+        """Write version checker state to the state table"""
+        state = {
+            "last_notified_version": self._last_notified_version,
+            "last_check_time": (
+                self._last_check_time.isoformat() if self._last_check_time else None
+            ),
+            "current_version": settings.cartographer_version,
+        }
+        self._state.put(VERSION_CHECKER, STATE_KEY, state)
 
     async def start(self):
         """Start the background version checker"""
@@ -258,7 +277,7 @@ class VersionChecker:
         has_update, update_type = compare_versions(settings.cartographer_version, latest_version)
 
         notification_sent = False
-        notification_results = None
+        broadcast_job_id = None
         skipped_already_notified = False
 
         # Send notification if requested and there's an update
@@ -270,12 +289,8 @@ class VersionChecker:
                 )
                 skipped_already_notified = True
             else:
-                notification_results = await self._send_update_notification(
-                    latest_version, update_type
-                )
-                notification_sent = (
-                    notification_results is not None and len(notification_results) > 0
-                )
+                broadcast_job_id = await self._send_update_notification(latest_version, update_type)
+                notification_sent = bool(broadcast_job_id)
 
         self._save_state()
 
@@ -293,17 +308,18 @@ class VersionChecker:
         if send_notification:
             result["notification_sent"] = notification_sent
             result["skipped_already_notified"] = skipped_already_notified
-            if notification_results:
-                result["networks_notified"] = len(notification_results)
+            if broadcast_job_id:
+                result["broadcast_job_id"] = broadcast_job_id
 
         return result
 
-    async def _send_update_notification(self, latest_version: str, update_type: str) -> dict:
+    async def _send_update_notification(self, latest_version: str, update_type: str) -> str | None:
         """
-        Send version update notification to all subscribed networks.
+        Start a broadcast job sending the version update to all subscribed networks.
 
-        Returns dict of network_id -> notification records, or None on failure.
+        Returns the broadcast job id, or None if nothing was sent.
         """
+        from .broadcast_jobs import NETWORKS, broadcast_jobs
         from .notification_manager import notification_manager
 
         logger.info(f"Sending version update notification: {latest_version} (type: {update_type})")
@@ -323,24 +339,25 @@ class VersionChecker:
             },
         )
 
-        # Broadcast to all networks with SYSTEM_STATUS notifications enabled
-        results = await notification_manager.broadcast_notification(event)
+        # Broadcast to all networks with SYSTEM_STATUS notifications enabled. The job
+        # sends in chunks in the background and resumes after a restart.
+        try:
+            job = await broadcast_jobs.submit(NETWORKS, event)
+        except Exception as e:
+            logger.error(f"Failed to create version update broadcast: {e}", exc_info=True)
+            return None
 
-        if results:
-            total_networks = len(results)
-            total_channels = sum(len(records) for records in results.values())
-            logger.info(
-                f"Sent version update notification to {total_networks} networks ({total_channels} channels)"
-            )
-            self._last_notified_version = latest_version
-        else:
+        if job is None:
             logger.warning(
                 f"No networks to notify about version update. "
                 f"Networks need to have SYSTEM_STATUS in their enabled_notification_types. "
                 f"Current enabled networks: {notification_manager.get_all_networks_with_notifications_enabled()}"
             )
+            return None
 
-        return results
+        logger.info(f"Version update broadcast {job.id} started for {job.total} networks")
+        self._last_notified_version = latest_version
+        return job.id
 
     def get_status(self) -> dict:
         """Get current version checker status"""
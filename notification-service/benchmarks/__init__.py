@@ -0,0 +1 @@
+"""Standalone micro-benchmarks for the notification service."""
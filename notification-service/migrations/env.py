@@ -21,6 +21,11 @@ from app.models.database import (
     UserNetworkNotificationPrefs,
     UserGlobalNotificationPrefs,
     DiscordUserLink,
+    EmailOutboxMessage,
+    NotificationHistoryEntry,
+    NotificationStatsBucket,
+    BroadcastJob,
+    NotificationState,
 )
 
 # this is the Alembic Config object, which provides
@@ -0,0 +1,59 @@
+"""Create email_outbox table for queued notification emails
+
+Revision ID: 004_email_outbox
+Revises: 003_performance_indexes
+Create Date: 2026-10-18
+
+Notification emails are rendered and written to this table instead of being
+sent inline. Background workers claim due rows, deliver them through the
+Resend batch API and either mark them sent, reschedule them with backoff or
+dead-letter them.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '004_email_outbox'
+down_revision: Union[str, None] = '003_performance_indexes'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    from sqlalchemy import inspect
+
+    conn = op.get_bind()
+    inspector = inspect(conn)
+    if 'email_outbox' in inspector.get_table_names():
+        return
+
+    op.create_table(
+        'email_outbox',
+        sa.Column('id', postgresql.UUID(as_uuid=False), nullable=False),
+        sa.Column('notification_id', sa.String(length=255), nullable=False),
+        sa.Column('event_id', sa.String(length=255), nullable=True),
+        sa.Column('network_id', sa.String(length=255), nullable=True),
+        sa.Column('to_email', sa.String(length=320), nullable=False),
+        sa.Column('subject', sa.Text(), nullable=False),
+        sa.Column('html', sa.Text(), nullable=False),
+        sa.Column('text', sa.Text(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='pending'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('next_attempt_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('provider_message_id', sa.String(length=255), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        comment='Durable outbox for notification emails'
+    )
+    op.create_index('idx_email_outbox_status_next_attempt', 'email_outbox', ['status', 'next_attempt_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_email_outbox_status_next_attempt', table_name='email_outbox')
+    op.drop_table('email_outbox')
@@ -0,0 +1,59 @@
+"""Create notification_history table
+
+Revision ID: 005_notification_history
+Revises: 004_email_outbox
+Create Date: 2026-10-18
+
+Notification history moves out of the in-memory deque and JSON file into
+PostgreSQL. Rows are written in batches and read with keyset pagination over
+(created_at, id), so the composite indexes lead with the filter column.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '005_notification_history'
+down_revision: Union[str, None] = '004_email_outbox'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    from sqlalchemy import inspect
+
+    conn = op.get_bind()
+    inspector = inspect(conn)
+    if 'notification_history' in inspector.get_table_names():
+        return
+
+    op.create_table(
+        'notification_history',
+        sa.Column('id', postgresql.UUID(as_uuid=False), nullable=False),
+        sa.Column('notification_id', sa.String(length=255), nullable=False),
+        sa.Column('event_id', sa.String(length=255), nullable=True),
+        sa.Column('network_id', sa.String(length=255), nullable=True),
+        sa.Column('user_id', sa.String(length=255), nullable=True),
+        sa.Column('channel', sa.String(length=20), nullable=False),
+        sa.Column('success', sa.Boolean(), nullable=False),
+        sa.Column('error_message', sa.Text(), nullable=True),
+        sa.Column('title', sa.Text(), nullable=False),
+        sa.Column('message', sa.Text(), nullable=False),
+        sa.Column('priority', sa.String(length=20), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        comment='Sent notification history, one row per channel attempt'
+    )
+    op.create_index('idx_notification_history_network_created', 'notification_history', ['network_id', 'created_at', 'id'], unique=False)
+    op.create_index('idx_notification_history_user_created', 'notification_history', ['user_id', 'created_at', 'id'], unique=False)
+    op.create_index('idx_notification_history_created', 'notification_history', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_notification_history_created', table_name='notification_history')
+    op.drop_index('idx_notification_history_user_created', table_name='notification_history')
+    op.drop_index('idx_notification_history_network_created', table_name='notification_history')
+    op.drop_table('notification_history')
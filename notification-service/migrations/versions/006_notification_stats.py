@@ -0,0 +1,59 @@
+"""Add notification stats buckets and history event_type
+
+Revision ID: 006_notification_stats
+Revises: 005_notification_history
+Create Date: 2026-10-18
+
+Notification statistics are maintained incrementally in per-network
+minute/hour/day buckets instead of being recomputed from history on every
+request. History rows gain an event_type column so the buckets can be
+rebuilt from history.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '006_notification_stats'
+down_revision: Union[str, None] = '005_notification_history'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    from sqlalchemy import inspect
+
+    conn = op.get_bind()
+    inspector = inspect(conn)
+
+    history_columns = {c['name'] for c in inspector.get_columns('notification_history')}
+    if 'event_type' not in history_columns:
+        op.add_column('notification_history', sa.Column('event_type', sa.String(length=50), nullable=True))
+
+    if 'notification_stats_buckets' in inspector.get_table_names():
+        return
+
+    op.create_table(
+        'notification_stats_buckets',
+        sa.Column('network_key', sa.String(length=255), nullable=False),
+        sa.Column('granularity', sa.String(length=10), nullable=False),
+        sa.Column('bucket_start', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('event_type', sa.String(length=50), nullable=False),
+        sa.Column('priority', sa.String(length=20), nullable=False),
+        sa.Column('channel', sa.String(length=20), nullable=False),
+        sa.Column('success', sa.Boolean(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint(
+            'network_key', 'granularity', 'bucket_start', 'event_type', 'priority', 'channel', 'success'
+        ),
+        comment='Pre-aggregated notification counts in minute/hour/day buckets'
+    )
+    op.create_index('idx_notification_stats_granularity_start', 'notification_stats_buckets', ['granularity', 'bucket_start'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_notification_stats_granularity_start', table_name='notification_stats_buckets')
+    op.drop_table('notification_stats_buckets')
+    op.drop_column('notification_history', 'event_type')
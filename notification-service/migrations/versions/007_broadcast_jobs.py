@@ -0,0 +1,59 @@
+"""Create broadcast_jobs table for chunked, resumable broadcasts
+
+Revision ID: 007_broadcast_jobs
+Revises: 006_notification_stats
+Create Date: 2026-10-18
+
+Broadcasts to every network or every globally subscribed user are run as
+jobs that page through recipients in sorted chunks. The cursor and counters
+are written after each chunk, so a restarted (or another) replica resumes
+from the last completed chunk once the owner's lease expires.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '007_broadcast_jobs'
+down_revision: Union[str, None] = '006_notification_stats'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    from sqlalchemy import inspect
+
+    conn = op.get_bind()
+    inspector = inspect(conn)
+    if 'broadcast_jobs' in inspector.get_table_names():
+        return
+
+    op.create_table(
+        'broadcast_jobs',
+        sa.Column('id', postgresql.UUID(as_uuid=False), nullable=False),
+        sa.Column('kind', sa.String(length=20), nullable=False),
+        sa.Column('event', sa.JSON(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='running'),
+        sa.Column('cursor', sa.String(length=255), nullable=True),
+        sa.Column('total', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('sent', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('failed', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('skipped', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('owner', sa.String(length=64), nullable=True),
+        sa.Column('lease_expires_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('completed_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        comment='Chunked broadcast jobs and their delivery progress'
+    )
+    op.create_index('idx_broadcast_jobs_status_lease', 'broadcast_jobs', ['status', 'lease_expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_broadcast_jobs_status_lease', table_name='broadcast_jobs')
+    op.drop_table('broadcast_jobs')
@@ -0,0 +1,46 @@
+"""Create notification_state table for keyed service state
+
+Revision ID: 008_notification_state
+Revises: 007_broadcast_jobs
+Create Date: 2026-10-18
+
+Network and global preferences, scheduled broadcasts, silenced devices,
+Cartographer status subscriptions and version checker state used to be JSON
+files rewritten in full on every change. They are now rows keyed by
+(namespace, key) and written one key at a time. Existing JSON files are
+imported by the service on its first start after this migration.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '008_notification_state'
+down_revision: Union[str, None] = '007_broadcast_jobs'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    from sqlalchemy import inspect
+
+    conn = op.get_bind()
+    inspector = inspect(conn)
+    if 'notification_state' in inspector.get_table_names():
+        return
+
+    op.create_table(
+        'notification_state',
+        sa.Column('namespace', sa.String(length=64), nullable=False),
+        sa.Column('key', sa.String(length=255), nullable=False),
+        sa.Column('value', sa.JSON(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('namespace', 'key'),
+        comment='Keyed notification service state, formerly JSON files'
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('notification_state')
@@ -0,0 +1,47 @@
+"""Create notification_history_recipients table
+
+Revision ID: 009_notification_history_recipients
+Revises: 008_notification_state
+Create Date: 2026-10-19
+
+A notification sent once on behalf of every member of a network is stored as
+one notification_history row, with the members it was sent for listed here.
+Network history and stats rebuilds then see one delivery, while each member's
+history still includes it.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '009_notification_history_recipients'
+down_revision: Union[str, None] = '008_notification_state'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    from sqlalchemy import inspect
+
+    conn = op.get_bind()
+    inspector = inspect(conn)
+    if 'notification_history_recipients' in inspector.get_table_names():
+        return
+
+    op.create_table(
+        'notification_history_recipients',
+        sa.Column('history_id', postgresql.UUID(as_uuid=False), nullable=False),
+        sa.Column('user_id', sa.String(length=255), nullable=False),
+        sa.ForeignKeyConstraint(['history_id'], ['notification_history.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('history_id', 'user_id'),
+        comment='Members a shared notification delivery was made for'
+    )
+    op.create_index('idx_notification_history_recipients_user', 'notification_history_recipients', ['user_id', 'history_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_notification_history_recipients_user', table_name='notification_history_recipients')
+    op.drop_table('notification_history_recipients')
@@ -120,6 +120,41 @@ def mock_discord_client():
     return mock
 
 
+@pytest.fixture(autouse=True)
+def reset_rate_limiter():
+    """Start every test with full in-process rate limit buckets"""
+    from app.services.rate_limiter import rate_limiter
+
+    rate_limiter.reset()
+    yield
+
+
+@pytest.fixture
+def history_store():
+    """In-memory notification history wired into the notification manager"""
+    from app.services.notification_history import InMemoryHistoryStore, NotificationHistory
+
+    store = InMemoryHistoryStore()
+    with patch(
+        "app.services.notification_manager.notification_history",
+        NotificationHistory(store=store),
+    ):
+        yield store
+
+
+@pytest.fixture
+def stats_store():
+    """In-memory notification stats wired into the notification manager"""
+    from app.services.notification_stats import InMemoryStatsStore, NotificationStats
+
+    store = InMemoryStatsStore()
+    with patch(
+        "app.services.notification_manager.notification_stats",
+        NotificationStats(store=store),
+    ):
+        yield store
+
+
 @pytest.fixture
 def notification_manager_instance():
     """Fresh NotificationManager instance for testing"""
@@ -131,7 +166,6 @@ def notification_manager_instance():
     # Clear any loaded state
     manager._preferences.clear()
     manager._history.clear()
-    manager._rate_limits.clear()
     manager._scheduled_broadcasts.clear()
     manager._silenced_devices.clear()
 
@@ -0,0 +1,244 @@
+"""
+Unit tests for chunked, resumable broadcast jobs.
+
+Recipients and sends are faked on a runner subclass and jobs are kept in the
+in-memory store, which hands out copies like the database does.
+"""
+
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.models import NetworkEvent, NotificationChannel, NotificationRecord, NotificationType
+from app.services.broadcast_jobs import (
+    NETWORKS,
+    STATUS_SUBSCRIBERS,
+    BroadcastJobRunner,
+    ChannelThrottle,
+    InMemoryBroadcastJobStore,
+)
+
+
+class _Runner(BroadcastJobRunner):
+    def __init__(self, store, recipients, fail=(), clock=None):
+        super().__init__(store=store, **({"clock": clock} if clock else {}))
+        self.recipients = recipients
+        self.fail = set(fail)
+        self.sent_to: list[str] = []
+        self.resolved = 0
+
+    async def _recipients(self, kind, event):
+        self.resolved += 1
+        return sorted(self.recipients)
+
+    async def _send(self, kind, event, recipient, notification_id):
+        self.sent_to.append(recipient)
+        if recipient.startswith("quiet"):
+            return []
+        return [
+            NotificationRecord(
+                notification_id=notification_id,
+                event_id=event.event_id,
+                channel=NotificationChannel.EMAIL,
+                success=recipient not in self.fail,
+                error_message="bounced" if recipient in self.fail else None,
+                title=event.title,
+                message=event.message,
+                priority=event.priority,
+            )
+        ]
+
+
+def _event():
+    return NetworkEvent(
+        event_type=NotificationType.SYSTEM_STATUS,
+        title="Cartographer 2.0.0 is available",
+        message="Update now",
+    )
+
+
+@pytest.fixture
+def store():
+    return InMemoryBroadcastJobStore()
+
+
+@pytest.fixture(autouse=True)
+def small_chunks():
+    with (
+        patch("app.services.broadcast_jobs.settings.broadcast_chunk_size", 2),
+        patch("app.services.broadcast_jobs.settings.broadcast_email_per_second", 0),
+    ):
+        yield
+
+
+class TestBroadcastJobs:
+    """Tests for chunking, progress and resuming"""
+
+    async def test_progress_is_saved_after_each_chunk(self, store):
+        runner = _Runner(store, ["n1", "n2", "n3", "quiet-n4", "n5"], fail={"n3"})
+        job = await runner.submit(NETWORKS, _event())
+        runner._tasks.pop(job.id).cancel()
+        event = _event()
+
+        assert await runner.run_chunk(job, event) is True
+        progress = await runner.get_progress(job.id)
+        assert (progress.sent, progress.remaining) == (2, 3)
+
+        while await runner.run_chunk(job, event):
+            pass
+
+        progress = await runner.get_progress(job.id)
+        assert progress.status == "completed"
+        assert (progress.sent, progress.failed, progress.skipped) == (3, 1, 1)
+        assert progress.remaining == 0
+        assert progress.last_error == "bounced"
+
+    async def test_restart_resumes_after_last_saved_chunk(self, store):
+        crashed = _Runner(store, ["u1", "u2", "u3", "u4", "u5"])
+        job = await crashed.submit(NETWORKS, _event())
+        crashed._tasks.pop(job.id).cancel()
+        await crashed.run_chunk(job, _event())
+        # The next chunk was in flight when the replica died: sent but not saved
+        await crashed._send(NETWORKS, _event(), "u3", job.id)
+        store.jobs[job.id].lease_expires_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+
+        restarted = _Runner(store, crashed.recipients + ["u6"])
+        [claimed] = await store.claim_orphaned(restarted._owner, 60)
+        restarted._spawn(claimed)
+        await restarted.wait(job.id)
+
+        assert restarted.sent_to == ["u3", "u4", "u5", "u6"]
+        progress = await restarted.get_progress(job.id)
+        assert (progress.status, progress.sent, progress.total) == ("completed", 6, 6)
+
+    async def test_recipients_are_resolved_once_per_run(self, store):
+        runner = _Runner(store, [f"u{i}" for i in range(7)])
+        job = await runner.submit(NETWORKS, _event())
+        await runner.wait(job.id)
+
+        assert runner.resolved == 1
+        assert len(runner.sent_to) == 7
+        assert runner._recipient_lists == {}
+
+    async def test_chunk_is_cut_short_before_the_lease_expires(self, store):
+        now = [0.0]
+        runner = _Runner(store, [f"u{i}" for i in range(5)], clock=lambda: now[0])
+        original_send = runner._send
+
+        async def slow_send(*args):
+            now[0] += 2.0
+            return await original_send(*args)
+
+        runner._send = slow_send
+        job = await runner.submit(NETWORKS, _event())
+        runner._tasks.pop(job.id).cancel()
+
+        with (
+            patch("app.services.broadcast_jobs.settings.broadcast_chunk_size", 5),
+            patch("app.services.broadcast_jobs.settings.broadcast_lease_seconds", 10),
+        ):
+            assert await runner.run_chunk(job, _event()) is True
+
+        # Half the 10s lease is used up after the third 2s send
+        assert runner.sent_to == ["u0", "u1", "u2"]
+        stored = store.jobs[job.id]
+        assert (stored.cursor, stored.sent) == ("u2", 3)
+        assert stored.lease_expires_at > datetime.now(timezone.utc)
+
+    async def test_job_taken_over_by_another_replica_stops(self, store):
+        runner = _Runner(store, ["u1", "u2", "u3"])
+        job = await runner.submit(NETWORKS, _event())
+        runner._tasks.pop(job.id).cancel()
+        store.jobs[job.id].owner = "other-replica"
+
+        assert await runner.run_chunk(job, _event()) is False
+
+    async def test_stop_releases_lease_for_immediate_resume(self, store):
+        runner = _Runner(store, ["u1"])
+        job = await runner.submit(NETWORKS, _event())
+        await runner.stop()
+
+        assert store.jobs[job.id].status == "running"
+        assert store.jobs[job.id].lease_expires_at is None
+        assert len(await store.claim_orphaned("next-replica", 60)) == 1
+
+    async def test_no_recipients_creates_no_job(self, store):
+        runner = _Runner(store, [])
+
+        assert await runner.submit(NETWORKS, _event()) is None
+        assert store.jobs == {}
+
+
+class TestChannelThrottle:
+    """Tests for per-channel pacing"""
+
+    async def test_paces_each_channel_independently(self):
+        sleeps = []
+
+        async def sleep(seconds):
+            sleeps.append(seconds)
+
+        throttle = ChannelThrottle(clock=lambda: 100.0, sleep=sleep)
+        with (
+            patch("app.services.broadcast_jobs.settings.broadcast_email_per_second", 2.0),
+            patch("app.services.broadcast_jobs.settings.broadcast_discord_per_second", 0),
+        ):
+            for _ in range(3):
+                await throttle.acquire(NotificationChannel.EMAIL)
+                await throttle.acquire(NotificationChannel.DISCORD)
+
+        assert sleeps == [0.5, 1.0]
+
+
+class TestVersionUpdateBroadcast:
+    """Tests for version updates going through a broadcast job"""
+
+    async def test_update_notification_submits_job(self):
+        from app.services.version_checker import VersionChecker
+
+        checker = VersionChecker()
+        job = type("Job", (), {"id": "job-1", "total": 3})()
+        with patch(
+            "app.services.broadcast_jobs.broadcast_jobs.submit", AsyncMock(return_value=job)
+        ) as submit:
+            job_id = await checker._send_update_notification("2.0.0", "major")
+
+        assert job_id == "job-1"
+        assert submit.await_args.args[0] == NETWORKS
+        assert checker._last_notified_version == "2.0.0"
+
+
+class TestStatusSubscriberBroadcast:
+    """Tests for Cartographer up/down alerts going through a broadcast job"""
+
+    async def test_resolves_and_emails_status_subscribers(self, store):
+        from app.services.cartographer_status import CartographerStatusSubscription
+
+        subscribers = {
+            user_id: CartographerStatusSubscription(user_id, f"{user_id}@example.com")
+            for user_id in ("u2", "u1")
+        }
+        event = NetworkEvent(
+            event_type=NotificationType.CARTOGRAPHER_DOWN,
+            title="Cartographer Service Alert",
+            message="Down",
+        )
+        runner = BroadcastJobRunner(store=store)
+        with (
+            patch("app.services.cartographer_status.cartographer_status_service") as status_service,
+            patch(
+                "app.services.notification_manager.notification_manager"
+                ".send_status_notification_to_subscriber",
+                AsyncMock(return_value=None),
+            ) as send,
+        ):
+            status_service.get_subscribers_for_event.return_value = list(subscribers.values())
+            job = await runner.submit(STATUS_SUBSCRIBERS, event)
+            await runner.wait(job.id)
+
+        status_service.get_subscribers_for_event.assert_called_once_with(
+            NotificationType.CARTOGRAPHER_DOWN, channel=NotificationChannel.EMAIL
+        )
+        assert [call.args[0] for call in send.await_args_list] == ["u1", "u2"]
+        assert (await runner.get_progress(job.id)).status == "completed"
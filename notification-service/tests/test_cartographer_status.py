@@ -187,6 +187,56 @@ class TestCartographerStatusSubscribers:
 
         assert len(subs) == 0
 
+    def test_subscribers_by_channel(self, status_service):
+        """Should look up subscribers reachable on one channel"""
+        from app.models import NotificationChannel, NotificationType
+
+        status_service.create_or_update_subscription(
+            user_id="email-user", email_address="a@example.com", email_enabled=True
+        )
+        status_service.create_or_update_subscription(
+            user_id="discord-user",
+            email_address="b@example.com",
+            discord_enabled=True,
+            discord_user_id="123",
+            _discord_user_id_provided=True,
+        )
+        status_service.create_or_update_subscription(
+            user_id="both-user",
+            email_address="c@example.com",
+            email_enabled=True,
+            discord_enabled=True,
+            discord_user_id="456",
+            _discord_user_id_provided=True,
+        )
+
+        up = NotificationType.CARTOGRAPHER_UP
+        email = status_service.get_subscribers_for_event(up, channel=NotificationChannel.EMAIL)
+        discord = status_service.get_subscribers_for_event(up, channel=NotificationChannel.DISCORD)
+        everyone = status_service.get_subscribers_for_event(up)
+
+        assert {s.user_id for s in email} == {"email-user", "both-user"}
+        assert {s.user_id for s in discord} == {"discord-user", "both-user"}
+        assert sorted(s.user_id for s in everyone) == ["both-user", "discord-user", "email-user"]
+
+    def test_index_follows_updates_and_deletes(self, status_service):
+        """Should keep the subscriber index in step with writes"""
+        from app.models import NotificationType
+
+        status_service.create_or_update_subscription(
+            user_id="user-1", email_address="a@example.com", email_enabled=True
+        )
+        status_service.create_or_update_subscription(
+            user_id="user-1", cartographer_down_enabled=False
+        )
+
+        assert status_service.get_subscribers_for_event(NotificationType.CARTOGRAPHER_UP)
+        assert not status_service.get_subscribers_for_event(NotificationType.CARTOGRAPHER_DOWN)
+
+        status_service.delete_subscription("user-1")
+
+        assert not status_service.get_subscribers_for_event(NotificationType.CARTOGRAPHER_UP)
+
 
 class TestCartographerStatusSubscriptionModel:
     """Tests for CartographerStatusSubscription model"""
@@ -76,16 +76,24 @@ class TestCartographerStatusSubscription:
 class TestCartographerStatusServicePersistence:
     """Tests for service file persistence."""
 
-    def test_save_subscriptions_error(self):
-        """Test error handling when saving subscriptions fails."""
+    async def test_save_subscriptions_writes_one_key(self):
+        """Test that saving writes only the changed user's subscription."""
         from app.services.cartographer_status import CartographerStatusService
+        from app.services.state_store import (
+            CARTOGRAPHER_SUBSCRIPTIONS,
+            InMemoryStateStore,
+            StateRepository,
+        )
 
-        service = CartographerStatusService()
-        service._subscriptions = {"user1": MagicMock()}
+        state = StateRepository(InMemoryStateStore())
+        service = CartographerStatusService(state=state)
+        service.create_or_update_subscription(user_id="user1", email_address="a@example.com")
+        service.create_or_update_subscription(user_id="user2", email_address="b@example.com")
+        service.delete_subscription("user1")
 
-        with patch("builtins.open", side_effect=PermissionError("No permission")):
-            # Should not raise, just log error
-            service._save_subscriptions()
+        stored = await state.load(CARTOGRAPHER_SUBSCRIPTIONS)
+        assert list(stored) == ["user2"]
+        assert stored["user2"]["email_address"] == "b@example.com"
 
     def test_load_subscriptions_error(self):
         """Test error handling when loading subscriptions fails."""
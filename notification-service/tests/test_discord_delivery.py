@@ -0,0 +1,354 @@
+"""
+Tests for the rate-limit-aware Discord DM delivery queue.
+
+Runs against an in-process Discord REST stub mounted on httpx.MockTransport,
+which opens DM channels, accepts messages and enforces a rate-limit bucket
+per channel the way Discord reports it in response headers.
+"""
+
+import asyncio
+import json
+import time
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from app.models import (
+    DiscordConfig,
+    DiscordDeliveryMethod,
+    NetworkEvent,
+    NotificationPriority,
+    NotificationType,
+)
+from app.services.discord_delivery import (
+    DiscordDeliveryQueue,
+    DiscordRestClient,
+    _build_message_payload,
+)
+
+
+class FakeDiscordRest:
+    """Discord REST stub with per-channel message buckets"""
+
+    def __init__(self, bucket_limit=5, bucket_window=0.2):
+        self.bucket_limit = bucket_limit
+        self.bucket_window = bucket_window
+        self.dm_channel_requests = []
+        self.messages: dict[str, list[dict]] = {}
+        self.message_times: list[float] = []
+        self.rejected_429 = 0
+        self.force_429 = 0
+        self.force_html_429 = 0
+        self.deleted_channels: set[str] = set()
+        self._windows: dict[str, tuple[float, int]] = {}
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content) if request.content else {}
+        path = request.url.path
+
+        if path.endswith("/users/@me/channels"):
+            self.dm_channel_requests.append(body["recipient_id"])
+            return httpx.Response(200, json={"id": f"dm-{body['recipient_id']}", "type": 1})
+
+        channel_id = path.split("/")[-2]
+        if channel_id in self.deleted_channels:
+            self.deleted_channels.discard(channel_id)
+            return httpx.Response(404, json={"message": "Unknown Channel", "code": 10003})
+
+        if self.force_html_429:
+            self.force_html_429 -= 1
+            self.rejected_429 += 1
+            return httpx.Response(
+                429, text="<html>rate limited</html>", headers={"Retry-After": "0.05"}
+            )
+
+        if self.force_429:
+            self.force_429 -= 1
+            self.rejected_429 += 1
+            return httpx.Response(429, json={"retry_after": 0.05, "global": False})
+
+        now = time.monotonic()
+        started, count = self._windows.get(channel_id, (now, 0))
+        if now - started >= self.bucket_window:
+            started, count = now, 0
+        if count >= self.bucket_limit:
+            self.rejected_429 += 1
+            return httpx.Response(
+                429, json={"retry_after": self.bucket_window - (now - started), "global": False}
+            )
+        count += 1
+        self._windows[channel_id] = (started, count)
+
+        self.messages.setdefault(channel_id, []).append(body)
+        self.message_times.append(now)
+        return httpx.Response(
+            200,
+            json={"id": "msg"},
+            headers={
+                "X-RateLimit-Bucket": f"bucket-{channel_id}",
+                "X-RateLimit-Limit": str(self.bucket_limit),
+                "X-RateLimit-Remaining": str(self.bucket_limit - count),
+                "X-RateLimit-Reset-After": f"{self.bucket_window - (now - started):.3f}",
+            },
+        )
+
+
+def _event(title="Device Offline", network_id="network-1"):
+    return NetworkEvent(
+        event_type=NotificationType.DEVICE_OFFLINE,
+        priority=NotificationPriority.HIGH,
+        title=title,
+        message=f"{title} message",
+        network_id=network_id,
+    )
+
+
+@pytest.fixture
+def fake_rest():
+    return FakeDiscordRest()
+
+
+@pytest.fixture
+async def queue(fake_rest):
+    rest = DiscordRestClient(token="test-token", transport=fake_rest.transport())
+    queue = DiscordDeliveryQueue(rest=rest)
+    await queue.start()
+    return queue
+
+
+@pytest.fixture(autouse=True)
+def short_window():
+    with patch("app.services.discord_delivery.settings.discord_dm_coalesce_window_seconds", 0.01):
+        yield
+
+
+class TestDmChannelCache:
+    """Tests for the cached user -> DM channel map"""
+
+    async def test_channel_opened_once_per_user(self, queue, fake_rest):
+        """Sequential sends to one user should reuse the cached DM channel"""
+        await queue.start()
+        await queue.send_dm("111", _event("First"), "n1")
+        await queue.send_dm("111", _event("Second"), "n2")
+        await queue.send_dm("222", _event("Third"), "n3")
+
+        assert fake_rest.dm_channel_requests == ["111", "222"]
+        assert len(fake_rest.messages["dm-111"]) == 2
+        status = queue.get_status()
+        assert status["dm_channel_cache_hits"] == 1
+        assert status["dm_channel_cache_misses"] == 2
+
+    async def test_channel_reopened_after_ttl(self, queue, fake_rest):
+        """Expired cache entries should be refreshed"""
+        with patch("app.services.discord_delivery.settings.discord_dm_channel_ttl_seconds", 0):
+            await queue.send_dm("111", _event(), "n1")
+            await queue.send_dm("111", _event(), "n2")
+
+        assert fake_rest.dm_channel_requests == ["111", "111"]
+
+    async def test_unknown_channel_reopens_once(self, queue, fake_rest):
+        """A stale cached channel should be dropped and reopened"""
+        await queue.send_dm("111", _event(), "n1")
+        fake_rest.deleted_channels.add("dm-111")
+
+        record = await queue.send_dm("111", _event(), "n2")
+
+        assert record.success is True
+        assert fake_rest.dm_channel_requests == ["111", "111"]
+
+    async def test_expired_entries_are_pruned(self, fake_rest):
+        """Channels and buckets of users no longer messaged should not accumulate"""
+        now = [1000.0]
+        rest = DiscordRestClient(token="t", transport=fake_rest.transport(), clock=lambda: now[0])
+        queue = DiscordDeliveryQueue(rest=rest, clock=lambda: now[0])
+        await queue.start()
+        await queue.send_dm("111", _event(), "n1")
+        await queue.send_dm("222", _event(), "n2")
+
+        now[0] += 2 * 3600
+        await queue.send_dm("333", _event(), "n3")
+
+        assert queue.get_status()["cached_dm_channels"] == 1
+        assert [key.rsplit(":", 1)[1] for key in rest.get_bucket_status()] == ["dm-333"]
+
+
+class TestCoalescing:
+    """Tests for merging pending alerts into one message"""
+
+    async def test_concurrent_alerts_share_one_message(self, queue, fake_rest):
+        """Alerts queued within the window should be sent as one multi-embed message"""
+        records = await asyncio.gather(
+            *(queue.send_dm("111", _event(f"Device {i}"), f"n{i}") for i in range(3))
+        )
+
+        assert all(r.success for r in records)
+        assert [r.notification_id for r in records] == ["n0", "n1", "n2"]
+        [message] = fake_rest.messages["dm-111"]
+        assert len(message["embeds"]) == 3
+        assert message["content"] == "**3 new alerts**"
+        assert queue.get_status()["alerts_coalesced"] == 2
+
+    async def test_coalescing_caps_embeds_per_message(self, queue, fake_rest):
+        """More than 10 pending alerts should be split across messages"""
+        await asyncio.gather(*(queue.send_dm("111", _event(), f"n{i}") for i in range(12)))
+
+        assert [len(m["embeds"]) for m in fake_rest.messages["dm-111"]] == [10, 2]
+
+    async def test_cancelled_alert_is_withdrawn(self, queue, fake_rest):
+        """A caller that gives up before the flush should not have its alert sent"""
+        kept = asyncio.create_task(queue.send_dm("111", _event("Kept"), "n1"))
+        dropped = asyncio.create_task(queue.send_dm("111", _event("Dropped"), "n2"))
+        await asyncio.sleep(0)
+
+        dropped.cancel()
+        assert (await kept).success is True
+        with pytest.raises(asyncio.CancelledError):
+            await dropped
+
+        [message] = fake_rest.messages["dm-111"]
+        assert len(message["embeds"]) == 1
+        assert message["embeds"][0]["title"].endswith("Kept")
+
+    async def test_withdraw_reports_alerts_no_longer_queued(self, queue, fake_rest):
+        """Only alerts still waiting for their message can be withdrawn"""
+        task = asyncio.create_task(queue.send_dm("111", _event(), "n1"))
+        await asyncio.sleep(0)
+
+        assert queue.withdraw("111", "n1") is True
+        assert queue.withdraw("111", "n1") is False
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert fake_rest.messages == {}
+
+    def test_payload_links_to_network_when_shared(self):
+        """One network gets a map link; mixed networks link to the app"""
+        same = _build_message_payload([_event(), _event()])
+        mixed = _build_message_payload([_event(network_id="a"), _event(network_id="b")])
+
+        assert same["components"][0]["components"][0]["url"].endswith("/network/network-1")
+        assert mixed["components"][0]["components"][0]["label"] == "Open Cartographer"
+
+
+class TestRateLimits:
+    """Tests for header-driven rate-limit scheduling"""
+
+    async def test_waits_for_bucket_reset_instead_of_429(self, fake_rest):
+        """Once a bucket reports remaining=0, the next send should wait for reset"""
+        fake_rest.bucket_limit = 2
+        rest = DiscordRestClient(token="t", transport=fake_rest.transport())
+        queue = DiscordDeliveryQueue(rest=rest)
+        await queue.start()
+
+        for i in range(5):
+            with patch(
+                "app.services.discord_delivery.settings.discord_dm_coalesce_window_seconds", 0
+            ):
+                await queue.send_dm("111", _event(), f"n{i}")
+
+        assert fake_rest.rejected_429 == 0
+        assert len(fake_rest.messages["dm-111"]) == 5
+        assert rest.rate_limit_waits >= 2
+        assert fake_rest.message_times[2] - fake_rest.message_times[0] >= 0.15
+        assert rest.get_bucket_status()["POST /channels/{channel_id}/messages:dm-111"][
+            "bucket"
+        ] == ("bucket-dm-111")
+
+    async def test_retries_after_429(self, queue, fake_rest):
+        """A 429 should be retried after retry_after"""
+        fake_rest.force_429 = 1
+
+        record = await queue.send_dm("111", _event(), "n1")
+
+        assert record.success is True
+        assert fake_rest.rejected_429 == 1
+        assert queue.get_status()["rate_limited_responses"] == 1
+
+    async def test_retries_after_non_json_429(self, queue, fake_rest):
+        """A 429 with an HTML body should fall back to the Retry-After header"""
+        fake_rest.force_html_429 = 1
+
+        record = await queue.send_dm("111", _event(), "n1")
+
+        assert record.success is True
+        assert fake_rest.rejected_429 == 1
+
+    async def test_persistent_failure_returns_failed_records(self, fake_rest):
+        """Exhausted retries should produce failed records, not exceptions"""
+        fake_rest.force_429 = 10
+        rest = DiscordRestClient(token="t", transport=fake_rest.transport(), max_retries=1)
+        queue = DiscordDeliveryQueue(rest=rest)
+        await queue.start()
+
+        record = await queue.send_dm("111", _event(), "n1")
+
+        assert record.success is False
+        assert "429" in record.error_message
+        assert queue.get_status()["alerts_failed"] == 1
+
+
+class TestServiceIntegration:
+    """Tests for routing DMs through the queue"""
+
+    async def test_send_notification_uses_queue_for_dm(self, queue, fake_rest):
+        """DM notifications should go through the queue when it is running"""
+        from app.services.discord_service import DiscordNotificationService
+
+        service = DiscordNotificationService()
+        config = DiscordConfig(
+            enabled=True, delivery_method=DiscordDeliveryMethod.DM, discord_user_id="111"
+        )
+        await queue.start()
+
+        with (
+            patch("app.services.discord_service.discord_delivery_queue", queue),
+            patch("app.services.discord_service.settings.discord_bot_token", "token"),
+        ):
+            record = await service.send_notification(config, _event(), "n1")
+
+        assert record.success is True
+        assert len(fake_rest.messages["dm-111"]) == 1
+
+    async def test_stop_flushes_pending(self, queue, fake_rest):
+        """Stopping should wait for in-flight user queues"""
+        await queue.start()
+        task = asyncio.create_task(queue.send_dm("111", _event(), "n1"))
+        await asyncio.sleep(0)
+
+        await queue.stop()
+
+        assert (await task).success is True
+        assert queue.is_running is False
+
+    async def test_send_after_stop_fails_without_queueing(self, queue, fake_rest):
+        """Alerts arriving after stop() should fail fast instead of being stranded"""
+        await queue.stop()
+
+        record = await queue.send_dm("111", _event(), "n1")
+
+        assert record.success is False
+        assert "not running" in record.error_message
+        assert queue.get_status()["pending_alerts"] == 0
+        assert fake_rest.messages == {}
+
+    async def test_unlink_drops_cached_dm_channel(self, queue, fake_rest):
+        """Deleting a Discord link should invalidate that user's DM channel"""
+        from unittest.mock import AsyncMock, MagicMock
+
+        from app.services.discord_oauth import DiscordOAuthService
+
+        await queue.send_dm("111", _event(), "n1")
+        assert queue.get_status()["cached_dm_channels"] == 1
+
+        service = DiscordOAuthService()
+        link = MagicMock(discord_id="111")
+        with (
+            patch.object(service, "get_link", new=AsyncMock(return_value=link)),
+            patch("app.services.discord_oauth.discord_delivery_queue", queue),
+        ):
+            assert await service.delete_link(AsyncMock(), "user-123") is True
+
+        assert queue.get_status()["cached_dm_channels"] == 0
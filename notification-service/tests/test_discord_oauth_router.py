@@ -231,6 +231,7 @@ class TestDiscordOAuthCallback:
                 )
 
                 mock_service.create_or_update_link = AsyncMock(return_value=MagicMock())
+                mock_prefs.invalidate_network = AsyncMock()
 
                 response = test_client.get(
                     "/api/auth/discord/callback",
@@ -242,8 +243,11 @@ class TestDiscordOAuthCallback:
                 )
 
                 assert response.status_code == 307
+                assert "discord_oauth=success" in response.headers["location"]
                 # Should have called execute for network prefs update
                 mock_db_session.execute.assert_called()
+                # Cached preferences for the network are dropped on every replica
+                mock_prefs.invalidate_network.assert_awaited_once_with("network-uuid")
 
     def test_callback_exception_handling(self, test_client):
         """Should redirect with error on exception"""
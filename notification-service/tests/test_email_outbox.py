@@ -0,0 +1,336 @@
+"""
+Unit tests for the email outbox.
+
+Uses the in-memory store and fake provider so no database or network is needed.
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import pytest
+import respx
+
+from app.models import NetworkEvent, NotificationPriority, NotificationType
+from app.services.email_outbox import (
+    EmailOutbox,
+    EmailProviderError,
+    FakeEmailProvider,
+    InMemoryOutboxStore,
+    ResendBatchProvider,
+)
+
+
+@pytest.fixture
+def store():
+    return InMemoryOutboxStore()
+
+
+@pytest.fixture
+def provider():
+    return FakeEmailProvider()
+
+
+@pytest.fixture
+def outbox(store, provider):
+    return EmailOutbox(store=store, provider=provider)
+
+
+async def _enqueue(outbox, count=1):
+    return [
+        await outbox.enqueue(
+            to_email=f"user{i}@example.com",
+            subject="Subject",
+            html="<p>Body</p>",
+            text="Body",
+            notification_id=f"n-{i}",
+            event_id="event-1",
+            network_id="network-1",
+        )
+        for i in range(count)
+    ]
+
+
+class TestEnqueueAndDeliver:
+    """Tests for enqueueing and batch delivery"""
+
+    async def test_enqueue_persists_pending_message(self, outbox, store, provider):
+        """Enqueue should store the message without sending it"""
+        [message_id] = await _enqueue(outbox)
+
+        assert store.messages[message_id].status == "pending"
+        assert store.messages[message_id].attempts == 0
+        assert provider.sent == []
+
+    async def test_process_once_sends_one_batch(self, outbox, store, provider):
+        """Due messages should be delivered in a single batch request"""
+        ids = await _enqueue(outbox, 3)
+
+        processed = await outbox.process_once()
+
+        assert processed == 3
+        assert len(provider.batches) == 1
+        assert [p["to"] for p in provider.batches[0]] == [
+            ["user0@example.com"],
+            ["user1@example.com"],
+            ["user2@example.com"],
+        ]
+        for message_id in ids:
+            assert store.messages[message_id].status == "sent"
+            assert store.messages[message_id].provider_message_id.startswith("fake-")
+        assert outbox.get_status()["sent"] == 3
+
+    async def test_process_once_respects_batch_size(self, outbox, provider):
+        """Batches should be capped at the configured batch size"""
+        await _enqueue(outbox, 5)
+
+        with patch("app.services.email_outbox.settings.email_outbox_batch_size", 2):
+            assert await outbox.process_once() == 2
+            assert await outbox.process_once() == 2
+            assert await outbox.process_once() == 1
+            assert await outbox.process_once() == 0
+
+        assert [len(batch) for batch in provider.batches] == [2, 2, 1]
+
+    async def test_process_once_empty(self, outbox):
+        """Nothing due should be a no-op"""
+        assert await outbox.process_once() == 0
+
+
+class TestRetryAndDeadLetter:
+    """Tests for backoff and dead-lettering"""
+
+    async def test_retryable_failure_reschedules_with_backoff(self, outbox, store, provider):
+        """A retryable failure should push the message out by the backoff delay"""
+        [message_id] = await _enqueue(outbox)
+        provider.fail_next.append(EmailProviderError("rate limited"))
+
+        before = datetime.now(timezone.utc)
+        await outbox.process_once()
+
+        message = store.messages[message_id]
+        assert message.status == "pending"
+        assert message.attempts == 1
+        assert message.last_error == "rate limited"
+        assert message.next_attempt_at >= before + timedelta(seconds=4)
+        # Not due yet, so nothing is claimed
+        assert await outbox.process_once() == 0
+        assert outbox.get_status()["retried"] == 1
+
+    async def test_non_retryable_failure_dead_letters(self, outbox, store, provider):
+        """A permanent rejection should dead-letter immediately"""
+        [message_id] = await _enqueue(outbox)
+        provider.fail_next.append(EmailProviderError("invalid from", retryable=False))
+
+        await outbox.process_once()
+
+        assert store.messages[message_id].status == "dead"
+        assert [m.id for m in await outbox.get_dead_letters()] == [message_id]
+
+    async def test_rejected_batch_is_split_to_isolate_bad_address(self, outbox, store, provider):
+        """One invalid recipient should not dead-letter the rest of its batch"""
+        message_ids = await _enqueue(outbox, count=8)
+        provider.rejected_addresses.add("user5@example.com")
+
+        assert await outbox.process_once() == 8
+
+        dead = [m for m in store.messages.values() if m.status == "dead"]
+        assert [m.to_email for m in dead] == ["user5@example.com"]
+        assert sum(1 for m in store.messages.values() if m.status == "sent") == 7
+        assert len(provider.sent) == 7
+        # 8 -> 4 + 4 -> 2 + 2 -> 1 + 1: the good halves go out as three batches
+        assert [len(batch) for batch in provider.batches] == [4, 1, 2]
+        assert outbox.get_status()["dead_lettered"] == 1
+
+    async def test_exhausted_attempts_dead_letter(self, outbox, store, provider):
+        """Messages should be dead-lettered after max attempts"""
+        [message_id] = await _enqueue(outbox)
+
+        with (
+            patch("app.services.email_outbox.settings.email_outbox_max_attempts", 2),
+            patch("app.services.email_outbox.settings.email_outbox_backoff_base_seconds", 0),
+        ):
+            provider.fail_next.extend([EmailProviderError("boom"), EmailProviderError("boom")])
+            await outbox.process_once()
+            assert store.messages[message_id].status == "pending"
+            await outbox.process_once()
+
+        assert store.messages[message_id].status == "dead"
+        assert store.messages[message_id].attempts == 2
+        assert outbox.get_status()["dead_lettered"] == 1
+
+    async def test_requeue_dead_letter(self, outbox, store, provider):
+        """Requeued dead letters should be delivered on the next pass"""
+        [message_id] = await _enqueue(outbox)
+        provider.fail_next.append(EmailProviderError("bad", retryable=False))
+        await outbox.process_once()
+
+        assert await outbox.requeue_dead_letter(message_id) is True
+        assert await outbox.requeue_dead_letter("missing") is False
+
+        await outbox.process_once()
+        assert store.messages[message_id].status == "sent"
+
+    def test_backoff_grows_and_caps(self):
+        """Backoff should double per attempt and stay under the cap"""
+        with (
+            patch("app.services.email_outbox.settings.email_outbox_backoff_base_seconds", 10),
+            patch("app.services.email_outbox.settings.email_outbox_backoff_max_seconds", 60),
+        ):
+            assert 5 <= EmailOutbox._backoff_seconds(1) <= 10
+            assert 20 <= EmailOutbox._backoff_seconds(3) <= 40
+            assert 30 <= EmailOutbox._backoff_seconds(10) <= 60
+
+
+class TestRetention:
+    """Tests for purging sent messages"""
+
+    async def test_purges_only_sent_messages_past_retention(self, outbox, store, provider):
+        """Sent messages older than the window are deleted; pending and dead ones stay"""
+        old, recent, dead = await _enqueue(outbox, count=3)
+        provider.rejected_addresses.add("user2@example.com")
+        await outbox.process_once()
+        store.messages[old].updated_at = datetime.now(timezone.utc) - timedelta(days=30)
+        store.messages[dead].updated_at = datetime.now(timezone.utc) - timedelta(days=30)
+        [pending] = await _enqueue(outbox)
+
+        with patch("app.services.email_outbox.settings.email_outbox_retention_batch_size", 1):
+            assert await outbox.enforce_retention() == 1
+
+        assert set(store.messages) == {recent, dead, pending}
+        assert outbox.get_status()["purged"] == 1
+
+    async def test_retention_disabled(self, outbox, store):
+        """A retention of 0 days keeps sent messages forever"""
+        await _enqueue(outbox)
+        await outbox.process_once()
+
+        with patch("app.services.email_outbox.settings.email_outbox_sent_retention_days", 0):
+            assert await outbox.enforce_retention() == 0
+        assert len(store.messages) == 1
+
+    async def test_first_pass_purges_then_waits_for_interval(self, outbox):
+        """Retention runs on the first pass however long the host has been up"""
+        with patch.object(outbox, "enforce_retention", AsyncMock(return_value=0)) as purge:
+            await outbox._maybe_enforce_retention()
+            await outbox._maybe_enforce_retention()
+
+        purge.assert_awaited_once()
+
+
+class TestWorkers:
+    """Tests for the background worker lifecycle"""
+
+    async def test_workers_deliver_enqueued_messages(self, outbox, store, provider):
+        """Running workers should pick up new messages without waiting for the poll"""
+        with patch("app.services.email_outbox.settings.email_outbox_poll_interval_seconds", 30):
+            await outbox.start()
+            try:
+                [message_id] = await _enqueue(outbox)
+                for _ in range(50):
+                    if store.messages[message_id].status == "sent":
+                        break
+                    await asyncio.sleep(0.01)
+            finally:
+                await outbox.stop()
+
+        assert store.messages[message_id].status == "sent"
+        assert outbox.is_running is False
+
+    async def test_stop_drains_pending_messages(self, outbox, store, provider):
+        """Stopping should make a final pass over due messages"""
+        ids = await _enqueue(outbox, 3)
+        outbox._running = True
+
+        await outbox.stop()
+
+        assert all(store.messages[i].status == "sent" for i in ids)
+
+
+class TestSendNotificationEmailOutbox:
+    """Tests for send_notification_email routing through the outbox"""
+
+    @pytest.fixture
+    def event(self):
+        return NetworkEvent(
+            event_type=NotificationType.DEVICE_OFFLINE,
+            priority=NotificationPriority.CRITICAL,
+            title="Router down",
+            message="Router is offline",
+            network_id="network-1",
+        )
+
+    async def test_queues_when_outbox_running(self, outbox, store, event):
+        """Emails should be queued and reported as accepted"""
+        from app.services.email_service import send_notification_email
+
+        outbox._running = True
+        with (
+            patch("app.services.email_service.email_outbox", outbox),
+            patch("app.services.email_service.settings.resend_api_key", "test-key"),
+            patch("app.services.email_service._get_resend") as mock_get_resend,
+        ):
+            record = await send_notification_email("user@example.com", event, "n-1")
+
+        assert record.success is True
+        mock_get_resend.assert_not_called()
+        [message] = store.messages.values()
+        assert message.subject == "🚨 CRITICAL: Router down"
+        assert message.network_id == "network-1"
+
+    async def test_immediate_bypasses_outbox(self, outbox, store, event, mock_resend):
+        """immediate=True should send inline even when the outbox is running"""
+        from app.services.email_service import send_notification_email
+
+        outbox._running = True
+        with (
+            patch("app.services.email_service.email_outbox", outbox),
+            patch("app.services.email_service.settings.resend_api_key", "test-key"),
+            patch("app.services.email_service._get_resend", return_value=mock_resend),
+        ):
+            record = await send_notification_email("user@example.com", event, "n-1", immediate=True)
+
+        assert record.success is True
+        assert store.messages == {}
+        mock_resend.Emails.send.assert_called_once()
+
+
+class TestResendBatchProvider:
+    """Tests for the Resend batch API provider"""
+
+    @respx.mock
+    async def test_send_batch_returns_ids(self):
+        respx.post("https://api.resend.com/emails/batch").mock(
+            return_value=httpx.Response(200, json={"data": [{"id": "a"}, {"id": "b"}]})
+        )
+        provider = ResendBatchProvider(api_key="key")
+
+        ids = await provider.send_batch([{"to": ["a@x"]}, {"to": ["b@x"]}])
+        await provider.aclose()
+
+        assert ids == ["a", "b"]
+
+    @respx.mock
+    async def test_rate_limit_is_retryable(self):
+        respx.post("https://api.resend.com/emails/batch").mock(return_value=httpx.Response(429))
+        provider = ResendBatchProvider(api_key="key")
+
+        with pytest.raises(EmailProviderError) as exc_info:
+            await provider.send_batch([{"to": ["a@x"]}])
+        await provider.aclose()
+
+        assert exc_info.value.retryable is True
+
+    @respx.mock
+    async def test_validation_error_is_permanent(self):
+        respx.post("https://api.resend.com/emails/batch").mock(
+            return_value=httpx.Response(422, json={"message": "invalid"})
+        )
+        provider = ResendBatchProvider(api_key="key")
+
+        with pytest.raises(EmailProviderError) as exc_info:
+            await provider.send_batch([{"to": ["a@x"]}])
+        await provider.aclose()
+
+        assert exc_info.value.retryable is False
@@ -131,8 +131,17 @@ class TestLifespanEvents:
                         mock_nm.start_scheduler = AsyncMock()
                         mock_nm.stop_scheduler = AsyncMock()
                         mock_nm.broadcast_notification = AsyncMock(return_value={})
-
-                        with patch("app.main.version_checker") as mock_vc:
+                        mock_nm.import_legacy_history = AsyncMock(return_value=0)
+
+                        with (
+                            patch("app.main.version_checker") as mock_vc,
+                            patch("app.main.notification_history") as mock_history,
+                            patch("app.main.notification_stats") as mock_stats,
+                        ):
+                            mock_history.start = AsyncMock()
+                            mock_history.stop = AsyncMock()
+                            mock_stats.start = AsyncMock()
+                            mock_stats.stop = AsyncMock()
                             mock_vc.start = AsyncMock()
                             mock_vc.stop = AsyncMock()
 
@@ -170,8 +179,17 @@ class TestLifespanEvents:
                         mock_nm.start_scheduler = AsyncMock()
                         mock_nm.stop_scheduler = AsyncMock()
                         mock_nm.broadcast_notification = AsyncMock(return_value={})
-
-                        with patch("app.main.version_checker") as mock_vc:
+                        mock_nm.import_legacy_history = AsyncMock(return_value=0)
+
+                        with (
+                            patch("app.main.version_checker") as mock_vc,
+                            patch("app.main.notification_history") as mock_history,
+                            patch("app.main.notification_stats") as mock_stats,
+                        ):
+                            mock_history.start = AsyncMock()
+                            mock_history.stop = AsyncMock()
+                            mock_stats.start = AsyncMock()
+                            mock_stats.stop = AsyncMock()
                             mock_vc.start = AsyncMock()
                             mock_vc.stop = AsyncMock()
 
@@ -2,6 +2,7 @@
 Unit tests for MassOutageDetector service.
 """
 
+import asyncio
 import uuid
 from datetime import datetime, timedelta
 from unittest.mock import patch
@@ -551,3 +552,125 @@ class TestMassRecoveryDetector:
         assert detector.get_pending_online_count(network_id) == 2
         assert detector.should_aggregate(network_id) is True
         assert detector.should_aggregate_online(network_id) is False
+
+
+class _Clock:
+    def __init__(self):
+        self.now = datetime(2024, 1, 1, 12, 0, 0)
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += timedelta(seconds=seconds)
+
+
+@pytest.fixture
+def clock():
+    return _Clock()
+
+
+@pytest.fixture
+def timed_detector(clock):
+    return MassOutageDetector(clock=clock)
+
+
+def _record_offline(detector, count, network_id="network-1", start=1):
+    for i in range(start, start + count):
+        ip = f"192.168.1.{i}"
+        detector.record_offline_event(network_id, ip, None, create_test_event(ip, None, network_id))
+
+
+class TestFlushTimers:
+    """Tests for the timer-driven flush engine"""
+
+    def test_nothing_due_before_window_expires(self, timed_detector, clock):
+        _record_offline(timed_detector, 2)
+
+        clock.advance(4.9)
+
+        assert timed_detector.flush_due() == []
+        assert timed_detector.next_deadline() == clock.now + timedelta(seconds=0.1)
+
+    def test_individual_events_flush_exactly_at_expiry(self, timed_detector, clock):
+        _record_offline(timed_detector, 1)
+        clock.advance(2)
+        _record_offline(timed_detector, 1, start=2)
+
+        clock.advance(3)
+        first = timed_detector.flush_due()
+        clock.advance(2)
+        second = timed_detector.flush_due()
+
+        assert [e.device_ip for _, e in first] == ["192.168.1.1"]
+        assert [e.device_ip for _, e in second] == ["192.168.1.2"]
+        assert timed_detector.next_deadline() is None
+
+    def test_threshold_flushes_mass_event_after_grace(self, timed_detector, clock):
+        _record_offline(timed_detector, 3)
+
+        clock.advance(0.5)
+        assert timed_detector.flush_due() == []
+        clock.advance(0.5)
+        flushed = timed_detector.flush_due()
+
+        assert len(flushed) == 1
+        network_id, event = flushed[0]
+        assert network_id == "network-1"
+        assert event.event_type == NotificationType.MASS_OUTAGE
+        assert timed_detector.get_pending_count("network-1") == 0
+
+    def test_removal_below_threshold_falls_back_to_window(self, timed_detector, clock):
+        _record_offline(timed_detector, 3)
+        timed_detector.remove_device("network-1", "192.168.1.3")
+
+        clock.advance(1)
+        assert timed_detector.flush_due() == []
+        clock.advance(4)
+
+        events = [e for _, e in timed_detector.flush_due()]
+        assert {e.event_type for e in events} == {NotificationType.DEVICE_OFFLINE}
+        assert len(events) == 2
+
+    def test_networks_flush_independently(self, timed_detector, clock):
+        _record_offline(timed_detector, 3, network_id="network-1")
+        clock.advance(0.5)
+        _record_offline(timed_detector, 3, network_id="network-2")
+
+        clock.advance(0.5)
+        assert [n for n, _ in timed_detector.flush_due()] == ["network-1"]
+        clock.advance(0.5)
+        assert [n for n, _ in timed_detector.flush_due()] == ["network-2"]
+
+    def test_buffer_is_bounded_but_overflow_is_counted(self, timed_detector, clock):
+        timed_detector.MAX_PENDING_EVENTS_PER_NETWORK = 4
+        _record_offline(timed_detector, 6)
+
+        assert timed_detector.get_pending_count("network-1") == 4
+        clock.advance(1)
+        [(_, event)] = timed_detector.flush_due()
+
+        assert event.details["total_affected"] == 6
+        assert len(event.details["affected_devices"]) == 4
+        assert "and 1 more" in event.message
+
+    async def test_background_task_dispatches_due_events(self, timed_detector, clock):
+        dispatched = asyncio.Queue()
+
+        async def dispatch(network_id, event):
+            await dispatched.put((network_id, event))
+
+        timed_detector.THRESHOLD_GRACE_PERIOD_SECONDS = 0
+        await timed_detector.start(dispatch)
+        try:
+            await asyncio.sleep(0)  # let the task go idle on an empty heap
+            # Reaching the threshold schedules a deadline of "now", which wakes the task
+            _record_offline(timed_detector, 3)
+
+            network_id, event = await asyncio.wait_for(dispatched.get(), timeout=1)
+        finally:
+            await timed_detector.stop()
+
+        assert network_id == "network-1"
+        assert event.event_type == NotificationType.MASS_OUTAGE
+        assert timed_detector.get_status()["running"] is False
@@ -207,9 +207,20 @@ class TestNetworkAnomalyDetectorBaselines:
 
     def test_sync_current_devices(self, detector):
         """Should sync device list"""
+        assert detector.devices_synced is False
+
         detector.sync_current_devices(["192.168.1.1", "192.168.1.2"])
 
         assert len(detector._current_devices) == 2
+        assert detector.devices_synced is True
+
+    def test_update_current_devices(self, detector):
+        """Should apply added and removed devices to the current set"""
+        detector.sync_current_devices(["192.168.1.1", "192.168.1.2"])
+
+        detector.update_current_devices(["192.168.1.3"], ["192.168.1.1"])
+
+        assert detector._current_devices == {"192.168.1.2", "192.168.1.3"}
 
 
 class TestNetworkAnomalyDetectorPersistence:
@@ -452,6 +452,45 @@ class TestSendToNetworkUsers:
         assert len(results) == 3
         assert mock_dispatch.call_count == 3
 
+    @pytest.mark.asyncio
+    async def test_send_to_network_users_skips_rate_limited(self, dispatch_service, sample_event):
+        """Should decide the whole fan-out in one limiter call and skip denied users"""
+        from app.services.rate_limiter import RateLimitDecision
+
+        mock_prefs = MagicMock()
+        mock_prefs.email_enabled = True
+        mock_prefs.enabled_types = ["device_offline"]
+        mock_prefs.type_priorities = {}
+        mock_prefs.minimum_priority = "low"
+        mock_prefs.quiet_hours_enabled = False
+
+        with (
+            patch("app.services.notification_dispatch.user_preferences_service") as mock_ups,
+            patch("app.services.notification_dispatch.rate_limiter") as mock_limiter,
+            patch.object(
+                dispatch_service, "_dispatch_notifications_for_user", new_callable=AsyncMock
+            ) as mock_dispatch,
+        ):
+            mock_ups.get_user_emails_batch = AsyncMock(return_value={})
+            mock_ups.get_network_preferences_batch = AsyncMock(
+                return_value={"user1": mock_prefs, "user2": mock_prefs}
+            )
+            mock_limiter.acquire_many = AsyncMock(
+                return_value=[RateLimitDecision(allowed=False), RateLimitDecision(allowed=True)]
+            )
+            mock_dispatch.return_value = []
+
+            results = await dispatch_service.send_to_network_users(
+                AsyncMock(), "network-123", ["user1", "user2"], sample_event
+            )
+
+        assert list(results) == ["user2"]
+        mock_limiter.acquire_many.assert_awaited_once()
+        assert [[limit.key for limit in d] for d in mock_limiter.acquire_many.call_args[0][0]] == [
+            ["user:user1"],
+            ["user:user2"],
+        ]
+
     @pytest.mark.asyncio
     async def test_send_to_network_users_scheduled(self, dispatch_service, sample_event):
         """Should skip scheduled notifications (not yet implemented)"""
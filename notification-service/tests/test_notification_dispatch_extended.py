@@ -9,7 +9,9 @@ Covers:
 - Global notifications
 """
 
+import asyncio
 import os
+import time
 from datetime import datetime, timedelta
 from datetime import timezone as dt_timezone
 from unittest.mock import AsyncMock, MagicMock, patch
@@ -34,6 +36,7 @@ from app.models.database import (
     UserNetworkNotificationPrefs,
 )
 from app.services.notification_dispatch import (
+    DispatchLimits,
     NotificationDispatchService,
     notification_dispatch_service,
 )
@@ -655,3 +658,239 @@ class TestSendGlobalNotification:
 
         # User not in results since no channels enabled
         assert results == {}
+
+
+class TestConcurrentFanOut:
+    """Tests for concurrent, bounded fan-out in send_to_network_users."""
+
+    @staticmethod
+    def _stub_channel(channel, delay, tracker):
+        """Build a stub channel sender that sleeps and tracks in-flight sends."""
+
+        async def send(**kwargs):
+            tracker["in_flight"] += 1
+            tracker["max_in_flight"] = max(tracker["max_in_flight"], tracker["in_flight"])
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                tracker["in_flight"] -= 1
+            return NotificationRecord(
+                notification_id=kwargs["notification_id"],
+                event_id=kwargs["event"].event_id,
+                channel=channel,
+                title="t",
+                message="m",
+                priority=NotificationPriority.HIGH,
+                success=True,
+            )
+
+        return send
+
+    @pytest.mark.asyncio
+    async def test_fan_out_runs_concurrently_within_channel_limits(
+        self, service, mock_db, sample_event
+    ):
+        """Deliveries overlap but never exceed the per-channel limit."""
+        user_ids = [f"user{i}" for i in range(20)]
+        prefs = MockUserNetworkPrefs(
+            email_enabled=True, discord_enabled=True, discord_user_id="123"
+        )
+        email_tracker = {"in_flight": 0, "max_in_flight": 0}
+        discord_tracker = {"in_flight": 0, "max_in_flight": 0}
+
+        with (
+            patch("app.services.notification_dispatch.user_preferences_service") as mock_prefs_svc,
+            patch("app.services.notification_dispatch.is_email_configured", return_value=True),
+            patch("app.services.notification_dispatch.is_discord_configured", return_value=True),
+            patch(
+                "app.services.notification_dispatch.send_notification_email",
+                new=self._stub_channel(NotificationChannel.EMAIL, 0.05, email_tracker),
+            ),
+            patch(
+                "app.services.discord_service.send_discord_dm",
+                new=self._stub_channel(NotificationChannel.DISCORD, 0.05, discord_tracker),
+            ),
+            patch("app.services.notification_dispatch.settings") as mock_settings,
+        ):
+            mock_settings.dispatch_email_concurrency = 5
+            mock_settings.dispatch_discord_concurrency = 2
+            mock_settings.dispatch_user_timeout_seconds = 5.0
+            mock_prefs_svc.get_user_emails_batch = AsyncMock(
+                return_value={u: f"{u}@example.com" for u in user_ids}
+            )
+            mock_prefs_svc.get_network_preferences_batch = AsyncMock(
+                return_value={u: prefs for u in user_ids}
+            )
+
+            started = time.monotonic()
+            results = await service.send_to_network_users(
+                mock_db, "test-network", user_ids, sample_event
+            )
+            elapsed = time.monotonic() - started
+
+        assert len(results) == 20
+        assert all(len(records) == 2 for records in results.values())
+        assert all(r.success for records in results.values() for r in records)
+        assert all(r.network_id == "test-network" for records in results.values() for r in records)
+        assert email_tracker["max_in_flight"] == 5
+        assert discord_tracker["max_in_flight"] == 2
+        # Sequential delivery would take 20 * (0.05 + 0.05) = 2s; Discord at
+        # 2-wide bounds the concurrent run at 10 rounds of 0.05s.
+        assert elapsed < 1.0
+
+    @pytest.mark.asyncio
+    async def test_slow_channel_times_out_per_user(self, service, sample_event):
+        """A channel exceeding the user timeout is cancelled and reported as failed."""
+        prefs = MockUserNetworkPrefs(
+            email_enabled=True, discord_enabled=True, discord_user_id="123"
+        )
+        tracker = {"in_flight": 0, "max_in_flight": 0}
+        limits = DispatchLimits(
+            email=asyncio.Semaphore(1), discord=asyncio.Semaphore(1), user_timeout=0.1
+        )
+
+        with (
+            patch("app.services.notification_dispatch.is_email_configured", return_value=True),
+            patch("app.services.notification_dispatch.is_discord_configured", return_value=True),
+            patch(
+                "app.services.notification_dispatch.send_notification_email",
+                new=self._stub_channel(NotificationChannel.EMAIL, 0.01, tracker),
+            ),
+            patch(
+                "app.services.discord_service.send_discord_dm",
+                new=self._stub_channel(NotificationChannel.DISCORD, 10, tracker),
+            ),
+        ):
+            records = await service._dispatch_notifications_for_user(
+                prefs=prefs,
+                user_email="user@example.com",
+                network_id="test-network",
+                event=sample_event,
+                limits=limits,
+            )
+            # Let the cancelled Discord task unwind
+            await asyncio.sleep(0)
+
+        assert [r.channel for r in records] == [
+            NotificationChannel.EMAIL,
+            NotificationChannel.DISCORD,
+        ]
+        assert records[0].success is True
+        assert records[1].success is False
+        assert "Timed out" in records[1].error_message
+        assert tracker["in_flight"] == 0
+
+    @pytest.mark.asyncio
+    async def test_timeout_starts_after_channel_slot_is_acquired(
+        self, service, mock_db, sample_event
+    ):
+        """Users queued behind the channel limit are not timed out before sending."""
+        user_ids = [f"user{i}" for i in range(8)]
+        prefs = MockUserNetworkPrefs(email_enabled=True, discord_enabled=False)
+        tracker = {"in_flight": 0, "max_in_flight": 0}
+
+        with (
+            patch("app.services.notification_dispatch.user_preferences_service") as mock_prefs_svc,
+            patch("app.services.notification_dispatch.is_email_configured", return_value=True),
+            patch(
+                "app.services.notification_dispatch.send_notification_email",
+                new=self._stub_channel(NotificationChannel.EMAIL, 0.05, tracker),
+            ),
+            patch("app.services.notification_dispatch.settings") as mock_settings,
+        ):
+            mock_settings.dispatch_email_concurrency = 2
+            mock_settings.dispatch_discord_concurrency = 2
+            mock_settings.dispatch_user_timeout_seconds = 0.15
+            mock_prefs_svc.get_user_emails_batch = AsyncMock(
+                return_value={u: f"{u}@example.com" for u in user_ids}
+            )
+            mock_prefs_svc.get_network_preferences_batch = AsyncMock(
+                return_value={u: prefs for u in user_ids}
+            )
+
+            results = await service.send_to_network_users(
+                mock_db, "test-network", user_ids, sample_event
+            )
+
+        # 8 users through 2 slots take 4 rounds of 0.05s, longer than the
+        # timeout, yet every individual send finishes well within it.
+        assert len(results) == 8
+        assert all(r.success for records in results.values() for r in records)
+        assert tracker["max_in_flight"] == 2
+
+    @pytest.mark.asyncio
+    async def test_timed_out_dm_already_handed_to_discord_reports_real_outcome(
+        self, service, sample_event
+    ):
+        """A DM the queue can no longer withdraw is awaited instead of marked failed."""
+        prefs = MockUserNetworkPrefs(
+            email_enabled=False, discord_enabled=True, discord_user_id="123"
+        )
+        tracker = {"in_flight": 0, "max_in_flight": 0}
+        limits = DispatchLimits(
+            email=asyncio.Semaphore(1), discord=asyncio.Semaphore(1), user_timeout=0.05
+        )
+
+        with (
+            patch("app.services.notification_dispatch.is_discord_configured", return_value=True),
+            patch(
+                "app.services.discord_service.send_discord_dm",
+                new=self._stub_channel(NotificationChannel.DISCORD, 0.15, tracker),
+            ),
+            patch("app.services.notification_dispatch.discord_delivery_queue") as mock_queue,
+        ):
+            mock_queue.is_running = True
+            mock_queue.withdraw.return_value = False
+            records = await service._dispatch_notifications_for_user(
+                prefs=prefs,
+                user_email=None,
+                network_id="test-network",
+                event=sample_event,
+                limits=limits,
+            )
+
+        mock_queue.withdraw.assert_called_once()
+        assert len(records) == 1
+        assert records[0].success is True
+
+    @pytest.mark.asyncio
+    async def test_channel_exception_becomes_failed_record(self, service, sample_event):
+        """An exception from one channel does not affect the other channel."""
+        prefs = MockUserNetworkPrefs(
+            email_enabled=True, discord_enabled=True, discord_user_id="123"
+        )
+        email_record = NotificationRecord(
+            notification_id="n1",
+            event_id=sample_event.event_id,
+            channel=NotificationChannel.EMAIL,
+            title="t",
+            message="m",
+            priority=NotificationPriority.HIGH,
+            success=True,
+        )
+
+        with (
+            patch("app.services.notification_dispatch.is_email_configured", return_value=True),
+            patch("app.services.notification_dispatch.is_discord_configured", return_value=True),
+            patch(
+                "app.services.notification_dispatch.send_notification_email",
+                new_callable=AsyncMock,
+                return_value=email_record,
+            ),
+            patch(
+                "app.services.discord_service.send_discord_dm",
+                new_callable=AsyncMock,
+                side_effect=RuntimeError("gateway closed"),
+            ),
+        ):
+            records = await service._dispatch_notifications_for_user(
+                prefs=prefs,
+                user_email="user@example.com",
+                network_id="test-network",
+                event=sample_event,
+            )
+
+        assert records[0].success is True
+        assert records[1].success is False
+        assert records[1].error_message == "gateway closed"
+        assert records[1].network_id == "test-network"
@@ -0,0 +1,294 @@
+"""
+Unit tests for the database-backed notification history.
+
+Uses the in-memory store so no database is needed; the SQL the real store
+emits is checked by compiling it against the PostgreSQL dialect.
+"""
+
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.models import NotificationChannel, NotificationPriority, NotificationRecord
+from app.services.notification_history import (
+    InMemoryHistoryStore,
+    InvalidCursorError,
+    NotificationHistory,
+    SqlHistoryStore,
+    decode_cursor,
+    encode_cursor,
+)
+
+
+def _record(i=0, network_id="network-1", channel=NotificationChannel.EMAIL, success=True, at=None):
+    return NotificationRecord(
+        notification_id=f"n-{i}",
+        event_id=f"e-{i}",
+        network_id=network_id,
+        channel=channel,
+        timestamp=at or datetime.utcnow() - timedelta(seconds=1000 - i),
+        success=success,
+        title=f"Alert {i}",
+        message="Device offline",
+        priority=NotificationPriority.HIGH,
+    )
+
+
+@pytest.fixture
+def store():
+    return InMemoryHistoryStore()
+
+
+@pytest.fixture
+def history(store):
+    return NotificationHistory(store=store)
+
+
+class TestBatchedWrites:
+    """Tests for buffering and batch flushing"""
+
+    async def test_add_buffers_without_writing(self, history, store):
+        """Recording should not touch the store"""
+        history.add(_record())
+
+        assert store.entries == []
+        assert history.get_status()["buffered"] == 1
+
+    async def test_flush_writes_one_batch(self, history, store):
+        """A flush should write at most one batch"""
+        for i in range(5):
+            history.add(_record(i), user_id="user-1")
+
+        with patch("app.services.notification_history.settings.history_batch_size", 3):
+            assert await history.flush() == 3
+            assert await history.flush() == 2
+            assert await history.flush() == 0
+
+        assert [e.notification_id for e in store.entries] == [f"n-{i}" for i in range(5)]
+        assert store.entries[0].user_id == "user-1"
+        assert store.entries[0].created_at.tzinfo is not None
+
+    async def test_failed_flush_keeps_batch(self, history, store):
+        """Rows from a failed write should be retried on the next flush"""
+        history.add(_record())
+        store.insert_many = AsyncMock(side_effect=ConnectionError("db down"))
+
+        with pytest.raises(ConnectionError):
+            await history.flush()
+
+        assert history.get_status()["buffered"] == 1
+
+    def test_buffer_is_bounded(self, history):
+        """The oldest buffered rows should be dropped past the cap"""
+        with patch("app.services.notification_history.settings.history_batch_size", 1):
+            for i in range(25):
+                history.add(_record(i))
+
+        status = history.get_status()
+        assert status["buffered"] == 20
+        assert status["dropped"] == 5
+
+    async def test_stop_flushes_buffer(self, history, store):
+        """Stopping should write out everything still buffered"""
+        await history.start()
+        history.add(_record())
+
+        await history.stop()
+
+        assert len(store.entries) == 1
+        assert history.is_running is False
+
+
+class TestUnwrittenRowsInQueries:
+    """Tests for merging buffered and in-flight rows into query results"""
+
+    async def test_query_reads_buffer_without_flushing(self, history, store):
+        """Buffered rows should be returned without the read writing them"""
+        history.add(_record(1), user_id="user-1")
+        history.add(_record(2), user_id="user-2")
+
+        page = await history.query(user_id="user-1")
+
+        assert [r.notification_id for r in page.notifications] == ["n-1"]
+        assert store.entries == []
+        assert history.get_status()["buffered"] == 2
+
+    async def test_rows_being_written_stay_visible(self, history, store):
+        """A query during a flush should see the in-flight batch exactly once"""
+        for i in range(3):
+            history.add(_record(i))
+        insert_many = store.insert_many
+        pages = []
+
+        async def insert_then_query(rows):
+            pages.append(await history.query())
+            await insert_many(rows)
+            pages.append(await history.query())
+
+        store.insert_many = insert_then_query
+        with patch("app.services.notification_history.settings.history_batch_size", 2):
+            await history.flush()
+
+        for page in pages:
+            assert [r.notification_id for r in page.notifications] == ["n-2", "n-1", "n-0"]
+
+
+class TestCursorPagination:
+    """Tests for keyset pagination and filters"""
+
+    async def test_pages_walk_newest_first_without_overlap(self, history):
+        """Following next_cursor should visit every row exactly once"""
+        for i in range(7):
+            history.add(_record(i))
+
+        seen, cursor = [], None
+        while True:
+            page = await history.query(network_id="network-1", per_page=3, cursor=cursor)
+            seen.extend(r.notification_id for r in page.notifications)
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+
+        assert seen == [f"n-{i}" for i in reversed(range(7))]
+
+    async def test_same_timestamp_rows_are_not_skipped(self, history):
+        """Rows sharing created_at should be separated by the id tiebreak"""
+        at = datetime.utcnow()
+        for i in range(4):
+            history.add(_record(i, at=at))
+
+        first = await history.query(per_page=2)
+        second = await history.query(per_page=2, cursor=first.next_cursor)
+
+        ids = {r.notification_id for r in first.notifications + second.notifications}
+        assert ids == {"n-0", "n-1", "n-2", "n-3"}
+        assert second.next_cursor is None
+
+    async def test_filters(self, history):
+        """Network, user, channel, success and time filters should combine"""
+        history.add(_record(1, network_id="a"), user_id="u1")
+        history.add(_record(2, network_id="a", channel=NotificationChannel.DISCORD))
+        history.add(_record(3, network_id="a", success=False))
+        history.add(_record(4, network_id="b"), user_id="u1")
+
+        by_channel = await history.query(network_id="a", channel=NotificationChannel.DISCORD)
+        failed = await history.query(network_id="a", success=False)
+        by_user = await history.query(user_id="u1")
+        recent = await history.query(since=datetime.utcnow() - timedelta(seconds=997.5))
+
+        assert [r.notification_id for r in by_channel.notifications] == ["n-2"]
+        assert [r.notification_id for r in failed.notifications] == ["n-3"]
+        assert [r.notification_id for r in by_user.notifications] == ["n-4", "n-1"]
+        assert [r.notification_id for r in recent.notifications] == ["n-4", "n-3"]
+
+    async def test_shared_send_is_one_row_listed_for_each_member(self, history, store):
+        """A member send should be one network row, found by each member's user query"""
+        history.add(_record(1), recipient_ids=["u1", "u2"])
+
+        buffered = await history.query(user_id="u2")
+        await history.flush()
+        by_network = await history.query(network_id="network-1")
+        by_member = await history.query(user_id="u1")
+        other = await history.query(user_id="u3")
+
+        assert [r.notification_id for r in buffered.notifications] == ["n-1"]
+        assert len(store.entries) == 1
+        assert store.recipients == {store.entries[0].id: {"u1", "u2"}}
+        assert [r.notification_id for r in by_network.notifications] == ["n-1"]
+        assert [r.notification_id for r in by_member.notifications] == ["n-1"]
+        assert other.notifications == []
+
+    async def test_sql_query_matches_shared_sends_for_a_user(self):
+        """A user filter should also match rows listing the user as a recipient"""
+        captured = {}
+
+        class _Session:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            async def execute(self, stmt):
+                captured["sql"] = str(stmt.compile(dialect=postgresql.dialect()))
+                raise RuntimeError("stop")
+
+        with pytest.raises(RuntimeError):
+            await SqlHistoryStore(session_maker=_Session).query(limit=51, user_id="u1")
+
+        assert "notification_history_recipients.user_id" in captured["sql"]
+
+    def test_cursor_round_trip(self):
+        created_at = datetime(2026, 1, 2, 3, 4, 5, 678, tzinfo=timezone.utc)
+
+        assert decode_cursor(encode_cursor(created_at, "abc")) == (created_at, "abc")
+        with pytest.raises(InvalidCursorError):
+            decode_cursor("not-a-cursor")
+
+    async def test_sql_query_uses_keyset_predicate(self):
+        """The SQL store should seek by (created_at, id), not OFFSET"""
+        captured = {}
+
+        class _Session:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            async def execute(self, stmt):
+                captured["sql"] = str(stmt.compile(dialect=postgresql.dialect()))
+                raise RuntimeError("stop")
+
+        store = SqlHistoryStore(session_maker=_Session)
+        after = (datetime.now(timezone.utc), "00000000-0000-0000-0000-000000000000")
+
+        with pytest.raises(RuntimeError):
+            await store.query(limit=51, network_id="n", after=after)
+
+        sql = captured["sql"]
+        assert "(notification_history.created_at, notification_history.id) <" in sql
+        assert "ORDER BY notification_history.created_at DESC, notification_history.id DESC" in sql
+        assert "OFFSET" not in sql
+
+
+class TestRetention:
+    """Tests for batched retention deletes"""
+
+    async def test_deletes_expired_rows_in_batches(self, history, store):
+        old = datetime.utcnow() - timedelta(days=100)
+        for i in range(5):
+            history.add(_record(i, at=old))
+        history.add(_record(9))
+        await history.flush()
+
+        with (
+            patch("app.services.notification_history.settings.history_retention_days", 90),
+            patch("app.services.notification_history.settings.history_retention_batch_size", 2),
+        ):
+            deleted = await history.enforce_retention()
+
+        assert deleted == 5
+        assert [e.notification_id for e in store.entries] == ["n-9"]
+        assert history.get_status()["expired"] == 5
+
+    async def test_expired_rows_drop_their_recipients(self, history, store):
+        history.add(_record(1, at=datetime.utcnow() - timedelta(days=100)), recipient_ids=["u1"])
+        await history.flush()
+
+        with patch("app.services.notification_history.settings.history_retention_days", 90):
+            assert await history.enforce_retention() == 1
+
+        assert store.entries == []
+        assert store.recipients == {}
+
+    async def test_retention_disabled(self, history, store):
+        history.add(_record(at=datetime.utcnow() - timedelta(days=1000)))
+        await history.flush()
+
+        with patch("app.services.notification_history.settings.history_retention_days", 0):
+            assert await history.enforce_retention() == 0
+
+        assert len(store.entries) == 1
@@ -2,6 +2,7 @@
 Unit tests for NotificationManager service.
 """
 
+import json
 from datetime import datetime, timedelta
 from unittest.mock import AsyncMock, MagicMock, patch
 
@@ -206,35 +207,32 @@ class TestSilencedDevices:
 class TestRateLimiting:
     """Tests for rate limiting"""
 
-    def test_check_rate_limit_allowed(self, notification_manager_instance):
+    async def test_acquire_rate_limit_allowed(self, notification_manager_instance):
         """Should allow when under rate limit"""
         prefs = NotificationPreferences(network_id="test-network", max_notifications_per_hour=10)
 
-        result = notification_manager_instance._check_rate_limit("test-network", prefs)
+        result = await notification_manager_instance._acquire_rate_limit(prefs)
 
         assert result is True
 
-    def test_check_rate_limit_exceeded(self, notification_manager_instance):
-        """Should block when over rate limit"""
+    async def test_acquire_rate_limit_exceeded(self, notification_manager_instance):
+        """Should block once the hourly limit and burst are used up"""
         prefs = NotificationPreferences(network_id="test-network", max_notifications_per_hour=2)
 
-        # Fill up rate limit
-        from collections import deque
+        with patch("app.services.rate_limiter.settings.rate_limit_network_burst", 1):
+            results = [
+                await notification_manager_instance._acquire_rate_limit(prefs) for _ in range(4)
+            ]
 
-        notification_manager_instance._rate_limits["test-network"] = deque(
-            [datetime.utcnow() for _ in range(3)], maxlen=10
-        )
-
-        result = notification_manager_instance._check_rate_limit("test-network", prefs)
+        assert results == [True, True, True, False]
 
-        assert result is False
+    def test_rate_limits_include_owner(self, notification_manager_instance):
+        """Owned networks should also draw from the owner's bucket"""
+        prefs = NotificationPreferences(network_id="test-network", owner_user_id="user-1")
 
-    def test_record_rate_limit(self, notification_manager_instance):
-        """Should record notification for rate limiting"""
-        notification_manager_instance._record_rate_limit("test-network")
+        keys = [limit.key for limit in notification_manager_instance._rate_limits_for(prefs)]
 
-        assert "test-network" in notification_manager_instance._rate_limits
-        assert len(notification_manager_instance._rate_limits["test-network"]) == 1
+        assert keys == ["network:test-network", "user:user-1"]
 
 
 class TestQuietHours:
@@ -707,7 +705,7 @@ class TestSendNotification:
             AsyncMock(return_value=mock_record),
         ):
             with patch("app.services.notification_manager.is_email_configured", return_value=True):
-                with patch.object(notification_manager_instance, "_save_history"):
+                with patch("app.services.notification_manager.notification_history"):
                     records = await notification_manager_instance.send_notification(
                         "test-network", sample_network_event, force=True
                     )
@@ -745,7 +743,7 @@ class TestSendNotification:
             AsyncMock(return_value=mock_record),
         ):
             with patch("app.services.notification_manager.is_email_configured", return_value=True):
-                with patch.object(notification_manager_instance, "_save_history"):
+                with patch("app.services.notification_manager.notification_history"):
                     results = await notification_manager_instance.broadcast_notification(
                         sample_network_event
                     )
@@ -784,9 +782,9 @@ class TestTestNotification:
 class TestHistoryAndStats:
     """Tests for history and statistics"""
 
-    def test_get_history(self, notification_manager_instance):
-        """Should return history"""
-        notification_manager_instance._history.append(
+    async def test_get_history(self, notification_manager_instance, history_store):
+        """Should return recorded history from the history store"""
+        notification_manager_instance._record_history(
             NotificationRecord(
                 notification_id="1",
                 event_id="1",
@@ -799,13 +797,15 @@ class TestHistoryAndStats:
             )
         )
 
-        result = notification_manager_instance.get_history(network_id="test-network")
+        result = await notification_manager_instance.get_history(network_id="test-network")
 
         assert result.total_count == 1
+        assert result.next_cursor is None
+        assert len(notification_manager_instance._history) == 1
 
-    def test_get_stats(self, notification_manager_instance):
-        """Should return stats"""
-        notification_manager_instance._history.append(
+    async def test_get_stats(self, notification_manager_instance, history_store, stats_store):
+        """Should return stats from the stats buckets"""
+        notification_manager_instance._record_history(
             NotificationRecord(
                 notification_id="1",
                 event_id="1",
@@ -819,9 +819,11 @@ class TestHistoryAndStats:
             )
         )
 
-        stats = notification_manager_instance.get_stats(network_id="test-network")
+        stats = await notification_manager_instance.get_stats(network_id="test-network")
 
         assert stats.total_sent_24h == 1
+        assert stats.by_channel == {"email": 1}
+        assert stats.by_priority == {"high": 1}
 
 
 class TestScheduledBroadcasts:
@@ -1059,19 +1061,24 @@ class TestGlobalPreferences:
 class TestPersistence:
     """Tests for data persistence"""
 
-    def test_save_preferences_creates_directory(self, notification_manager_instance, tmp_path):
-        """Should create data directory if not exists"""
-        with patch(
-            "app.services.notification_manager.settings.notification_data_dir",
-            str(tmp_path / "new_dir"),
-        ):
-            with patch(
-                "app.services.notification_manager.PREFERENCES_FILE",
-                tmp_path / "new_dir" / "prefs.json",
-            ):
-                notification_manager_instance._save_preferences()
+    async def test_save_preferences_writes_one_network(self):
+        """Should write only the changed network's preferences"""
+        from app.services.notification_manager import NotificationManager
+        from app.services.state_store import (
+            NETWORK_PREFERENCES,
+            InMemoryStateStore,
+            StateRepository,
+        )
+
+        state = StateRepository(InMemoryStateStore())
+        manager = NotificationManager(state=state)
+        manager.get_preferences("net-1")
+        manager.update_preferences("net-2", NotificationPreferencesUpdate(enabled=False))
+        manager.delete_preferences("net-1")
 
-        # No exception should be raised
+        stored = await state.load(NETWORK_PREFERENCES)
+        assert list(stored) == ["net-2"]
+        assert stored["net-2"]["enabled"] is False
 
     def test_load_preferences_missing_file(self, notification_manager_instance, tmp_path):
         """Should handle missing preferences file"""
@@ -1083,26 +1090,33 @@ class TestPersistence:
 
         assert len(notification_manager_instance._preferences) == 0
 
-    def test_save_and_load_history(self, notification_manager_instance, tmp_path):
-        """Should save and load history correctly"""
-        notification_manager_instance._history.append(
-            NotificationRecord(
-                notification_id="1",
-                event_id="1",
-                network_id="test",
-                channel=NotificationChannel.EMAIL,
-                success=True,
-                title="Test",
-                message="Test",
-                priority=NotificationPriority.HIGH,
+    async def test_import_legacy_history(
+        self, notification_manager_instance, history_store, tmp_path
+    ):
+        """Should import the legacy JSON history file once and rename it"""
+        history_file = tmp_path / "notification_history.json"
+        history_file.write_text(
+            json.dumps(
+                [
+                    NotificationRecord(
+                        notification_id="1",
+                        event_id="1",
+                        network_id="test",
+                        channel=NotificationChannel.EMAIL,
+                        success=True,
+                        title="Test",
+                        message="Test",
+                        priority=NotificationPriority.HIGH,
+                    ).model_dump(mode="json")
+                ]
             )
         )
 
-        with patch(
-            "app.services.notification_manager.settings.notification_data_dir", str(tmp_path)
-        ):
-            with patch("app.services.notification_manager.HISTORY_FILE", tmp_path / "history.json"):
-                notification_manager_instance._save_history()
+        with patch("app.services.notification_manager.HISTORY_FILE", history_file):
+            notification_manager_instance._load_history()
+            assert await notification_manager_instance.import_legacy_history() == 1
+            assert await notification_manager_instance.import_legacy_history() == 0
 
-        # Verify file was created
-        assert (tmp_path / "history.json").exists()
+        assert [e.notification_id for e in history_store.entries] == ["1"]
+        assert not history_file.exists()
+        assert (tmp_path / "notification_history.json.imported").exists()
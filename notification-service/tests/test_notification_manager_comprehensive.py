@@ -29,6 +29,20 @@ from app.models import (
     ScheduledBroadcastUpdate,
     TestNotificationRequest,
 )
+from app.services.notification_manager import NotificationManager
+from app.services.state_store import (
+    GLOBAL_PREFERENCES,
+    NETWORK_PREFERENCES,
+    SCHEDULED_BROADCASTS,
+    SILENCED_DEVICES,
+    InMemoryStateStore,
+    StateRepository,
+)
+
+
+@pytest.fixture
+def state():
+    return StateRepository(InMemoryStateStore())
 
 
 class TestPersistenceLoad:
@@ -235,57 +249,42 @@ class TestPersistenceLoad:
 class TestPersistenceSave:
     """Tests for saving persisted data"""
 
-    def test_save_preferences_error_handling(self, notification_manager_instance, tmp_path):
-        """Should handle save errors gracefully"""
-        # Create a read-only directory
-        read_only_dir = tmp_path / "readonly"
-        read_only_dir.mkdir()
+    async def test_save_preferences_deletes_removed_network(self, state):
+        """Should turn a removed network into a delete of its key"""
+        manager = NotificationManager(state=state)
+        manager._preferences["test"] = NotificationPreferences(network_id="test")
+        manager._save_preferences("test")
+        await state.flush_all()
 
-        notification_manager_instance._preferences["test"] = NotificationPreferences(
-            network_id="test"
-        )
+        del manager._preferences["test"]
+        manager._save_preferences("test")
+        await state.flush_all()
 
-        with patch(
-            "app.services.notification_manager.settings.notification_data_dir", str(read_only_dir)
-        ):
-            with patch(
-                "app.services.notification_manager.PREFERENCES_FILE",
-                read_only_dir / "readonly_dir" / "prefs.json",
-            ):
-                with patch("app.services.notification_manager.logger.error") as mock_error:
-                    # Force an error by making directory creation fail
-                    with patch("pathlib.Path.mkdir", side_effect=PermissionError("Access denied")):
-                        notification_manager_instance._save_preferences()
-                        mock_error.assert_called()
-
-    def test_save_history_error_handling(self, notification_manager_instance, tmp_path):
-        """Should handle history save errors gracefully"""
-        notification_manager_instance._history.append(
-            NotificationRecord(
-                notification_id="1",
-                event_id="1",
-                network_id="test",
-                channel=NotificationChannel.EMAIL,
-                success=True,
-                title="Test",
-                message="Test",
-                priority=NotificationPriority.HIGH,
-            )
-        )
+        assert await state.load(NETWORK_PREFERENCES) == {}
+        assert state.get_status()["deleted"] == 1
 
-        with patch(
-            "app.services.notification_manager.settings.notification_data_dir", str(tmp_path)
-        ):
-            with patch("builtins.open", side_effect=IOError("Write failed")):
-                with patch("app.services.notification_manager.logger.error") as mock_error:
-                    notification_manager_instance._save_history()
-                    mock_error.assert_called()
-
-    def test_save_scheduled_broadcasts_error_handling(
+    async def test_import_legacy_history_error_keeps_file(
         self, notification_manager_instance, tmp_path
     ):
-        """Should handle scheduled broadcast save errors"""
-        notification_manager_instance._scheduled_broadcasts["test-id"] = ScheduledBroadcast(
+        """Should keep the legacy history file when the import fails"""
+        history_file = tmp_path / "notification_history.json"
+        history_file.write_text("[]")
+
+        with (
+            patch("app.services.notification_manager.HISTORY_FILE", history_file),
+            patch("app.services.notification_manager.notification_history") as mock_history,
+            patch("app.services.notification_manager.logger.error") as mock_error,
+        ):
+            mock_history.import_records = AsyncMock(side_effect=IOError("Database down"))
+            assert await notification_manager_instance.import_legacy_history() == 0
+            mock_error.assert_called()
+
+        assert history_file.exists()
+
+    async def test_save_scheduled_broadcasts_writes_one_key(self, state):
+        """Should write each scheduled broadcast under its own key"""
+        manager = NotificationManager(state=state)
+        manager._scheduled_broadcasts["test-id"] = ScheduledBroadcast(
             id="test-id",
             title="Test",
             message="Test",
@@ -293,40 +292,36 @@ class TestPersistenceSave:
             scheduled_at=datetime.utcnow(),
             created_by="admin",
         )
+        manager._save_scheduled_broadcasts("test-id")
+
+        stored = await state.load(SCHEDULED_BROADCASTS)
+        assert stored["test-id"]["title"] == "Test"
+
+    async def test_set_silenced_devices_writes_only_changes(self, state):
+        """Should write only devices whose silenced flag changed"""
+        manager = NotificationManager(state=state)
+        manager.set_silenced_devices(["192.168.1.1", "192.168.1.2"])
+        await state.flush_all()
+
+        manager.set_silenced_devices(["192.168.1.2", "192.168.1.3"])
+        await state.flush_all()
+
+        assert set(await state.load(SILENCED_DEVICES)) == {"192.168.1.2", "192.168.1.3"}
+        assert state.get_status()["written"] == 3
+        assert state.get_status()["deleted"] == 1
+
+    async def test_repeated_global_preference_updates_coalesce(self, state):
+        """Should write a user's global preferences once per flush however often they change"""
+        manager = NotificationManager(state=state)
+        for enabled in (True, False, True):
+            manager.update_global_preferences(
+                "user1", GlobalUserPreferencesUpdate(cartographer_up_enabled=enabled)
+            )
+        await state.flush_all()
 
-        with patch(
-            "app.services.notification_manager.settings.notification_data_dir", str(tmp_path)
-        ):
-            with patch("builtins.open", side_effect=IOError("Write failed")):
-                with patch("app.services.notification_manager.logger.error") as mock_error:
-                    notification_manager_instance._save_scheduled_broadcasts()
-                    mock_error.assert_called()
-
-    def test_save_silenced_devices_error_handling(self, notification_manager_instance, tmp_path):
-        """Should handle silenced devices save errors"""
-        notification_manager_instance._silenced_devices.add("192.168.1.1")
-
-        with patch(
-            "app.services.notification_manager.settings.notification_data_dir", str(tmp_path)
-        ):
-            with patch("builtins.open", side_effect=IOError("Write failed")):
-                with patch("app.services.notification_manager.logger.error") as mock_error:
-                    notification_manager_instance._save_silenced_devices()
-                    mock_error.assert_called()
-
-    def test_save_global_preferences_error_handling(self, notification_manager_instance, tmp_path):
-        """Should handle global preferences save errors"""
-        notification_manager_instance._global_preferences["user1"] = GlobalUserPreferences(
-            user_id="user1"
-        )
-
-        with patch(
-            "app.services.notification_manager.settings.notification_data_dir", str(tmp_path)
-        ):
-            with patch("builtins.open", side_effect=IOError("Write failed")):
-                with patch("app.services.notification_manager.logger.error") as mock_error:
-                    notification_manager_instance._save_global_preferences()
-                    mock_error.assert_called()
+        assert state.get_status()["written"] == 1
+        stored = await state.load(GLOBAL_PREFERENCES)
+        assert stored["user1"]["cartographer_up_enabled"] is True
 
 
 class TestGlobalPreferencesMigration:
@@ -599,7 +594,7 @@ class TestNotificationSending:
         )
 
         with patch("app.services.notification_manager.is_email_configured", return_value=False):
-            with patch.object(notification_manager_instance, "_save_history"):
+            with patch("app.services.notification_manager.notification_history"):
                 records = await notification_manager_instance.send_notification_to_network(
                     "test-network", event, force=True
                 )
@@ -640,7 +635,7 @@ class TestNotificationSending:
             new_callable=AsyncMock,
             return_value=mock_record,
         ):
-            with patch.object(notification_manager_instance, "_save_history"):
+            with patch("app.services.notification_manager.notification_history"):
                 records = await notification_manager_instance.send_notification_to_network(
                     "test-network", event, force=True
                 )
@@ -682,7 +677,10 @@ class TestNotificationSending:
                 new_callable=AsyncMock,
                 return_value=mock_record,
             ):
-                with patch.object(notification_manager_instance, "_save_history"):
+                with (
+                    patch("app.services.notification_manager.notification_history") as history,
+                    patch("app.services.notification_manager.notification_stats") as stats,
+                ):
                     results = (
                         await notification_manager_instance.send_notification_to_network_members(
                             "test-network", ["user1", "user2"], event, force=True
@@ -692,6 +690,10 @@ class TestNotificationSending:
         assert "user1" in results
         assert "user2" in results
         assert all(r[0].success for r in results.values())
+        # One history row for the one send, listing both members
+        history.add.assert_called_once()
+        assert history.add.call_args.kwargs["recipient_ids"] == ["user1", "user2"]
+        stats.record.assert_called_once()
 
     @pytest.mark.asyncio
     async def test_send_notification_to_network_members_email_exception(
@@ -717,7 +719,7 @@ class TestNotificationSending:
                 new_callable=AsyncMock,
                 side_effect=Exception("Send failed"),
             ):
-                with patch.object(notification_manager_instance, "_save_history"):
+                with patch("app.services.notification_manager.notification_history"):
                     results = (
                         await notification_manager_instance.send_notification_to_network_members(
                             "test-network", ["user1"], event, force=True
@@ -750,7 +752,7 @@ class TestNotificationSending:
             new_callable=AsyncMock,
             side_effect=Exception("Discord failed"),
         ):
-            with patch.object(notification_manager_instance, "_save_history"):
+            with patch("app.services.notification_manager.notification_history"):
                 results = await notification_manager_instance.send_notification_to_network_members(
                     "test-network", ["user1"], event, force=True
                 )
@@ -800,7 +802,7 @@ class TestBroadcastNotification:
                 new_callable=AsyncMock,
                 return_value=mock_record,
             ):
-                with patch.object(notification_manager_instance, "_save_history"):
+                with patch("app.services.notification_manager.notification_history"):
                     results = await notification_manager_instance.broadcast_notification(event)
 
         assert len(results) == 2
@@ -957,11 +959,9 @@ class TestShouldNotifyAdvanced:
 class TestHistoryAndStatsAdvanced:
     """Advanced tests for history and statistics"""
 
-    def test_get_history_all_networks(self, notification_manager_instance):
+    async def test_get_history_all_networks(self, notification_manager_instance, history_store):
         """Should return history for all networks when no filter"""
-        notification_manager_instance._history.clear()
-
-        notification_manager_instance._history.append(
+        notification_manager_instance._record_history(
             NotificationRecord(
                 notification_id="1",
                 event_id="1",
@@ -973,7 +973,7 @@ class TestHistoryAndStatsAdvanced:
                 priority=NotificationPriority.HIGH,
             )
         )
-        notification_manager_instance._history.append(
+        notification_manager_instance._record_history(
             NotificationRecord(
                 notification_id="2",
                 event_id="2",
@@ -986,16 +986,17 @@ class TestHistoryAndStatsAdvanced:
             )
         )
 
-        result = notification_manager_instance.get_history()
+        result = await notification_manager_instance.get_history()
 
-        assert result.total_count >= 2
+        assert result.total_count == 2
 
-    def test_get_stats_with_failures(self, notification_manager_instance):
+    async def test_get_stats_with_failures(
+        self, notification_manager_instance, history_store, stats_store
+    ):
         """Should correctly count stats"""
         now = datetime.utcnow()
-        notification_manager_instance._history.clear()
 
-        notification_manager_instance._history.append(
+        notification_manager_instance._record_history(
             NotificationRecord(
                 notification_id="1",
                 event_id="1",
@@ -1008,7 +1009,7 @@ class TestHistoryAndStatsAdvanced:
                 timestamp=now,
             )
         )
-        notification_manager_instance._history.append(
+        notification_manager_instance._record_history(
             NotificationRecord(
                 notification_id="2",
                 event_id="2",
@@ -1020,11 +1021,14 @@ class TestHistoryAndStatsAdvanced:
                 priority=NotificationPriority.HIGH,
                 timestamp=now,
                 error_message="Failed",
-            )
+            ),
+            event_type=NotificationType.ANOMALY_DETECTED,
         )
 
-        stats = notification_manager_instance.get_stats(network_id="test")
+        stats = await notification_manager_instance.get_stats(network_id="test")
 
-        # Check that stats has the expected attributes
-        assert stats.total_sent_24h >= 0
-        assert stats.total_sent_7d >= 0
+        assert stats.total_sent_24h == 2
+        assert stats.total_sent_7d == 2
+        assert stats.success_rate == 0.5
+        assert stats.by_type == {"anomaly_detected": 1}
+        assert stats.anomalies_detected_24h == 1
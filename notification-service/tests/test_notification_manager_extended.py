@@ -54,7 +54,6 @@ def fresh_notification_manager():
     manager._preferences.clear()
     manager._global_preferences.clear()
     manager._history.clear()
-    manager._rate_limits.clear()
     manager._scheduled_broadcasts.clear()
     manager._silenced_devices.clear()
 
@@ -196,6 +195,80 @@ class TestScheduledBroadcastProcessing:
             await manager._process_due_broadcasts()
             mock_send.assert_called_once()
 
+    @pytest.mark.asyncio
+    async def test_process_due_broadcasts_in_send_time_order(self, fresh_notification_manager):
+        """Due broadcasts are sent earliest first; cancelled and future ones are not."""
+        manager = fresh_notification_manager
+        now = datetime.utcnow()
+        ids = {}
+        for title, offset in [("later", -1), ("future", 60), ("cancelled", -3), ("first", -2)]:
+            ids[title] = manager.create_scheduled_broadcast(
+                title=title,
+                message="m",
+                scheduled_at=now + timedelta(minutes=offset),
+                created_by="testuser",
+                network_id="test-network-id",
+            ).id
+        manager.cancel_scheduled_broadcast(ids["cancelled"])
+
+        with patch.object(
+            manager, "_send_scheduled_broadcast", new_callable=AsyncMock
+        ) as mock_send:
+            await manager._process_due_broadcasts()
+
+        assert [c.args[0] for c in mock_send.call_args_list] == [ids["first"], ids["later"]]
+        assert manager._next_due_broadcast()[1] == ids["future"]
+
+    @pytest.mark.asyncio
+    async def test_rescheduled_broadcast_uses_new_time(self, fresh_notification_manager):
+        """Moving a broadcast later leaves its old heap entry stale."""
+        manager = fresh_notification_manager
+        broadcast = manager.create_scheduled_broadcast(
+            title="Moved",
+            message="m",
+            scheduled_at=datetime.utcnow() - timedelta(minutes=1),
+            created_by="testuser",
+            network_id="test-network-id",
+        )
+        later = datetime.utcnow() + timedelta(hours=1)
+        manager.update_scheduled_broadcast(
+            broadcast.id, ScheduledBroadcastUpdate(scheduled_at=later)
+        )
+
+        with patch.object(
+            manager, "_send_scheduled_broadcast", new_callable=AsyncMock
+        ) as mock_send:
+            await manager._process_due_broadcasts()
+
+        mock_send.assert_not_called()
+        assert manager._next_due_broadcast() == (later, broadcast.id)
+
+    @pytest.mark.asyncio
+    async def test_scheduler_wakes_for_new_earliest_broadcast(self, fresh_notification_manager):
+        """The scheduler sleeps until the next send time instead of polling."""
+        manager = fresh_notification_manager
+        sent = asyncio.Event()
+
+        with patch.object(
+            manager, "_send_scheduled_broadcast", new_callable=AsyncMock
+        ) as mock_send:
+            mock_send.side_effect = lambda broadcast_id: sent.set()
+            await manager.start_scheduler()
+            try:
+                await asyncio.sleep(0)
+                manager.create_scheduled_broadcast(
+                    title="Soon",
+                    message="m",
+                    scheduled_at=datetime.utcnow() + timedelta(milliseconds=50),
+                    created_by="testuser",
+                    network_id="test-network-id",
+                )
+                await asyncio.wait_for(sent.wait(), timeout=2)
+            finally:
+                await manager.stop_scheduler()
+
+        mock_send.assert_called_once()
+
 
 class TestSendScheduledBroadcast:
     """Tests for sending scheduled broadcasts."""
@@ -874,10 +947,12 @@ class TestNotificationSending:
             enabled_notification_types=[NotificationType.DEVICE_OFFLINE],
         )
 
-        # Fill rate limit
-        from collections import deque
+        # Use up the network's bucket
+        from app.services.rate_limiter import network_rate_limit, rate_limiter
 
-        manager._rate_limits["test-network"] = deque([datetime.utcnow()])
+        limit = network_rate_limit("test-network", 1)
+        while (await rate_limiter.acquire(limit)).allowed:
+            pass
 
         event = NetworkEvent(
             event_type=NotificationType.DEVICE_OFFLINE,
@@ -1130,6 +1205,38 @@ class TestLoadScheduledBroadcasts:
         # Should skip broadcast without network_id
         assert "test-id" not in manager._scheduled_broadcasts
 
+    def test_load_fails_broadcast_interrupted_mid_send(self, fresh_notification_manager):
+        """A broadcast that had started sending is not sent again after a restart."""
+        manager = fresh_notification_manager
+
+        from app.config import settings
+        from app.services.notification_manager import SCHEDULED_FILE
+
+        settings.data_dir.mkdir(parents=True, exist_ok=True)
+
+        broadcasts = {}
+        for broadcast_id, started in [("interrupted", datetime.utcnow()), ("waiting", None)]:
+            broadcasts[broadcast_id] = ScheduledBroadcast(
+                id=broadcast_id,
+                title=broadcast_id,
+                message="m",
+                network_id="test-network-id",
+                scheduled_at=datetime.utcnow() - timedelta(minutes=1),
+                created_by="testuser",
+                dispatch_started_at=started,
+            ).model_dump(mode="json")
+
+        with open(SCHEDULED_FILE, "w") as f:
+            json.dump(broadcasts, f)
+
+        manager._scheduled_broadcasts.clear()
+        manager._load_scheduled_broadcasts()
+
+        interrupted = manager._scheduled_broadcasts["interrupted"]
+        assert interrupted.status == ScheduledBroadcastStatus.FAILED
+        assert manager._next_due_broadcast()[1] == "waiting"
+        SCHEDULED_FILE.unlink()
+
 
 class TestShouldNotifyPriorityLogic:
     """Tests for notification priority filtering logic."""
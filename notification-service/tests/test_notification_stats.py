@@ -0,0 +1,247 @@
+"""
+Unit tests for pre-aggregated notification statistics.
+
+Uses the in-memory stores and a fixed clock so bucket boundaries are
+deterministic.
+"""
+
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.models import (
+    NotificationChannel,
+    NotificationPriority,
+    NotificationRecord,
+    NotificationType,
+)
+from app.services.notification_history import InMemoryHistoryStore, NotificationHistory
+from app.services.notification_stats import InMemoryStatsStore, NotificationStats, plan_ranges
+
+NOW = datetime(2026, 3, 10, 12, 30, 15, tzinfo=timezone.utc)
+
+
+def _record(
+    at=NOW,
+    network_id="network-1",
+    channel=NotificationChannel.EMAIL,
+    priority=NotificationPriority.HIGH,
+    success=True,
+):
+    return NotificationRecord(
+        notification_id="n",
+        event_id="e",
+        network_id=network_id,
+        channel=channel,
+        timestamp=at,
+        success=success,
+        title="Alert",
+        message="Device offline",
+        priority=priority,
+    )
+
+
+@pytest.fixture
+def store():
+    return InMemoryStatsStore()
+
+
+@pytest.fixture
+def stats(store):
+    return NotificationStats(store=store, clock=lambda: NOW)
+
+
+class TestPlanRanges:
+    """Tests for covering a time range with buckets"""
+
+    def test_short_range_uses_minutes(self):
+        ranges, since, until = plan_ranges(NOW - timedelta(minutes=10), NOW, NOW)
+
+        assert ranges == [("minute", since, until)]
+        assert since == datetime(2026, 3, 10, 12, 20, tzinfo=timezone.utc)
+        assert until == datetime(2026, 3, 10, 12, 31, tzinfo=timezone.utc)
+
+    def test_multi_day_range_uses_days_in_the_middle(self):
+        ranges, _, _ = plan_ranges(datetime(2026, 3, 8, 22, 45, tzinfo=timezone.utc), NOW, NOW)
+
+        assert [r[0] for r in ranges] == ["minute", "hour", "day", "hour", "minute"]
+        day = ranges[2]
+        assert day[1:] == (
+            datetime(2026, 3, 9, tzinfo=timezone.utc),
+            datetime(2026, 3, 10, tzinfo=timezone.utc),
+        )
+        # Minute buckets only at the edges, so the bucket count stays small
+        assert ranges[0][1:] == (
+            datetime(2026, 3, 8, 22, 45, tzinfo=timezone.utc),
+            datetime(2026, 3, 8, 23, tzinfo=timezone.utc),
+        )
+
+    def test_old_ranges_widen_to_coarser_buckets(self):
+        with (
+            patch("app.services.notification_stats.settings.stats_minute_retention_hours", 48),
+            patch("app.services.notification_stats.settings.stats_hour_retention_days", 35),
+        ):
+            ranges, since, until = plan_ranges(
+                NOW - timedelta(days=60, minutes=7), NOW - timedelta(days=50, minutes=7), NOW
+            )
+
+        assert {r[0] for r in ranges} == {"day"}
+        assert since.hour == 0 and until.hour == 0
+
+    def test_empty_range(self):
+        assert plan_ranges(NOW, NOW - timedelta(hours=1), NOW)[0] == []
+
+
+class TestIncrementalStats:
+    """Tests for recording and querying"""
+
+    async def test_record_increments_every_granularity(self, stats, store):
+        stats.record(_record(), event_type=NotificationType.DEVICE_OFFLINE)
+        stats.record(_record(), event_type=NotificationType.DEVICE_OFFLINE)
+
+        assert store.buckets == {}
+        assert await stats.flush() == 3
+
+        assert sorted(k[1] for k in store.buckets) == ["day", "hour", "minute"]
+        assert set(store.buckets.values()) == {2}
+
+    async def test_query_breaks_down_dimensions(self, stats):
+        stats.record(_record(), event_type=NotificationType.DEVICE_OFFLINE)
+        stats.record(
+            _record(channel=NotificationChannel.DISCORD, success=False),
+            event_type=NotificationType.DEVICE_OFFLINE,
+        )
+        stats.record(
+            _record(priority=NotificationPriority.LOW, at=NOW - timedelta(days=3)),
+            event_type=NotificationType.DEVICE_ONLINE,
+        )
+        stats.record(_record(network_id="network-2"))
+
+        result = await stats.query("network-1", NOW - timedelta(days=7))
+
+        assert result.total == 3
+        assert result.failed == 1
+        assert result.by_channel == {"email": 2, "discord": 1}
+        assert result.by_priority == {"high": 2, "low": 1}
+        assert result.by_type == {"device_offline": 2, "device_online": 1}
+        assert result.success_rate == pytest.approx(2 / 3)
+
+    async def test_query_respects_range_bounds(self, stats):
+        stats.record(_record(at=NOW - timedelta(hours=30)))
+        stats.record(_record(at=NOW - timedelta(minutes=5)))
+
+        day = await stats.query("network-1", NOW - timedelta(days=1), NOW)
+        before = await stats.query("network-1", NOW - timedelta(days=2), NOW - timedelta(days=1))
+
+        assert day.total == 1
+        assert before.total == 1
+
+    async def test_summary_matches_legacy_shape(self, stats):
+        stats.record(_record(), event_type=NotificationType.ANOMALY_DETECTED)
+        stats.record(_record(at=NOW - timedelta(days=2)))
+
+        summary = await stats.get_summary("network-1")
+
+        assert summary.total_sent_24h == 1
+        assert summary.total_sent_7d == 2
+        assert summary.anomalies_detected_24h == 1
+
+    async def test_failed_flush_merges_back(self, stats, store):
+        stats.record(_record())
+        store.increment = AsyncMock(side_effect=ConnectionError("db down"))
+
+        with pytest.raises(ConnectionError):
+            await stats.flush()
+        stats.record(_record())
+
+        assert stats.get_status()["pending_buckets"] == 3
+        assert set(stats._pending.values()) == {2}
+
+
+class TestRetentionAndRebuild:
+    """Tests for bucket expiry and rebuilding from history"""
+
+    async def test_retention_keeps_day_buckets(self, stats, store):
+        stats.record(_record(at=NOW - timedelta(days=60)))
+        await stats.flush()
+
+        await stats.enforce_retention()
+
+        assert [k[1] for k in store.buckets] == ["day"]
+
+    async def test_rebuild_from_history(self):
+        history_store = InMemoryHistoryStore()
+        history = NotificationHistory(store=history_store)
+        for at in (NOW, NOW - timedelta(days=1), NOW - timedelta(days=3)):
+            history.add(_record(at=at), event_type=NotificationType.DEVICE_OFFLINE)
+        history.add(_record(network_id="network-2"))
+        await history.flush()
+
+        store = InMemoryStatsStore(history_store=history_store)
+        stats = NotificationStats(store=store, clock=lambda: NOW)
+        # A stale count that the rebuild should replace
+        stats.record(_record())
+        await stats.flush()
+
+        await stats.rebuild(network_id="network-1")
+
+        result = await stats.query("network-1", NOW - timedelta(days=7))
+        assert result.total == 3
+        assert result.by_type == {"device_offline": 3}
+        # Other networks are only touched by an unscoped rebuild
+        assert (await stats.query("network-2", NOW - timedelta(days=1))).total == 0
+        await stats.rebuild()
+        assert (await stats.query("network-2", NOW - timedelta(days=1))).total == 1
+
+    async def test_rebuild_matches_live_counts_after_member_send(self):
+        """A send shared by network members should count once, live and rebuilt"""
+        from app.services.notification_manager import NotificationManager
+
+        history_store = InMemoryHistoryStore()
+        history = NotificationHistory(store=history_store)
+        store = InMemoryStatsStore(history_store=history_store)
+        stats = NotificationStats(store=store, clock=lambda: NOW)
+        with (
+            patch("app.services.notification_manager.notification_history", history),
+            patch("app.services.notification_manager.notification_stats", stats),
+        ):
+            NotificationManager()._record_history(
+                _record(),
+                event_type=NotificationType.DEVICE_OFFLINE,
+                recipient_ids=["user-1", "user-2", "user-3"],
+            )
+        await history.flush()
+        await stats.flush()
+        live = await stats.query("network-1", NOW - timedelta(days=1))
+
+        await stats.rebuild(network_id="network-1")
+        rebuilt = await stats.query("network-1", NOW - timedelta(days=1))
+
+        assert live.total == 1
+        assert rebuilt.total == live.total
+        assert rebuilt.by_type == live.by_type
+
+    async def test_rebuild_since_keeps_older_buckets(self):
+        history_store = InMemoryHistoryStore()
+        store = InMemoryStatsStore(history_store=history_store)
+        stats = NotificationStats(store=store, clock=lambda: NOW)
+        stats.record(_record(at=NOW - timedelta(days=5)))
+        await stats.flush()
+
+        await stats.rebuild(since=NOW - timedelta(days=1))
+
+        assert (await stats.query("network-1", NOW - timedelta(days=7))).total == 1
+
+    def test_rebuild_command(self):
+        from app.commands.__main__ import main
+
+        with patch("app.commands.__main__.notification_stats") as mock_stats:
+            mock_stats.rebuild = AsyncMock(return_value=12)
+            code = main(["rebuild-stats", "--network-id", "network-1", "--since", "2026-01-01"])
+
+        assert code == 0
+        mock_stats.rebuild.assert_awaited_once_with(
+            network_id="network-1", since=datetime(2026, 1, 1)
+        )
+        assert main(["unknown"]) == 1
@@ -51,6 +51,7 @@ class TestPreferencesEndpoints:
     def test_get_preferences(self, test_client):
         """Should return network preferences"""
         with patch("app.routers.notifications.notification_manager") as mock_nm:
+            mock_nm.ensure_preferences_loaded = AsyncMock()
             default_prefs = NotificationPreferences(
                 network_id="network_uuid_123",
             )
@@ -68,6 +69,7 @@ class TestPreferencesEndpoints:
     def test_update_preferences(self, test_client):
         """Should update preferences"""
         with patch("app.routers.notifications.notification_manager") as mock_nm:
+            mock_nm.ensure_preferences_loaded = AsyncMock()
             updated_prefs = NotificationPreferences(
                 network_id="network_uuid_123",
             )
@@ -84,6 +86,7 @@ class TestPreferencesEndpoints:
     def test_delete_preferences(self, test_client):
         """Should delete preferences"""
         with patch("app.routers.notifications.notification_manager") as mock_nm:
+            mock_nm.ensure_preferences_loaded = AsyncMock()
             mock_nm.delete_preferences.return_value = True
 
             response = test_client.delete(
@@ -228,29 +231,64 @@ class TestHistoryEndpoints:
         with patch("app.routers.notifications.notification_manager") as mock_nm:
             from app.models import NotificationHistoryResponse
 
-            mock_nm.get_history.return_value = NotificationHistoryResponse(
-                notifications=[], total_count=0, page=1, per_page=50
+            mock_nm.get_history = AsyncMock(
+                return_value=NotificationHistoryResponse(
+                    notifications=[], total_count=0, per_page=50
+                )
             )
 
             response = test_client.get(
                 "/api/notifications/networks/network_uuid_123/history",
+                params={"channel": "email", "success": "false"},
                 headers={"X-User-Id": "user_123"},
             )
 
             assert response.status_code == 200
+            kwargs = mock_nm.get_history.call_args.kwargs
+            assert kwargs["network_id"] == "network_uuid_123"
+            assert kwargs["channel"] == NotificationChannel.EMAIL
+            assert kwargs["success"] is False
+
+    def test_get_user_history(self, test_client):
+        """Should scope history to the requesting user"""
+        with patch("app.routers.notifications.notification_manager") as mock_nm:
+            from app.models import NotificationHistoryResponse
+
+            mock_nm.get_history = AsyncMock(
+                return_value=NotificationHistoryResponse(notifications=[], total_count=0)
+            )
+
+            response = test_client.get(
+                "/api/notifications/history", headers={"X-User-Id": "user_123"}
+            )
+
+            assert response.status_code == 200
+            assert mock_nm.get_history.call_args.kwargs["user_id"] == "user_123"
+
+    def test_get_history_invalid_cursor(self, test_client):
+        """Should reject a malformed cursor"""
+        response = test_client.get(
+            "/api/notifications/networks/network_uuid_123/history",
+            params={"cursor": "not-a-cursor"},
+            headers={"X-User-Id": "user_123"},
+        )
+
+        assert response.status_code == 400
 
     def test_get_stats(self, test_client):
         """Should return notification stats"""
         with patch("app.routers.notifications.notification_manager") as mock_nm:
             from app.models import NotificationStatsResponse
 
-            mock_nm.get_stats.return_value = NotificationStatsResponse(
-                total_sent_24h=100,
-                total_sent_7d=500,
-                by_channel={"discord": 80, "email": 20},
-                by_type={},
-                success_rate=0.95,
-                anomalies_detected_24h=2,
+            mock_nm.get_stats = AsyncMock(
+                return_value=NotificationStatsResponse(
+                    total_sent_24h=100,
+                    total_sent_7d=500,
+                    by_channel={"discord": 80, "email": 20},
+                    by_type={},
+                    success_rate=0.95,
+                    anomalies_detected_24h=2,
+                )
             )
 
             response = test_client.get(
@@ -260,6 +298,65 @@ class TestHistoryEndpoints:
 
             assert response.status_code == 200
 
+    def test_get_stats_range(self, test_client):
+        """Should return stats for an arbitrary range"""
+        with patch("app.routers.notifications.notification_manager") as mock_nm:
+            from app.models import NotificationStatsRange
+
+            since = datetime(2026, 1, 1, tzinfo=timezone.utc)
+            mock_nm.get_stats_range = AsyncMock(
+                return_value=NotificationStatsRange(
+                    network_id="network_uuid_123", since=since, until=since, total=3
+                )
+            )
+
+            response = test_client.get(
+                "/api/notifications/networks/network_uuid_123/stats/range",
+                params={"since": "2026-01-01T00:00:00Z", "until": "2026-01-02T00:00:00Z"},
+                headers={"X-User-Id": "user_123"},
+            )
+
+            assert response.status_code == 200
+            assert response.json()["total"] == 3
+            assert mock_nm.get_stats_range.call_args.args[0] == "network_uuid_123"
+
+    def test_get_stats_range_rejects_inverted_range(self, test_client):
+        """Should reject until before since"""
+        response = test_client.get(
+            "/api/notifications/networks/network_uuid_123/stats/range",
+            params={"since": "2026-01-02T00:00:00Z", "until": "2026-01-01T00:00:00Z"},
+            headers={"X-User-Id": "user_123"},
+        )
+
+        assert response.status_code == 400
+
+    def test_get_stats_range_mixes_naive_and_aware_params(self, test_client):
+        """A naive bound should be read as UTC rather than fail the comparison"""
+        with patch("app.routers.notifications.notification_manager") as mock_nm:
+            from app.models import NotificationStatsRange
+
+            since = datetime(2026, 1, 1, tzinfo=timezone.utc)
+            mock_nm.get_stats_range = AsyncMock(
+                return_value=NotificationStatsRange(
+                    network_id="network_uuid_123", since=since, until=since, total=0
+                )
+            )
+
+            response = test_client.get(
+                "/api/notifications/networks/network_uuid_123/stats/range",
+                params={"since": "2026-01-01T00:00:00", "until": "2026-01-02T00:00:00Z"},
+                headers={"X-User-Id": "user_123"},
+            )
+            inverted = test_client.get(
+                "/api/notifications/networks/network_uuid_123/stats/range",
+                params={"since": "2026-01-02T00:00:00Z", "until": "2026-01-01T00:00:00"},
+                headers={"X-User-Id": "user_123"},
+            )
+
+        assert response.status_code == 200
+        assert mock_nm.get_stats_range.call_args.args[1] == since
+        assert inverted.status_code == 400
+
 
 class TestMLAnomalyEndpoints:
     """Tests for ML anomaly detection endpoints"""
@@ -362,6 +459,39 @@ class TestMLAnomalyEndpoints:
             assert data["devices_synced"] == 3
             mock_detector.sync_current_devices.assert_called_once_with(device_ips)
 
+    def test_sync_device_changes(self, test_client):
+        """Should apply only the devices that were added or removed"""
+        with patch("app.routers.notifications.network_anomaly_detector_manager") as mock_nadm:
+            mock_detector = MagicMock()
+            mock_nadm.get_detector.return_value = mock_detector
+
+            response = test_client.post(
+                "/api/notifications/ml/sync-devices/delta?network_id=network_uuid_123",
+                json={"added": ["192.168.1.4"], "removed": ["192.168.1.1"]},
+            )
+
+            assert response.status_code == 200
+            assert response.json()["devices_added"] == 1
+            mock_nadm.get_detector.assert_called_once_with("network_uuid_123")
+            mock_detector.update_current_devices.assert_called_once_with(
+                ["192.168.1.4"], ["192.168.1.1"]
+            )
+
+    def test_sync_device_changes_requires_full_list_first(self, test_client):
+        """Should refuse a delta until the network's full device list has been synced"""
+        with patch("app.routers.notifications.network_anomaly_detector_manager") as mock_nadm:
+            mock_detector = MagicMock()
+            mock_detector.devices_synced = False
+            mock_nadm.get_detector.return_value = mock_detector
+
+            response = test_client.post(
+                "/api/notifications/ml/sync-devices/delta?network_id=network_uuid_123",
+                json={"added": ["192.168.1.4"], "removed": []},
+            )
+
+            assert response.status_code == 409
+            mock_detector.update_current_devices.assert_not_called()
+
 
 class TestHealthCheckProcessing:
     """Tests for health check processing endpoints"""
@@ -388,9 +518,9 @@ class TestManualNotificationEndpoints:
     """Tests for manual notification endpoints"""
 
     def test_send_manual_notification_broadcast(self, test_client):
-        """Should broadcast notification"""
-        with patch("app.routers.notifications.notification_manager") as mock_nm:
-            mock_nm.broadcast_notification = AsyncMock(return_value={"user1": True})
+        """Should start a chunked broadcast job to every network"""
+        with patch("app.routers.notifications.broadcast_jobs") as mock_jobs:
+            mock_jobs.submit = AsyncMock(return_value=MagicMock(id="job-1", total=3))
 
             event_data = {
                 "event_type": "device_offline",
@@ -402,6 +532,9 @@ class TestManualNotificationEndpoints:
             response = test_client.post("/api/notifications/send-notification", json=event_data)
 
             assert response.status_code == 200
+            assert response.json()["users_notified"] == 3
+            assert response.json()["broadcast_job_id"] == "job-1"
+            assert mock_jobs.submit.await_args.args[0] == "networks"
 
     def test_send_manual_notification_to_network(self, test_client):
         """Should send notification to a network"""
@@ -616,13 +749,35 @@ class TestServiceStatusNotifications:
     """Tests for Cartographer service status notification endpoints"""
 
     def test_notify_cartographer_up(self, test_client):
-        """Should send cartographer up notification"""
-        with patch("app.routers.notifications.notification_manager") as mock_nm:
-            mock_nm.broadcast_notification = AsyncMock(return_value={"user1": True})
+        """Should start a broadcast job to the status subscribers"""
+        with (
+            patch("app.routers.notifications.is_email_configured", return_value=True),
+            patch("app.routers.notifications.broadcast_jobs") as mock_jobs,
+        ):
+            mock_jobs.submit = AsyncMock(return_value=MagicMock(id="job-1", total=2))
 
             response = test_client.post("/api/notifications/service-status/up")
 
             assert response.status_code == 200
+            assert response.json()["broadcast_job_id"] == "job-1"
+            assert response.json()["total_subscribers"] == 2
+            kind, event = mock_jobs.submit.await_args.args
+            assert kind == "status_subscribers"
+            assert event.event_type.value == "cartographer_up"
+
+    def test_notify_cartographer_down_without_subscribers(self, test_client):
+        """Should report failure when nobody is subscribed"""
+        with (
+            patch("app.routers.notifications.is_email_configured", return_value=True),
+            patch("app.routers.notifications.broadcast_jobs") as mock_jobs,
+        ):
+            mock_jobs.submit = AsyncMock(return_value=None)
+
+            response = test_client.post("/api/notifications/service-status/down")
+
+            assert response.status_code == 200
+            assert response.json()["success"] is False
+            assert mock_jobs.submit.await_args.args[0] == "status_subscribers"
 
     def test_notify_cartographer_up_with_downtime(self, test_client):
         """Should include downtime in notification"""
@@ -0,0 +1,183 @@
+"""
+Unit tests for the versioned notification preference cache.
+
+The database is a mock session, so the tests count how many queries the
+batch reads actually issue.
+"""
+
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.models.database import UserNetworkNotificationPrefs
+from app.services.preference_cache import (
+    INVALIDATION_CHANNEL,
+    PreferenceCache,
+    detached_copy,
+    network_scope,
+)
+from app.services.user_preferences import DEVICE_ADD_REMOVE_DEFAULTS_MARKER, UserPreferencesService
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _prefs(user_id, network_id="net-1"):
+    return UserNetworkNotificationPrefs(
+        user_id=user_id,
+        network_id=network_id,
+        email_enabled=True,
+        discord_enabled=False,
+        enabled_types=["device_offline"],
+        type_priorities={DEVICE_ADD_REMOVE_DEFAULTS_MARKER: "1"},
+        minimum_priority="medium",
+        quiet_hours_enabled=False,
+    )
+
+
+def _db(rows):
+    db = AsyncMock()
+    result = MagicMock()
+    result.scalars.return_value.all.return_value = rows
+    db.execute.return_value = result
+    return db
+
+
+@pytest.fixture
+def clock():
+    return _Clock()
+
+
+@pytest.fixture
+def cache(clock):
+    return PreferenceCache(clock=clock)
+
+
+@pytest.fixture
+def service(cache):
+    return UserPreferencesService(cache=cache)
+
+
+class TestPreferenceCache:
+    """Tests for versioning and expiry"""
+
+    async def test_invalidate_drops_entry(self, cache):
+        scope = network_scope("net-1")
+        cache.store(scope, cache.version(scope), {"u1": "prefs"})
+
+        assert cache.lookup(scope, ["u1"])[0] == {"u1": "prefs"}
+        await cache.invalidate(scope)
+
+        assert cache.lookup(scope, ["u1"])[1] == ["u1"]
+
+    async def test_load_overtaken_by_write_is_not_stored(self, cache):
+        scope = network_scope("net-1")
+        _, _, version = cache.lookup(scope, ["u1"])
+
+        await cache.invalidate(scope)
+        cache.store(scope, version, {"u1": "stale"})
+
+        assert cache.lookup(scope, ["u1"])[0] == {}
+
+    def test_clear_discards_in_flight_loads(self, cache):
+        scope = network_scope("net-1")
+        _, _, version = cache.lookup(scope, ["u1"])
+
+        cache.clear()
+        cache.store(scope, version, {"u1": "stale"})
+
+        assert cache.lookup(scope, ["u1"])[0] == {}
+
+    def test_entries_expire(self, cache, clock):
+        scope = network_scope("net-1")
+        cache.store(scope, cache.version(scope), {"u1": "prefs"})
+
+        clock.now += 301
+
+        assert cache.lookup(scope, ["u1"])[1] == ["u1"]
+
+    def test_remote_invalidation_ignores_own_messages(self, cache):
+        scope = network_scope("net-1")
+        cache.store(scope, cache.version(scope), {"u1": "prefs"})
+
+        cache.handle_message(json.dumps({"scope": scope, "origin": cache._origin}))
+        assert cache.lookup(scope, ["u1"])[0] == {"u1": "prefs"}
+
+        cache.handle_message(json.dumps({"scope": scope, "origin": "other-replica"}))
+        assert cache.lookup(scope, ["u1"])[0] == {}
+        assert cache.get_status()["remote_invalidations"] == 1
+
+    async def test_invalidate_publishes(self, cache):
+        cache._redis = MagicMock(publish=AsyncMock())
+
+        await cache.invalidate(network_scope("net-1"))
+
+        channel, payload = cache._redis.publish.call_args[0]
+        assert channel == INVALIDATION_CHANNEL
+        assert json.loads(payload)["scope"] == "network:net-1"
+
+    def test_detached_copy_does_not_share_mutable_columns(self):
+        row = _prefs("u1")
+        copied = detached_copy(row)
+
+        copied.enabled_types.append("device_online")
+
+        assert copied.user_id == "u1"
+        assert row.enabled_types == ["device_offline"]
+
+
+class TestCachedPreferenceReads:
+    """Tests for the service's cached batch reads"""
+
+    async def test_repeat_reads_skip_the_database(self, service, cache):
+        db = _db([_prefs("u1")])
+
+        first = await service.get_network_preferences_batch(db, ["u1", "u2"], "net-1")
+        second = await service.get_network_preferences_batch(db, ["u1", "u2"], "net-1")
+
+        assert list(first) == list(second) == ["u1"]
+        assert db.execute.await_count == 1
+        status = cache.get_status()
+        assert (status["hits"], status["misses"], status["db_queries"]) == (1, 1, 1)
+
+    async def test_only_uncached_users_are_queried(self, service):
+        await service.get_network_preferences_batch(_db([_prefs("u1")]), ["u1"], "net-1")
+        db = _db([_prefs("u2")])
+
+        result = await service.get_network_preferences_batch(db, ["u1", "u2"], "net-1")
+
+        assert set(result) == {"u1", "u2"}
+        assert ["u2"] in db.execute.call_args[0][0].compile().params.values()
+
+    async def test_update_invalidates_network(self, service):
+        db = _db([_prefs("u1")])
+        await service.get_network_preferences_batch(db, ["u1"], "net-1")
+
+        with patch.object(
+            service, "get_or_create_network_preferences", AsyncMock(return_value=_prefs("u1"))
+        ):
+            await service.update_network_preferences(db, "u1", "net-1", {"email_enabled": False})
+        await service.get_network_preferences_batch(db, ["u1"], "net-1")
+
+        assert db.execute.await_count == 2
+
+    async def test_emails_are_cached_but_failures_are_not(self, service):
+        db = AsyncMock()
+        db.execute.side_effect = Exception("users table unavailable")
+        assert await service.get_user_emails_batch(db, ["u1"]) == {}
+
+        result = MagicMock()
+        result.fetchall.return_value = [("u1", "u1@example.com")]
+        db.execute.side_effect = None
+        db.execute.return_value = result
+        await service.get_user_emails_batch(db, ["u1"])
+        emails = await service.get_user_emails_batch(db, ["u1"])
+
+        assert emails == {"u1": "u1@example.com"}
+        assert db.execute.await_count == 2
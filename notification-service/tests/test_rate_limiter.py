@@ -0,0 +1,114 @@
+"""
+Unit tests for the shared notification rate limiter.
+
+The token bucket logic is exercised through the in-process backend with a
+fake clock; the Redis backend is checked for how it packs a batch into one
+script call and for falling back when Redis fails.
+"""
+
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.services.rate_limiter import (
+    KEY_PREFIX,
+    LocalRateLimiter,
+    NotificationRateLimiter,
+    RateLimit,
+    RedisRateLimiter,
+)
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return _Clock()
+
+
+@pytest.fixture
+def limiter(clock):
+    return NotificationRateLimiter(local=LocalRateLimiter(clock=clock))
+
+
+NETWORK = RateLimit("network:n1", limit=2, burst=1)
+USER = RateLimit("user:u1", limit=1)
+
+
+class TestTokenBuckets:
+    """Tests for bucket semantics"""
+
+    async def test_burst_then_deny(self, limiter):
+        results = [(await limiter.acquire(NETWORK)).allowed for _ in range(4)]
+
+        assert results == [True, True, True, False]
+
+    async def test_refills_at_limit_per_window(self, limiter, clock):
+        for _ in range(3):
+            await limiter.acquire(NETWORK)
+
+        denied = await limiter.acquire(NETWORK)
+        assert denied.retry_after == pytest.approx(1800)
+
+        clock.now += 1800
+        assert (await limiter.acquire(NETWORK)).allowed is True
+        assert (await limiter.acquire(NETWORK)).allowed is False
+
+    async def test_decision_takes_all_tokens_or_none(self, limiter):
+        """A denied user bucket should not drain the network bucket"""
+        assert (await limiter.acquire(NETWORK, USER)).allowed is True
+        assert (await limiter.acquire(NETWORK, USER)).allowed is False
+
+        others = [(await limiter.acquire(NETWORK)).allowed for _ in range(3)]
+        assert others == [True, True, False]
+
+    async def test_batch_decisions_share_buckets_in_order(self, limiter):
+        decisions = await limiter.acquire_many([[NETWORK, USER], [NETWORK, USER], [NETWORK]])
+
+        assert [d.allowed for d in decisions] == [True, False, True]
+        assert limiter.get_status()["denied"] == 1
+
+    async def test_non_positive_limit_is_unlimited(self, limiter):
+        unlimited = RateLimit("network:n2", limit=0)
+
+        results = [(await limiter.acquire(unlimited)).allowed for _ in range(50)]
+
+        assert all(results)
+
+
+class TestRedisBackend:
+    """Tests for the Redis script backend"""
+
+    def _redis(self, script):
+        redis = MagicMock()
+        redis.register_script.return_value = script
+        return redis
+
+    async def test_batch_is_one_script_call(self):
+        script = AsyncMock(return_value=[[1, 0], [0, 1500]])
+        backend = RedisRateLimiter(self._redis(script))
+
+        decisions = await backend.acquire_many([[NETWORK, USER], [USER]])
+
+        script.assert_awaited_once_with(
+            keys=[f"{KEY_PREFIX}network:n1", f"{KEY_PREFIX}user:u1", f"{KEY_PREFIX}user:u1"],
+            args=[2, 2, 2, 1, 3_600_000, 1, 0, 3_600_000, 1, 1, 0, 3_600_000],
+        )
+        assert [d.allowed for d in decisions] == [True, False]
+        assert decisions[1].retry_after == 1.5
+
+    async def test_falls_back_to_local_buckets(self, limiter):
+        script = AsyncMock(side_effect=RedisConnectionError("down"))
+        limiter._remote = RedisRateLimiter(self._redis(script))
+
+        decision = await limiter.acquire(NETWORK)
+
+        assert decision.allowed is True
+        assert limiter.get_status()["redis_errors"] == 1
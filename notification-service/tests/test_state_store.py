@@ -0,0 +1,209 @@
+"""
+Unit tests for the keyed state repository and lazy loading of network preferences.
+
+Tests run the repository over the in-memory store and wrap its load method
+where the number of queries matters.
+"""
+
+import json
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.models import NotificationPreferencesUpdate
+from app.services.notification_manager import NotificationManager
+from app.services.state_store import (
+    GLOBAL_PREFERENCES,
+    NETWORK_PREFERENCES,
+    SILENCED_DEVICES,
+    InMemoryStateStore,
+    StateRepository,
+)
+
+
+@pytest.fixture
+def store():
+    return InMemoryStateStore()
+
+
+@pytest.fixture
+def state(store):
+    return StateRepository(store)
+
+
+class TestStateRepository:
+    """Tests for write-behind puts, deletes and reads"""
+
+    async def test_reads_see_unflushed_writes(self, state, store):
+        store.rows[(NETWORK_PREFERENCES, "a")] = {"v": 1}
+        store.rows[(NETWORK_PREFERENCES, "b")] = {"v": 1}
+        state.put(NETWORK_PREFERENCES, "a", {"v": 2})
+        state.delete(NETWORK_PREFERENCES, "b")
+        state.put(NETWORK_PREFERENCES, "c", {"v": 3})
+
+        assert await state.load(NETWORK_PREFERENCES) == {"a": {"v": 2}, "c": {"v": 3}}
+        assert await state.load_keys(NETWORK_PREFERENCES, ["b", "c"]) == {"c": {"v": 3}}
+        assert store.rows[(NETWORK_PREFERENCES, "b")] == {"v": 1}
+
+    async def test_reads_during_a_flush_see_the_batch_being_written(self, state, store):
+        store.rows[(GLOBAL_PREFERENCES, "u1")] = {"v": 1}
+        state.put(GLOBAL_PREFERENCES, "u1", {"v": 2})
+        write = store.write
+        seen = []
+
+        async def slow_write(upserts, deletes):
+            seen.append(await state.load_keys(GLOBAL_PREFERENCES, ["u1"]))
+            await write(upserts, deletes)
+
+        with patch.object(store, "write", slow_write):
+            await state.flush()
+
+        assert seen == [{"u1": {"v": 2}}]
+
+    async def test_read_overlapping_a_committed_flush_is_not_stale(self, state, store):
+        store.rows[(GLOBAL_PREFERENCES, "u1")] = {"v": 1}
+        state.put(GLOBAL_PREFERENCES, "u1", {"v": 2})
+        load = store.load
+
+        async def load_then_flush(namespace, keys=None):
+            # The read sees the old row, then the write commits before it returns
+            rows = await load(namespace, keys)
+            await state.flush()
+            return rows
+
+        with patch.object(store, "load", load_then_flush):
+            assert await state.load(GLOBAL_PREFERENCES) == {"u1": {"v": 2}}
+
+    async def test_flush_writes_in_batches(self, state, store):
+        for i in range(5):
+            state.put(SILENCED_DEVICES, f"10.0.0.{i}", True)
+
+        with patch("app.services.state_store.settings.state_batch_size", 2):
+            assert await state.flush() == 2
+            await state.flush_all()
+
+        assert len(store.rows) == 5
+        assert state.get_status()["pending"] == 0
+
+    async def test_failed_flush_is_retried_without_losing_newer_writes(self, state, store):
+        state.put(GLOBAL_PREFERENCES, "u1", {"v": 1})
+        state.put(GLOBAL_PREFERENCES, "u2", {"v": 1})
+
+        async def write_fails(upserts, deletes):
+            # A newer change to u1 arrives while the write is in flight
+            state.put(GLOBAL_PREFERENCES, "u1", {"v": 2})
+            raise IOError("Database down")
+
+        with patch.object(store, "write", write_fails):
+            with pytest.raises(IOError):
+                await state.flush()
+
+        await state.flush_all()
+        assert store.rows[(GLOBAL_PREFERENCES, "u1")] == {"v": 2}
+        assert store.rows[(GLOBAL_PREFERENCES, "u2")] == {"v": 1}
+
+
+class TestLazyNetworkPreferences:
+    """Tests for loading network preferences per network on first use"""
+
+    @pytest.fixture
+    async def running_state(self, state):
+        await state.start()
+        yield state
+        await state.stop()
+
+    async def test_only_unseen_networks_are_queried(self, running_state, store):
+        store.rows[(NETWORK_PREFERENCES, "net-1")] = {"network_id": "net-1", "enabled": False}
+        manager = NotificationManager(state=running_state)
+        load = AsyncMock(wraps=store.load)
+
+        with patch.object(store, "load", load):
+            await manager.ensure_preferences_loaded(["net-1", "net-2"])
+            await manager.ensure_preferences_loaded(["net-1", "net-2"])
+
+        assert load.await_count == 1
+        assert manager.get_preferences("net-1").enabled is False
+        assert "net-2" in manager._absent_preferences
+
+    async def test_unloaded_network_is_not_overwritten_with_defaults(self, running_state, store):
+        store.rows[(NETWORK_PREFERENCES, "net-1")] = {"network_id": "net-1", "enabled": False}
+        manager = NotificationManager(state=running_state)
+
+        assert manager.get_preferences("net-1").enabled is True
+        await running_state.flush_all()
+        assert store.rows[(NETWORK_PREFERENCES, "net-1")]["enabled"] is False
+
+        await manager.ensure_preferences_loaded(["net-1"])
+        manager.update_preferences("net-1", NotificationPreferencesUpdate(timezone="UTC"))
+        await running_state.flush_all()
+        assert store.rows[(NETWORK_PREFERENCES, "net-1")]["enabled"] is False
+        assert store.rows[(NETWORK_PREFERENCES, "net-1")]["timezone"] == "UTC"
+
+    async def test_broadcast_recipients_load_every_network(self, running_state, store):
+        for i in range(3):
+            store.rows[(NETWORK_PREFERENCES, f"net-{i}")] = {
+                "network_id": f"net-{i}",
+                "email": {"enabled": i != 1},
+            }
+        manager = NotificationManager(state=running_state)
+
+        await manager.load_all_preferences()
+
+        assert sorted(manager.get_all_networks_with_notifications_enabled()) == ["net-0", "net-2"]
+
+
+class TestLegacyImport:
+    """Tests for the one-shot import of JSON state files"""
+
+    async def test_files_are_imported_once_and_renamed(self, state, store, tmp_path):
+        prefs_file = tmp_path / "notification_preferences.json"
+        prefs_file.write_text(
+            json.dumps(
+                {
+                    "net-1": {
+                        "network_id": "net-1",
+                        "owner_user_id": "owner-1",
+                        "email": {"enabled": True, "email_address": "owner@example.com"},
+                    }
+                }
+            )
+        )
+        silenced_file = tmp_path / "silenced_devices.json"
+        silenced_file.write_text(json.dumps(["10.0.0.5"]))
+
+        with (
+            patch("app.services.notification_manager.PREFERENCES_FILE", prefs_file),
+            patch("app.services.notification_manager.SILENCED_DEVICES_FILE", silenced_file),
+            patch(
+                "app.services.notification_manager.GLOBAL_PREFERENCES_FILE",
+                tmp_path / "missing-global.json",
+            ),
+            patch("app.services.notification_manager.SCHEDULED_FILE", tmp_path / "missing.json"),
+        ):
+            manager = NotificationManager(state=state)
+            assert await manager.import_legacy_state() == 3
+            assert await manager.import_legacy_state() == 0
+
+        assert not prefs_file.exists()
+        assert (tmp_path / "notification_preferences.json.imported").exists()
+        assert set(store.rows) == {
+            (NETWORK_PREFERENCES, "net-1"),
+            (SILENCED_DEVICES, "10.0.0.5"),
+            # Owners of legacy networks are migrated to global preferences
+            (GLOBAL_PREFERENCES, "owner-1"),
+        }
+
+    async def test_files_are_kept_when_the_import_fails(self, state, store, tmp_path):
+        silenced_file = tmp_path / "silenced_devices.json"
+        silenced_file.write_text(json.dumps(["10.0.0.5"]))
+
+        with (
+            patch("app.services.notification_manager.PREFERENCES_FILE", tmp_path / "a.json"),
+            patch("app.services.notification_manager.GLOBAL_PREFERENCES_FILE", tmp_path / "b.json"),
+            patch("app.services.notification_manager.SCHEDULED_FILE", tmp_path / "c.json"),
+            patch("app.services.notification_manager.SILENCED_DEVICES_FILE", silenced_file),
+            patch.object(store, "write", AsyncMock(side_effect=IOError("Database down"))),
+        ):
+            assert await NotificationManager(state=state).import_legacy_state() == 0
+
+        assert silenced_file.exists()
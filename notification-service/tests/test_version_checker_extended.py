@@ -23,6 +23,7 @@ os.environ["NOTIFICATION_DATA_DIR"] = "/tmp/test_notification_data_version"
 
 from app.config import settings
 from app.models import NotificationPriority
+from app.services.state_store import VERSION_CHECKER, InMemoryStateStore, StateRepository
 from app.services.version_checker import (
     VERSION_STATE_FILE,
     VersionChecker,
@@ -239,20 +240,35 @@ class TestVersionChecker:
         checker._load_state()
         # Should not error
 
-    def test_save_state(self, checker):
-        """Test saving state to file."""
-        settings.data_dir.mkdir(parents=True, exist_ok=True)
-
+    async def test_save_state(self, checker):
+        """Test saving state to the state table."""
+        state = StateRepository(InMemoryStateStore())
+        checker._state = state
         checker._last_notified_version = "1.0.0"
         checker._last_check_time = datetime.utcnow()
 
         checker._save_state()
 
-        assert VERSION_STATE_FILE.exists()
-        with open(VERSION_STATE_FILE, "r") as f:
-            state = json.load(f)
+        stored = await state.load(VERSION_CHECKER)
+        assert stored["state"]["last_notified_version"] == "1.0.0"
+        assert not VERSION_STATE_FILE.exists()
 
-        assert state["last_notified_version"] == "1.0.0"
+    async def test_load_state_imports_legacy_file(self, checker):
+        """Test the legacy state file is imported once and renamed."""
+        settings.data_dir.mkdir(parents=True, exist_ok=True)
+        with open(VERSION_STATE_FILE, "w") as f:
+            json.dump({"last_notified_version": "1.2.0", "last_check_time": None}, f)
+        state = StateRepository(InMemoryStateStore())
+        checker._state = state
+
+        await checker.load_state()
+
+        imported = VERSION_STATE_FILE.with_suffix(".json.imported")
+        assert not VERSION_STATE_FILE.exists() and imported.exists()
+        imported.unlink()
+        restarted = VersionChecker(state=state)
+        await restarted.load_state()
+        assert restarted._last_notified_version == "1.2.0"
 
     @pytest.mark.asyncio
     async def test_start(self, checker):
@@ -0,0 +1,5 @@
+"""Endpoint usage tracking shared by the Cartographer services."""
+
+from .middleware import UsageRecord, UsageReporter, UsageTrackingMiddleware
+
+__all__ = ["UsageRecord", "UsageReporter", "UsageTrackingMiddleware"]
@@ -2,7 +2,8 @@
 Usage Tracking Middleware
 
 Automatically tracks endpoint usage statistics and reports them
-to the metrics service for aggregation.
+to the metrics service for aggregation. Every Cartographer service installs
+this package and adds the middleware with its own name and settings.
 """
 
 import asyncio
@@ -11,15 +12,12 @@ import json
 import logging
 import time
 from collections import deque
-from collections.abc import Callable
 from datetime import datetime
+from typing import Any, Awaitable, Callable, Iterable
 
 import httpx
-from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
-from starlette.responses import Response
-
-from ..config import get_settings
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 logger = logging.getLogger(__name__)
 
@@ -31,9 +29,15 @@ except Exception:  # pragma: no cover - only exercised when dependency is absent
 _POSTHOG_INITIALIZED = False
 
 # Excluded paths and prefixes (not configurable - these are internal)
-EXCLUDED_PATHS = {"/healthz", "/ready", "/", "/docs", "/openapi.json", "/redoc", "/favicon.png"}
-EXCLUDED_PREFIXES = ("/docs", "/openapi", "/assets", "/api/metrics/usage")
+EXCLUDED_PATHS = {"/healthz", "/ready", "/", "/docs", "/openapi.json", "/redoc"}
+EXCLUDED_PREFIXES = ("/docs", "/openapi")
 INTERNAL_HEADER_KEYS = ("x-service-name", "x-request-signature", "x-request-timestamp")
+# Usage of requests no route matched (404s) is recorded under this endpoint
+UNMATCHED_ENDPOINT = "<unmatched>"
+USAGE_BATCH_PATH = "/api/metrics/usage/record/batch"
+
+# Delivers a batch of usage records (UsageRecord.to_dict() shape); False to retry later
+UsageReporter = Callable[[list[dict]], Awaitable[bool]]
 
 
 def _initialize_posthog(posthog_api_key: str, posthog_host: str, posthog_enabled: bool) -> bool:
@@ -80,6 +84,12 @@ def _is_service_bearer_token(authorization: str | None) -> bool:
     return payload.get("service") is True or str(payload.get("type", "")).lower() == "service"
 
 
+def _route_template(request: Request) -> str:
+    """The path template of the route that handled a request, e.g. /api/items/{item_id}."""
+    route = request.scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ENDPOINT
+
+
 def _is_user_generated_request(request: Request) -> bool:
     """Classify request origin for analytics filtering."""
     headers = request.headers
@@ -177,20 +187,48 @@ class UsageRecord:
         }
 
 
-class UsageTrackingMiddleware(BaseHTTPMiddleware):
+class UsageTrackingMiddleware:
     """
     Middleware that tracks endpoint usage and reports to metrics service.
 
     Features:
+    - Pure ASGI: Times requests up to the response head without wrapping
+      response bodies, so streaming responses pass through unchanged
     - Non-blocking: Uses background tasks for reporting
     - Batching: Accumulates records and sends in batches
     - Resilient: Continues operating even if metrics service is unavailable
+
+    Args:
+        app: The ASGI app to wrap
+        service_name: Name usage is recorded under
+        settings: The service's settings; reads ``usage_batch_size``,
+            ``usage_batch_interval_seconds``, the ``posthog_*`` fields and,
+            unless a reporter is given, ``metrics_service_url``
+        excluded_paths: Paths not tracked, on top of EXCLUDED_PATHS
+        excluded_prefixes: Path prefixes not tracked, on top of EXCLUDED_PREFIXES
+        user_facing: False for internal services that only see gateway traffic;
+            their requests are never counted as user-generated in PostHog
+        reporter: Delivers batches instead of POSTing them to the metrics
+            service (the metrics service records its own usage directly)
     """
 
-    def __init__(self, app, service_name: str = "backend"):
-        super().__init__(app)
+    def __init__(
+        self,
+        app: ASGIApp,
+        service_name: str,
+        settings: Any,
+        excluded_paths: Iterable[str] = (),
+        excluded_prefixes: Iterable[str] = (),
+        user_facing: bool = True,
+        reporter: UsageReporter | None = None,
+    ):
+        self.app = app
         self.service_name = service_name
-        self._settings = get_settings()
+        self._settings = settings
+        self._excluded_paths = EXCLUDED_PATHS | set(excluded_paths)
+        self._excluded_prefixes = EXCLUDED_PREFIXES + tuple(excluded_prefixes)
+        self._user_facing = user_facing
+        self._reporter = reporter or self._post_batch
         self._buffer: deque[UsageRecord] = deque(maxlen=1000)
         self._client: httpx.AsyncClient | None = None
         self._flush_task: asyncio.Task | None = None
@@ -205,6 +243,15 @@ class UsageTrackingMiddleware(BaseHTTPMiddleware):
             )
         return self._client
 
+    async def _post_batch(self, records: list[dict]) -> bool:
+        """Send a batch of records to the metrics service."""
+        client = await self._get_client()
+        response = await client.post(USAGE_BATCH_PATH, json={"records": records})
+        if response.status_code != 200:
+            logger.debug(f"Failed to report usage: {response.status_code}")
+            return False
+        return True
+
     async def _start_flush_task(self):
         """Start the background flush task if not running."""
         if not self._running:
@@ -223,7 +270,7 @@ class UsageTrackingMiddleware(BaseHTTPMiddleware):
                 logger.debug(f"Flush loop error: {e}")
 
     async def _flush_buffer(self):
-        """Send accumulated records to metrics service."""
+        """Report accumulated records."""
         if not self._buffer:
             return
 
@@ -236,18 +283,11 @@ class UsageTrackingMiddleware(BaseHTTPMiddleware):
             return
 
         try:
-            client = await self._get_client()
-            response = await client.post(
-                "/api/metrics/usage/record/batch",
-                json={"records": records_to_send},
-            )
-
-            if response.status_code != 200:
-                logger.debug(f"Failed to report usage: {response.status_code}")
+            if not await self._reporter(records_to_send):
                 # Put records back in buffer on failure (at the front)
                 self._restore_records(records_to_send)
         except Exception as e:
-            logger.debug(f"Failed to report usage to metrics service: {e}")
+            logger.debug(f"Failed to report usage: {e}")
             # Put records back on failure
             self._restore_records(records_to_send)
 
@@ -264,29 +304,43 @@ class UsageTrackingMiddleware(BaseHTTPMiddleware):
             )
             self._buffer.appendleft(record)
 
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        """Process request and track usage."""
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Time the request and track usage once the response has started."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
         # Start flush task on first request
         if not self._running:
             asyncio.create_task(self._start_flush_task())
 
         # Skip excluded paths
-        path = request.url.path
-        if path in EXCLUDED_PATHS:
-            return await call_next(request)
-
-        # Skip excluded prefixes
-        for prefix in EXCLUDED_PREFIXES:
-            if path.startswith(prefix):
-                return await call_next(request)
+        path = scope["path"]
+        if path in self._excluded_paths or path.startswith(self._excluded_prefixes):
+            await self.app(scope, receive, send)
+            return
 
         # Track timing
+        request = Request(scope)
         start_time = time.perf_counter()
-        is_user_generated = _is_user_generated_request(request)
+        is_user_generated = self._user_facing and _is_user_generated_request(request)
+
+        async def send_timed(message: Message) -> None:
+            # Timing stops at the response head; body messages pass straight
+            # through, so streaming responses are never buffered
+            if message["type"] == "http.response.start":
+                self._track(
+                    request,
+                    path,
+                    message["status"],
+                    (time.perf_counter() - start_time) * 1000,
+                    is_user_generated,
+                )
+            await send(message)
 
         # Process request
         try:
-            response = await call_next(request)
+            await self.app(scope, receive, send_timed)
         except Exception as exc:
             response_time_ms = (time.perf_counter() - start_time) * 1000
             _capture_posthog_api_event(
@@ -303,15 +357,20 @@ class UsageTrackingMiddleware(BaseHTTPMiddleware):
             )
             raise
 
-        # Calculate response time
-        response_time_ms = (time.perf_counter() - start_time) * 1000
-
-        # Create usage record
+    def _track(
+        self,
+        request: Request,
+        path: str,
+        status_code: int,
+        response_time_ms: float,
+        is_user_generated: bool,
+    ) -> None:
+        """Buffer a usage record for a response; never blocks the request."""
         record = UsageRecord(
-            endpoint=path,
+            endpoint=_route_template(request),
             method=request.method,
             service_name=self.service_name,
-            status_code=response.status_code,
+            status_code=status_code,
             response_time_ms=response_time_ms,
             timestamp=datetime.utcnow(),
         )
@@ -322,7 +381,7 @@ class UsageTrackingMiddleware(BaseHTTPMiddleware):
             service_name=self.service_name,
             path=path,
             method=request.method,
-            status_code=response.status_code,
+            status_code=status_code,
             response_time_ms=response_time_ms,
             is_user_generated=is_user_generated,
             error_type=None,
@@ -335,8 +394,6 @@ class UsageTrackingMiddleware(BaseHTTPMiddleware):
         if len(self._buffer) >= self._settings.usage_batch_size:
             asyncio.create_task(self._flush_buffer())
 
-        return response
-
     async def shutdown(self):
         """Clean shutdown - flush remaining records."""
         self._running = False
@@ -348,9 +405,13 @@ class UsageTrackingMiddleware(BaseHTTPMiddleware):
             except asyncio.CancelledError:
                 pass
 
-        # Final flush
+        # Final flush, until the metrics service stops accepting records
         while self._buffer:
+            remaining = len(self._buffer)
             await self._flush_buffer()
+            if len(self._buffer) >= remaining:
+                logger.debug(f"Dropping {remaining} unreported usage records on shutdown")
+                break
 
         if self._client:
             await self._client.aclose()
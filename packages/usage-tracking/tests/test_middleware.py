@@ -7,6 +7,7 @@ import asyncio
 import base64
 import json
 from datetime import datetime
+from types import SimpleNamespace
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
@@ -16,8 +17,8 @@ from starlette.responses import JSONResponse, Response
 from starlette.routing import Route
 from starlette.testclient import TestClient
 
-import app.services.usage_middleware as usage_middleware
-from app.services.usage_middleware import (
+import cartographer_usage.middleware as usage_middleware
+from cartographer_usage.middleware import (
     UsageRecord,
     UsageTrackingMiddleware,
     _capture_posthog_api_event,
@@ -27,6 +28,19 @@ from app.services.usage_middleware import (
 )
 
 
+def _settings(**overrides):
+    """Settings with the fields the middleware reads from a service's config"""
+    values = {
+        "metrics_service_url": "http://metrics:8003",
+        "usage_batch_size": 10,
+        "usage_batch_interval_seconds": 5.0,
+        "posthog_api_key": "",
+        "posthog_host": "https://us.i.posthog.com",
+        "posthog_enabled": False,
+    }
+    return SimpleNamespace(**{**values, **overrides})
+
+
 def _build_token(payload: dict) -> str:
     encoded_payload = base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).decode("utf-8")
     encoded_payload = encoded_payload.rstrip("=")
@@ -39,7 +53,7 @@ class TestUsageTrackingMiddleware:
     @pytest.fixture
     def app(self):
         """Create a simple test app with middleware"""
-        from app.services.usage_middleware import UsageTrackingMiddleware
+        from cartographer_usage.middleware import UsageTrackingMiddleware
 
         async def homepage(request):
             return JSONResponse({"status": "ok"})
@@ -61,7 +75,9 @@ class TestUsageTrackingMiddleware:
         ]
 
         app = Starlette(routes=routes)
-        app.add_middleware(UsageTrackingMiddleware, service_name="test-service")
+        app.add_middleware(
+            UsageTrackingMiddleware, service_name="test-service", settings=_settings()
+        )
         return app
 
     @pytest.fixture
@@ -100,7 +116,7 @@ class TestUsageRecord:
 
     def test_usage_record_to_dict(self):
         """UsageRecord should serialize to dict correctly"""
-        from app.services.usage_middleware import UsageRecord
+        from cartographer_usage.middleware import UsageRecord
 
         now = datetime.utcnow()
         record = UsageRecord(
@@ -128,13 +144,13 @@ class TestMiddlewareBuffer:
     @pytest.fixture
     def middleware(self):
         """Create middleware instance for testing"""
-        from app.services.usage_middleware import UsageTrackingMiddleware
+        from cartographer_usage.middleware import UsageTrackingMiddleware
 
         # Create a minimal ASGI app
         async def app(scope, receive, send):
             pass
 
-        return UsageTrackingMiddleware(app, service_name="test-service")
+        return UsageTrackingMiddleware(app, service_name="test-service", settings=_settings())
 
     def test_buffer_has_max_size(self, middleware):
         """Buffer should have a maximum size"""
@@ -151,12 +167,12 @@ class TestMiddlewareFlush:
     @pytest.fixture
     def middleware(self):
         """Create middleware instance for testing"""
-        from app.services.usage_middleware import UsageRecord, UsageTrackingMiddleware
+        from cartographer_usage.middleware import UsageRecord, UsageTrackingMiddleware
 
         async def app(scope, receive, send):
             pass
 
-        mw = UsageTrackingMiddleware(app, service_name="test-service")
+        mw = UsageTrackingMiddleware(app, service_name="test-service", settings=_settings())
 
         # Add some records to buffer
         for i in range(5):
@@ -259,12 +275,12 @@ class TestMiddlewareShutdown:
     @pytest.fixture
     def middleware(self):
         """Create middleware instance for testing"""
-        from app.services.usage_middleware import UsageTrackingMiddleware
+        from cartographer_usage.middleware import UsageTrackingMiddleware
 
         async def app(scope, receive, send):
             pass
 
-        return UsageTrackingMiddleware(app, service_name="test-service")
+        return UsageTrackingMiddleware(app, service_name="test-service", settings=_settings())
 
     async def test_shutdown_stops_running(self, middleware):
         """Shutdown should stop the running flag"""
@@ -293,19 +309,19 @@ class TestMiddlewareExclusions:
 
     def test_healthz_excluded(self):
         """Healthcheck paths should be excluded"""
-        from app.services.usage_middleware import EXCLUDED_PATHS
+        from cartographer_usage.middleware import EXCLUDED_PATHS
 
         assert "/healthz" in EXCLUDED_PATHS
 
     def test_docs_excluded(self):
         """Documentation paths should be excluded"""
-        from app.services.usage_middleware import EXCLUDED_PATHS
+        from cartographer_usage.middleware import EXCLUDED_PATHS
 
         assert "/docs" in EXCLUDED_PATHS
 
     def test_root_excluded(self):
         """Root path should be excluded"""
-        from app.services.usage_middleware import EXCLUDED_PATHS
+        from cartographer_usage.middleware import EXCLUDED_PATHS
 
         assert "/" in EXCLUDED_PATHS
 
@@ -316,12 +332,12 @@ class TestGetClient:
     @pytest.fixture
     def middleware(self):
         """Create middleware instance for testing"""
-        from app.services.usage_middleware import UsageTrackingMiddleware
+        from cartographer_usage.middleware import UsageTrackingMiddleware
 
         async def app(scope, receive, send):
             pass
 
-        return UsageTrackingMiddleware(app, service_name="test-service")
+        return UsageTrackingMiddleware(app, service_name="test-service", settings=_settings())
 
     async def test_get_client_creates_new_client(self, middleware):
         """Should create a new client when none exists"""
@@ -363,12 +379,12 @@ class TestStartFlushTask:
     @pytest.fixture
     def middleware(self):
         """Create middleware instance for testing"""
-        from app.services.usage_middleware import UsageTrackingMiddleware
+        from cartographer_usage.middleware import UsageTrackingMiddleware
 
         async def app(scope, receive, send):
             pass
 
-        return UsageTrackingMiddleware(app, service_name="test-service")
+        return UsageTrackingMiddleware(app, service_name="test-service", settings=_settings())
 
     async def test_start_flush_task_starts_task(self, middleware):
         """Should start flush task when not running"""
@@ -404,12 +420,12 @@ class TestFlushLoop:
     @pytest.fixture
     def middleware(self):
         """Create middleware instance for testing"""
-        from app.services.usage_middleware import UsageTrackingMiddleware
+        from cartographer_usage.middleware import UsageTrackingMiddleware
 
         async def app(scope, receive, send):
             pass
 
-        return UsageTrackingMiddleware(app, service_name="test-service")
+        return UsageTrackingMiddleware(app, service_name="test-service", settings=_settings())
 
     async def test_flush_loop_exits_on_cancelled_error(self, middleware):
         """Should exit gracefully on CancelledError"""
@@ -469,12 +485,12 @@ class TestFlushBufferHTTP:
     @pytest.fixture
     def middleware(self):
         """Create middleware instance with records"""
-        from app.services.usage_middleware import UsageRecord, UsageTrackingMiddleware
+        from cartographer_usage.middleware import UsageRecord, UsageTrackingMiddleware
 
         async def app(scope, receive, send):
             pass
 
-        mw = UsageTrackingMiddleware(app, service_name="test-service")
+        mw = UsageTrackingMiddleware(app, service_name="test-service", settings=_settings())
 
         # Add records to buffer
         for i in range(3):
@@ -515,12 +531,12 @@ class TestShutdownWithClient:
     @pytest.fixture
     def middleware(self):
         """Create middleware instance"""
-        from app.services.usage_middleware import UsageTrackingMiddleware
+        from cartographer_usage.middleware import UsageTrackingMiddleware
 
         async def app(scope, receive, send):
             pass
 
-        return UsageTrackingMiddleware(app, service_name="test-service")
+        return UsageTrackingMiddleware(app, service_name="test-service", settings=_settings())
 
     async def test_shutdown_closes_client(self, middleware):
         """Should close HTTP client during shutdown"""
@@ -653,24 +669,21 @@ class TestPostHogHelpers:
 
     async def test_dispatch_tracks_exception_path(self):
         async def app(scope, receive, send):
-            pass
+            raise RuntimeError("boom")
 
-        middleware = UsageTrackingMiddleware(app, service_name="backend")
+        middleware = UsageTrackingMiddleware(app, service_name="backend", settings=_settings())
         middleware._running = True
 
-        request = Request(
-            {
-                "type": "http",
-                "method": "GET",
-                "path": "/api/error",
-                "headers": [],
-            }
-        )
-        call_next = AsyncMock(side_effect=RuntimeError("boom"))
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": "/api/error",
+            "headers": [],
+        }
 
-        with patch("app.services.usage_middleware._capture_posthog_api_event") as mock_capture:
+        with patch("cartographer_usage.middleware._capture_posthog_api_event") as mock_capture:
             with pytest.raises(RuntimeError):
-                await middleware.dispatch(request, call_next)
+                await middleware(scope, AsyncMock(), AsyncMock())
 
         mock_capture.assert_called_once()
         assert mock_capture.call_args.kwargs["status_code"] == 500
@@ -679,7 +692,7 @@ class TestPostHogHelpers:
         async def app(scope, receive, send):
             pass
 
-        middleware = UsageTrackingMiddleware(app, service_name="backend")
+        middleware = UsageTrackingMiddleware(app, service_name="backend", settings=_settings())
         middleware._buffer.append(
             UsageRecord(
                 endpoint="/api/test",
@@ -700,7 +713,7 @@ class TestPostHogHelpers:
         async def app(scope, receive, send):
             pass
 
-        middleware = UsageTrackingMiddleware(app, service_name="backend")
+        middleware = UsageTrackingMiddleware(app, service_name="backend", settings=_settings())
         middleware._buffer.append(
             UsageRecord(
                 endpoint="/api/test",
@@ -722,16 +735,11 @@ class TestPostHogHelpers:
 
 
 class TestDispatchExcludedPrefixes:
-    """Tests for dispatch with excluded prefixes"""
+    """Tests for dispatch with excluded paths and prefixes"""
 
     @pytest.fixture
-    def app(self):
-        """Create a simple test app with middleware"""
-        from starlette.applications import Starlette
-        from starlette.responses import JSONResponse
-        from starlette.routing import Route
-
-        from app.services.usage_middleware import UsageTrackingMiddleware
+    def middleware(self):
+        """Middleware excluding extra paths and prefixes, as the backend does"""
 
         async def test_endpoint(request):
             return JSONResponse({"status": "ok"})
@@ -741,23 +749,165 @@ class TestDispatchExcludedPrefixes:
             Route("/api/metrics/usage/record", test_endpoint),
             Route("/assets/test.js", test_endpoint),
             Route("/docs/test", test_endpoint),
+            Route("/favicon.png", test_endpoint),
         ]
 
-        app = Starlette(routes=routes)
-        app.add_middleware(UsageTrackingMiddleware, service_name="test-service")
-        return app
+        return UsageTrackingMiddleware(
+            Starlette(routes=routes),
+            service_name="backend",
+            settings=_settings(),
+            excluded_paths={"/favicon.png"},
+            excluded_prefixes=("/assets", "/api/metrics/usage"),
+        )
 
-    @pytest.fixture
-    def client(self, app):
-        """Create test client"""
-        return TestClient(app)
+    @pytest.mark.parametrize(
+        "path", ["/assets/test.js", "/api/metrics/usage/record", "/docs/test", "/favicon.png"]
+    )
+    def test_dispatch_excludes(self, middleware, path):
+        """Should pass excluded requests through without recording them"""
+        middleware._running = True
+        response = TestClient(middleware).get(path)
 
-    def test_dispatch_excludes_assets(self, client):
-        """Should exclude /assets/ prefix"""
-        response = client.get("/assets/test.js")
         assert response.status_code == 200
+        assert len(middleware._buffer) == 0
 
-    def test_dispatch_excludes_metrics_usage(self, client):
-        """Should exclude /api/metrics/usage prefix"""
-        response = client.get("/api/metrics/usage/record")
-        assert response.status_code == 200
+    def test_dispatch_tracks_other_paths(self, middleware):
+        """Should record requests outside the exclusions"""
+        middleware._running = True
+        TestClient(middleware).get("/api/test")
+
+        assert [r.method for r in middleware._buffer] == ["GET"]
+
+
+class TestServiceOptions:
+    """Tests for the per-service options"""
+
+    async def test_reporter_replaces_http_post(self):
+        """A reporter should receive the batch instead of the metrics service"""
+        reporter = AsyncMock(return_value=True)
+
+        async def app(scope, receive, send):
+            pass
+
+        middleware = UsageTrackingMiddleware(
+            app, service_name="metrics-service", settings=_settings(), reporter=reporter
+        )
+        middleware._buffer.append(
+            UsageRecord("/api/x", "GET", "metrics-service", 200, 1.0, datetime.utcnow())
+        )
+
+        with patch.object(middleware, "_get_client") as mock_get_client:
+            await middleware._flush_buffer()
+
+        mock_get_client.assert_not_called()
+        [records] = reporter.await_args.args
+        assert records[0]["service"] == "metrics-service"
+        assert len(middleware._buffer) == 0
+
+    async def test_failed_reporter_keeps_records(self):
+        """A reporter returning False should leave the batch for the next flush"""
+
+        async def app(scope, receive, send):
+            pass
+
+        middleware = UsageTrackingMiddleware(
+            app,
+            service_name="metrics-service",
+            settings=_settings(),
+            reporter=AsyncMock(return_value=False),
+        )
+        middleware._buffer.append(
+            UsageRecord("/api/x", "GET", "metrics-service", 200, 1.0, datetime.utcnow())
+        )
+
+        await middleware._flush_buffer()
+
+        assert len(middleware._buffer) == 1
+
+    async def test_internal_service_never_counts_user_traffic(self):
+        """user_facing=False should classify every request as server traffic"""
+
+        async def app(scope, receive, send):
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+
+        middleware = UsageTrackingMiddleware(
+            app, service_name="notification-service", settings=_settings(), user_facing=False
+        )
+        middleware._running = True
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": "/api/notifications",
+            "headers": [(b"user-agent", b"Mozilla/5.0")],
+            "query_string": b"",
+        }
+
+        with patch("cartographer_usage.middleware._capture_posthog_api_event") as mock_capture:
+            await middleware(scope, AsyncMock(), AsyncMock())
+
+        assert mock_capture.call_args.kwargs["is_user_generated"] is False
+
+    async def test_shutdown_gives_up_when_metrics_is_unreachable(self):
+        """Shutdown should not spin forever on records that cannot be sent"""
+
+        async def app(scope, receive, send):
+            pass
+
+        middleware = UsageTrackingMiddleware(
+            app,
+            service_name="backend",
+            settings=_settings(),
+            reporter=AsyncMock(side_effect=ConnectionError("down")),
+        )
+        middleware._buffer.append(
+            UsageRecord("/api/x", "GET", "backend", 200, 1.0, datetime.utcnow())
+        )
+
+        await asyncio.wait_for(middleware.shutdown(), timeout=1)
+
+        assert len(middleware._buffer) == 1
+
+
+class TestStreamingResponses:
+    """Tests for streamed (SSE and proxied) responses"""
+
+    async def test_stream_chunks_pass_through_unbuffered(self):
+        """Should forward each chunk as the app sends it and record once at the response head"""
+        from fastapi import FastAPI
+        from starlette.responses import StreamingResponse
+
+        app = FastAPI()
+
+        @app.get("/api/events/{network_id}")
+        async def events(network_id: int):
+            async def chunks():
+                for i in range(3):
+                    yield f"data: {i}\n\n"
+
+            return StreamingResponse(chunks(), media_type="text/event-stream")
+
+        middleware = UsageTrackingMiddleware(app, service_name="backend", settings=_settings())
+        middleware._running = True
+        sent = []
+
+        async def receive():
+            # The client stays connected until the stream ends
+            await asyncio.Event().wait()
+
+        async def send(message):
+            sent.append((message, len(middleware._buffer)))
+
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": "/api/events/1",
+            "headers": [],
+            "query_string": b"",
+        }
+        await middleware(scope, receive, send)
+
+        bodies = [m["body"] for m, _ in sent if m["type"] == "http.response.body" and m["body"]]
+        assert bodies == [b"data: 0\n\n", b"data: 1\n\n", b"data: 2\n\n"]
+        assert all(buffered == 1 for _, buffered in sent)
+        assert middleware._buffer[0].endpoint == "/api/events/{network_id}"